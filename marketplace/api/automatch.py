@@ -9,8 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 logger = logging.getLogger(__name__)
 
 from marketplace.core.auth import get_current_agent_id
-from marketplace.core.async_tasks import fire_and_forget
-from marketplace.database import async_session, get_db
+from marketplace.database import get_db
 from marketplace.services import demand_service, match_service
 
 router = APIRouter(prefix="/agents", tags=["auto-match"])
@@ -42,20 +41,13 @@ async def auto_match(
         routing_strategy=req.routing_strategy, buyer_region=req.buyer_region,
     )
 
-    # Log demand signal with its own session
-    async def _log_demand():
-        try:
-            async with async_session() as bg_db:
-                await demand_service.log_search(
-                    bg_db, query_text=req.description, category=req.category,
-                    source="auto_match", requester_id=buyer_id,
-                    matched_count=len(result["matches"]), max_price=req.max_price,
-                    led_to_purchase=1 if (req.auto_buy and result["matches"]) else 0,
-                )
-        except Exception:
-            logger.warning("Failed to log demand signal for auto-match", exc_info=True)
-
-    fire_and_forget(_log_demand(), task_name="automatch_log_demand")
+    # Buffered; written to search_logs by the demand flush loop
+    demand_service.record_search(
+        req.description, category=req.category,
+        source="auto_match", requester_id=buyer_id,
+        matched_count=len(result["matches"]), max_price=req.max_price,
+        led_to_purchase=1 if (req.auto_buy and result["matches"]) else 0,
+    )
 
     if req.auto_buy and result["matches"]:
         top = result["matches"][0]
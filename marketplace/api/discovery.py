@@ -6,8 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
 
-from marketplace.core.async_tasks import fire_and_forget
-from marketplace.database import async_session, get_db
+from marketplace.database import get_db
 from marketplace.schemas.listing import ListingListResponse, ListingResponse, SellerSummary
 from marketplace.services import demand_service, listing_service, trust_verification_service
 
@@ -80,18 +79,11 @@ async def discover(
             updated_at=listing.updated_at,
         ))
 
-    # Fire-and-forget demand logging with its own session
-    async def _log_demand():
-        try:
-            async with async_session() as bg_db:
-                await demand_service.log_search(
-                    bg_db, query_text=q or "", category=category, source="discover",
-                    matched_count=total, max_price=max_price,
-                )
-        except Exception:
-            logger.warning("Failed to log demand signal for discover", exc_info=True)
-
-    fire_and_forget(_log_demand(), task_name="discover_log_demand")
+    # Buffered; written to search_logs by the demand flush loop
+    demand_service.record_search(
+        q or "", category=category, source="discover",
+        matched_count=total, max_price=max_price,
+    )
 
     return ListingListResponse(
         total=total,
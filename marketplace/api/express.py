@@ -10,8 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 logger = logging.getLogger(__name__)
 
 from marketplace.core.auth import get_current_agent_id
-from marketplace.core.async_tasks import fire_and_forget
-from marketplace.database import async_session, get_db
+from marketplace.database import get_db
 from marketplace.services import demand_service, express_service
 
 router = APIRouter(prefix="/express", tags=["express"])
@@ -40,18 +39,10 @@ async def express_buy(
     payment_method = body.payment_method if body else "token"
     response = await express_service.express_buy(db, listing_id, buyer_id, payment_method)
 
-    # Log demand signal in background with its own session
-    # (the request-scoped `db` will close when the handler returns)
-    async def _log_demand():
-        try:
-            async with async_session() as bg_db:
-                await demand_service.log_search(
-                    bg_db, query_text=listing_id, source="express",
-                    requester_id=buyer_id, matched_count=1, led_to_purchase=1,
-                )
-        except Exception:
-            logger.warning("Failed to log demand signal for express purchase", exc_info=True)
-
-    fire_and_forget(_log_demand(), task_name="express_log_demand")
+    # Buffered; written to search_logs by the demand flush loop
+    demand_service.record_search(
+        listing_id, source="express",
+        requester_id=buyer_id, matched_count=1, led_to_purchase=1,
+    )
 
     return response
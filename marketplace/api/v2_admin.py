@@ -17,7 +17,11 @@ from marketplace.schemas.dashboard import (
     AdminSecurityEventsResponse,
     AdminUsageResponse,
 )
-from marketplace.services import admin_dashboard_service, redemption_service
+from marketplace.services import (
+    admin_dashboard_service,
+    listing_trust_pipeline,
+    redemption_service,
+)
 
 router = APIRouter(prefix="/admin", tags=["admin-v2"])
 
@@ -131,6 +135,17 @@ async def admin_reject_payout(
         raise HTTPException(status_code=400, detail=str(exc))
 
 
+@router.post("/listings/reverify", status_code=202)
+async def admin_reverify_listings(
+    status: str = Query("active", max_length=20),
+    ctx: AuthContext = Depends(require_role("admin")),
+):
+    listing_trust_pipeline.schedule_reverify_all_listings(
+        status=status, requested_by=ctx.actor_id,
+    )
+    return {"scheduled": True, "status": status}
+
+
 @router.get("/events/stream-token")
 async def admin_stream_token(
     ctx: AuthContext = Depends(require_role("admin")),
@@ -30,10 +30,10 @@ from marketplace.services.billing_v2_service import (
     change_plan,
     get_plan,
     get_plan_limits,
+    get_period_usage,
     get_plans,
     get_subscription,
     get_subscription_with_plan,
-    get_usage,
     list_invoices_paginated,
     plan_to_response,
     subscribe,
@@ -434,20 +434,16 @@ async def billing_my_usage(
     agent_id: str = Depends(get_current_agent_id),
 ) -> list[UsageMeterResponse]:
     """Get the current agent's usage meters for this billing period."""
-    from marketplace.services.billing_v2_service import (
-        METRICS,
-        _current_period_start,
-    )
+    from marketplace.services.billing_v2_service import METRICS
 
     # Fetch subscription + plan once (avoids 9 queries from 3x check_limits)
     _, plan = await get_subscription_with_plan(db, agent_id)
     limits = get_plan_limits(plan) if plan else {}
-    period_start = _current_period_start()
+    period_usage = await get_period_usage(db, agent_id)
 
     results: list[UsageMeterResponse] = []
     for metric in METRICS:
-        usage_records = await get_usage(db, agent_id, metric, period_start)
-        current = sum(float(u.value) for u in usage_records)
+        current = period_usage.get(metric, 0.0)
         limit = limits.get(metric, 0)
         percent = round((current / limit) * 100, 1) if limit > 0 else 0.0
         results.append(
@@ -8,16 +8,20 @@ Provides endpoints for:
 
 from __future__ import annotations
 
+import json
 import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from marketplace.core.auth import get_current_agent_id
 from marketplace.database import get_db
+from marketplace.models.compliance_job import ComplianceJob
+from marketplace.services import compliance_service
 
 router = APIRouter(prefix="/compliance", tags=["compliance"])
 
@@ -25,8 +29,6 @@ router = APIRouter(prefix="/compliance", tags=["compliance"])
 # In-memory stores (replace with DB-backed persistence in production)
 # ---------------------------------------------------------------------------
 
-_export_jobs: dict[str, dict] = {}
-_deletion_requests: dict[str, dict] = {}
 _consent_records: dict[str, list[dict]] = {}  # agent_id -> [consent records]
 
 
@@ -39,7 +41,10 @@ class DataExportRequest(BaseModel):
         default=None,
         description="Target agent ID for export. Defaults to the authenticated agent.",
     )
-    format: str = Field(default="json", description="Export format: json or csv")
+    format: str = Field(
+        default="json",
+        description="Export format: json (NDJSON), zip (per-table NDJSON) or csv (per-table CSV in a zip)",
+    )
     include_transactions: bool = Field(default=True)
     include_listings: bool = Field(default=True)
     include_reputation: bool = Field(default=True)
@@ -53,6 +58,9 @@ class DataExportStatusResponse(BaseModel):
     created_at: str
     completed_at: Optional[str] = None
     download_url: Optional[str] = None
+    progress: dict[str, int] = Field(default_factory=dict)
+    size_bytes: Optional[int] = None
+    error: Optional[str] = None
 
 
 class DataDeletionRequest(BaseModel):
@@ -75,6 +83,8 @@ class DataDeletionStatusResponse(BaseModel):
     soft_delete: bool
     created_at: str
     completed_at: Optional[str] = None
+    progress: dict[str, int] = Field(default_factory=dict)
+    error: Optional[str] = None
 
 
 class ConsentRecord(BaseModel):
@@ -95,6 +105,60 @@ class ConsentRecordResponse(BaseModel):
     recorded_at: str
 
 
+# ---------------------------------------------------------------------------
+# Job serialization
+# ---------------------------------------------------------------------------
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+def _export_status(job: ComplianceJob) -> DataExportStatusResponse:
+    return DataExportStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        agent_id=job.agent_id,
+        format=job.format,
+        created_at=_iso(job.created_at),
+        completed_at=_iso(job.completed_at),
+        download_url=(
+            f"/api/v2/compliance/data-export/{job.id}/download"
+            if job.status == "completed" else None
+        ),
+        progress=json.loads(job.progress_json or "{}"),
+        size_bytes=job.artifact_size,
+        error=job.failure_reason,
+    )
+
+
+def _deletion_status(job: ComplianceJob) -> DataDeletionStatusResponse:
+    return DataDeletionStatusResponse(
+        request_id=job.id,
+        status=job.status,
+        agent_id=job.agent_id,
+        reason=job.reason or "",
+        soft_delete=job.soft_delete,
+        created_at=_iso(job.created_at),
+        completed_at=_iso(job.completed_at),
+        progress=json.loads(job.progress_json or "{}"),
+        error=job.failure_reason,
+    )
+
+
+async def _owned_job(db: AsyncSession, job_id: str, kind: str, agent_id: str) -> ComplianceJob:
+    job = await compliance_service.get_job(db, job_id, kind)
+    if job is None:
+        label = "Export job" if kind == "export" else "Deletion request"
+        raise HTTPException(status_code=404, detail=f"{label} not found")
+    if job.agent_id != agent_id:
+        label = "export job" if kind == "export" else "deletion request"
+        raise HTTPException(
+            status_code=403,
+            detail=f"You do not have access to this {label}",
+        )
+    return job
+
+
 # ---------------------------------------------------------------------------
 # Data export endpoints
 # ---------------------------------------------------------------------------
@@ -107,8 +171,8 @@ async def request_data_export(
 ):
     """Request a GDPR data export for the authenticated agent.
 
-    Creates an asynchronous export job and returns the ``job_id``
-    which can be polled for status and download.
+    Creates a background export job and returns the ``job_id``, which can
+    be polled for progress and, once completed, a download link.
     """
     target_agent_id = req.agent_id or agent_id
     if target_agent_id != agent_id:
@@ -117,53 +181,50 @@ async def request_data_export(
             detail="You can only request data exports for your own account",
         )
 
-    job_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
-
-    _export_jobs[job_id] = {
-        "job_id": job_id,
-        "status": "processing",
-        "agent_id": target_agent_id,
-        "format": req.format,
-        "include_transactions": req.include_transactions,
-        "include_listings": req.include_listings,
-        "include_reputation": req.include_reputation,
-        "created_at": now,
-        "completed_at": None,
-        "download_url": None,
-    }
-
-    # In production this would enqueue a background task.
-    # For now, mark as completed immediately with a placeholder URL.
-    _export_jobs[job_id]["status"] = "completed"
-    _export_jobs[job_id]["completed_at"] = now
-    _export_jobs[job_id]["download_url"] = f"/api/v2/compliance/data-export/{job_id}/download"
-
-    return DataExportStatusResponse(**{
-        k: _export_jobs[job_id][k]
-        for k in DataExportStatusResponse.model_fields
-    })
+    try:
+        job = await compliance_service.create_export_job(
+            db,
+            target_agent_id,
+            format=req.format,
+            include_transactions=req.include_transactions,
+            include_listings=req.include_listings,
+            include_reputation=req.include_reputation,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _export_status(job)
 
 
 @router.get("/data-export/{job_id}", response_model=DataExportStatusResponse)
 async def get_data_export_status(
     job_id: str,
+    db: AsyncSession = Depends(get_db),
     agent_id: str = Depends(get_current_agent_id),
 ):
     """Get the status of a data export job and its download link when ready."""
-    job = _export_jobs.get(job_id)
-    if job is None:
-        raise HTTPException(status_code=404, detail="Export job not found")
+    return _export_status(await _owned_job(db, job_id, "export", agent_id))
 
-    if job["agent_id"] != agent_id:
-        raise HTTPException(
-            status_code=403,
-            detail="You do not have access to this export job",
-        )
 
-    return DataExportStatusResponse(**{
-        k: job[k] for k in DataExportStatusResponse.model_fields
-    })
+@router.get("/data-export/{job_id}/download")
+async def download_data_export(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    agent_id: str = Depends(get_current_agent_id),
+):
+    """Stream the finished export artifact from content storage."""
+    job = await _owned_job(db, job_id, "export", agent_id)
+    artifact = await compliance_service.open_export_artifact(job)
+    if artifact is None:
+        raise HTTPException(status_code=409, detail=f"Export is not ready (status: {job.status})")
+    chunks, media_type = artifact
+    extension = "ndjson" if job.format == "json" else "zip"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="export-{job.id}.{extension}"',
+        },
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -178,7 +239,7 @@ async def request_data_deletion(
 ):
     """Request right-to-deletion (GDPR Article 17) for the authenticated agent.
 
-    Creates an asynchronous deletion request and returns the ``request_id``
+    Creates a background deletion job and returns the ``request_id``
     which can be polled for status.
     """
     target_agent_id = req.agent_id or agent_id
@@ -188,44 +249,20 @@ async def request_data_deletion(
             detail="You can only request data deletion for your own account",
         )
 
-    request_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
-
-    _deletion_requests[request_id] = {
-        "request_id": request_id,
-        "status": "pending",
-        "agent_id": target_agent_id,
-        "reason": req.reason,
-        "soft_delete": req.soft_delete,
-        "created_at": now,
-        "completed_at": None,
-    }
-
-    return DataDeletionStatusResponse(**{
-        k: _deletion_requests[request_id][k]
-        for k in DataDeletionStatusResponse.model_fields
-    })
+    job = await compliance_service.create_deletion_job(
+        db, target_agent_id, reason=req.reason, soft_delete=req.soft_delete,
+    )
+    return _deletion_status(job)
 
 
 @router.get("/data-deletion/{request_id}", response_model=DataDeletionStatusResponse)
 async def get_data_deletion_status(
     request_id: str,
+    db: AsyncSession = Depends(get_db),
     agent_id: str = Depends(get_current_agent_id),
 ):
     """Get the status of a data deletion request."""
-    request = _deletion_requests.get(request_id)
-    if request is None:
-        raise HTTPException(status_code=404, detail="Deletion request not found")
-
-    if request["agent_id"] != agent_id:
-        raise HTTPException(
-            status_code=403,
-            detail="You do not have access to this deletion request",
-        )
-
-    return DataDeletionStatusResponse(**{
-        k: request[k] for k in DataDeletionStatusResponse.model_fields
-    })
+    return _deletion_status(await _owned_job(db, request_id, "deletion", agent_id))
 
 
 # ---------------------------------------------------------------------------
@@ -13,6 +13,7 @@ from marketplace.core.auth_context import AuthContext
 from marketplace.core.trust_gate import require_trust_tier
 from marketplace.database import get_db
 from marketplace.services import mcp_federation_service
+from marketplace.services.mcp_routing_table import mcp_routing_table
 
 router = APIRouter(prefix="/federation", tags=["mcp-federation"])
 
@@ -170,6 +171,7 @@ async def update_server(
 
     await db.commit()
     await db.refresh(server)
+    mcp_routing_table.upsert(server)
     return _server_to_dict(server)
 
 
@@ -14,6 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from marketplace.config import settings
 from marketplace.database import get_db
+from marketplace.services.billing_v2_service import invalidate_plan_cache
 from marketplace.services.stripe_service import StripePaymentService
 
 # Maximum age for webhook events (5 minutes) to prevent replay attacks
@@ -269,6 +270,7 @@ async def _handle_subscription_created(event: dict, db: AsyncSession) -> None:
         existing.stripe_subscription_id = stripe_sub_id
         existing.status = "active"
         await db.commit()
+        invalidate_plan_cache(agent_id)
         logger.info("Activated subscription %s with stripe_id=%s", existing.id, stripe_sub_id)
         return
 
@@ -327,6 +329,7 @@ async def _handle_subscription_updated(event: dict, db: AsyncSession) -> None:
 
     sub.cancel_at_period_end = sub_obj.get("cancel_at_period_end", False)
     await db.commit()
+    invalidate_plan_cache(sub.agent_id)
     logger.info("Subscription updated: stripe_id=%s status=%s", stripe_sub_id, sub.status)
 
 
@@ -348,6 +351,7 @@ async def _handle_subscription_deleted(event: dict, db: AsyncSession) -> None:
 
     sub.status = "cancelled"
     await db.commit()
+    invalidate_plan_cache(sub.agent_id)
     logger.info("Subscription cancelled: stripe_id=%s agent=%s", stripe_sub_id, sub.agent_id)
 
 
@@ -386,6 +390,7 @@ async def _handle_invoice_payment_succeeded(event: dict, db: AsyncSession) -> No
         if sub and sub.status == "past_due":
             sub.status = "active"
             await db.commit()
+            invalidate_plan_cache(sub.agent_id)
             logger.info("Subscription reactivated after payment: stripe_sub=%s", stripe_sub_id)
 
 
@@ -410,6 +415,7 @@ async def _handle_invoice_payment_failed(event: dict, db: AsyncSession) -> None:
 
     sub.status = "past_due"
     await db.commit()
+    invalidate_plan_cache(sub.agent_id)
     logger.warning("Subscription set to past_due after payment failure: stripe_sub=%s", stripe_sub_id)
 
 
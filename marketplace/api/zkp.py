@@ -1,12 +1,12 @@
 """ZKP endpoints: pre-purchase verification without revealing content."""
 
-import json
 import logging
 
 from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from marketplace.core.auth import get_current_agent_id
 from marketplace.database import get_db
 from marketplace.services import zkp_service
 
@@ -36,7 +36,7 @@ async def get_proofs(
                 "id": p.id,
                 "proof_type": p.proof_type,
                 "commitment": p.commitment,
-                "public_inputs": json.loads(p.public_inputs),
+                "public_inputs": zkp_service.public_inputs_for(p),
                 "created_at": p.created_at.isoformat() if p.created_at else None,
             }
             for p in proofs
@@ -89,3 +89,33 @@ async def bloom_check(
             "error": "Internal server error",
             "probably_present": False,
         }
+
+
+@router.get("/{listing_id}/merkle/proof")
+async def merkle_inclusion_proof(
+    listing_id: str,
+    chunk: int = Query(..., ge=0),
+    db: AsyncSession = Depends(get_db),
+    _caller: str = Depends(get_current_agent_id),
+):
+    """Inclusion proof for one 1KB chunk against the listing's Merkle root.
+
+    Hash the chunk with SHA-256, then fold in each sibling on the given side
+    to recompute the root.
+    """
+    return await zkp_service.get_inclusion_proof(db, listing_id, chunk)
+
+
+@router.get("/{listing_id}/chunks")
+async def get_verified_chunks(
+    listing_id: str,
+    start: int = Query(0, ge=0),
+    count: int = Query(64, ge=1, le=zkp_service.MAX_CHUNKS_PER_REQUEST),
+    db: AsyncSession = Depends(get_db),
+    agent_id: str = Depends(get_current_agent_id),
+):
+    """Partial content delivery: a chunk range with per-chunk inclusion proofs.
+
+    Available to the seller and to buyers with a paid transaction.
+    """
+    return await zkp_service.get_verified_chunks(db, listing_id, agent_id, start, count)
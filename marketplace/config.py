@@ -20,6 +20,15 @@ class Settings(BaseSettings):
 
     # Content storage — local HashFS path
     content_store_path: str = "./data/content_store"
+    content_chunking_min_bytes: int = 64 * 1024  # larger content is chunked and deduplicated; smaller is stored verbatim
+    content_compression: str = "zstd"  # zstd | none — chunk compression (needs the zstandard package)
+    content_compression_level: int = 3
+    content_store_io_workers: int = 16  # threads serving async storage calls, per store
+    content_gc_interval_hours: float = 24.0  # mark-and-sweep of unreferenced blobs; 0 disables
+    content_gc_grace_hours: float = 24.0  # blobs younger than this are never swept (uploads in flight)
+    content_scrub_interval_seconds: float = 600.0  # pause between scrub passes; 0 disables
+    content_scrub_batch_objects: int = 500  # blobs re-hashed per scrub pass
+    content_scrub_bytes_per_second: int = 8 * 1024 * 1024  # read budget of the scrubber
 
     # Auth
     jwt_secret_key: str = "dev-secret-change-in-production"
@@ -40,6 +49,11 @@ class Settings(BaseSettings):
     # Billing
     platform_fee_pct: float = 0.02  # 2% fee on purchases
     signup_bonus_usd: float = 0.10  # $0.10 welcome credit for new agents
+    usage_flush_interval_seconds: float = 5.0  # background flush of buffered usage counters
+    usage_flush_batch_size: int = 500  # pending counter keys that force an inline flush
+    usage_counter_ttl_seconds: float = 30.0  # re-read running totals written by other workers
+    usage_counter_cache_size: int = 10_000  # running totals kept per process (LRU)
+    billing_plan_cache_ttl_seconds: float = 60.0  # cached plan limits per agent
 
     # CORS
     cors_origins: str = "http://localhost:5173,http://localhost:3000"
@@ -48,10 +62,36 @@ class Settings(BaseSettings):
     mcp_enabled: bool = True
     mcp_rate_limit_per_minute: int = 60
 
+    # Listing trust pipeline
+    listing_trust_background: bool = True  # run proofs + strict verification off the request path
+    trust_reverify_concurrency: int = 8  # max listings re-verified in parallel
+
     # CDN
     cdn_hot_cache_max_bytes: int = 256 * 1024 * 1024  # 256MB
     cdn_decay_interval_seconds: int = 60
 
+    # Zero-knowledge proofs
+    zkp_merkle_cache_max_bytes: int = 64 * 1024 * 1024  # decoded Merkle trees kept in memory
+
+    # Demand Intelligence
+    demand_search_flush_interval_seconds: float = 2.0  # background bulk insert of buffered searches
+    demand_search_flush_batch_size: int = 1000  # buffered searches that force a flush
+    demand_search_buffer_max: int = 50_000  # oldest searches are dropped beyond this (DB outage)
+    demand_late_arrival_seconds: float = 60.0  # re-scan window for searches flushed late by other workers
+
+    # Fraud Prevention
+    fraud_graph_window_days: int = 7  # completed trades that form the Sybil trade graph
+    fraud_graph_rebuild_seconds: float = 3600.0  # full rebuild drops trades that left the window
+
+    # Compliance (GDPR)
+    compliance_export_batch_size: int = 1000  # rows fetched per server-side cursor round trip
+    compliance_deletion_batch_size: int = 500  # rows anonymized/deleted per committed batch
+
+    # Data Retention
+    retention_batch_size: int = 5000  # rows redacted/deleted per committed batch
+    retention_interval_hours: float = 12.0  # how often the retention policies run
+    retention_partitions_ahead: int = 2  # monthly partitions pre-created for partitioned tables (PostgreSQL)
+
     # OpenClaw Integration
     openclaw_webhook_max_retries: int = 3
     openclaw_webhook_timeout_seconds: int = 10
@@ -70,6 +110,11 @@ class Settings(BaseSettings):
     creator_royalty_mode: str = "full"  # "full" | "percentage"
     creator_min_withdrawal_usd: float = 10.00  # Minimum $10 USD for withdrawal
     creator_payout_day: int = 1  # Day of month for auto-payout
+    payout_batch_chunk_size: int = 500  # Items per chunk of a payout run
+    payout_batch_concurrency: int = 8  # Chunks processed at once (SQLite runs them serially)
+    payout_provider_concurrency: int = 4  # In-flight calls per payout provider
+    payout_provider_rate_limits: str = "upi=20,bank_withdrawal=10,gift_card=10"  # Calls/sec per provider
+    payout_max_attempts: int = 3  # A failed item is retried by later runs up to this many times
 
     # Redemption
     redemption_min_api_credits_usd: float = 0.10
@@ -95,12 +140,19 @@ class Settings(BaseSettings):
 
     # Redis (for multi-instance rate limiting and caching)
     redis_url: str = ""  # e.g. "redis://localhost:6379/0" or Azure Redis "rediss://:password@host:6380/0"
+    cache_l2_enabled: bool = True  # share listing/agent caches through Redis when redis_url is set
+    cache_invalidation_channel: str = "agentchains:cache-invalidate"
 
     # Azure Key Vault
     azure_keyvault_url: str = ""  # e.g. "https://agentchains-kv.vault.azure.net/"
 
     # Azure Service Bus
     azure_servicebus_connection: str = ""  # Service Bus connection string
+    azure_servicebus_prefetch_count: int = 20  # messages buffered per long-lived receiver
+    local_queue_path: str = ""  # SQLite file for the local queue backend; empty keeps it in memory
+    local_queue_visibility_timeout_seconds: float = 30.0  # lock duration of a received message
+    local_queue_max_delivery_count: int = 10  # deliveries before a message is dead-lettered
+    webhook_consumer_enabled: bool = True  # drain the webhooks queue in a background task
 
     # Azure AI Search
     azure_search_endpoint: str = ""  # e.g. "https://agentchains-search.search.windows.net"
@@ -119,14 +171,34 @@ class Settings(BaseSettings):
     a2ui_max_sessions_per_agent: int = 10
     a2ui_rate_limit_per_minute: int = 60
 
+    # GraphQL
+    graphql_max_depth: int = 5
+    graphql_max_complexity: int = 10_000  # fields x requested page sizes per operation
+    graphql_persisted_queries_enabled: bool = True
+    graphql_persisted_query_cache_size: int = 1000
+    graphql_document_cache_size: int = 256  # parsed + validated documents kept in memory
+
     # MCP Federation
     mcp_federation_enabled: bool = True
     mcp_federation_health_interval_seconds: int = 30
+    mcp_federation_health_max_concurrency: int = 200  # health probes in flight at once
+    mcp_federation_routing_ttl_seconds: float = 5.0  # reload the routing table from DB after this
+    mcp_federation_lb_strategy: str = "peak_ewma"  # round_robin | least_loaded | weighted | health_first | peak_ewma
+    mcp_federation_latency_decay_seconds: float = 10.0  # peak-EWMA decay time constant
+    mcp_federation_max_connections_per_server: int = 50
 
     # Orchestration
     orchestration_enabled: bool = True
     orchestration_max_concurrent_workflows: int = 50
     orchestration_default_budget_usd: float = 10.0
+    orchestration_plan_cache_size: int = 500
+    orchestration_plan_cache_ttl_seconds: int = 3600
+    orchestration_plan_cache_semantic: bool = False  # also reuse plans for near-identical wordings
+    orchestration_discovery_concurrency: int = 8  # capability lookups run in parallel sessions
+    capability_index_sync_interval_seconds: float = 1.0  # how often lookups re-check DB watermarks
+    chain_provenance_flush_interval_seconds: float = 0.5  # journal bulk-insert cadence per execution
+    chain_provenance_flush_batch_size: int = 200  # pending events that trigger an early flush
+    chain_provenance_inline_hash_bytes: int = 65_536  # larger node payloads are hashed in a worker thread
 
     # Structured Logging (Layer 5)
     log_format: str = "console"  # "console" | "json"
@@ -145,6 +217,15 @@ class Settings(BaseSettings):
     foundry_local_default_model: str = "phi-4-mini"
     ollama_base_url: str = "http://localhost:11434"
     ollama_default_model: str = "llama3.2"
+    model_routing_adaptive: bool = True  # reorder fallback chain by observed latency/errors
+    model_hedging_enabled: bool = False  # backup request to the next provider after p95 latency
+    model_provider_max_concurrency: int = 16
+    model_cache_enabled: bool = True
+    model_cache_max_entries: int = 1000
+    model_cache_ttl_seconds: int = 3600
+    model_cache_semantic_enabled: bool = False  # reuse answers to near-identical temperature-0 prompts
+    model_cache_semantic_threshold: float = 0.95
+    model_cache_sqlite_path: str = ""  # e.g. "./data/completion_cache.db"; empty keeps the cache in memory
 
     # Memory Layer (Layer 6)
     memory_embedding_model: str = ""
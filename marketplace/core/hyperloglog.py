@@ -0,0 +1,87 @@
+"""HyperLogLog cardinality sketch.
+
+Counts distinct values in a fixed amount of memory: ``2**precision`` one-byte
+registers, with a standard error of about ``1.04 / sqrt(2**precision)``
+(3.25% at the default precision of 10). Sketches merge by taking the
+register-wise maximum, so per-period sketches can be combined into a count
+for any range of periods.
+
+Until it holds ``2**precision / 8`` distinct registers a sketch stores them in
+a dict, which keeps the many small sketches (a handful of requesters per
+bucket) cheap. At small cardinalities the estimate uses linear counting and
+is effectively exact.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+
+
+class HyperLogLog:
+    __slots__ = ("_p", "_m", "_sparse", "_dense")
+
+    def __init__(self, precision: int = 10) -> None:
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self._p = precision
+        self._m = 1 << precision
+        self._sparse: dict[int, int] | None = {}
+        self._dense: bytearray | None = None
+
+    def add(self, value: str) -> None:
+        x = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = x >> (64 - self._p)
+        rest = x & ((1 << (64 - self._p)) - 1)
+        rank = (64 - self._p) - rest.bit_length() + 1
+        self._set(index, rank)
+
+    def merge(self, other: HyperLogLog) -> None:
+        """Fold ``other`` (same precision) into this sketch."""
+        if other._p != self._p:
+            raise ValueError("cannot merge sketches of different precision")
+        if other._dense is not None:
+            for index, rank in enumerate(other._dense):
+                if rank:
+                    self._set(index, rank)
+        else:
+            for index, rank in other._sparse.items():
+                self._set(index, rank)
+
+    def count(self) -> int:
+        if self._dense is not None:
+            registers = self._dense
+            zeros = registers.count(0)
+            raw = sum(2.0 ** -r for r in registers)
+        else:
+            zeros = self._m - len(self._sparse)
+            raw = zeros + sum(2.0 ** -r for r in self._sparse.values())
+        estimate = self._alpha() * self._m * self._m / raw
+        if estimate <= 2.5 * self._m and zeros:
+            estimate = self._m * math.log(self._m / zeros)
+        return round(estimate)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def _set(self, index: int, rank: int) -> None:
+        if self._dense is not None:
+            if rank > self._dense[index]:
+                self._dense[index] = rank
+            return
+        if rank > self._sparse.get(index, 0):
+            self._sparse[index] = rank
+            if len(self._sparse) > self._m // 8:
+                self._dense = bytearray(self._m)
+                for i, r in self._sparse.items():
+                    self._dense[i] = r
+                self._sparse = None
+
+    def _alpha(self) -> float:
+        if self._m == 16:
+            return 0.673
+        if self._m == 32:
+            return 0.697
+        if self._m == 64:
+            return 0.709
+        return 0.7213 / (1 + 1.079 / self._m)
@@ -52,6 +52,54 @@ MODEL_TOKENS_TOTAL = Counter(
     ["model", "provider", "direction"],  # direction: prompt | completion
 )
 
+MODEL_PROVIDER_LATENCY = Histogram(
+    "model_provider_duration_seconds",
+    "Model provider completion latency in seconds",
+    ["provider", "outcome"],  # outcome: success | error
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+MODEL_TIME_TO_FIRST_TOKEN = Histogram(
+    "model_time_to_first_token_seconds",
+    "Time from stream start to the first generated text",
+    ["provider"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+MODEL_HEDGED_REQUESTS = Counter(
+    "model_hedged_requests_total",
+    "Backup completion requests launched after the hedge deadline",
+    ["provider"],
+)
+
+MODEL_CACHE_LOOKUPS = Counter(
+    "model_cache_lookups_total",
+    "Completion cache lookups by result",
+    ["result"],  # result: exact_hit | semantic_hit | miss | bypass
+)
+
+MODEL_CACHE_LATENCY_SAVED = Counter(
+    "model_cache_latency_saved_seconds_total",
+    "Provider latency avoided by serving completions from cache",
+)
+
+# ---------------------------------------------------------------------------
+# MCP federation metrics
+# ---------------------------------------------------------------------------
+
+MCP_FEDERATION_CALL_LATENCY = Histogram(
+    "mcp_federation_call_duration_seconds",
+    "Upstream latency of federated MCP tool calls per server",
+    ["server", "outcome"],  # outcome: success | http_error | error
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+MCP_FEDERATION_COALESCED_CALLS = Counter(
+    "mcp_federation_coalesced_calls_total",
+    "Federated tool calls served by joining an identical in-flight call",
+    ["namespace"],
+)
+
 # ---------------------------------------------------------------------------
 # Workflow / orchestration metrics
 # ---------------------------------------------------------------------------
@@ -61,8 +109,94 @@ ACTIVE_WORKFLOWS = Gauge(
     "Number of currently running workflows",
 )
 
+ORCHESTRATOR_PLAN_CACHE_LOOKUPS = Counter(
+    "orchestrator_plan_cache_lookups_total",
+    "SmartOrchestrator plan cache lookups by result",
+    ["result"],  # result: hit | semantic_hit | stale | miss
+)
+
+ORCHESTRATOR_PLANNING_SECONDS = Histogram(
+    "orchestrator_planning_duration_seconds",
+    "Time to produce an executable plan for a composed task",
+    ["source"],  # source: cache | llm
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
 CIRCUIT_BREAKER_STATE = Gauge(
     "circuit_breaker_state",
     "Circuit breaker state (0=closed, 1=open, 2=half-open)",
     ["agent_id"],
 )
+
+# ---------------------------------------------------------------------------
+# Abuse detection metrics
+# ---------------------------------------------------------------------------
+
+ABUSE_ANOMALIES_DETECTED = Counter(
+    "abuse_anomalies_detected_total",
+    "Anomalies raised by abuse detection rules",
+    ["rule", "mode"],  # mode: scan | stream
+)
+
+# ---------------------------------------------------------------------------
+# Data retention metrics
+# ---------------------------------------------------------------------------
+
+RETENTION_ROWS_PROCESSED = Counter(
+    "retention_rows_processed_total",
+    "Rows redacted or deleted by retention policies",
+    ["policy", "action"],  # action: redact | delete
+)
+
+RETENTION_PARTITIONS_DROPPED = Counter(
+    "retention_partitions_dropped_total",
+    "Expired partitions dropped by retention policies",
+    ["policy"],
+)
+
+RETENTION_RUN_SECONDS = Histogram(
+    "retention_run_duration_seconds",
+    "Time to apply one retention policy",
+    ["policy"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0, 600.0),
+)
+
+# ---------------------------------------------------------------------------
+# Content storage maintenance metrics
+# ---------------------------------------------------------------------------
+
+CONTENT_STORE_OBJECTS = Gauge(
+    "content_store_objects",
+    "Blobs in content storage, as of the last stats read",
+)
+
+CONTENT_STORE_BYTES = Gauge(
+    "content_store_bytes",
+    "Bytes in content storage, as of the last stats read",
+)
+
+CONTENT_GC_SWEPT = Counter(
+    "content_gc_swept_total",
+    "Unreferenced blobs removed by storage GC",
+)
+
+CONTENT_SCRUB_BYTES = Counter(
+    "content_scrub_bytes_total",
+    "Bytes re-hashed by the storage scrubber",
+)
+
+CONTENT_SCRUB_FAILURES = Counter(
+    "content_scrub_failures_total",
+    "Blobs the scrubber found damaged",
+    ["reason"],  # reason: corrupt | missing
+)
+
+# ---------------------------------------------------------------------------
+# Shared cache metrics
+# ---------------------------------------------------------------------------
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Tiered cache lookups by the level that answered",
+    ["cache", "result"],  # result: l1_hit | l2_hit | miss
+)
@@ -9,7 +9,7 @@ from __future__ import annotations
 import logging
 from datetime import datetime, timezone
 
-from sqlalchemy import delete, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from marketplace.models.revoked_token import RevokedToken
@@ -148,9 +148,6 @@ async def is_actor_tokens_revoked_after(
 
 async def cleanup_expired(db: AsyncSession) -> int:
     """Delete revoked token records that have expired (housekeeping)."""
-    now = datetime.now(timezone.utc)
-    result = await db.execute(
-        delete(RevokedToken).where(RevokedToken.expires_at < now)
-    )
-    await db.commit()
-    return result.rowcount or 0
+    from marketplace.services.retention_service import EXPIRED_REVOKED_TOKENS, apply_policy
+
+    return await apply_policy(db, EXPIRED_REVOKED_TOKENS)
@@ -44,6 +44,9 @@ _SQLITE_COLUMN_MIGRATIONS: dict[str, list[tuple[str, str]]] = {
         ("provenance_json", "TEXT DEFAULT '{}'"),
         ("verification_updated_at", "DATETIME"),
     ],
+    "zk_proofs": [
+        ("proof_blob", "BLOB"),
+    ],
 }
 
 # PostgreSQL additive column migrations — same idea, runs on startup.
@@ -81,6 +84,9 @@ _PG_COLUMN_MIGRATIONS: dict[str, list[tuple[str, str]]] = {
         ("ip_address", "VARCHAR(45)"),
         ("user_agent", "VARCHAR(255) DEFAULT ''"),
     ],
+    "zk_proofs": [
+        ("proof_blob", "BYTEA"),
+    ],
 }
 _ALLOWED_PG_TABLES = frozenset(_PG_COLUMN_MIGRATIONS.keys())
 
@@ -212,6 +218,18 @@ def _apply_pg_column_defaults(sync_conn) -> None:
         )
 
 
+def upsert_insert(db: AsyncSession, model):
+    """Dialect ``insert()`` for ``model`` that supports ``on_conflict_do_update``.
+
+    Only SQLite and PostgreSQL are supported, matching the engine setup above.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
+
 async def get_db() -> AsyncSession:
     """FastAPI dependency that yields a database session."""
     async with async_session() as session:
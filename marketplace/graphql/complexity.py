@@ -0,0 +1,116 @@
+"""Query complexity limit for the GraphQL endpoint.
+
+Each selected field costs 1 point; a field that takes a ``limit`` argument
+multiplies the cost of its sub-selection by the requested page size (clamped
+to the root queries' 1-100 range; a variable counts as the maximum, since
+its value is not known at validation time). Operations above the configured
+maximum are rejected during validation, before any resolver runs.
+"""
+
+from typing import Any
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    InlineFragmentNode,
+    IntValueNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    ValidationRule,
+    get_named_type,
+    is_object_type,
+    is_interface_type,
+)
+from graphql.pyutils import Undefined
+
+MIN_PAGE_SIZE = 1
+MAX_PAGE_SIZE = 100
+
+
+def _page_size(node: FieldNode, field_def) -> int:
+    argument = field_def.args.get("limit")
+    if argument is None:
+        return 1
+    value = next(
+        (arg.value for arg in node.arguments or () if arg.name.value == "limit"), None
+    )
+    if value is None:
+        size = argument.default_value
+        if size is Undefined or size is None:
+            size = MAX_PAGE_SIZE
+    elif isinstance(value, IntValueNode):
+        size = int(value.value)
+    else:
+        size = MAX_PAGE_SIZE
+    return max(MIN_PAGE_SIZE, min(int(size), MAX_PAGE_SIZE))
+
+
+def selection_cost(
+    schema,
+    selection_set: SelectionSetNode | None,
+    parent_type: Any,
+    fragments: dict[str, FragmentDefinitionNode],
+    visited: frozenset[str] = frozenset(),
+) -> int:
+    """Cost of ``selection_set`` resolved against ``parent_type``."""
+    if selection_set is None or not (is_object_type(parent_type) or is_interface_type(parent_type)):
+        return 0
+
+    cost = 0
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            name = selection.name.value
+            field_def = parent_type.fields.get(name)
+            if name.startswith("__") or field_def is None:
+                continue
+            child = selection_cost(
+                schema,
+                selection.selection_set,
+                get_named_type(field_def.type),
+                fragments,
+                visited,
+            )
+            cost += _page_size(selection, field_def) * (1 + child)
+        elif isinstance(selection, InlineFragmentNode):
+            condition = selection.type_condition
+            fragment_type = schema.get_type(condition.name.value) if condition else parent_type
+            cost += selection_cost(schema, selection.selection_set, fragment_type, fragments, visited)
+        elif isinstance(selection, FragmentSpreadNode):
+            name = selection.name.value
+            fragment = fragments.get(name)
+            if fragment is None or name in visited:
+                continue
+            cost += selection_cost(
+                schema,
+                fragment.selection_set,
+                schema.get_type(fragment.type_condition.name.value),
+                fragments,
+                visited | {name},
+            )
+    return cost
+
+
+def create_complexity_rule(max_complexity: int) -> type[ValidationRule]:
+    """Validation rule rejecting operations whose cost exceeds ``max_complexity``."""
+
+    class QueryComplexityRule(ValidationRule):
+        def enter_operation_definition(self, node: OperationDefinitionNode, *_args) -> None:
+            schema = self.context.schema
+            fragments = {
+                definition.name.value: definition
+                for definition in self.context.document.definitions
+                if isinstance(definition, FragmentDefinitionNode)
+            }
+            cost = selection_cost(
+                schema, node.selection_set, schema.get_root_type(node.operation), fragments
+            )
+            if cost > max_complexity:
+                self.report_error(GraphQLError(
+                    f"Query complexity {cost} exceeds the maximum of {max_complexity}.",
+                    node,
+                ))
+
+    return QueryComplexityRule
+
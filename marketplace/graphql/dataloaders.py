@@ -1,23 +1,101 @@
-"""Strawberry DataLoader classes for N+1 query prevention."""
-
-from typing import List
-
-from sqlalchemy import select
+"""Strawberry DataLoader classes for N+1 query prevention.
+
+Each GraphQL request gets its own ``RequestLoaders`` (see ``create_loaders``):
+one Strawberry ``DataLoader`` per relationship, so every ``load`` call made
+while resolving a level of the query collapses into one ``IN (...)`` query and
+repeated keys are served from the request-level cache. All loaders share the
+request's ``AsyncSession`` and serialise their statements on a single lock,
+since an ``AsyncSession`` does not allow concurrent operations.
+
+Rows are fetched with ``raiseload("*")``: the models declare
+``lazy="selectin"`` relationships that would otherwise load every listing's
+transactions (and so on) behind the resolver's back. Nested GraphQL fields
+go through the loaders instead.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Any, List
+
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, raiseload
+from strawberry.dataloader import DataLoader
 
 from marketplace.models.agent import RegisteredAgent
 from marketplace.models.listing import DataListing
+from marketplace.models.transaction import Transaction
+from marketplace.models.workflow import WorkflowDefinition
+
+# Upper bound on rows returned per parent by the one-to-many loaders; matches
+# the page-size cap applied by the root queries.
+MAX_CHILDREN_PER_PARENT = 100
+
+
+class _BatchLoader:
+    """Base for batch-load functions bound to one session."""
+
+    def __init__(self, db: AsyncSession, lock: asyncio.Lock | None = None):
+        self.db = db
+        self._lock = lock or asyncio.Lock()
+
+    async def _execute(self, stmt):
+        async with self._lock:
+            return await self.db.execute(stmt)
+
+
+class _ByIdLoader(_BatchLoader):
+    model: Any
+
+    async def load(self, keys: List[str]) -> List[Any]:
+        result = await self._execute(
+            select(self.model).where(self.model.id.in_(keys)).options(raiseload("*"))
+        )
+        rows = result.scalars().all()
+
+        # Build a map for O(1) lookup
+        row_map = {row.id: row for row in rows}
+
+        # Return in the same order as keys, None for missing
+        return [row_map.get(key) for key in keys]
+
+
+class _GroupedLoader(_BatchLoader):
+    """Loads the newest ``MAX_CHILDREN_PER_PARENT`` children for each parent key."""
+
+    model: Any
+    key_attr: str
+    order_attr: str
+
+    async def load(self, keys: List[str]) -> List[List[Any]]:
+        key_column = getattr(self.model, self.key_attr)
+        order_column = getattr(self.model, self.order_attr)
+        rank = func.row_number().over(
+            partition_by=key_column, order_by=order_column.desc()
+        ).label("child_rank")
+        ranked = select(self.model, rank).where(key_column.in_(keys)).subquery()
+        child = aliased(self.model, ranked)
+        result = await self._execute(
+            select(child)
+            .where(ranked.c.child_rank <= MAX_CHILDREN_PER_PARENT)
+            .order_by(ranked.c.child_rank)
+            .options(raiseload("*"))
+        )
 
+        groups: dict[str, list[Any]] = defaultdict(list)
+        for row in result.scalars().all():
+            groups[getattr(row, self.key_attr)].append(row)
+        return [groups.get(key, []) for key in keys]
 
-class AgentLoader:
+
+class AgentLoader(_ByIdLoader):
     """Batch loader for agents by ID.
 
     Prevents N+1 queries when resolving agent references from
     listings, transactions, or other types that reference agents.
     """
 
-    def __init__(self, db: AsyncSession):
-        self.db = db
+    model = RegisteredAgent
 
     async def load(self, keys: List[str]) -> List[RegisteredAgent | None]:
         """Batch load agents by their IDs.
@@ -29,27 +107,17 @@ class AgentLoader:
             List of RegisteredAgent instances (or None for missing IDs),
             in the same order as the input keys.
         """
-        result = await self.db.execute(
-            select(RegisteredAgent).where(RegisteredAgent.id.in_(keys))
-        )
-        agents = result.scalars().all()
-
-        # Build a map for O(1) lookup
-        agent_map = {agent.id: agent for agent in agents}
-
-        # Return in the same order as keys, None for missing
-        return [agent_map.get(key) for key in keys]
+        return await super().load(keys)
 
 
-class ListingLoader:
+class ListingLoader(_ByIdLoader):
     """Batch loader for listings by ID.
 
     Prevents N+1 queries when resolving listing references from
     transactions or other types that reference listings.
     """
 
-    def __init__(self, db: AsyncSession):
-        self.db = db
+    model = DataListing
 
     async def load(self, keys: List[str]) -> List[DataListing | None]:
         """Batch load listings by their IDs.
@@ -61,13 +129,73 @@ class ListingLoader:
             List of DataListing instances (or None for missing IDs),
             in the same order as the input keys.
         """
-        result = await self.db.execute(
-            select(DataListing).where(DataListing.id.in_(keys))
+        return await super().load(keys)
+
+
+class WorkflowLoader(_ByIdLoader):
+    """Batch loader for workflow definitions by ID."""
+
+    model = WorkflowDefinition
+
+
+class ListingsBySellerLoader(_GroupedLoader):
+    """Batch loader for each seller's newest listings."""
+
+    model = DataListing
+    key_attr = "seller_id"
+    order_attr = "created_at"
+
+
+class TransactionsByListingLoader(_GroupedLoader):
+    """Batch loader for each listing's newest transactions."""
+
+    model = Transaction
+    key_attr = "listing_id"
+    order_attr = "initiated_at"
+
+
+class WorkflowsByOwnerLoader(_GroupedLoader):
+    """Batch loader for each agent's newest workflow definitions."""
+
+    model = WorkflowDefinition
+    key_attr = "owner_id"
+    order_attr = "created_at"
+
+
+class RequestLoaders:
+    """Per-request DataLoaders plus serialised access to the request session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._lock = asyncio.Lock()
+        self.agent = DataLoader(load_fn=AgentLoader(db, self._lock).load)
+        self.listing = DataLoader(load_fn=ListingLoader(db, self._lock).load)
+        self.workflow = DataLoader(load_fn=WorkflowLoader(db, self._lock).load)
+        self.listings_by_seller = DataLoader(
+            load_fn=ListingsBySellerLoader(db, self._lock).load
+        )
+        self.transactions_by_listing = DataLoader(
+            load_fn=TransactionsByListingLoader(db, self._lock).load
+        )
+        self.workflows_by_owner = DataLoader(
+            load_fn=WorkflowsByOwnerLoader(db, self._lock).load
         )
-        listings = result.scalars().all()
 
-        # Build a map for O(1) lookup
-        listing_map = {listing.id: listing for listing in listings}
+    async def execute(self, stmt):
+        """Run a root-query statement without racing the loaders on the session."""
+        async with self._lock:
+            return await self.db.execute(stmt)
 
-        # Return in the same order as keys, None for missing
-        return [listing_map.get(key) for key in keys]
+
+def create_loaders(db: AsyncSession) -> RequestLoaders:
+    """Build a fresh set of loaders for one GraphQL request."""
+    return RequestLoaders(db)
+
+
+def get_loaders(info) -> RequestLoaders:
+    """Loaders for the current request, created on first use from ``context["db"]``."""
+    context = info.context
+    loaders = context.get("loaders")
+    if loaders is None:
+        loaders = context["loaders"] = create_loaders(context["db"])
+    return loaders
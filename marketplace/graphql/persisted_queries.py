@@ -0,0 +1,87 @@
+"""Automatic persisted queries (APQ) for the GraphQL endpoint.
+
+Clients following the Apollo APQ protocol send
+``extensions.persistedQuery.sha256Hash`` instead of the query text. The first
+request for a hash carries the full query, which is verified and stored;
+later requests send only the hash. Combined with the schema's
+``ParserCache``/``ValidationCache``, a hot persisted query maps to the same
+document text and skips parsing and validation entirely.
+
+Resolution runs in ``PersistedQueryExtension.on_operation``, before Strawberry
+parses the operation, so it applies to every transport (single, batched,
+streamed) without touching the HTTP view.
+"""
+
+import hashlib
+import logging
+from collections.abc import Iterator
+from typing import Any
+
+from graphql import GraphQLError
+from strawberry.extensions import SchemaExtension
+
+from marketplace.config import settings
+from marketplace.services.cache_service import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_APQ_VERSION = 1
+
+# Query text by sha256 hex digest. Entries are evicted LRU; an evicted hash
+# just makes the client resend its query once.
+persisted_query_cache = TTLCache(
+    maxsize=settings.graphql_persisted_query_cache_size, default_ttl=24 * 3600.0,
+)
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def register_persisted_query(query: str) -> str:
+    """Store ``query`` ahead of time (e.g. trusted documents) and return its hash."""
+    digest = query_hash(query)
+    persisted_query_cache.put(digest, query)
+    return digest
+
+
+def _error(message: str, code: str) -> GraphQLError:
+    return GraphQLError(message, extensions={"code": code})
+
+
+def resolve_persisted_query(query: str | None, extensions: dict[str, Any] | None) -> str | None:
+    """Return the query text for an operation, resolving the APQ extension.
+
+    Raises ``GraphQLError`` with an APQ error code for the client to act on.
+    """
+    extension: Any = (extensions or {}).get("persistedQuery")
+    if not extension:
+        return query
+    if not settings.graphql_persisted_queries_enabled:
+        raise _error("PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED")
+    if not isinstance(extension, dict) or extension.get("version") != _APQ_VERSION:
+        raise _error("Unsupported persisted query version", "PERSISTED_QUERY_INVALID")
+
+    digest = extension.get("sha256Hash")
+    if not isinstance(digest, str):
+        raise _error("Missing persisted query hash", "PERSISTED_QUERY_INVALID")
+
+    if query:
+        if query_hash(query) != digest.lower():
+            raise _error("provided sha does not match query", "PERSISTED_QUERY_INVALID")
+        persisted_query_cache.put(digest.lower(), query)
+        return query
+
+    stored = persisted_query_cache.get(digest.lower())
+    if stored is None:
+        raise _error("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+    return stored
+
+
+class PersistedQueryExtension(SchemaExtension):
+    """Fill in the query text of APQ requests before the operation is parsed."""
+
+    def on_operation(self) -> Iterator[None]:
+        context = self.execution_context
+        context.query = resolve_persisted_query(context.query, context.operation_extensions)
+        yield
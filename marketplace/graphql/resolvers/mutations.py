@@ -9,25 +9,12 @@ from typing import Optional
 
 from sqlalchemy import select
 
-from marketplace.graphql.schema import AgentType, ListingType
+from marketplace.graphql.schema import AgentType, ListingType, WorkflowType
 from marketplace.models.agent import RegisteredAgent
 from marketplace.models.listing import DataListing
 from marketplace.models.workflow import WorkflowDefinition
 
 
-# WorkflowType is defined locally since the linted schema doesn't export it.
-@strawberry.type
-class WorkflowType:
-    """GraphQL type representing a workflow definition."""
-
-    id: str
-    name: str
-    description: str
-    owner_id: str
-    version: int
-    status: str
-
-
 def _agent_to_type(agent: RegisteredAgent) -> AgentType:
     """Convert a RegisteredAgent ORM model to a GraphQL AgentType."""
     return AgentType(
@@ -12,6 +12,7 @@ from marketplace.graphql.schema import (
     ListingConnection,
     TransactionType,
     PageInfo,
+    WorkflowType,
 )
 from marketplace.models.agent import RegisteredAgent
 from marketplace.models.listing import DataListing
@@ -19,19 +20,6 @@ from marketplace.models.transaction import Transaction
 from marketplace.models.workflow import WorkflowDefinition
 
 
-# WorkflowType is defined locally since the linted schema doesn't export it.
-@strawberry.type
-class WorkflowType:
-    """GraphQL type representing a workflow definition."""
-
-    id: str
-    name: str
-    description: str
-    owner_id: str
-    version: int
-    status: str
-
-
 def _agent_to_type(agent: RegisteredAgent) -> AgentType:
     """Convert a RegisteredAgent ORM model to a GraphQL AgentType."""
     return AgentType(
@@ -1,4 +1,10 @@
-"""Strawberry GraphQL schema with types, queries, mutations, and the router."""
+"""Strawberry GraphQL schema with types, queries, mutations, and the router.
+
+Resolvers run on one request-scoped session (``context["db"]``) and resolve
+nested relationship fields through the per-request DataLoaders in
+``marketplace.graphql.dataloaders``, so a nested query costs one statement
+per level rather than one per row.
+"""
 
 import hashlib
 import logging
@@ -9,16 +15,30 @@ from typing import List, Optional
 logger = logging.getLogger(__name__)
 
 import strawberry
-from strawberry.extensions import QueryDepthLimiter
+from fastapi import Depends, Request
+from strawberry.extensions import AddValidationRules, ParserCache, ValidationCache
+from strawberry.extensions.query_depth_limiter import create_validator as create_depth_rule
 from strawberry.fastapi import GraphQLRouter
 
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
 
 from marketplace.config import settings
-from marketplace.database import async_session
+from marketplace.database import get_db
+from marketplace.graphql.complexity import create_complexity_rule
+from marketplace.graphql.dataloaders import create_loaders, get_loaders
+from marketplace.graphql.persisted_queries import PersistedQueryExtension
 from marketplace.models.agent import RegisteredAgent
 from marketplace.models.listing import DataListing
 from marketplace.models.transaction import Transaction
+from marketplace.models.workflow import WorkflowDefinition
+
+MAX_PAGE_SIZE = 100
+
+
+def _page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
 
 
 # ---------------------------------------------------------------------------
@@ -36,6 +56,22 @@ class AgentType:
     status: str
     created_at: str
 
+    @strawberry.field
+    async def listings(
+        self, info: strawberry.Info, limit: int = 20,
+    ) -> List["ListingType"]:
+        """The agent's newest listings."""
+        rows = await get_loaders(info).listings_by_seller.load(self.id)
+        return [_listing_to_type(lst) for lst in rows[:_page_size(limit)]]
+
+    @strawberry.field
+    async def workflows(
+        self, info: strawberry.Info, limit: int = 20,
+    ) -> List["WorkflowType"]:
+        """Workflow definitions owned by the agent, newest first."""
+        rows = await get_loaders(info).workflows_by_owner.load(self.id)
+        return [_workflow_to_type(wf) for wf in rows[:_page_size(limit)]]
+
 
 @strawberry.type
 class ListingType:
@@ -49,6 +85,20 @@ class ListingType:
     status: str
     seller_id: str
 
+    @strawberry.field
+    async def seller(self, info: strawberry.Info) -> Optional[AgentType]:
+        """The agent selling this listing."""
+        agent = await get_loaders(info).agent.load(self.seller_id)
+        return _agent_to_type(agent) if agent else None
+
+    @strawberry.field
+    async def transactions(
+        self, info: strawberry.Info, limit: int = 20,
+    ) -> List["TransactionType"]:
+        """The listing's newest transactions."""
+        rows = await get_loaders(info).transactions_by_listing.load(self.id)
+        return [_transaction_to_type(t) for t in rows[:_page_size(limit)]]
+
 
 @strawberry.type
 class TransactionType:
@@ -62,6 +112,42 @@ class TransactionType:
     status: str
     created_at: str
 
+    @strawberry.field
+    async def listing(self, info: strawberry.Info) -> Optional[ListingType]:
+        """The listing that was purchased."""
+        listing = await get_loaders(info).listing.load(self.listing_id)
+        return _listing_to_type(listing) if listing else None
+
+    @strawberry.field
+    async def buyer(self, info: strawberry.Info) -> Optional[AgentType]:
+        """The buying agent."""
+        agent = await get_loaders(info).agent.load(self.buyer_id)
+        return _agent_to_type(agent) if agent else None
+
+    @strawberry.field
+    async def seller(self, info: strawberry.Info) -> Optional[AgentType]:
+        """The selling agent."""
+        agent = await get_loaders(info).agent.load(self.seller_id)
+        return _agent_to_type(agent) if agent else None
+
+
+@strawberry.type
+class WorkflowType:
+    """GraphQL type representing a workflow definition."""
+
+    id: str
+    name: str
+    description: str
+    owner_id: str
+    version: int
+    status: str
+
+    @strawberry.field
+    async def owner(self, info: strawberry.Info) -> Optional[AgentType]:
+        """The agent that owns this workflow."""
+        agent = await get_loaders(info).agent.load(self.owner_id)
+        return _agent_to_type(agent) if agent else None
+
 
 @strawberry.type
 class PageInfo:
@@ -127,6 +213,17 @@ def _transaction_to_type(txn: Transaction) -> TransactionType:
     )
 
 
+def _workflow_to_type(wf: WorkflowDefinition) -> WorkflowType:
+    return WorkflowType(
+        id=wf.id,
+        name=wf.name,
+        description=wf.description or "",
+        owner_id=wf.owner_id,
+        version=wf.version or 1,
+        status=wf.status or "draft",
+    )
+
+
 # ---------------------------------------------------------------------------
 # Query
 # ---------------------------------------------------------------------------
@@ -138,72 +235,68 @@ class Query:
     @strawberry.field
     async def agents(
         self,
+        info: strawberry.Info,
         limit: int = 20,
         status: Optional[str] = None,
     ) -> List[AgentType]:
         """List agents with optional status filter."""
-        limit = max(1, min(limit, 100))
-        async with async_session() as db:
-            stmt = select(RegisteredAgent).limit(limit)
-            if status:
-                stmt = stmt.where(RegisteredAgent.status == status)
-            result = await db.execute(stmt)
-            return [_agent_to_type(a) for a in result.scalars().all()]
+        stmt = select(RegisteredAgent).options(raiseload("*")).limit(_page_size(limit))
+        if status:
+            stmt = stmt.where(RegisteredAgent.status == status)
+        result = await get_loaders(info).execute(stmt)
+        return [_agent_to_type(a) for a in result.scalars().all()]
 
     @strawberry.field
-    async def agent(self, id: str) -> Optional[AgentType]:
+    async def agent(self, info: strawberry.Info, id: str) -> Optional[AgentType]:
         """Get a single agent by ID."""
-        async with async_session() as db:
-            result = await db.execute(
-                select(RegisteredAgent).where(RegisteredAgent.id == id)
-            )
-            agent = result.scalar_one_or_none()
-            return _agent_to_type(agent) if agent else None
+        agent = await get_loaders(info).agent.load(id)
+        return _agent_to_type(agent) if agent else None
 
     @strawberry.field
     async def listings(
         self,
+        info: strawberry.Info,
         limit: int = 20,
         category: Optional[str] = None,
     ) -> List[ListingType]:
         """List data listings with optional category filter."""
-        limit = max(1, min(limit, 100))
-        async with async_session() as db:
-            stmt = select(DataListing).limit(limit)
-            if category:
-                stmt = stmt.where(DataListing.category == category)
-            result = await db.execute(stmt)
-            return [_listing_to_type(lst) for lst in result.scalars().all()]
+        stmt = select(DataListing).options(raiseload("*")).limit(_page_size(limit))
+        if category:
+            stmt = stmt.where(DataListing.category == category)
+        result = await get_loaders(info).execute(stmt)
+        return [_listing_to_type(lst) for lst in result.scalars().all()]
 
     @strawberry.field
-    async def listing(self, id: str) -> Optional[ListingType]:
+    async def listing(self, info: strawberry.Info, id: str) -> Optional[ListingType]:
         """Get a single listing by ID."""
-        async with async_session() as db:
-            result = await db.execute(
-                select(DataListing).where(DataListing.id == id)
-            )
-            listing = result.scalar_one_or_none()
-            return _listing_to_type(listing) if listing else None
+        listing = await get_loaders(info).listing.load(id)
+        return _listing_to_type(listing) if listing else None
 
     @strawberry.field
     async def transactions(
         self,
+        info: strawberry.Info,
         agent_id: str,
         limit: int = 20,
     ) -> List[TransactionType]:
         """List transactions where agent_id is either buyer or seller."""
-        limit = max(1, min(limit, 100))
-        async with async_session() as db:
-            stmt = (
-                select(Transaction)
-                .where(
-                    (Transaction.buyer_id == agent_id)
-                    | (Transaction.seller_id == agent_id)
-                )
-                .limit(limit)
+        stmt = (
+            select(Transaction)
+            .options(raiseload("*"))
+            .where(
+                (Transaction.buyer_id == agent_id)
+                | (Transaction.seller_id == agent_id)
             )
-            result = await db.execute(stmt)
-            return [_transaction_to_type(t) for t in result.scalars().all()]
+            .limit(_page_size(limit))
+        )
+        result = await get_loaders(info).execute(stmt)
+        return [_transaction_to_type(t) for t in result.scalars().all()]
+
+    @strawberry.field
+    async def workflow(self, info: strawberry.Info, id: str) -> Optional[WorkflowType]:
+        """Get a single workflow definition by ID."""
+        wf = await get_loaders(info).workflow.load(id)
+        return _workflow_to_type(wf) if wf else None
 
 
 # ---------------------------------------------------------------------------
@@ -217,7 +310,7 @@ class Mutation:
     @strawberry.mutation
     async def create_listing(
         self,
-        info: strawberry.types.Info,
+        info: strawberry.Info,
         title: str,
         category: str,
         price_usdc: float,
@@ -227,25 +320,25 @@ class Mutation:
         if not user or not user.get("id"):
             raise PermissionError("Authentication required to create listings")
         seller_id = user["id"]
-        async with async_session() as db:
-            content_hash = "sha256:" + hashlib.sha256(b"").hexdigest()
-            listing = DataListing(
-                id=str(uuid.uuid4()),
-                seller_id=seller_id,
-                title=title,
-                category=category,
-                price_usdc=price_usdc,
-                content_hash=content_hash,
-                content_size=0,
-                content_type="application/json",
-                status="active",
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-            )
-            db.add(listing)
-            await db.commit()
-            await db.refresh(listing)
-            return _listing_to_type(listing)
+        db = info.context["db"]
+        content_hash = "sha256:" + hashlib.sha256(b"").hexdigest()
+        listing = DataListing(
+            id=str(uuid.uuid4()),
+            seller_id=seller_id,
+            title=title,
+            category=category,
+            price_usdc=price_usdc,
+            content_hash=content_hash,
+            content_size=0,
+            content_type="application/json",
+            status="active",
+            created_at=datetime.now(timezone.utc),
+            updated_at=datetime.now(timezone.utc),
+        )
+        db.add(listing)
+        await db.commit()
+        await db.refresh(listing)
+        return _listing_to_type(listing)
 
 
 # ---------------------------------------------------------------------------
@@ -254,29 +347,41 @@ class Mutation:
 
 _is_prod = settings.environment.lower() in {"production", "prod"}
 
+# Built once: ValidationCache keys on the rule classes, so repeated (and
+# persisted) queries skip both parse and validate.
+_VALIDATION_RULES = [
+    create_depth_rule(settings.graphql_max_depth, should_ignore=None),
+    create_complexity_rule(settings.graphql_max_complexity),
+]
+
 schema = strawberry.Schema(
     query=Query,
     mutation=Mutation,
-    extensions=[QueryDepthLimiter(max_depth=5)],
+    extensions=[
+        PersistedQueryExtension,
+        lambda: AddValidationRules(_VALIDATION_RULES),
+        lambda: ParserCache(maxsize=settings.graphql_document_cache_size),
+        lambda: ValidationCache(maxsize=settings.graphql_document_cache_size),
+    ],
 )
 
 
-async def _graphql_context_getter(request=None, **kwargs):
-    """Build GraphQL context with authenticated user and DB session."""
-    from starlette.requests import Request as StarletteRequest
-
-    context: dict = {"user": None, "db": None}
-
-    if request and isinstance(request, StarletteRequest):
-        auth_header = request.headers.get("authorization", "")
-        if auth_header.lower().startswith("bearer "):
-            token = auth_header[7:]
-            try:
-                from marketplace.core.auth import decode_token
-                payload = decode_token(token)
-                context["user"] = {"id": payload.get("sub"), "token_type": payload.get("type")}
-            except Exception:
-                logger.warning("GraphQL auth token decode failed", exc_info=True)
+async def _graphql_context_getter(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    """Build GraphQL context with authenticated user, DB session and DataLoaders."""
+    context: dict = {"user": None, "db": db, "loaders": create_loaders(db)}
+
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.lower().startswith("bearer "):
+        token = auth_header[7:]
+        try:
+            from marketplace.core.auth import decode_token
+            payload = decode_token(token)
+            context["user"] = {"id": payload.get("sub"), "token_type": payload.get("type")}
+        except Exception:
+            logger.warning("GraphQL auth token decode failed", exc_info=True)
 
     return context
 
@@ -275,6 +275,28 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
                     except ValueError:
                         pass  # Role already assigned or not found
 
+    # Load the last day of transactions into the streaming abuse detector
+    async def _prime_abuse_stream() -> None:
+        from marketplace.services.abuse_detection_service import abuse_stream
+
+        try:
+            async with async_session() as db:
+                await abuse_stream.prime(db)
+        except Exception:
+            logger.exception("Failed to prime streaming abuse detection")
+
+    fire_and_forget(_prime_abuse_stream(), task_name="prime_abuse_stream")
+
+    # Resume GDPR export/deletion jobs interrupted by the last shutdown
+    from marketplace.services.compliance_service import resume_jobs
+
+    fire_and_forget(resume_jobs(), task_name="resume_compliance_jobs")
+
+    # Re-queue listing trust verification lost with the last process
+    from marketplace.services.listing_trust_pipeline import resume_pending_listings
+
+    fire_and_forget(resume_pending_listings(), task_name="resume_listing_trust")
+
     # Start background demand aggregation (initial delay avoids lock contention at startup)
     async def _demand_loop() -> None:
         await asyncio.sleep(30)  # Wait 30s before first run
@@ -313,6 +335,22 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     cdn_task = asyncio.create_task(cdn_decay_loop())
 
+    # Flush buffered billing usage counters
+    from marketplace.services.usage_metering_service import (
+        backfill_counters,
+        flush_usage,
+        usage_flush_loop,
+    )
+
+    async with async_session() as usage_db:
+        await backfill_counters(usage_db)
+    usage_flush_task = asyncio.create_task(usage_flush_loop())
+
+    # Flush buffered search events into search_logs
+    from marketplace.services.demand_service import flush_searches, search_flush_loop
+
+    search_flush_task = asyncio.create_task(search_flush_loop())
+
     # Start monthly payout background task
     async def _payout_loop() -> None:
         await asyncio.sleep(60)
@@ -336,73 +374,81 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         while True:
             try:
                 async with async_session() as security_db:
-                    from marketplace.services.event_subscription_service import (
-                        redact_old_webhook_deliveries,
-                    )
-                    from marketplace.services.memory_service import (
-                        redact_old_memory_verification_evidence,
-                    )
-
-                    await redact_old_webhook_deliveries(
-                        security_db,
-                        retention_days=settings.security_event_retention_days,
-                    )
-                    await redact_old_memory_verification_evidence(
-                        security_db,
-                        retention_days=settings.security_event_retention_days,
-                    )
+                    from marketplace.services.retention_service import run_retention
+
+                    await run_retention(security_db)
             except Exception:
                 logger.exception("Background task error")
-            await asyncio.sleep(12 * 3600)
+            await asyncio.sleep(settings.retention_interval_hours * 3600)
 
     security_retention_task = asyncio.create_task(_security_retention_loop())
 
+    # Content storage GC and integrity scrubbing
+    from marketplace.services.storage_maintenance_service import storage_maintenance_loop
+    from marketplace.services.storage_service import open_storage
+
+    await open_storage()
+
+    storage_maintenance_task = asyncio.create_task(storage_maintenance_loop())
+
+    # Shared cache tier: apply other workers' listing/agent invalidations
+    cache_invalidation_task = None
+    if settings.redis_url and settings.cache_l2_enabled:
+        from marketplace.services.cache_service import cache_invalidation_listener
+
+        cache_invalidation_task = asyncio.create_task(cache_invalidation_listener())
+
     # MCP federation health monitor background task
     mcp_health_task = None
     if settings.mcp_federation_enabled:
-        async def _mcp_health_loop() -> None:
-            await asyncio.sleep(30)
-            while True:
-                try:
-                    from marketplace.services.mcp_health_monitor import (
-                        mcp_health_monitor,
-                    )
+        from marketplace.services.mcp_health_monitor import health_check_loop
 
-                    await mcp_health_monitor.check_all_servers()
-                except Exception:
-                    logger.exception("MCP health monitor error")
-                await asyncio.sleep(30)
-
-        mcp_health_task = asyncio.create_task(_mcp_health_loop())
+        mcp_health_task = asyncio.create_task(
+            health_check_loop(settings.mcp_federation_health_interval_seconds)
+        )
 
-    # Azure Service Bus consumer background task
+    # Webhook queue consumer (Azure Service Bus, or the local queue backend)
     servicebus_task = None
-    if settings.azure_servicebus_connection:
-        async def _servicebus_loop() -> None:
-            await asyncio.sleep(10)
-            try:
-                from marketplace.services.servicebus_service import (
-                    ServiceBusService,
-                )
-
-                svc = ServiceBusService(settings.azure_servicebus_connection)
-                await svc.start_consumer("webhook-delivery")
-            except Exception:
-                logger.exception("Service Bus consumer error")
+    if settings.webhook_consumer_enabled:
+        from marketplace.services.webhook_v2_service import webhook_consumer_loop
 
-        servicebus_task = asyncio.create_task(_servicebus_loop())
+        servicebus_task = asyncio.create_task(webhook_consumer_loop())
 
     yield
 
     # Shutdown: cancel background tasks and dispose connection pool
     demand_task.cancel()
     cdn_task.cancel()
+    usage_flush_task.cancel()
+    try:
+        await flush_usage()
+    except Exception:
+        logger.exception("Final usage flush failed")
+    search_flush_task.cancel()
+    try:
+        await flush_searches()
+    except Exception:
+        logger.exception("Final search log flush failed")
     payout_task.cancel()
     security_retention_task.cancel()
+    storage_maintenance_task.cancel()
+    if cache_invalidation_task:
+        cache_invalidation_task.cancel()
     if mcp_health_task:
         mcp_health_task.cancel()
     if servicebus_task:
         servicebus_task.cancel()
+    from marketplace.services.servicebus_service import close_servicebus_service
+
+    await close_servicebus_service()
+
+    from marketplace.services.mcp_federation_service import close_federation_clients
+
+    await close_federation_clients()
+
+    from marketplace.services.storage_service import close_storage
+
+    close_storage()
 
     # Close model router connections
     if hasattr(app, "state") and hasattr(app.state, "model_router"):
@@ -578,11 +624,9 @@ def create_app() -> FastAPI:
 
     # GraphQL endpoint
     try:
-        from marketplace.graphql.schema import schema
-        from strawberry.fastapi import GraphQLRouter
+        from marketplace.graphql.schema import graphql_router
 
-        graphql_app = GraphQLRouter(schema)
-        app.include_router(graphql_app, prefix="/graphql")
+        app.include_router(graphql_router)
     except ImportError:
         logger.info("strawberry-graphql not installed — GraphQL disabled")
 
@@ -176,6 +176,37 @@ class ReputationModel:
 
         return max(0.0, min(1.0, score))
 
+    def predict_batch(self, feature_matrix: Any) -> Any:
+        """Predict reputation scores for many agents in one model call.
+
+        Args:
+            feature_matrix: 2D array-like, one row per agent, columns in
+                FEATURE_NAMES order.
+
+        Returns:
+            1D NumPy array of scores clipped to [0.0, 1.0].
+
+        Raises:
+            RuntimeError: If no model has been trained or loaded.
+        """
+        import numpy as np
+
+        if self._model is None:
+            raise RuntimeError("No model loaded. Train or load a model first.")
+
+        matrix = np.asarray(feature_matrix, dtype=float)
+        if matrix.shape[0] == 0:
+            return np.zeros(0)
+        if hasattr(self._model, "predict_proba"):
+            probas = np.asarray(self._model.predict_proba(matrix))
+            if probas.ndim > 1 and probas.shape[1] > 1:
+                scores = probas[:, 1]  # probability of class 1 (good reputation)
+            else:
+                scores = probas.reshape(len(matrix), -1)[:, 0]
+        else:
+            scores = np.asarray(self._model.predict(matrix), dtype=float)
+        return np.clip(scores.astype(float), 0.0, 1.0)
+
     @staticmethod
     def _compute_file_hash(path: Path) -> str:
         """Compute SHA-256 hash of a file."""
@@ -0,0 +1,373 @@
+"""Completion cache — serves repeated prompts without calling a provider.
+
+Two tiers sit in front of ``ModelRouter.complete``:
+
+* **exact** — key is a SHA-256 over (model, messages, tools, temperature,
+  max_tokens). Entries live in a size- and TTL-bounded in-memory LRU and,
+  optionally, an on-disk SQLite table shared across restarts/workers.
+* **semantic** — for deterministic (temperature 0, tool-free) requests only.
+  The prompt text is embedded with ``EmbeddingService`` and a cached response
+  is reused when a previous prompt for the same model is at least
+  ``semantic_threshold`` cosine-similar.
+
+Only temperature-0 requests are cached unless the caller opts in with
+``cache=True``; a sampled answer is not a stable answer to its prompt.
+Concurrent misses for the same exact key share one provider call. A request
+with ``cache=False`` (e.g. a retry after an unusable answer) skips the lookup
+and its response overwrites the stale entry. The semantic similarity scan runs
+in a worker thread so a large cache never stalls the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import structlog
+
+from marketplace.core.metrics import MODEL_CACHE_LATENCY_SAVED, MODEL_CACHE_LOOKUPS
+from marketplace.model_layer.types import (
+    CompletionRequest,
+    CompletionResponse,
+    ModelProvider,
+    ToolCall,
+)
+
+logger = structlog.get_logger(__name__)
+
+
+def completion_cache_key(request: CompletionRequest) -> str:
+    """Stable exact-match key for a completion request."""
+    payload = json.dumps(
+        {
+            "model": request.model,
+            "messages": request.messages,
+            "tools": request.tools,
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _prompt_text(request: CompletionRequest) -> str:
+    return "\n".join(
+        f"{message.get('role', '')}: {message.get('content', '')}"
+        for message in request.messages
+    )
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else vector
+
+
+def _best_match(
+    vector: list[float],
+    candidates: list[tuple[str, list[float]]],
+    threshold: float,
+) -> str | None:
+    best_key, best_score = None, threshold
+    for key, other in candidates:
+        if len(other) != len(vector):
+            continue
+        score = sum(a * b for a, b in zip(vector, other))
+        if score >= best_score:
+            best_key, best_score = key, score
+    return best_key
+
+
+def _to_json(response: CompletionResponse) -> str:
+    data = dataclasses.asdict(response)
+    data["provider"] = response.provider.value
+    return json.dumps(data)
+
+
+def _from_json(raw: str) -> CompletionResponse:
+    data = json.loads(raw)
+    data["provider"] = ModelProvider(data["provider"])
+    data["tool_calls"] = [ToolCall(**call) for call in data.get("tool_calls", [])]
+    return CompletionResponse(**data)
+
+
+@dataclasses.dataclass
+class _Entry:
+    response: CompletionResponse
+    expires_at: float
+
+
+class SQLiteCompletionStore:
+    """On-disk exact-key tier. Blocking sqlite3 calls run in a worker thread."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completion_cache ("
+                " key TEXT PRIMARY KEY, response_json TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _get(self, key: str) -> tuple[str, float] | None:
+        row = self._connection().execute(
+            "SELECT response_json, expires_at FROM completion_cache WHERE key = ?", (key,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _put(self, key: str, response_json: str, expires_at: float) -> None:
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO completion_cache (key, response_json, expires_at)"
+            " VALUES (?, ?, ?)",
+            (key, response_json, expires_at),
+        )
+        conn.execute("DELETE FROM completion_cache WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+
+    async def get(self, key: str) -> tuple[CompletionResponse, float] | None:
+        """Cached response and its wall-clock expiry, if present and fresh."""
+        row = await asyncio.to_thread(self._get, key)
+        if row is None or row[1] < time.time():
+            return None
+        return _from_json(row[0]), row[1]
+
+    async def put(self, key: str, response: CompletionResponse, ttl: float) -> None:
+        await asyncio.to_thread(self._put, key, _to_json(response), time.time() + ttl)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class CompletionCache:
+    """Exact + semantic completion cache with LRU/TTL bounds and metrics."""
+
+    def __init__(
+        self,
+        *,
+        maxsize: int = 1000,
+        ttl_seconds: float = 3600.0,
+        embedding_service: Any = None,
+        semantic_threshold: float = 0.95,
+        store: SQLiteCompletionStore | None = None,
+    ) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl_seconds
+        self._embedding_service = embedding_service
+        self._semantic_threshold = semantic_threshold
+        self._store = store
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # model -> key -> unit embedding of the prompt (semantic tier)
+        self._vectors: dict[str, OrderedDict[str, list[float]]] = {}
+        self._in_flight: dict[str, asyncio.Future[CompletionResponse]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def cacheable(request: CompletionRequest) -> bool:
+        if not request.messages:
+            return False
+        return request.temperature == 0 or request.cache is True
+
+    def _semantic_eligible(self, request: CompletionRequest) -> bool:
+        return (
+            self._embedding_service is not None
+            and request.temperature == 0
+            and not request.tools
+        )
+
+    def _memory_get(self, key: str) -> CompletionResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.response
+
+    def _memory_put(self, key: str, response: CompletionResponse, ttl: float) -> None:
+        self._entries[key] = _Entry(response, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str) -> None:
+        self._entries.pop(key, None)
+        for vectors in self._vectors.values():
+            vectors.pop(key, None)
+
+    async def _semantic_get(
+        self, request: CompletionRequest,
+    ) -> tuple[CompletionResponse | None, list[float] | None]:
+        vector = _unit(await self._embedding_service.embed(_prompt_text(request)))
+        candidates = list(self._vectors.get(request.model, {}).items())
+        if not candidates:
+            return None, vector
+        best_key = await asyncio.to_thread(
+            _best_match, vector, candidates, self._semantic_threshold
+        )
+        if best_key is None:
+            return None, vector
+        return self._memory_get(best_key), vector
+
+    def _hit(self, tier: str, response: CompletionResponse) -> CompletionResponse:
+        self.hits += 1
+        MODEL_CACHE_LOOKUPS.labels(result=f"{tier}_hit").inc()
+        MODEL_CACHE_LATENCY_SAVED.inc(response.latency_ms / 1000)
+        return dataclasses.replace(response, cached=True)
+
+    async def _exact_get(self, key: str) -> CompletionResponse | None:
+        cached = self._memory_get(key)
+        if cached is not None or self._store is None:
+            return cached
+        try:
+            stored = await self._store.get(key)
+        except Exception:
+            logger.warning("completion_cache_store_read_failed", exc_info=True)
+            return None
+        if stored is None:
+            return None
+        response, expires_at = stored
+        self._memory_put(key, response, max(expires_at - time.time(), 0.0))
+        return response
+
+    async def _semantic_lookup(
+        self, request: CompletionRequest,
+    ) -> tuple[CompletionResponse | None, list[float] | None]:
+        if not self._semantic_eligible(request):
+            return None, None
+        try:
+            return await self._semantic_get(request)
+        except Exception:
+            logger.warning("completion_cache_embedding_failed", exc_info=True)
+            return None, None
+
+    def _miss(self) -> None:
+        self.misses += 1
+        MODEL_CACHE_LOOKUPS.labels(result="miss").inc()
+
+    async def get_or_complete(
+        self,
+        request: CompletionRequest,
+        complete: Callable[[CompletionRequest], Awaitable[CompletionResponse]],
+    ) -> CompletionResponse:
+        """Return a cached response for ``request`` or compute and cache one."""
+        if not self.cacheable(request):
+            MODEL_CACHE_LOOKUPS.labels(result="bypass").inc()
+            return await complete(request)
+
+        key = completion_cache_key(request)
+        if request.cache is False:
+            MODEL_CACHE_LOOKUPS.labels(result="bypass").inc()
+            response = await complete(request)
+            await self._store_response(key, response)
+            return response
+
+        cached = await self._exact_get(key)
+        if cached is not None:
+            return self._hit("exact", cached)
+
+        waiter = self._in_flight.get(key)
+        if waiter is not None:
+            return self._hit("exact", await asyncio.shield(waiter))
+
+        similar, vector = await self._semantic_lookup(request)
+        if similar is not None:
+            return self._hit("semantic", similar)
+
+        self._miss()
+        future: asyncio.Future[CompletionResponse] = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await complete(request)
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        future.set_result(response)
+
+        if vector is not None:
+            self._vectors.setdefault(request.model, OrderedDict())[key] = vector
+        await self._store_response(key, response)
+        return response
+
+    async def lookup(self, request: CompletionRequest) -> CompletionResponse | None:
+        """Cached response for ``request``, or None; never calls a provider.
+
+        For callers that produce the response themselves (streaming) and
+        hand it back through :meth:`store`.
+        """
+        if not self.cacheable(request) or request.cache is False:
+            MODEL_CACHE_LOOKUPS.labels(result="bypass").inc()
+            return None
+        cached = await self._exact_get(completion_cache_key(request))
+        if cached is not None:
+            return self._hit("exact", cached)
+        similar, _ = await self._semantic_lookup(request)
+        if similar is not None:
+            return self._hit("semantic", similar)
+        self._miss()
+        return None
+
+    async def store(self, request: CompletionRequest, response: CompletionResponse) -> None:
+        """Cache ``response`` as the answer to ``request``."""
+        if not self.cacheable(request):
+            return
+        key = completion_cache_key(request)
+        _, vector = await self._semantic_lookup(request)
+        if vector is not None:
+            self._vectors.setdefault(request.model, OrderedDict())[key] = vector
+        await self._store_response(key, response)
+
+    async def _store_response(self, key: str, response: CompletionResponse) -> None:
+        self._memory_put(key, response, self._ttl)
+        if self._store is not None:
+            try:
+                await self._store.put(key, response, self._ttl)
+            except Exception:
+                logger.warning("completion_cache_store_write_failed", exc_info=True)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._vectors.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self._maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._store is not None:
+            self._store.close()
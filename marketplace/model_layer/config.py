@@ -17,6 +17,23 @@ class ProviderConfig:
     default_model: str = ""
     timeout_seconds: float = 30.0
     max_retries: int = 2
+    max_concurrency: int = 16  # in-flight completions before the router prefers other providers
+
+
+@dataclass
+class RoutingConfig:
+    """Adaptive routing knobs shared by all providers."""
+
+    adaptive: bool = True  # demote slow/erroring providers instead of strict fallback order
+    ewma_alpha: float = 0.2  # weight of the newest sample in latency/error averages
+    slow_factor: float = 2.0  # demote providers slower than this multiple of the fastest
+    max_error_rate: float = 0.5  # demote providers whose EWMA error rate is above this
+    hedge_enabled: bool = False
+    hedge_quantile: float = 0.95  # launch a backup request after this latency quantile
+    hedge_min_samples: int = 20  # latency samples needed before hedging a provider
+    breaker_failure_threshold: int = 5
+    breaker_recovery_seconds: float = 30.0
+    health_check_timeout_seconds: float = 5.0
 
 
 @dataclass
@@ -44,6 +61,7 @@ class ModelLayerConfig:
     openai: ProviderConfig = field(default_factory=lambda: ProviderConfig(
         default_model="gpt-4o-mini",
     ))
+    routing: RoutingConfig = field(default_factory=RoutingConfig)
 
     def get_provider_config(self, provider: ModelProvider) -> ProviderConfig:
         """Return the config for a given provider."""
@@ -4,12 +4,15 @@ from __future__ import annotations
 
 import os
 import time
+from collections.abc import AsyncIterator
 
 import structlog
 
 from marketplace.model_layer.config import ProviderConfig
 from marketplace.model_layer.providers.base import ModelProviderBackend
+from marketplace.model_layer.providers.streaming import StreamAssembler
 from marketplace.model_layer.types import (
+    CompletionChunk,
     CompletionRequest,
     CompletionResponse,
     ModelHealth,
@@ -38,7 +41,7 @@ class AzureOpenAIBackend(ModelProviderBackend):
             self._client = AsyncAzureOpenAI(
                 azure_endpoint=self._config.base_url or os.environ.get("AZURE_OPENAI_ENDPOINT", ""),
                 api_key=self._config.api_key or os.environ.get("AZURE_OPENAI_API_KEY", ""),
-                api_version=os.environ.get("AZURE_OPENAI_API_VERSION", "2024-06-01"),
+                api_version=os.environ.get("AZURE_OPENAI_API_VERSION", "2024-10-21"),
                 timeout=self._config.timeout_seconds,
                 max_retries=self._config.max_retries,
             )
@@ -88,6 +91,34 @@ class AzureOpenAIBackend(ModelProviderBackend):
             cost_usd=cost,
         )
 
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[CompletionChunk]:
+        client = self._get_client()
+        model = request.model or self._config.default_model
+
+        kwargs: dict = {
+            "model": model,
+            "messages": request.messages,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if request.tools:
+            kwargs["tools"] = request.tools
+
+        assembler = StreamAssembler(ModelProvider.AZURE_OPENAI, model)
+        start = time.perf_counter()
+        async for chunk in await client.chat.completions.create(**kwargs):
+            delta = assembler.feed_openai(chunk.model_dump())
+            if delta:
+                yield CompletionChunk(delta=delta, provider=ModelProvider.AZURE_OPENAI)
+
+        response = assembler.response(
+            (time.perf_counter() - start) * 1000,
+            cost_per_1k=(_COST_PER_1K_PROMPT, _COST_PER_1K_COMPLETION),
+        )
+        yield CompletionChunk(provider=ModelProvider.AZURE_OPENAI, done=True, response=response)
+
     async def health_check(self) -> ModelHealth:
         try:
             client = self._get_client()
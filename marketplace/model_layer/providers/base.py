@@ -3,8 +3,14 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 
-from marketplace.model_layer.types import CompletionRequest, CompletionResponse, ModelHealth
+from marketplace.model_layer.types import (
+    CompletionChunk,
+    CompletionRequest,
+    CompletionResponse,
+    ModelHealth,
+)
 
 
 class ModelProviderBackend(ABC):
@@ -14,6 +20,21 @@ class ModelProviderBackend(ABC):
     async def complete(self, request: CompletionRequest) -> CompletionResponse:
         """Execute a chat completion request."""
 
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[CompletionChunk]:
+        """Execute a chat completion request, yielding text as it is generated.
+
+        The last chunk has ``done=True`` and the assembled response. This
+        default yields the whole completion at once; backends whose API can
+        stream override it.
+        """
+        response = await self.complete(request)
+        yield CompletionChunk(
+            delta=response.content,
+            provider=response.provider,
+            done=True,
+            response=response,
+        )
+
     @abstractmethod
     async def health_check(self) -> ModelHealth:
         """Check if this provider is available and responsive."""
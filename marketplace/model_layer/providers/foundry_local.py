@@ -7,6 +7,7 @@ Uses the standard OpenAI chat completions format.
 from __future__ import annotations
 
 import time
+from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
@@ -14,7 +15,9 @@ import structlog
 
 from marketplace.model_layer.config import ProviderConfig
 from marketplace.model_layer.providers.base import ModelProviderBackend
+from marketplace.model_layer.providers.streaming import StreamAssembler, iter_sse_json
 from marketplace.model_layer.types import (
+    CompletionChunk,
     CompletionRequest,
     CompletionResponse,
     ModelHealth,
@@ -75,6 +78,31 @@ class FoundryLocalBackend(ModelProviderBackend):
             latency_ms=latency_ms,
         )
 
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[CompletionChunk]:
+        model = request.model or self._config.default_model
+        payload: dict[str, Any] = {
+            "model": model,
+            "messages": request.messages,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if request.tools:
+            payload["tools"] = request.tools
+
+        assembler = StreamAssembler(ModelProvider.FOUNDRY_LOCAL, model)
+        start = time.perf_counter()
+        async with self._client.stream("POST", "/v1/chat/completions", json=payload) as resp:
+            resp.raise_for_status()
+            async for chunk in iter_sse_json(resp):
+                delta = assembler.feed_openai(chunk)
+                if delta:
+                    yield CompletionChunk(delta=delta, provider=ModelProvider.FOUNDRY_LOCAL)
+
+        response = assembler.response((time.perf_counter() - start) * 1000)
+        yield CompletionChunk(provider=ModelProvider.FOUNDRY_LOCAL, done=True, response=response)
+
     async def health_check(self) -> ModelHealth:
         try:
             start = time.perf_counter()
@@ -5,7 +5,9 @@ Supports Llama 3.2, Mistral, Qwen, and other Ollama-hosted models.
 
 from __future__ import annotations
 
+import json
 import time
+from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
@@ -13,7 +15,9 @@ import structlog
 
 from marketplace.model_layer.config import ProviderConfig
 from marketplace.model_layer.providers.base import ModelProviderBackend
+from marketplace.model_layer.providers.streaming import StreamAssembler, iter_ndjson
 from marketplace.model_layer.types import (
+    CompletionChunk,
     CompletionRequest,
     CompletionResponse,
     ModelHealth,
@@ -66,7 +70,7 @@ class OllamaBackend(ModelProviderBackend):
                 id=tc.get("id", ""),
                 name=func.get("name", ""),
                 arguments=func.get("arguments", "{}") if isinstance(func.get("arguments"), str)
-                else __import__("json").dumps(func.get("arguments", {})),
+                else json.dumps(func.get("arguments", {})),
             ))
 
         prompt_tokens = data.get("prompt_eval_count", 0)
@@ -82,6 +86,46 @@ class OllamaBackend(ModelProviderBackend):
             latency_ms=latency_ms,
         )
 
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[CompletionChunk]:
+        model = request.model or self._config.default_model
+        payload: dict[str, Any] = {
+            "model": model,
+            "messages": request.messages,
+            "stream": True,
+            "options": {
+                "num_predict": request.max_tokens,
+                "temperature": request.temperature,
+            },
+        }
+        if request.tools:
+            payload["tools"] = request.tools
+
+        assembler = StreamAssembler(ModelProvider.OLLAMA, model)
+        start = time.perf_counter()
+        async with self._client.stream("POST", "/api/chat", json=payload) as resp:
+            resp.raise_for_status()
+            async for data in iter_ndjson(resp):
+                assembler.model = data.get("model", assembler.model)
+                message = data.get("message", {})
+                for index, tc in enumerate(message.get("tool_calls", [])):
+                    func = tc.get("function", {})
+                    arguments = func.get("arguments", {})
+                    assembler.add_tool_call(
+                        index,
+                        tc.get("id", ""),
+                        func.get("name", ""),
+                        arguments if isinstance(arguments, str) else json.dumps(arguments),
+                    )
+                delta = assembler.add_text(message.get("content", ""))
+                if delta:
+                    yield CompletionChunk(delta=delta, provider=ModelProvider.OLLAMA)
+                if data.get("done"):
+                    assembler.prompt_tokens = data.get("prompt_eval_count", 0)
+                    assembler.completion_tokens = data.get("eval_count", 0)
+
+        response = assembler.response((time.perf_counter() - start) * 1000)
+        yield CompletionChunk(provider=ModelProvider.OLLAMA, done=True, response=response)
+
     async def health_check(self) -> ModelHealth:
         try:
             start = time.perf_counter()
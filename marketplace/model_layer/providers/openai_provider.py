@@ -4,12 +4,15 @@ from __future__ import annotations
 
 import os
 import time
+from collections.abc import AsyncIterator
 
 import structlog
 
 from marketplace.model_layer.config import ProviderConfig
 from marketplace.model_layer.providers.base import ModelProviderBackend
+from marketplace.model_layer.providers.streaming import StreamAssembler
 from marketplace.model_layer.types import (
+    CompletionChunk,
     CompletionRequest,
     CompletionResponse,
     ModelHealth,
@@ -85,6 +88,34 @@ class OpenAIBackend(ModelProviderBackend):
             cost_usd=cost,
         )
 
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[CompletionChunk]:
+        client = self._get_client()
+        model = request.model or self._config.default_model
+
+        kwargs: dict = {
+            "model": model,
+            "messages": request.messages,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if request.tools:
+            kwargs["tools"] = request.tools
+
+        assembler = StreamAssembler(ModelProvider.OPENAI, model)
+        start = time.perf_counter()
+        async for chunk in await client.chat.completions.create(**kwargs):
+            delta = assembler.feed_openai(chunk.model_dump())
+            if delta:
+                yield CompletionChunk(delta=delta, provider=ModelProvider.OPENAI)
+
+        response = assembler.response(
+            (time.perf_counter() - start) * 1000,
+            cost_per_1k=(_COST_PER_1K_PROMPT, _COST_PER_1K_COMPLETION),
+        )
+        yield CompletionChunk(provider=ModelProvider.OPENAI, done=True, response=response)
+
     async def health_check(self) -> ModelHealth:
         try:
             client = self._get_client()
@@ -0,0 +1,100 @@
+"""Helpers for assembling streamed chat completions.
+
+Foundry Local and the OpenAI SDKs all emit OpenAI-format ``chat.completion.chunk``
+objects; SDK chunks are converted with ``model_dump()`` so one assembler
+handles both.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
+
+from marketplace.model_layer.types import CompletionResponse, ModelProvider, ToolCall
+
+
+async def iter_sse_json(response: httpx.Response) -> AsyncIterator[dict[str, Any]]:
+    """Decode the ``data:`` payloads of a server-sent event stream."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return
+        if payload:
+            yield json.loads(payload)
+
+
+async def iter_ndjson(response: httpx.Response) -> AsyncIterator[dict[str, Any]]:
+    """Decode a newline-delimited JSON stream (Ollama)."""
+    async for line in response.aiter_lines():
+        if line.strip():
+            yield json.loads(line)
+
+
+class StreamAssembler:
+    """Accumulates chunk deltas into a ``CompletionResponse``."""
+
+    def __init__(self, provider: ModelProvider, model: str) -> None:
+        self.provider = provider
+        self.model = model
+        self.prompt_tokens: int | None = None
+        self.completion_tokens: int | None = None
+        self._content: list[str] = []
+        self._tool_calls: dict[int, dict[str, str]] = {}
+
+    def add_text(self, delta: str) -> str:
+        if delta:
+            self._content.append(delta)
+        return delta
+
+    def add_tool_call(self, index: int, call_id: str, name: str, arguments: str) -> None:
+        call = self._tool_calls.setdefault(index, {"id": "", "name": "", "arguments": ""})
+        call["id"] = call["id"] or call_id
+        call["name"] = call["name"] or name
+        call["arguments"] += arguments
+
+    def feed_openai(self, chunk: dict[str, Any]) -> str:
+        """Absorb one OpenAI-format chunk and return its text delta."""
+        self.model = chunk.get("model") or self.model
+        usage = chunk.get("usage")
+        if usage:
+            self.prompt_tokens = usage.get("prompt_tokens", 0)
+            self.completion_tokens = usage.get("completion_tokens", 0)
+        choices = chunk.get("choices") or []
+        if not choices:
+            return ""
+        delta = choices[0].get("delta") or {}
+        for position, tc in enumerate(delta.get("tool_calls") or []):
+            function = tc.get("function") or {}
+            self.add_tool_call(
+                tc.get("index", position),
+                tc.get("id") or "",
+                function.get("name") or "",
+                function.get("arguments") or "",
+            )
+        return self.add_text(delta.get("content") or "")
+
+    def response(self, latency_ms: float, cost_per_1k: tuple[float, float] = (0.0, 0.0)) -> CompletionResponse:
+        # Providers that omit usage on streams are billed by chunk count,
+        # which tracks tokens closely for text deltas.
+        prompt_tokens = self.prompt_tokens or 0
+        completion_tokens = (
+            self.completion_tokens if self.completion_tokens is not None else len(self._content)
+        )
+        return CompletionResponse(
+            content="".join(self._content),
+            tool_calls=[
+                ToolCall(id=call["id"], name=call["name"], arguments=call["arguments"] or "{}")
+                for _, call in sorted(self._tool_calls.items())
+            ],
+            model=self.model,
+            provider=self.provider,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_ms=latency_ms,
+            cost_usd=(prompt_tokens * cost_per_1k[0] + completion_tokens * cost_per_1k[1]) / 1000,
+        )
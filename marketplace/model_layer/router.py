@@ -1,25 +1,48 @@
-"""Model Router — routes completion requests with fallback chain.
-
-Tries providers in configured order, falling through on failure.
+"""Model Router — routes completion requests with adaptive fallback.
+
+Providers are tried in configured order, except that the router keeps an
+EWMA of each provider's latency and error rate and demotes providers that
+are slow, erroring, saturated or behind an open circuit breaker. With
+hedging enabled, a backup request goes to the next provider once the
+current one passes its p95 latency; the first success wins. ``stream()``
+yields text as it is generated and fails over only until the first chunk
+arrives. An optional
+``CompletionCache`` answers repeated prompts before any provider is tried.
 Emits Prometheus metrics for token usage and latency.
 """
 
 from __future__ import annotations
 
+import asyncio
+import dataclasses
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+
 import structlog
 
-from marketplace.core.metrics import MODEL_TOKENS_TOTAL
-from marketplace.model_layer.config import ModelLayerConfig, ProviderConfig
+from marketplace.core.metrics import (
+    MODEL_HEDGED_REQUESTS,
+    MODEL_PROVIDER_LATENCY,
+    MODEL_TIME_TO_FIRST_TOKEN,
+    MODEL_TOKENS_TOTAL,
+)
+from marketplace.model_layer.completion_cache import CompletionCache, SQLiteCompletionStore
+from marketplace.model_layer.config import ModelLayerConfig, ProviderConfig, RoutingConfig
 from marketplace.model_layer.providers.base import ModelProviderBackend
 from marketplace.model_layer.types import (
+    CompletionChunk,
     CompletionRequest,
     CompletionResponse,
     ModelHealth,
     ModelProvider,
 )
+from marketplace.services.circuit_breaker import CircuitBreaker, CircuitState
 
 logger = structlog.get_logger(__name__)
 
+_LATENCY_WINDOW = 200  # recent samples kept per provider for the hedge quantile
+
 
 class FallbackChain:
     """Ordered list of providers to try in sequence."""
@@ -28,13 +51,54 @@ class FallbackChain:
         self.providers = providers
 
 
+class ProviderStats:
+    """Latency and error tracking for one provider."""
+
+    def __init__(self, alpha: float) -> None:
+        self._alpha = alpha
+        self.ewma_latency_ms: float | None = None
+        self.ewma_error_rate = 0.0
+        self.healthy = True
+        self.in_flight = 0
+        self._samples: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def record_success(self, latency_ms: float) -> None:
+        self._samples.append(latency_ms)
+        if self.ewma_latency_ms is None:
+            self.ewma_latency_ms = latency_ms
+        else:
+            self.ewma_latency_ms += self._alpha * (latency_ms - self.ewma_latency_ms)
+        self.ewma_error_rate *= 1 - self._alpha
+        self.healthy = True
+
+    def record_failure(self) -> None:
+        self.ewma_error_rate += self._alpha * (1.0 - self.ewma_error_rate)
+
+    def latency_quantile(self, quantile: float, min_samples: int) -> float | None:
+        """Latency (ms) at ``quantile`` of recent successes, if enough samples exist."""
+        if len(self._samples) < max(min_samples, 1):
+            return None
+        ordered = sorted(self._samples)
+        index = min(int(quantile * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+
 class ModelRouter:
     """Routes completion requests to the best available provider with fallback."""
 
-    def __init__(self, config: ModelLayerConfig) -> None:
+    def __init__(
+        self,
+        config: ModelLayerConfig,
+        cache: CompletionCache | None = None,
+    ) -> None:
         self._config = config
+        self.cache = cache
+        self._routing = config.routing
         self._backends: dict[ModelProvider, ModelProviderBackend] = {}
         self._fallback_chain = FallbackChain(config.fallback_order)
+        self._breakers: dict[ModelProvider, CircuitBreaker] = {}
+        self._stats: dict[ModelProvider, ProviderStats] = {}
+        self._semaphores: dict[ModelProvider, asyncio.Semaphore] = {}
 
     def register_provider(
         self,
@@ -43,81 +107,348 @@ class ModelRouter:
     ) -> None:
         """Register a provider backend."""
         self._backends[provider] = backend
+        self._breakers[provider] = CircuitBreaker(
+            failure_threshold=self._routing.breaker_failure_threshold,
+            recovery_timeout=self._routing.breaker_recovery_seconds,
+            half_open_max_calls=1,
+        )
+        self._stats[provider] = ProviderStats(self._routing.ewma_alpha)
+        max_concurrency = self._config.get_provider_config(provider).max_concurrency
+        self._semaphores[provider] = asyncio.Semaphore(max(1, max_concurrency))
         logger.info("model_provider_registered", provider=provider.value)
 
+    def provider_stats(self) -> dict[ModelProvider, dict[str, object]]:
+        """Snapshot of the routing state per registered provider."""
+        return {
+            provider: {
+                "ewma_latency_ms": stats.ewma_latency_ms,
+                "ewma_error_rate": round(stats.ewma_error_rate, 4),
+                "healthy": stats.healthy,
+                "in_flight": stats.in_flight,
+                "circuit": self._breakers[provider].state.value,
+            }
+            for provider, stats in self._stats.items()
+        }
+
+    # ----- routing -----------------------------------------------------------
+
+    def _candidates(self) -> list[ModelProvider]:
+        """Enabled, registered providers in the order they should be tried.
+
+        Configured order is kept as the preference; with adaptive routing a
+        provider drops behind the others when it is unhealthy, erroring,
+        much slower than the fastest provider, saturated, or recovering
+        from an open circuit. Providers with an open circuit are left out.
+        """
+        providers = [
+            provider for provider in self._fallback_chain.providers
+            if provider in self._backends
+            and self._config.get_provider_config(provider).enabled
+        ]
+        if not self._routing.adaptive:
+            return providers
+
+        known = [
+            self._stats[p].ewma_latency_ms for p in providers
+            if self._stats[p].ewma_latency_ms is not None
+        ]
+        fastest = min(known) if known else None
+
+        def tier(provider: ModelProvider) -> int:
+            state = self._breakers[provider].state
+            if state == CircuitState.OPEN:
+                return 3
+            if state == CircuitState.HALF_OPEN or not self._stats[provider].healthy:
+                return 2
+            stats = self._stats[provider]
+            slow = (
+                fastest is not None
+                and stats.ewma_latency_ms is not None
+                and stats.ewma_latency_ms > fastest * self._routing.slow_factor
+            )
+            if slow or stats.ewma_error_rate > self._routing.max_error_rate:
+                return 1
+            if self._semaphores[provider].locked():
+                return 1
+            return 0
+
+        ranked = sorted(providers, key=tier)  # stable: ties keep configured order
+        return [p for p in ranked if tier(p) < 3]
+
+    def _hedge_delay(self, provider: ModelProvider) -> float | None:
+        if not self._routing.hedge_enabled:
+            return None
+        deadline_ms = self._stats[provider].latency_quantile(
+            self._routing.hedge_quantile, self._routing.hedge_min_samples,
+        )
+        return deadline_ms / 1000 if deadline_ms is not None else None
+
+    async def _attempt(
+        self,
+        provider: ModelProvider,
+        request: CompletionRequest,
+    ) -> CompletionResponse:
+        backend = self._backends[provider]
+        provider_config: ProviderConfig = self._config.get_provider_config(provider)
+        # Per-attempt copy: the caller's request is shared and never mutated.
+        if not request.model:
+            request = dataclasses.replace(request, model=provider_config.default_model)
+
+        stats = self._stats[provider]
+        breaker = self._breakers[provider]
+        async with self._semaphores[provider]:
+            stats.in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = await backend.complete(request)
+            except Exception:
+                elapsed = time.perf_counter() - start
+                stats.record_failure()
+                breaker.record_failure()
+                MODEL_PROVIDER_LATENCY.labels(provider=provider.value, outcome="error").observe(elapsed)
+                raise
+            finally:
+                stats.in_flight -= 1
+
+        elapsed = time.perf_counter() - start
+        stats.record_success(elapsed * 1000)
+        breaker.record_success()
+        MODEL_PROVIDER_LATENCY.labels(provider=provider.value, outcome="success").observe(elapsed)
+        return response
+
     async def complete(self, request: CompletionRequest) -> CompletionResponse:
         """Route a completion request through the fallback chain.
 
-        Tries each provider in order. Falls through on failure.
-        Emits MODEL_TOKENS_TOTAL metrics on success.
+        Tries each candidate provider in turn, falling through on failure;
+        with hedging, also after the running attempt's p95 latency.
+        Emits MODEL_TOKENS_TOTAL metrics on success. Cache hits come back
+        with ``cached=True`` and count no tokens.
         """
-        errors: list[str] = []
+        if self.cache is not None:
+            return await self.cache.get_or_complete(request, self._route)
+        return await self._route(request)
 
-        for provider in self._fallback_chain.providers:
-            backend = self._backends.get(provider)
-            if backend is None:
-                continue
-
-            provider_config = self._config.get_provider_config(provider)
-            if not provider_config.enabled:
-                continue
+    async def _route(self, request: CompletionRequest) -> CompletionResponse:
+        errors: list[str] = []
+        candidates = iter(self._candidates())
+        pending: dict[asyncio.Task[CompletionResponse], ModelProvider] = {}
+        latest: ModelProvider | None = None
+
+        def launch_next() -> bool:
+            nonlocal latest
+            for provider in candidates:
+                if not self._breakers[provider].allow_request():
+                    errors.append(f"{provider.value}: circuit open")
+                    continue
+                task = asyncio.create_task(self._attempt(provider, request))
+                # A cancelled attempt (a lost hedge race) has no verdict
+                # for the breaker, but must not keep its half-open slot.
+                breaker = self._breakers[provider]
+                task.add_done_callback(lambda t, b=breaker: t.cancelled() and b.release())
+                pending[task] = provider
+                latest = provider
+                return True
+            return False
+
+        launch_next()
+        try:
+            while pending:
+                timeout = self._hedge_delay(latest) if latest is not None else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Hedge deadline passed: race a backup provider.
+                    hedged_from = latest
+                    if launch_next():
+                        MODEL_HEDGED_REQUESTS.labels(provider=latest.value).inc()
+                        logger.info(
+                            "model_request_hedged",
+                            slow_provider=hedged_from.value,
+                            backup_provider=latest.value,
+                        )
+                    else:
+                        latest = None  # nothing left to hedge with; just wait
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    exc = task.exception()
+                    if exc is None:
+                        response = task.result()
+                        self._emit_token_metrics(response)
+                        logger.debug(
+                            "model_completion_success",
+                            provider=provider.value,
+                            model=response.model,
+                            prompt_tokens=response.prompt_tokens,
+                            completion_tokens=response.completion_tokens,
+                            latency_ms=response.latency_ms,
+                        )
+                        return response
+                    errors.append(f"{provider.value}: {exc}")
+                    logger.warning(
+                        "model_provider_failed",
+                        provider=provider.value,
+                        error=str(exc),
+                    )
+                if not pending:
+                    launch_next()
+        finally:
+            for task in pending:
+                task.cancel()
 
-            try:
-                # Use provider's default model if none specified in request
-                if not request.model:
-                    request.model = provider_config.default_model
+        raise RuntimeError(
+            f"All model providers failed. Errors: {'; '.join(errors)}"
+        )
 
-                response = await backend.complete(request)
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[CompletionChunk]:
+        """Stream a completion through the fallback chain.
 
-                # Emit token metrics
-                MODEL_TOKENS_TOTAL.labels(
-                    model=response.model,
-                    provider=response.provider.value,
-                    direction="prompt",
-                ).inc(response.prompt_tokens)
-                MODEL_TOKENS_TOTAL.labels(
-                    model=response.model,
-                    provider=response.provider.value,
-                    direction="completion",
-                ).inc(response.completion_tokens)
-
-                logger.debug(
-                    "model_completion_success",
-                    provider=provider.value,
-                    model=response.model,
-                    prompt_tokens=response.prompt_tokens,
-                    completion_tokens=response.completion_tokens,
-                    latency_ms=response.latency_ms,
+        A provider that errors before producing its first chunk is skipped
+        like in :meth:`complete`; once a chunk has been yielded the stream
+        is committed and later errors propagate to the caller. The final
+        chunk has ``done=True`` and the assembled response; token metrics
+        are emitted from it. Hedging does not apply to streams.
+        """
+        if self.cache is not None:
+            cached = await self.cache.lookup(request)
+            if cached is not None:
+                yield CompletionChunk(
+                    delta=cached.content, provider=cached.provider, done=True, response=cached,
                 )
-                return response
+                return
 
-            except Exception as exc:
-                error_msg = f"{provider.value}: {exc}"
-                errors.append(error_msg)
-                logger.warning(
-                    "model_provider_failed",
-                    provider=provider.value,
-                    error=str(exc),
-                )
-                # Reset model for next provider attempt
-                request.model = ""
+        errors: list[str] = []
+        for provider in self._candidates():
+            if not self._breakers[provider].allow_request():
+                errors.append(f"{provider.value}: circuit open")
                 continue
+            chunks = self._stream_attempt(provider, request)
+            try:
+                try:
+                    first = await anext(chunks)
+                except Exception as exc:
+                    errors.append(f"{provider.value}: {exc}")
+                    logger.warning("model_provider_failed", provider=provider.value, error=str(exc))
+                    continue
+
+                yield first
+                chunk = first
+                while not chunk.done:
+                    chunk = await anext(chunks)
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+            if self.cache is not None and chunk.response is not None:
+                await self.cache.store(request, chunk.response)
+            return
 
         raise RuntimeError(
             f"All model providers failed. Errors: {'; '.join(errors)}"
         )
 
+    async def _stream_attempt(
+        self,
+        provider: ModelProvider,
+        request: CompletionRequest,
+    ) -> AsyncIterator[CompletionChunk]:
+        backend = self._backends[provider]
+        if not request.model:
+            request = dataclasses.replace(
+                request, model=self._config.get_provider_config(provider).default_model,
+            )
+
+        stats = self._stats[provider]
+        breaker = self._breakers[provider]
+        settled = False
+        async with self._semaphores[provider]:
+            stats.in_flight += 1
+            start = time.perf_counter()
+            first = True
+            try:
+                async for chunk in backend.stream(request):
+                    if first:
+                        MODEL_TIME_TO_FIRST_TOKEN.labels(provider=provider.value).observe(
+                            time.perf_counter() - start,
+                        )
+                        first = False
+                    if chunk.done:
+                        if chunk.response is None:
+                            raise RuntimeError("stream finished without a response")
+                        elapsed = time.perf_counter() - start
+                        stats.record_success(elapsed * 1000)
+                        breaker.record_success()
+                        settled = True
+                        MODEL_PROVIDER_LATENCY.labels(
+                            provider=provider.value, outcome="success",
+                        ).observe(elapsed)
+                        self._emit_token_metrics(chunk.response)
+                        yield chunk
+                        return
+                    yield chunk
+                raise RuntimeError("stream ended before completion")
+            except Exception:
+                stats.record_failure()
+                breaker.record_failure()
+                settled = True
+                MODEL_PROVIDER_LATENCY.labels(provider=provider.value, outcome="error").observe(
+                    time.perf_counter() - start,
+                )
+                raise
+            finally:
+                stats.in_flight -= 1
+                if not settled:  # abandoned by the consumer or cancelled
+                    breaker.release()
+
+    @staticmethod
+    def _emit_token_metrics(response: CompletionResponse) -> None:
+        MODEL_TOKENS_TOTAL.labels(
+            model=response.model,
+            provider=response.provider.value,
+            direction="prompt",
+        ).inc(response.prompt_tokens)
+        MODEL_TOKENS_TOTAL.labels(
+            model=response.model,
+            provider=response.provider.value,
+            direction="completion",
+        ).inc(response.completion_tokens)
+
     async def health_check_all(self) -> dict[ModelProvider, ModelHealth]:
-        """Check health of all registered providers."""
-        results: dict[ModelProvider, ModelHealth] = {}
-        for provider, backend in self._backends.items():
-            results[provider] = await backend.health_check()
+        """Check health of all registered providers concurrently.
+
+        A probe that errors or exceeds ``health_check_timeout_seconds``
+        reports the provider unavailable; unavailable providers are tried
+        last until they answer a probe or a completion again.
+        """
+        timeout = self._routing.health_check_timeout_seconds
+
+        async def _probe(provider: ModelProvider, backend: ModelProviderBackend) -> ModelHealth:
+            try:
+                return await asyncio.wait_for(backend.health_check(), timeout=timeout)
+            except Exception as exc:
+                return ModelHealth(
+                    provider=provider,
+                    available=False,
+                    error=str(exc) or type(exc).__name__,
+                )
+
+        providers = list(self._backends)
+        probes = await asyncio.gather(
+            *(_probe(provider, self._backends[provider]) for provider in providers)
+        )
+        results = dict(zip(providers, probes))
+        for provider, health in results.items():
+            self._stats[provider].healthy = health.available
         return results
 
     async def close(self) -> None:
-        """Close all provider backends."""
+        """Close all provider backends and the completion cache store."""
         for backend in self._backends.values():
             await backend.close()
+        if self.cache is not None:
+            self.cache.close()
 
 
 def build_model_router_from_settings() -> ModelRouter:
@@ -128,6 +459,7 @@ def build_model_router_from_settings() -> ModelRouter:
     """
     from marketplace.config import settings
 
+    max_concurrency = int(settings.model_provider_max_concurrency)
     config = ModelLayerConfig(
         default_provider=ModelProvider(settings.model_default_provider),
         fallback_order=[
@@ -138,21 +470,29 @@ def build_model_router_from_settings() -> ModelRouter:
         foundry_local=ProviderConfig(
             base_url=settings.foundry_local_base_url,
             default_model=settings.foundry_local_default_model,
+            max_concurrency=max_concurrency,
         ),
         ollama=ProviderConfig(
             base_url=settings.ollama_base_url,
             default_model=settings.ollama_default_model,
+            max_concurrency=max_concurrency,
         ),
         azure_openai=ProviderConfig(
             default_model=settings.openai_model,
+            max_concurrency=max_concurrency,
         ),
         openai=ProviderConfig(
             api_key=settings.openai_api_key,
             default_model=settings.openai_model,
+            max_concurrency=max_concurrency,
+        ),
+        routing=RoutingConfig(
+            adaptive=bool(settings.model_routing_adaptive),
+            hedge_enabled=bool(settings.model_hedging_enabled),
         ),
     )
 
-    router = ModelRouter(config)
+    router = ModelRouter(config, cache=_build_completion_cache(settings))
 
     # Register Foundry Local
     from marketplace.model_layer.providers.foundry_local import FoundryLocalBackend
@@ -187,3 +527,28 @@ def build_model_router_from_settings() -> ModelRouter:
     )
 
     return router
+
+
+def _build_completion_cache(settings) -> CompletionCache | None:
+    if not bool(settings.model_cache_enabled):
+        return None
+
+    embedding_service = None
+    if bool(settings.model_cache_semantic_enabled):
+        from marketplace.memory.embedding_service import EmbeddingService
+
+        embedding_service = EmbeddingService(
+            foundry_url=str(settings.foundry_local_base_url),
+            ollama_url=str(settings.ollama_base_url),
+            openai_api_key=str(settings.openai_api_key),
+            model=str(settings.memory_embedding_model),
+        )
+
+    sqlite_path = settings.model_cache_sqlite_path
+    return CompletionCache(
+        maxsize=int(settings.model_cache_max_entries),
+        ttl_seconds=float(settings.model_cache_ttl_seconds),
+        embedding_service=embedding_service,
+        semantic_threshold=float(settings.model_cache_semantic_threshold),
+        store=SQLiteCompletionStore(sqlite_path) if isinstance(sqlite_path, str) and sqlite_path else None,
+    )
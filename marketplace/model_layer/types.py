@@ -36,6 +36,9 @@ class CompletionRequest:
     tools: list[dict[str, Any]] | None = None
     max_tokens: int = 4096
     temperature: float = 0.7
+    # None caches deterministic (temperature 0) requests only; True also caches
+    # sampled ones; False skips the lookup and the fresh answer replaces the entry
+    cache: bool | None = None
 
 
 @dataclass
@@ -59,6 +62,21 @@ class CompletionResponse:
     completion_tokens: int = 0
     latency_ms: float = 0.0
     cost_usd: float = 0.0
+    cached: bool = False  # served by the completion cache, no provider call
+
+
+@dataclass
+class CompletionChunk:
+    """One increment of a streamed completion.
+
+    ``delta`` is newly generated text. The final chunk has ``done=True`` and
+    carries the assembled ``response`` (full content, tool calls, usage).
+    """
+
+    delta: str = ""
+    provider: ModelProvider = ModelProvider.AZURE_OPENAI
+    done: bool = False
+    response: CompletionResponse | None = None
 
 
 @dataclass
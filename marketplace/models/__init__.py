@@ -15,6 +15,7 @@ from marketplace.models.openclaw_webhook import OpenClawWebhook
 from marketplace.models.creator import Creator
 from marketplace.models.audit_log import AuditLog
 from marketplace.models.redemption import RedemptionRequest, ApiCreditBalance
+from marketplace.models.payout import PayoutItem, PayoutRun
 from marketplace.models.trust_verification import (
     ArtifactManifest,
     SourceReceipt,
@@ -54,7 +55,7 @@ from marketplace.models.chain_template import ChainTemplate, ChainExecution
 from marketplace.models.chain_provenance import ChainProvenanceEntry
 from marketplace.models.chain_policy import ChainPolicy
 from marketplace.models.webhook_v2 import DeadLetterEntry, DeliveryAttempt
-from marketplace.models.billing import BillingPlan, Subscription, UsageMeter, Invoice
+from marketplace.models.billing import BillingPlan, Subscription, UsageCounter, UsageMeter, Invoice
 from marketplace.models.judge import JudgeEvaluation, JudgePipelineRun
 from marketplace.models.revoked_token import RevokedToken
 from marketplace.models.refresh_token import RefreshToken
@@ -62,6 +63,7 @@ from marketplace.models.role import ActorRole, Role
 from marketplace.models.api_key import ApiKey
 from marketplace.models.auth_event import AuthEvent
 from marketplace.models.semantic_memory import SemanticMemory
+from marketplace.models.compliance_job import ComplianceJob
 
 __all__ = [
     "RegisteredAgent",
@@ -85,6 +87,8 @@ __all__ = [
     "AuditLog",
     "RedemptionRequest",
     "ApiCreditBalance",
+    "PayoutRun",
+    "PayoutItem",
     "SourceReceipt",
     "ArtifactManifest",
     "VerificationJob",
@@ -118,6 +122,7 @@ __all__ = [
     "BillingPlan",
     "Subscription",
     "UsageMeter",
+    "UsageCounter",
     "Invoice",
     "ChainTemplate",
     "ChainExecution",
@@ -132,4 +137,5 @@ __all__ = [
     "ApiKey",
     "AuthEvent",
     "SemanticMemory",
+    "ComplianceJob",
 ]
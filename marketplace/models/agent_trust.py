@@ -181,6 +181,7 @@ class MemoryVerificationRun(Base):
     __table_args__ = (
         Index("idx_memory_verify_snapshot", "snapshot_id"),
         Index("idx_memory_verify_agent", "agent_id"),
+        Index("idx_memory_verify_created", "created_at"),
     )
 
 
@@ -224,5 +225,6 @@ class WebhookDelivery(Base):
         Index("idx_webhook_delivery_sub", "subscription_id"),
         Index("idx_webhook_delivery_event", "event_id"),
         Index("idx_webhook_delivery_status", "status"),
+        Index("idx_webhook_delivery_created", "created_at"),
     )
 
@@ -3,7 +3,9 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, Numeric, String, Text
+from sqlalchemy import (
+    Boolean, Column, DateTime, ForeignKey, Index, Integer, Numeric, String, Text, UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
 from marketplace.database import Base
@@ -78,6 +80,29 @@ class UsageMeter(Base):
     )
 
 
+class UsageCounter(Base):
+    """Running usage total per (agent, metric, billing period).
+
+    Maintained by upserts from the metering buffer so limit checks read one
+    row instead of summing every ``UsageMeter`` data point.
+    """
+
+    __tablename__ = "usage_counters"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    agent_id = Column(String(36), nullable=False)
+    metric_name = Column(String(50), nullable=False)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    value = Column(Numeric(18, 4), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "agent_id", "metric_name", "period_start", name="uq_usage_counter_agent_metric_period",
+        ),
+    )
+
+
 class Invoice(Base):
     __tablename__ = "invoices"
 
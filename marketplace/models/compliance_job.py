@@ -0,0 +1,47 @@
+"""GDPR data export and erasure jobs, run in the background with progress."""
+
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text
+
+from marketplace.database import Base
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class ComplianceJob(Base):
+    __tablename__ = "compliance_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String(20), nullable=False)  # export | deletion
+    # No FK: the job outlives a hard-deleted agent
+    agent_id = Column(String(36), nullable=False)
+    status = Column(String(24), nullable=False, default="pending")  # pending|running|completed|failed
+
+    # Export
+    format = Column(String(10), nullable=True)  # json | zip | csv
+    options_json = Column(Text, default="{}")
+    artifact_hash = Column(String(71), nullable=True)  # sha256:<hex> in content storage
+    artifact_size = Column(Integer, nullable=True)
+
+    # Deletion
+    reason = Column(String(200), nullable=True)
+    soft_delete = Column(Boolean, nullable=False, default=True)
+
+    # {"listings": 1200, "transactions": 5000, ...} rows handled so far
+    progress_json = Column(Text, default="{}")
+    # Deletion only: {"step": "listings", "done": 1200}
+    checkpoint_json = Column(Text, default="{}")
+    failure_reason = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("idx_compliance_jobs_agent", "agent_id"),
+        Index("idx_compliance_jobs_status", "status"),
+    )
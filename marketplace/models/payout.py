@@ -0,0 +1,71 @@
+"""Payout batch runs and their per-item state, so an interrupted run can resume."""
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Numeric, String, Text, UniqueConstraint
+
+from marketplace.database import Base
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class PayoutRun(Base):
+    """One batch run: a month's auto-payouts or a dispatch of pending redemptions."""
+
+    __tablename__ = "payout_runs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String(20), nullable=False)  # monthly | dispatch
+    period = Column(String(40), nullable=False)  # "2026-10" for monthly, start timestamp for dispatch
+    status = Column(
+        String(20), nullable=False, default="running"
+    )  # running | incomplete | completed
+
+    # {"plan_cursor": last creator/redemption id planned, "planned": bool}
+    checkpoint_json = Column(Text, default="{}")
+    summary_json = Column(Text, default="{}")
+
+    started_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "period", name="uq_payout_run_kind_period"),
+    )
+
+
+class PayoutItem(Base):
+    """A single payout within a run.
+
+    State machine: pending -> submitted -> succeeded, or pending -> failed
+    (retried while attempts remain), or skipped at planning time. The
+    idempotency key is unique, so the same creator-month or redemption is
+    never paid twice however many times a run is restarted.
+    """
+
+    __tablename__ = "payout_items"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    run_id = Column(String(36), ForeignKey("payout_runs.id"), nullable=False)
+    idempotency_key = Column(String(100), nullable=False, unique=True)
+
+    creator_id = Column(String(36), ForeignKey("creators.id"), nullable=True)
+    redemption_id = Column(String(36), nullable=True)
+    provider = Column(String(30), nullable=True)  # upi | bank_withdrawal | gift_card | api_credits
+    amount_usd = Column(Numeric(18, 6), nullable=False, default=0)
+
+    state = Column(
+        String(20), nullable=False, default="pending"
+    )  # pending | submitted | succeeded | failed | skipped
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+
+    __table_args__ = (
+        Index("idx_payout_item_run_state", "run_id", "state"),
+        Index("idx_payout_item_creator", "creator_id"),
+    )
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, ForeignKey, Index, String, Text, DateTime
+from sqlalchemy import Column, DateTime, ForeignKey, Index, LargeBinary, String, Text
 
 from marketplace.database import Base
 
@@ -28,6 +28,7 @@ class ZKProof(Base):
     commitment = Column(String(128), nullable=False)  # hex-encoded hash or root
     proof_data = Column(Text, nullable=False, default="{}")  # JSON: full proof payload
     public_inputs = Column(Text, nullable=False, default="{}")  # JSON: verifiable without content
+    proof_blob = Column(LargeBinary, nullable=True)  # raw binary payload (bloom filter bits)
     created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
 
     __table_args__ = (
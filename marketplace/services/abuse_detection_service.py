@@ -3,35 +3,100 @@
 Applies rule-based anomaly detection to identify suspicious activity
 patterns in the marketplace: rate anomalies, financial abuse, sybil
 patterns, and content manipulation.
+
+Rules are set-based: ``AnomalyRule.evaluate_batch`` runs one grouped query
+over every agent in a scope (a list of ids or a ``SELECT`` of ids), so
+``scan_all_agents`` costs one query per rule regardless of how many agents it
+covers. Each transaction is counted for its buyer and its seller through a
+``UNION ALL`` of the two sides, which lets both halves use their own index
+instead of an ``OR`` across ``buyer_id`` and ``seller_id``.
+
+Rules can also implement ``observe`` for the streaming mode: the
+``abuse_stream`` detector keeps per-agent sliding windows of transaction times,
+is fed as transactions are created, and raises anomalies as soon as a
+threshold is crossed.
 """
 
 from __future__ import annotations
 
+import bisect
 import logging
+from collections import Counter, OrderedDict, deque
+from collections.abc import Sequence
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Any
+from typing import Any, Union
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import Select, func, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from marketplace.core.metrics import ABUSE_ANOMALIES_DETECTED
 from marketplace.models.agent import RegisteredAgent
 from marketplace.models.transaction import Transaction
 
 logger = logging.getLogger(__name__)
 
+# Agents to evaluate: explicit ids, a SELECT of ids, or None for every agent.
+AgentScope = Union[Sequence[str], Select, None]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes for timezone-aware columns.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _agent_transactions(*conditions, scope: AgentScope = None, columns=()):
+    """One row per (agent, transaction) side: buyer rows plus seller rows.
+
+    Self-trades appear once, matching ``buyer_id == a OR seller_id == a``.
+    """
+    buyer = select(Transaction.buyer_id.label("agent_id"), *columns).where(*conditions)
+    seller = select(Transaction.seller_id.label("agent_id"), *columns).where(
+        *conditions, Transaction.seller_id != Transaction.buyer_id,
+    )
+    if scope is not None:
+        buyer = buyer.where(Transaction.buyer_id.in_(scope))
+        seller = seller.where(Transaction.seller_id.in_(scope))
+    return union_all(buyer, seller).subquery()
+
 
 # ── Anomaly rule definitions ──
 
 class AnomalyRule:
-    """Base class for anomaly detection rules."""
+    """Base class for anomaly detection rules.
+
+    Subclasses implement ``evaluate_batch``; ``observe`` is optional and only
+    needed for rules that take part in streaming detection.
+    """
 
     name: str = ""
     severity: str = "medium"  # low | medium | high | critical
+    # How far back the streaming detector must remember transactions for this rule.
+    stream_horizon: timedelta = timedelta(0)
 
     async def evaluate(self, db: AsyncSession, agent_id: str) -> list[dict[str, Any]]:
+        return (await self.evaluate_batch(db, [agent_id])).get(agent_id, [])
+
+    async def evaluate_batch(
+        self, db: AsyncSession, scope: AgentScope = None,
+    ) -> dict[str, list[dict[str, Any]]]:
         raise NotImplementedError
 
+    def observe(
+        self, stream: StreamingAnomalyDetector, agent_id: str, tx: TransactionEvent,
+    ) -> list[dict[str, Any]]:
+        return []
+
+    def _anomaly(self, agent_id: str, detail: str, value: Any, **extra: Any) -> dict[str, Any]:
+        return {
+            "rule": self.name,
+            "severity": self.severity,
+            "agent_id": agent_id,
+            "detail": detail,
+            **extra,
+            "value": value,
+        }
+
 
 class RapidTransactionRule(AnomalyRule):
     """Detects unusually rapid transaction volume."""
@@ -42,27 +107,29 @@ class RapidTransactionRule(AnomalyRule):
     def __init__(self, threshold: int = 50, window_hours: int = 1):
         self.threshold = threshold
         self.window_hours = window_hours
+        self.stream_horizon = timedelta(hours=window_hours)
 
-    async def evaluate(self, db: AsyncSession, agent_id: str) -> list[dict[str, Any]]:
+    def _flag(self, agent_id: str, count: int) -> dict[str, Any]:
+        return self._anomaly(
+            agent_id,
+            f"{count} transactions in {self.window_hours}h (threshold: {self.threshold})",
+            count,
+        )
+
+    async def evaluate_batch(self, db, scope=None):
         since = datetime.now(timezone.utc) - timedelta(hours=self.window_hours)
+        sides = _agent_transactions(Transaction.initiated_at >= since, scope=scope)
         result = await db.execute(
-            select(func.count(Transaction.id)).where(
-                and_(
-                    (Transaction.buyer_id == agent_id) | (Transaction.seller_id == agent_id),
-                    Transaction.created_at >= since,
-                )
-            )
+            select(sides.c.agent_id, func.count())
+            .group_by(sides.c.agent_id)
+            .having(func.count() >= self.threshold)
         )
-        count = result.scalar() or 0
-        if count >= self.threshold:
-            return [{
-                "rule": self.name,
-                "severity": self.severity,
-                "agent_id": agent_id,
-                "detail": f"{count} transactions in {self.window_hours}h (threshold: {self.threshold})",
-                "value": count,
-            }]
-        return []
+        return {agent_id: [self._flag(agent_id, count)] for agent_id, count in result.all()}
+
+    def observe(self, stream, agent_id, tx):
+        count = stream.count_since(agent_id, tx.at - self.stream_horizon)
+        # Raised once, when the window first reaches the threshold.
+        return [self._flag(agent_id, count)] if count == self.threshold else []
 
 
 class SelfTradingRule(AnomalyRule):
@@ -71,25 +138,24 @@ class SelfTradingRule(AnomalyRule):
     name = "self_trading"
     severity = "critical"
 
-    async def evaluate(self, db: AsyncSession, agent_id: str) -> list[dict[str, Any]]:
-        result = await db.execute(
-            select(func.count(Transaction.id)).where(
-                and_(
-                    Transaction.buyer_id == agent_id,
-                    Transaction.seller_id == agent_id,
-                )
-            )
+    def _flag(self, agent_id: str, count: int) -> dict[str, Any]:
+        return self._anomaly(agent_id, f"Agent has {count} self-trade transactions", count)
+
+    async def evaluate_batch(self, db, scope=None):
+        query = (
+            select(Transaction.buyer_id, func.count(Transaction.id))
+            .where(Transaction.buyer_id == Transaction.seller_id)
+            .group_by(Transaction.buyer_id)
         )
-        count = result.scalar() or 0
-        if count > 0:
-            return [{
-                "rule": self.name,
-                "severity": self.severity,
-                "agent_id": agent_id,
-                "detail": f"Agent has {count} self-trade transactions",
-                "value": count,
-            }]
-        return []
+        if scope is not None:
+            query = query.where(Transaction.buyer_id.in_(scope))
+        result = await db.execute(query)
+        return {agent_id: [self._flag(agent_id, count)] for agent_id, count in result.all()}
+
+    def observe(self, stream, agent_id, tx):
+        if tx.buyer_id != tx.seller_id:
+            return []
+        return [self._anomaly(agent_id, f"Self-trade transaction {tx.id}", 1, transaction_id=tx.id)]
 
 
 class LargeTransactionRule(AnomalyRule):
@@ -101,30 +167,33 @@ class LargeTransactionRule(AnomalyRule):
     def __init__(self, threshold_usd: Decimal = Decimal("1000")):
         self.threshold_usd = threshold_usd
 
-    async def evaluate(self, db: AsyncSession, agent_id: str) -> list[dict[str, Any]]:
+    def _flag(self, agent_id: str, tx_id: str, amount) -> dict[str, Any]:
+        return self._anomaly(
+            agent_id,
+            f"Transaction {tx_id}: ${amount} exceeds ${self.threshold_usd} threshold",
+            float(amount),
+            transaction_id=tx_id,
+        )
+
+    async def evaluate_batch(self, db, scope=None):
         since = datetime.now(timezone.utc) - timedelta(hours=24)
-        result = await db.execute(
-            select(Transaction).where(
-                and_(
-                    (Transaction.buyer_id == agent_id) | (Transaction.seller_id == agent_id),
-                    Transaction.amount_usdc >= self.threshold_usd,
-                    Transaction.created_at >= since,
-                )
-            )
+        sides = _agent_transactions(
+            Transaction.amount_usdc >= self.threshold_usd,
+            Transaction.initiated_at >= since,
+            scope=scope,
+            columns=(Transaction.id.label("tx_id"), Transaction.amount_usdc.label("amount")),
         )
-        large_txs = result.scalars().all()
-        anomalies = []
-        for tx in large_txs:
-            anomalies.append({
-                "rule": self.name,
-                "severity": self.severity,
-                "agent_id": agent_id,
-                "detail": f"Transaction {tx.id}: ${tx.amount_usdc} exceeds ${self.threshold_usd} threshold",
-                "transaction_id": tx.id,
-                "value": float(tx.amount_usdc),
-            })
+        result = await db.execute(select(sides.c.agent_id, sides.c.tx_id, sides.c.amount))
+        anomalies: dict[str, list[dict[str, Any]]] = {}
+        for agent_id, tx_id, amount in result.all():
+            anomalies.setdefault(agent_id, []).append(self._flag(agent_id, tx_id, amount))
         return anomalies
 
+    def observe(self, stream, agent_id, tx):
+        if Decimal(str(tx.amount)) < self.threshold_usd:
+            return []
+        return [self._flag(agent_id, tx.id, tx.amount)]
+
 
 class NewAccountHighVolumeRule(AnomalyRule):
     """Detects new accounts with unusually high transaction volume."""
@@ -135,34 +204,44 @@ class NewAccountHighVolumeRule(AnomalyRule):
     def __init__(self, account_age_hours: int = 24, tx_threshold: int = 10):
         self.account_age_hours = account_age_hours
         self.tx_threshold = tx_threshold
+        # Every transaction of an account this young falls inside the horizon.
+        self.stream_horizon = timedelta(hours=account_age_hours)
 
-    async def evaluate(self, db: AsyncSession, agent_id: str) -> list[dict[str, Any]]:
+    def _flag(self, agent_id: str, created_at: datetime, count: int, now: datetime) -> dict[str, Any]:
+        age_hours = (now - created_at).total_seconds() / 3600
+        return self._anomaly(
+            agent_id,
+            f"New account ({age_hours:.1f}h old) with {count} transactions",
+            count,
+        )
+
+    async def evaluate_batch(self, db, scope=None):
+        now = datetime.now(timezone.utc)
+        new_agents = select(RegisteredAgent.id).where(
+            RegisteredAgent.created_at >= now - timedelta(hours=self.account_age_hours),
+        )
+        if scope is not None:
+            new_agents = new_agents.where(RegisteredAgent.id.in_(scope))
+        sides = _agent_transactions(scope=new_agents)
         result = await db.execute(
-            select(RegisteredAgent).where(RegisteredAgent.id == agent_id)
+            select(sides.c.agent_id, RegisteredAgent.created_at, func.count())
+            .join(RegisteredAgent, RegisteredAgent.id == sides.c.agent_id)
+            .group_by(sides.c.agent_id, RegisteredAgent.created_at)
+            .having(func.count() >= self.tx_threshold)
         )
-        agent = result.scalar_one_or_none()
-        if not agent:
+        return {
+            agent_id: [self._flag(agent_id, _as_utc(created_at), count, now)]
+            for agent_id, created_at, count in result.all()
+        }
+
+    def observe(self, stream, agent_id, tx):
+        created_at = stream.created_at(agent_id)
+        if created_at is None or tx.at - created_at > self.stream_horizon:
             return []
-
-        age = datetime.now(timezone.utc) - (agent.created_at or datetime.now(timezone.utc))
-        if age.total_seconds() > self.account_age_hours * 3600:
+        count = stream.count_since(agent_id, created_at)
+        if count != self.tx_threshold:
             return []
-
-        tx_result = await db.execute(
-            select(func.count(Transaction.id)).where(
-                (Transaction.buyer_id == agent_id) | (Transaction.seller_id == agent_id)
-            )
-        )
-        tx_count = tx_result.scalar() or 0
-        if tx_count >= self.tx_threshold:
-            return [{
-                "rule": self.name,
-                "severity": self.severity,
-                "agent_id": agent_id,
-                "detail": f"New account ({age.total_seconds()/3600:.1f}h old) with {tx_count} transactions",
-                "value": tx_count,
-            }]
-        return []
+        return [self._flag(agent_id, created_at, count, tx.at)]
 
 
 # ── Default rules ──
@@ -208,29 +287,219 @@ async def detect_anomalies(
 
 async def scan_all_agents(
     db: AsyncSession,
-    limit: int = 100,
+    limit: int | None = 100,
+    rules: list[AnomalyRule] | None = None,
 ) -> dict[str, list[dict[str, Any]]]:
-    """Scan recently active agents for anomalies.
+    """Scan active agents for anomalies; ``limit=None`` covers every active agent.
 
-    Returns a mapping of agent_id -> list of anomalies.
+    Each rule evaluates the whole scope in one query. Returns a mapping of
+    agent_id -> list of anomalies.
     """
-    since = datetime.now(timezone.utc) - timedelta(hours=24)
-    result = await db.execute(
-        select(RegisteredAgent.id).where(
-            RegisteredAgent.status == "active",
-        ).limit(limit)
-    )
-    agent_ids = [row[0] for row in result.all()]
-
-    results = {}
-    for agent_id in agent_ids:
-        anomalies = await detect_anomalies(db, agent_id)
-        if anomalies:
-            results[agent_id] = anomalies
+    scope = select(RegisteredAgent.id).where(RegisteredAgent.status == "active")
+    if limit is not None:
+        scope = scope.limit(limit)
 
+    results: dict[str, list[dict[str, Any]]] = {}
+    for rule in rules or DEFAULT_RULES:
+        try:
+            found = await rule.evaluate_batch(db, scope)
+        except Exception:
+            logger.exception("Anomaly rule %s failed during scan", rule.name)
+            continue
+        for agent_id, anomalies in found.items():
+            results.setdefault(agent_id, []).extend(anomalies)
+            ABUSE_ANOMALIES_DETECTED.labels(rule=rule.name, mode="scan").inc(len(anomalies))
+
+    if results:
+        logger.warning("Anomaly scan flagged %d agents", len(results))
     return results
 
 
+# ── Streaming detection ──
+
+class TransactionEvent:
+    """The transaction fields streaming rules look at."""
+
+    __slots__ = ("id", "buyer_id", "seller_id", "amount", "at")
+
+    def __init__(self, id: str, buyer_id: str, seller_id: str, amount, at: datetime):
+        self.id = id
+        self.buyer_id = buyer_id
+        self.seller_id = seller_id
+        self.amount = amount
+        self.at = _as_utc(at)
+
+    @classmethod
+    def from_transaction(cls, tx: Transaction) -> TransactionEvent:
+        return cls(
+            tx.id, tx.buyer_id, tx.seller_id, tx.amount_usdc,
+            tx.initiated_at or datetime.now(timezone.utc),
+        )
+
+
+class StreamingAnomalyDetector:
+    """Per-agent sliding windows of recent transactions, fed as they are created.
+
+    Only transactions within the longest ``stream_horizon`` of the rules are
+    kept. ``prime`` loads that span (and the accounts registered within it)
+    from the database so that counts are complete after a restart; after that
+    the detector never queries, so feeding it adds nothing to the request's
+    database work. Agents are evicted least-recently-active first beyond
+    ``max_agents``.
+
+    Transactions are observed after they commit, so until priming finishes the
+    same transaction can reach the detector both live and from ``prime``. The
+    ids of live transactions and of the most recent primed rows are kept for
+    that period so each is counted once.
+    """
+
+    # Primed rows this close to the start of priming may also be observed live.
+    PRIME_OVERLAP = timedelta(minutes=5)
+
+    def __init__(self, rules: list[AnomalyRule] | None = None, max_agents: int = 100_000):
+        self.rules = rules or DEFAULT_RULES
+        self.max_agents = max_agents
+        self.horizon = max((r.stream_horizon for r in self.rules), default=timedelta(0))
+        self._windows: OrderedDict[str, deque[datetime]] = OrderedDict()
+        self._created: OrderedDict[str, datetime] = OrderedDict()
+        self.raised: Counter = Counter()
+        self._primed = False
+        self._unprimed_ids: set[str] = set()
+
+    def count_since(self, agent_id: str, since: datetime) -> int:
+        window = self._windows.get(agent_id)
+        if not window:
+            return 0
+        return len(window) - bisect.bisect_left(window, since)
+
+    def created_at(self, agent_id: str) -> datetime | None:
+        """Creation time of a recently registered agent; None for established ones."""
+        return self._created.get(agent_id)
+
+    def observe(self, tx: TransactionEvent) -> list[dict[str, Any]]:
+        """Record a transaction and return the anomalies it raises."""
+        parties = (tx.buyer_id,) if tx.buyer_id == tx.seller_id else (tx.buyer_id, tx.seller_id)
+        already_counted = not self._primed and not self._remember_unprimed(tx.id)
+        anomalies: list[dict[str, Any]] = []
+        for agent_id in parties:
+            if not already_counted:
+                self._record(agent_id, tx.at)
+            for rule in self.rules:
+                try:
+                    anomalies.extend(rule.observe(self, agent_id, tx))
+                except Exception:
+                    logger.exception("Streaming rule %s failed for agent %s", rule.name, agent_id)
+
+        for anomaly in anomalies:
+            self.raised[anomaly["rule"]] += 1
+            ABUSE_ANOMALIES_DETECTED.labels(rule=anomaly["rule"], mode="stream").inc()
+            logger.warning(
+                "Anomaly %s for agent %s: %s",
+                anomaly["rule"], anomaly["agent_id"], anomaly["detail"],
+            )
+        return anomalies
+
+    def note_agent(self, agent_id: str, created_at: datetime | None) -> None:
+        """Remember a new account's creation time (called on registration)."""
+        if created_at is not None:
+            self._remember_created(agent_id, _as_utc(created_at))
+
+    async def prime(self, db: AsyncSession) -> int:
+        """Load the transactions and new accounts inside the horizon. Returns rows loaded.
+
+        Rows for transactions already observed live are skipped.
+        """
+        try:
+            return await self._prime(db)
+        finally:
+            self._primed = True
+            self._unprimed_ids.clear()
+
+    async def _prime(self, db: AsyncSession) -> int:
+        started = datetime.now(timezone.utc)
+        since = started - self.horizon
+        overlap = started - self.PRIME_OVERLAP
+        agents = await db.stream(
+            select(RegisteredAgent.id, RegisteredAgent.created_at)
+            .where(RegisteredAgent.created_at >= since)
+        )
+        async for agent_id, created in agents:
+            self._remember_created(agent_id, _as_utc(created))
+
+        sides = _agent_transactions(
+            Transaction.initiated_at >= since,
+            columns=(Transaction.id.label("tx_id"), Transaction.initiated_at.label("at")),
+        )
+        rows = await db.stream(
+            select(sides.c.agent_id, sides.c.tx_id, sides.c.at).order_by(sides.c.at)
+            .execution_options(yield_per=10_000)
+        )
+        loaded = 0
+        recent: set[str] = set()
+        async for agent_id, tx_id, at in rows:
+            at = _as_utc(at)
+            if at >= overlap:
+                # Both sides of a transaction share its id; only the first
+                # side decides whether it was already observed live.
+                if tx_id not in recent:
+                    if not self._remember_unprimed(tx_id):
+                        continue
+                    recent.add(tx_id)
+            self._record(agent_id, at)
+            loaded += 1
+        return loaded
+
+    def reset(self) -> None:
+        self._windows.clear()
+        self._created.clear()
+        self.raised.clear()
+        self._primed = False
+        self._unprimed_ids.clear()
+
+    def _remember_unprimed(self, tx_id: str) -> bool:
+        """Note a transaction seen before priming finished; False if already seen."""
+        if tx_id in self._unprimed_ids:
+            return False
+        if len(self._unprimed_ids) < self.max_agents:
+            self._unprimed_ids.add(tx_id)
+        return True
+
+    def _remember_created(self, agent_id: str, created: datetime) -> None:
+        self._created[agent_id] = created
+        self._created.move_to_end(agent_id)
+        while len(self._created) > self.max_agents:
+            self._created.popitem(last=False)
+
+    def _record(self, agent_id: str, at: datetime) -> None:
+        window = self._windows.get(agent_id)
+        if window is None:
+            window = self._windows[agent_id] = deque()
+        else:
+            self._windows.move_to_end(agent_id)
+        if window and at < window[-1]:
+            bisect.insort(window, at)
+        else:
+            window.append(at)
+        cutoff = at - self.horizon
+        while window and window[0] < cutoff:
+            window.popleft()
+        while len(self._windows) > self.max_agents:
+            self._windows.popitem(last=False)
+
+
+# Singleton fed by the transaction creation paths
+abuse_stream = StreamingAnomalyDetector()
+
+
+def observe_transaction(tx: Transaction) -> list[dict[str, Any]]:
+    """Run the streaming rules for a new transaction; never raises."""
+    try:
+        return abuse_stream.observe(TransactionEvent.from_transaction(tx))
+    except Exception:
+        logger.exception("Streaming abuse detection failed for transaction %s", tx.id)
+        return []
+
+
 class AbuseDetectionService:
     """Service wrapper for abuse detection operations."""
 
@@ -242,7 +511,7 @@ class AbuseDetectionService:
             raise ValueError("Database session required")
         return await detect_anomalies(self.db, agent_id, rules)
 
-    async def scan_all_agents(self, limit: int = 100):
+    async def scan_all_agents(self, limit: int | None = 100):
         if self.db is None:
             raise ValueError("Database session required")
         return await scan_all_agents(self.db, limit)
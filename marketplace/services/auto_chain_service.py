@@ -2,7 +2,7 @@
 
 Given a natural-language task description, this service:
 1. Extracts required capabilities using keyword matching against a taxonomy.
-2. Discovers candidate agents per capability via catalog + agent search.
+2. Discovers candidate agents per capability via the capability index.
 3. Ranks candidates by reputation, quality, and cost.
 4. Builds a DAG (graph_json) ordered by capability flow.
 5. Validates the DAG and returns a draft ChainTemplate for user review.
@@ -10,6 +10,7 @@ Given a natural-language task description, this service:
 
 from __future__ import annotations
 
+import heapq
 import json
 import logging
 import re
@@ -18,8 +19,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from marketplace.models.agent import RegisteredAgent
-from marketplace.models.catalog import DataCatalogEntry
-from marketplace.models.reputation import ReputationScore
+from marketplace.services.capability_index import capability_index
 from marketplace.services.chain_registry_service import (
     validate_graph_agents,
 )
@@ -55,6 +55,8 @@ CAPABILITY_TAXONOMY: dict[str, list[str]] = {
     ],
 }
 
+capability_index.pin(CAPABILITY_TAXONOMY)
+
 # Ordered capability flow: data → transform → analysis → compliance → output
 CAPABILITY_FLOW_ORDER: list[str] = [
     "data",
@@ -104,126 +106,48 @@ async def suggest_agents_for_capability(
 ) -> list[dict]:
     """Discover and rank active agents that match a given capability.
 
-    Searches both RegisteredAgent.capabilities (JSON array) and
-    DataCatalogEntry descriptions/namespaces. Results are ranked by a
-    composite of reputation score and catalog quality.
+    Candidates come from the capability index, which matches
+    RegisteredAgent.capabilities/description and DataCatalogEntry
+    topics/descriptions/namespaces against the capability's keywords.
+    Results are ranked by a composite of reputation score and catalog quality.
     """
-    candidates: dict[str, dict] = {}  # agent_id -> info
-
     keywords = CAPABILITY_TAXONOMY.get(capability, [capability])
+    candidates = await capability_index.candidates(db, capability, keywords)
 
-    # 1. Search RegisteredAgent.capabilities JSON field
-    agents_q = select(RegisteredAgent).where(RegisteredAgent.status == "active")
-    agents_result = await db.execute(agents_q)
-    all_agents = list(agents_result.scalars().all())
-
-    for agent in all_agents:
-        try:
-            caps = json.loads(agent.capabilities) if agent.capabilities else []
-        except (json.JSONDecodeError, TypeError):
-            caps = []
-
-        cap_text = " ".join(str(c).lower() for c in caps)
-        agent_desc = (agent.description or "").lower()
-
-        for kw in keywords:
-            if kw in cap_text or kw in agent_desc:
-                candidates[agent.id] = {
-                    "agent_id": agent.id,
-                    "name": agent.name,
-                    "description": agent.description or "",
-                    "a2a_endpoint": agent.a2a_endpoint,
-                    "match_source": "capabilities",
-                    "reputation_score": 0.5,
-                    "catalog_quality": 0.0,
-                    "avg_price": 0.0,
-                }
-                break
-
-    # 2. Search DataCatalogEntry
-    for kw in keywords:
-        pattern = f"%{kw}%"
-        catalog_q = select(DataCatalogEntry).where(
-            DataCatalogEntry.status == "active",
-            (
-                DataCatalogEntry.topic.ilike(pattern)
-                | DataCatalogEntry.description.ilike(pattern)
-                | DataCatalogEntry.namespace.ilike(pattern)
-            ),
-        )
-        catalog_result = await db.execute(catalog_q)
-        entries = list(catalog_result.scalars().all())
-
-        for entry in entries:
-            aid = entry.agent_id
-            if aid in candidates:
-                candidates[aid]["catalog_quality"] = max(
-                    candidates[aid]["catalog_quality"],
-                    float(entry.quality_avg or 0),
-                )
-                candidates[aid]["avg_price"] = float(entry.price_range_min or 0)
-                candidates[aid]["match_source"] = "catalog"
-            else:
-                # Verify agent is active
-                agent_r = await db.execute(
-                    select(RegisteredAgent).where(
-                        RegisteredAgent.id == aid,
-                        RegisteredAgent.status == "active",
-                    )
-                )
-                agent_obj = agent_r.scalar_one_or_none()
-                if not agent_obj:
-                    continue
-
-                candidates[aid] = {
-                    "agent_id": aid,
-                    "name": agent_obj.name,
-                    "description": agent_obj.description or "",
-                    "a2a_endpoint": agent_obj.a2a_endpoint,
-                    "match_source": "catalog",
-                    "reputation_score": 0.5,
-                    "catalog_quality": float(entry.quality_avg or 0),
-                    "avg_price": float(entry.price_range_min or 0),
-                }
-
-    # 3. Enrich with reputation scores
-    if candidates:
-        rep_q = select(ReputationScore).where(
-            ReputationScore.agent_id.in_(list(candidates.keys()))
-        )
-        rep_result = await db.execute(rep_q)
-        reps = list(rep_result.scalars().all())
-        for rep in reps:
-            if rep.agent_id in candidates:
-                candidates[rep.agent_id]["reputation_score"] = float(
-                    rep.composite_score or 0.5
-                )
-
-    # 4. Apply filters
-    filtered = list(candidates.values())
-
+    # 1. Apply filters
     if max_price is not None:
-        filtered = [c for c in filtered if c["avg_price"] <= max_price]
+        candidates = [c for c in candidates if c.avg_price <= max_price]
 
     if min_quality is not None:
-        filtered = [
-            c for c in filtered
-            if c["catalog_quality"] >= min_quality or c["reputation_score"] >= min_quality
+        candidates = [
+            c for c in candidates
+            if c.catalog_quality >= min_quality or c.reputation_score >= min_quality
         ]
 
-    # 5. Rank: 0.5 * reputation + 0.3 * quality - 0.2 * normalized_price
-    max_p = max((c["avg_price"] for c in filtered), default=1.0) or 1.0
-    for c in filtered:
-        norm_price = c["avg_price"] / max_p if max_p > 0 else 0
-        c["rank_score"] = round(
-            0.5 * c["reputation_score"]
-            + 0.3 * c["catalog_quality"]
-            - 0.2 * norm_price,
-            4,
-        )
-
-    filtered.sort(key=lambda c: c["rank_score"], reverse=True)
-    return filtered[:max_results]
+    # 2. Rank: 0.5 * reputation + 0.3 * quality - 0.2 * normalized_price
+    max_p = max((c.avg_price for c in candidates), default=1.0) or 1.0
+    price_weight = 0.2 / max_p
+    ranked = heapq.nlargest(
+        max_results,
+        candidates,
+        key=lambda c: 0.5 * c.reputation_score + 0.3 * c.catalog_quality - price_weight * c.avg_price,
+    )
+    return [
+        {
+            "agent_id": c.agent_id,
+            "name": c.name,
+            "description": c.description,
+            "a2a_endpoint": c.a2a_endpoint,
+            "match_source": c.match_source,
+            "reputation_score": c.reputation_score,
+            "catalog_quality": c.catalog_quality,
+            "avg_price": c.avg_price,
+            "rank_score": round(
+                0.5 * c.reputation_score + 0.3 * c.catalog_quality - price_weight * c.avg_price, 4,
+            ),
+        }
+        for c in ranked
+    ]
 
 
 # ---------------------------------------------------------------------------
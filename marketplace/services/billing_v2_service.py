@@ -10,9 +10,12 @@ from decimal import Decimal
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from marketplace.config import settings
 from marketplace.core.utils import utcnow as _utcnow
 from marketplace.models.billing import BillingPlan, Invoice, Subscription, UsageMeter
 from marketplace.schemas.billing import PlanResponse
+from marketplace.services import usage_metering_service
+from marketplace.services.cache_service import plan_limits_cache
 
 logger = logging.getLogger(__name__)
 
@@ -68,9 +71,28 @@ def _current_period_start() -> datetime:
 
 def _period_end_from_start(period_start: datetime) -> datetime:
     """Calculate the end of a billing period from its start."""
-    next_month = (period_start.month % 12) + 1
-    year = period_start.year + (1 if next_month == 1 else 0)
-    return period_start.replace(year=year, month=next_month)
+    return usage_metering_service.period_end_for(period_start)
+
+
+def invalidate_plan_cache(agent_id: str) -> None:
+    """Drop cached plan limits after an agent's subscription changes."""
+    plan_limits_cache.invalidate(f"limits:{agent_id}")
+
+
+async def get_cached_plan_limits(db: AsyncSession, agent_id: str) -> dict[str, int] | None:
+    """Plan limits for the agent's active subscription, or None without one.
+
+    Cached for ``settings.billing_plan_cache_ttl_seconds``; subscription
+    changes made through this module invalidate the entry.
+    """
+    key = f"limits:{agent_id}"
+    cached = plan_limits_cache.get(key)
+    if cached is not None:
+        return cached or None
+    _, plan = await get_subscription_with_plan(db, agent_id)
+    limits = get_plan_limits(plan) if plan else {}
+    plan_limits_cache.put(key, limits, ttl=settings.billing_plan_cache_ttl_seconds)
+    return limits or None
 
 
 # ---------------------------------------------------------------------------
@@ -151,6 +173,7 @@ async def subscribe(db: AsyncSession, agent_id: str, plan_id: str) -> Subscripti
     db.add(sub)
     await db.commit()
     await db.refresh(sub)
+    invalidate_plan_cache(agent_id)
     return sub
 
 
@@ -183,6 +206,7 @@ async def cancel_subscription(
     sub.updated_at = _utcnow()
     await db.commit()
     await db.refresh(sub)
+    invalidate_plan_cache(sub.agent_id)
     return sub
 
 
@@ -214,21 +238,24 @@ async def get_subscription_with_plan(
 async def record_usage(
     db: AsyncSession, agent_id: str, meter_type: str, value: float
 ) -> UsageMeter:
-    """Record a usage data point for an agent."""
+    """Record a usage data point for an agent.
+
+    The point is buffered in-process and persisted by the next usage flush
+    (background loop, or inline once ``settings.usage_flush_batch_size``
+    keys are pending). Returns the unsaved data point.
+    """
     period_start = _current_period_start()
-    period_end = _period_end_from_start(period_start)
+    usage_metering_service.record(agent_id, meter_type, value, period_start)
+    if len(usage_metering_service.usage_buffer) >= settings.usage_flush_batch_size:
+        await usage_metering_service.flush_usage(db)
 
-    meter = UsageMeter(
+    return UsageMeter(
         agent_id=agent_id,
         metric_name=meter_type,
         value=value,
         period_start=period_start,
-        period_end=period_end,
+        period_end=_period_end_from_start(period_start),
     )
-    db.add(meter)
-    await db.commit()
-    await db.refresh(meter)
-    return meter
 
 
 async def get_usage(
@@ -237,7 +264,12 @@ async def get_usage(
     meter_type: str | None = None,
     period_start: datetime | None = None,
 ) -> list[UsageMeter]:
-    """Get usage records for an agent, optionally filtered by type and period."""
+    """Get usage history rows for an agent, optionally filtered by type and period.
+
+    Buffered usage is flushed first so the rows include every recorded point.
+    Use ``get_period_usage`` when only the totals are needed.
+    """
+    await usage_metering_service.flush_usage(db)
     stmt = select(UsageMeter).where(UsageMeter.agent_id == agent_id)
     if meter_type:
         stmt = stmt.where(UsageMeter.metric_name == meter_type)
@@ -247,32 +279,29 @@ async def get_usage(
     return list(result.scalars().all())
 
 
+async def get_period_usage(db: AsyncSession, agent_id: str) -> dict[str, float]:
+    """Current-period totals per metric from the pre-aggregated counters."""
+    return await usage_metering_service.period_usage(db, agent_id, _current_period_start())
+
+
 async def check_limits(
     db: AsyncSession, agent_id: str, meter_type: str
 ) -> dict:
     """Check if an agent has exceeded their plan limits for a meter type.
 
+    Answered from the cached plan limits and the running usage counter, so
+    the cost is constant regardless of how much usage was recorded.
+
     Returns dict with keys: allowed (bool), current (float), limit (int).
     """
-    sub = await get_subscription(db, agent_id)
-    if not sub:
+    limits = await get_cached_plan_limits(db, agent_id)
+    if not limits:
         return {"allowed": False, "current": 0, "limit": 0}
 
-    # Load the plan
-    plan_result = await db.execute(
-        select(BillingPlan).where(BillingPlan.id == sub.plan_id)
-    )
-    plan = plan_result.scalar_one_or_none()
-    if not plan:
-        return {"allowed": False, "current": 0, "limit": 0}
-
-    limits = get_plan_limits(plan)
     limit = limits.get(meter_type, 0)
-
-    # Sum usage for the current period
-    period_start = _current_period_start()
-    usage_records = await get_usage(db, agent_id, meter_type, period_start)
-    current = sum(float(u.value) for u in usage_records)
+    current = await usage_metering_service.current_usage(
+        db, agent_id, meter_type, _current_period_start()
+    )
 
     return {
         "allowed": current < limit,
@@ -412,6 +441,7 @@ async def change_plan(
     db.add(new_sub)
     await db.commit()
     await db.refresh(new_sub)
+    invalidate_plan_cache(agent_id)
     return new_sub
 
 
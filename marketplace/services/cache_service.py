@@ -1,12 +1,47 @@
-"""In-memory LRU cache with per-entry TTL expiration.
+"""In-memory LRU cache with per-entry TTL expiration, and a shared tier.
 
-Pure Python, no external dependencies. Uses OrderedDict for O(1) LRU
-and time.monotonic() for clock-safe TTL.
+``TTLCache`` is pure Python, no external dependencies. Uses OrderedDict for
+O(1) LRU and time.monotonic() for clock-safe TTL. ``SizedTTLCache`` also
+keeps the total size of its values within a byte budget, for entries whose
+size varies by orders of magnitude.
+
+``TieredCache`` keeps a ``TTLCache`` as L1 in front of Redis (``REDIS_URL``)
+as L2, so a value loaded by one worker serves every worker and replica.
+It holds JSON-native snapshots, never ORM instances: ``snapshot()`` and
+``restore()`` convert between the two. Invalidations are published on a
+Redis channel and applied to every process's L1 by
+``cache_invalidation_listener()``. Misses are single-flight: concurrent
+lookups of one key share a single load, within a process and — via a
+short Redis lock — across processes. Without Redis a ``TieredCache``
+behaves like its L1 alone.
 """
 
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
 import time
+import uuid
 from collections import OrderedDict
-from typing import Any
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import DateTime, Numeric
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from marketplace.config import settings
+from marketplace.core.metrics import CACHE_LOOKUPS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
 
 
 class TTLCache:
@@ -66,7 +101,423 @@ class TTLCache:
         }
 
 
+class SizedTTLCache(TTLCache):
+    """TTLCache whose values together stay within ``max_bytes``.
+
+    ``sizeof`` gives a value's size in bytes. Least recently used entries are
+    evicted until a new value fits; a value larger than the whole budget is
+    not cached.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizeof: Callable[[Any], int] = len,
+        maxsize: int = 1024,
+        default_ttl: float = 300.0,
+    ):
+        super().__init__(maxsize=maxsize, default_ttl=default_ttl)
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._sizes: dict[str, int] = {}
+        self._current_bytes = 0
+
+    def _forget(self, key: str) -> None:
+        self._current_bytes -= self._sizes.pop(key, 0)
+
+    def get(self, key: str) -> Any | None:
+        value = super().get(key)
+        if value is None:
+            self._forget(key)  # expired entries are dropped by the lookup
+        return value
+
+    def put(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Store value with TTL. Evicts LRU entries until it fits the byte budget."""
+        size = self._sizeof(value)
+        self.invalidate(key)
+        if size > self._max_bytes:
+            return
+        while self._cache and (
+            self._current_bytes + size > self._max_bytes or len(self._cache) >= self._maxsize
+        ):
+            evicted, _ = self._cache.popitem(last=False)
+            self._forget(evicted)
+        super().put(key, value, ttl)
+        self._sizes[key] = size
+        self._current_bytes += size
+
+    def invalidate(self, key: str) -> bool:
+        self._forget(key)
+        return super().invalidate(key)
+
+    def clear(self) -> None:
+        super().clear()
+        self._sizes.clear()
+        self._current_bytes = 0
+
+    def stats(self) -> dict:
+        return {**super().stats(), "bytes_used": self._current_bytes, "bytes_max": self._max_bytes}
+
+
+# ── Shared tier ──
+
+# Identifies this process in invalidation messages, so it skips its own
+_INSTANCE_ID = uuid.uuid4().hex
+_REDIS_RETRY_SECONDS = 30.0
+_LOAD_LOCK_MS = 2000  # how long other replicas wait for one replica's load
+_LOAD_POLL_SECONDS = 0.05
+_GENERATION_TTL_MS = 60_000  # outlives any load that compares against it
+
+_tiered_caches: dict[str, TieredCache] = {}
+_redis = None
+_redis_retry_at = 0.0
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+async def _get_redis():
+    """The shared Redis client, or None when L2 is off or unreachable."""
+    global _redis, _redis_retry_at
+    if not settings.redis_url or not settings.cache_l2_enabled:
+        return None
+    if _redis is None and time.monotonic() >= _redis_retry_at:
+        try:
+            from redis.asyncio import from_url
+
+            connect_kwargs: dict[str, Any] = {"socket_connect_timeout": 2, "socket_timeout": 2}
+            if settings.redis_url.startswith("rediss://"):
+                connect_kwargs["ssl_cert_reqs"] = "required"
+            client = from_url(settings.redis_url, **connect_kwargs)
+            await client.ping()
+            _redis = client
+        except Exception:
+            logger.warning("Redis unavailable — caches run without the shared tier")
+            _redis_retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+    return _redis
+
+
+async def get_shared_redis():
+    """The shared Redis client for cross-process coordination, or None."""
+    return await _get_redis()
+
+
+def _redis_failed() -> None:
+    """Drop the client after an error; L2 is retried after a pause."""
+    global _redis, _redis_retry_at
+    if _redis is not None:
+        logger.warning("Redis cache tier failed — using in-process caches only for now")
+    _redis = None
+    _redis_retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+
+
+class TieredCache(TTLCache):
+    """TTLCache (L1) backed by a Redis tier (L2) shared by all processes.
+
+    The inherited sync methods touch L1 only. Values must survive a JSON
+    round trip.
+
+    ``ainvalidate`` bumps a per-key generation in Redis. A load stores its
+    result only if neither that generation nor this process saw an
+    invalidation while the loader ran, so a snapshot read before a write is
+    never republished after the write's invalidation.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, default_ttl: float = 300.0):
+        super().__init__(maxsize, default_ttl)
+        self.name = name
+        self._l2_hits = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._stale_loads: set[str] = set()  # in-flight loads invalidated meanwhile
+        _tiered_caches[name] = self
+
+    def _l2_key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    def invalidate(self, key: str) -> bool:
+        if key in self._inflight:
+            self._stale_loads.add(key)
+        return super().invalidate(key)
+
+    def clear(self) -> None:
+        self._stale_loads.update(self._inflight)
+        super().clear()
+
+    async def _l2_get(self, key: str) -> Any | None:
+        redis = await _get_redis()
+        if redis is None:
+            return None
+        try:
+            raw = await redis.get(self._l2_key(key))
+        except Exception:
+            _redis_failed()
+            return None
+        if raw is None:
+            return None
+        value = _loads(raw)
+        self._l2_hits += 1
+        super().put(key, value)
+        return value
+
+    async def aget(self, key: str) -> Any | None:
+        """L1, then L2 (which refills L1)."""
+        value = self.get(key)
+        if value is not None:
+            CACHE_LOOKUPS.labels(cache=self.name, result="l1_hit").inc()
+            return value
+        value = await self._l2_get(key)
+        CACHE_LOOKUPS.labels(cache=self.name, result="miss" if value is None else "l2_hit").inc()
+        return value
+
+    async def aput(self, key: str, value: Any, ttl: float | None = None) -> None:
+        ttl = ttl if ttl is not None else self._default_ttl
+        super().put(key, value, ttl)
+        redis = await _get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(self._l2_key(key), _dumps(value), px=max(1, int(ttl * 1000)))
+        except Exception:
+            _redis_failed()
+
+    async def ainvalidate(self, key: str) -> None:
+        """Drop ``key`` from L1 and L2 and tell every other process to drop it."""
+        self.invalidate(key)
+        redis = await _get_redis()
+        if redis is None:
+            return
+        generation_key = f"{self._l2_key(key)}:gen"
+        try:
+            # Bump the generation before deleting, so a concurrent load that
+            # writes after the delete sees it and takes its write back.
+            await redis.incr(generation_key)
+            await redis.pexpire(generation_key, _GENERATION_TTL_MS)
+            await redis.delete(self._l2_key(key))
+            await redis.publish(
+                settings.cache_invalidation_channel,
+                _dumps({"origin": _INSTANCE_ID, "cache": self.name, "key": key}),
+            )
+        except Exception:
+            _redis_failed()
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float | None = None,
+    ) -> Any:
+        """Cached value of ``key``, else the result of one shared ``loader()``.
+
+        A None result is returned but not cached; loader exceptions reach
+        every caller waiting on that load.
+        """
+        value = await self.aget(key)
+        if value is not None:
+            return value
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        # A failed load with no waiters is not an "exception never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader, ttl)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+            self._stale_loads.discard(key)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float | None) -> Any:
+        redis = await _get_redis()
+        lock_key = f"{self._l2_key(key)}:loading"
+        locked = False
+        if redis is not None:
+            try:
+                locked = bool(await redis.set(lock_key, _INSTANCE_ID, nx=True, px=_LOAD_LOCK_MS))
+            except Exception:
+                _redis_failed()
+            if not locked and _redis is not None:
+                # Another replica is loading this key; wait for its result,
+                # or until it releases the lock without one (None or error)
+                deadline = time.monotonic() + _LOAD_LOCK_MS / 1000
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(_LOAD_POLL_SECONDS)
+                    try:
+                        released = await redis.get(lock_key) is None
+                    except Exception:
+                        _redis_failed()
+                        break
+                    value = await self._l2_get(key)
+                    if value is not None:
+                        return value
+                    if released:
+                        break
+        generation_key = f"{self._l2_key(key)}:gen"
+        generation = await self._generation(generation_key)
+        self._stale_loads.discard(key)
+        try:
+            value = await loader()
+            if value is not None:
+                await self._put_loaded(key, value, ttl, generation_key, generation)
+            return value
+        finally:
+            if locked:
+                try:
+                    await redis.delete(lock_key)
+                except Exception:
+                    _redis_failed()
+
+    async def _generation(self, generation_key: str) -> bytes | None:
+        redis = await _get_redis()
+        if redis is None:
+            return None
+        try:
+            return await redis.get(generation_key)
+        except Exception:
+            _redis_failed()
+            return None
+
+    async def _put_loaded(
+        self, key: str, value: Any, ttl: float | None, generation_key: str, generation: bytes | None,
+    ) -> None:
+        """``aput`` a loader's result unless ``key`` was invalidated during the load."""
+        if key in self._stale_loads or await self._generation(generation_key) != generation:
+            return
+        await self.aput(key, value, ttl)
+        # An invalidation between the check and the write bumped the
+        # generation before its delete; drop what was just written.
+        if key in self._stale_loads or await self._generation(generation_key) != generation:
+            self.invalidate(key)
+            redis = await _get_redis()
+            if redis is not None:
+                try:
+                    await redis.delete(self._l2_key(key))
+                except Exception:
+                    _redis_failed()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["l2_hits"] = self._l2_hits
+        stats["shared"] = _redis is not None
+        return stats
+
+
+def _apply_invalidation(raw: bytes) -> None:
+    try:
+        message = _loads(raw)
+    except ValueError:
+        return
+    if message.get("origin") == _INSTANCE_ID:
+        return
+    cache = _tiered_caches.get(message.get("cache"))
+    if cache is not None:
+        cache.invalidate(message.get("key", ""))
+
+
+async def cache_invalidation_listener() -> None:
+    """Background task: apply other processes' invalidations to this L1.
+
+    L1 is cleared on every (re)subscribe, since invalidations sent while
+    unsubscribed were missed.
+    """
+    while True:
+        redis = await _get_redis()
+        if redis is None:
+            await asyncio.sleep(_REDIS_RETRY_SECONDS)
+            continue
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(settings.cache_invalidation_channel)
+            for cache in _tiered_caches.values():
+                cache.clear()
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _apply_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            _redis_failed()
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+        await asyncio.sleep(1)
+
+
+# ── ORM snapshots ──
+
+def snapshot(instance) -> dict[str, Any] | None:
+    """Column values of an ORM instance as JSON-native values.
+
+    None if any column is unloaded (reading it would need the database).
+    """
+    state = sa_inspect(instance)
+    columns = state.mapper.column_attrs
+    if state.unloaded & {attr.key for attr in columns}:
+        return None
+    data: dict[str, Any] = {}
+    for attr in columns:
+        value = state.dict.get(attr.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        data[attr.key] = value
+    return data
+
+
+async def restore(db, model, data: dict[str, Any]):
+    """A persistent ``model`` instance in ``db`` from a ``snapshot()``.
+
+    Issues no SQL: an instance already in the session is returned as is,
+    otherwise the snapshot is merged in as if freshly loaded.
+    Relationships are left unloaded.
+    """
+    mapper = sa_inspect(model)
+    identity = mapper.identity_key_from_primary_key(
+        [data[mapper.get_property_by_column(column).key] for column in mapper.primary_key]
+    )
+    existing = db.identity_map.get(identity)
+    if existing is not None:
+        return existing
+    instance = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        value = data.get(attr.key)
+        if value is not None:
+            column_type = attr.columns[0].type
+            if isinstance(column_type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column_type, Numeric) and column_type.asdecimal:
+                value = Decimal(value)
+        set_committed_value(instance, attr.key, value)
+    make_transient_to_detached(instance)
+    return await db.merge(instance, load=False)
+
+
 # Pre-configured singleton caches
-listing_cache = TTLCache(maxsize=512, default_ttl=120.0)    # 2 min TTL
+listing_cache = TieredCache("listing", maxsize=512, default_ttl=120.0)  # 2 min TTL, listing snapshots
 content_cache = TTLCache(maxsize=256, default_ttl=300.0)    # 5 min TTL, stores bytes
-agent_cache = TTLCache(maxsize=256, default_ttl=600.0)      # 10 min TTL
+agent_cache = TieredCache("agent", maxsize=256, default_ttl=600.0)      # 10 min TTL, agent snapshots
+proof_cache = TTLCache(maxsize=512, default_ttl=600.0)      # 10 min TTL, decoded ZK proof headers
+merkle_tree_cache = SizedTTLCache(                          # 10 min TTL, packed Merkle trees
+    max_bytes=settings.zkp_merkle_cache_max_bytes,
+    sizeof=lambda tree: len(tree.blob),
+    maxsize=512,
+    default_ttl=600.0,
+)
+plan_limits_cache = TTLCache(maxsize=4096, default_ttl=60.0)  # 1 min TTL, billing limits per agent
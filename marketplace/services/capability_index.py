@@ -0,0 +1,351 @@
+"""In-memory capability index for agent discovery.
+
+Keeps one document per active agent (name, endpoint, capability text, active
+catalog entries and reputation) and, per capability, a postings map of the
+agents whose capabilities, description or catalog entries mention one of the
+capability's keywords, with the matching catalog quality and price
+pre-joined. ``auto_chain_service.suggest_agents_for_capability`` ranks
+straight from these postings instead of scanning the agent and catalog
+tables on every call.
+
+The index stays current in two ways:
+
+* Registry, catalog and reputation services call ``invalidate(agent_id)``
+  after a write, so the agent is reloaded on the next lookup.
+* A lookup first compares the tables' ``(max(updated_at), count)``
+  watermarks with the last sync (at most every
+  ``capability_index_sync_interval_seconds``) and reloads only agents with
+  rows newer than the watermark. This picks up writes that bypass the
+  services or come from other workers. A shrinking row count means
+  something was hard-deleted and triggers a full rebuild.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.config import settings
+from marketplace.models.agent import RegisteredAgent
+from marketplace.models.catalog import DataCatalogEntry
+from marketplace.models.reputation import ReputationScore
+
+logger = logging.getLogger(__name__)
+
+# Ad-hoc capabilities (anything outside the taxonomy) whose postings are kept
+_MAX_ADHOC_POSTINGS = 256
+
+
+@dataclass(slots=True)
+class _CatalogDoc:
+    text: str  # lowercased topic + description + namespace
+    quality: float
+    price: float
+
+
+@dataclass(slots=True)
+class _AgentDoc:
+    agent_id: str
+    name: str
+    description: str
+    a2a_endpoint: str
+    search_text: str  # lowercased capabilities + description
+    reputation: float = 0.5
+    catalog: list[_CatalogDoc] = field(default_factory=list)
+
+
+@dataclass(slots=True, frozen=True)
+class _Posting:
+    match_source: str  # "capabilities" | "catalog"
+    catalog_quality: float
+    avg_price: float
+
+
+@dataclass(slots=True)
+class Candidate:
+    """One agent matching a capability, with its ranking inputs."""
+
+    agent_id: str
+    name: str
+    description: str
+    a2a_endpoint: str
+    match_source: str
+    reputation_score: float
+    catalog_quality: float
+    avg_price: float
+
+
+def _keyword_pattern(keywords: tuple[str, ...]) -> re.Pattern[str]:
+    return re.compile("|".join(re.escape(kw) for kw in keywords))
+
+
+def _match(doc: _AgentDoc, pattern: re.Pattern[str]) -> _Posting | None:
+    matching = [entry for entry in doc.catalog if pattern.search(entry.text)]
+    if not matching:
+        return _Posting("capabilities", 0.0, 0.0) if pattern.search(doc.search_text) else None
+    return _Posting(
+        "catalog",
+        max(entry.quality for entry in matching),
+        min(entry.price for entry in matching),
+    )
+
+
+def _search_text(capabilities: str | None, description: str | None) -> str:
+    try:
+        caps = json.loads(capabilities) if capabilities else []
+    except (json.JSONDecodeError, TypeError):
+        caps = []
+    if not isinstance(caps, list):
+        caps = []
+    return " ".join(str(c).lower() for c in caps) + "\n" + (description or "").lower()
+
+
+class _Postings:
+    """Agents matching one capability's keywords."""
+
+    __slots__ = ("keywords", "pattern", "by_agent", "_candidates")
+
+    def __init__(self, keywords: tuple[str, ...]) -> None:
+        self.keywords = keywords
+        self.pattern = _keyword_pattern(keywords)
+        self.by_agent: dict[str, _Posting] = {}
+        self._candidates: list[Candidate] | None = None
+
+    def fill(self, docs: dict[str, _AgentDoc]) -> None:
+        self.by_agent = {}
+        for agent_id, doc in docs.items():
+            posting = _match(doc, self.pattern)
+            if posting is not None:
+                self.by_agent[agent_id] = posting
+        self._candidates = None
+
+    def update(self, agent_id: str, doc: _AgentDoc | None) -> None:
+        posting = _match(doc, self.pattern) if doc is not None else None
+        if posting is None:
+            if self.by_agent.pop(agent_id, None) is not None:
+                self._candidates = None
+        else:
+            self.by_agent[agent_id] = posting
+            self._candidates = None
+
+    def candidates(self, docs: dict[str, _AgentDoc]) -> list[Candidate]:
+        # Materialized once per change, so repeated lookups only pay for ranking.
+        if self._candidates is None:
+            self._candidates = [
+                Candidate(
+                    agent_id=agent_id,
+                    name=docs[agent_id].name,
+                    description=docs[agent_id].description,
+                    a2a_endpoint=docs[agent_id].a2a_endpoint,
+                    match_source=posting.match_source,
+                    reputation_score=docs[agent_id].reputation,
+                    catalog_quality=posting.catalog_quality,
+                    avg_price=posting.avg_price,
+                )
+                for agent_id, posting in self.by_agent.items()
+            ]
+        return self._candidates
+
+
+class CapabilityIndex:
+    """Capability → matching agents, maintained incrementally."""
+
+    def __init__(self, sync_interval_seconds: float = 1.0) -> None:
+        self._sync_interval = sync_interval_seconds
+        self._docs: dict[str, _AgentDoc] = {}
+        self._postings: OrderedDict[str, _Postings] = OrderedDict()
+        self._pinned: set[str] = set()
+        self._watermarks: tuple | None = None
+        self._synced_at = 0.0
+        self._pending: set[str] = set()
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def invalidate(self, agent_id: str | None = None) -> None:
+        """Reload ``agent_id`` (or just re-check the watermarks) on the next lookup."""
+        if agent_id:
+            self._pending.add(agent_id)
+        self._synced_at = 0.0
+
+    def clear(self) -> None:
+        self._docs.clear()
+        self._postings.clear()
+        self._watermarks = None
+        self._synced_at = 0.0
+        self._pending.clear()
+        self.rebuilds = 0
+
+    def pin(self, capabilities: Iterable[str]) -> None:
+        """Register capabilities whose postings are never evicted (the taxonomy)."""
+        self._pinned.update(capabilities)
+
+    async def candidates(
+        self, db: AsyncSession, capability: str, keywords: list[str],
+    ) -> list[Candidate]:
+        """Active agents matching any of ``keywords``, in index order.
+
+        The returned list is shared between callers and must not be mutated.
+        """
+        await self._sync(db)
+        return self._postings_for(capability, tuple(kw.lower() for kw in keywords)).candidates(self._docs)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "agents": len(self._docs),
+            "capabilities": len(self._postings),
+            "rebuilds": self.rebuilds,
+        }
+
+    def _postings_for(self, capability: str, keywords: tuple[str, ...]) -> _Postings:
+        postings = self._postings.get(capability)
+        if postings is not None and postings.keywords == keywords:
+            self._postings.move_to_end(capability)
+            return postings
+
+        postings = _Postings(keywords)
+        postings.fill(self._docs)
+        self._postings[capability] = postings
+
+        adhoc = [cap for cap in self._postings if cap not in self._pinned]
+        for cap in adhoc[:max(len(adhoc) - _MAX_ADHOC_POSTINGS, 0)]:
+            del self._postings[cap]
+        return postings
+
+    # ------------------------------------------------------------------
+    # Synchronisation with the database
+    # ------------------------------------------------------------------
+
+    async def _sync(self, db: AsyncSession) -> None:
+        if self._watermarks is not None and time.monotonic() - self._synced_at < self._sync_interval:
+            return
+        async with self._lock:
+            if self._watermarks is not None and time.monotonic() - self._synced_at < self._sync_interval:
+                return
+            watermarks = await _read_watermarks(db)
+            previous = self._watermarks
+            if previous is None or any(now[1] < before[1] for now, before in zip(watermarks, previous)):
+                await self._rebuild(db)
+            elif watermarks != previous or self._pending:
+                await self._apply_changes(db, previous)
+            self._watermarks = watermarks
+            self._synced_at = time.monotonic()
+
+    async def _rebuild(self, db: AsyncSession) -> None:
+        started = time.perf_counter()
+        self._docs = await _load_docs(db, None)
+        for postings in self._postings.values():
+            postings.fill(self._docs)
+        self._pending.clear()
+        self.rebuilds += 1
+        logger.info(
+            "Capability index rebuilt: %d agents in %.0fms",
+            len(self._docs), (time.perf_counter() - started) * 1000,
+        )
+
+    async def _apply_changes(self, db: AsyncSession, previous: tuple) -> None:
+        (agents_since, _), (catalog_since, _), (reputation_since, _) = previous
+        changed = set(self._pending)
+        self._pending.clear()
+        for id_column, stamp_column, since in (
+            (RegisteredAgent.id, RegisteredAgent.updated_at, agents_since),
+            (DataCatalogEntry.agent_id, DataCatalogEntry.updated_at, catalog_since),
+            (ReputationScore.agent_id, ReputationScore.last_calculated_at, reputation_since),
+        ):
+            query = select(id_column).distinct()
+            if since is not None:
+                # >= so rows sharing the watermark's timestamp are not missed
+                query = query.where(stamp_column >= since)
+            changed.update((await db.execute(query)).scalars().all())
+        if not changed:
+            return
+
+        docs = await _load_docs(db, changed)
+        for agent_id in changed:
+            doc = docs.get(agent_id)
+            if doc is None:
+                self._docs.pop(agent_id, None)
+            else:
+                self._docs[agent_id] = doc
+            for postings in self._postings.values():
+                postings.update(agent_id, doc)
+
+
+async def _read_watermarks(db: AsyncSession) -> tuple:
+    """``(max timestamp, row count)`` for agents, catalog entries and reputation."""
+    row = (await db.execute(select(
+        select(func.max(RegisteredAgent.updated_at)).scalar_subquery(),
+        select(func.count(RegisteredAgent.id)).scalar_subquery(),
+        select(func.max(DataCatalogEntry.updated_at)).scalar_subquery(),
+        select(func.count(DataCatalogEntry.id)).scalar_subquery(),
+        select(func.max(ReputationScore.last_calculated_at)).scalar_subquery(),
+        select(func.count(ReputationScore.id)).scalar_subquery(),
+    ))).one()
+    return ((row[0], row[1]), (row[2], row[3]), (row[4], row[5]))
+
+
+async def _load_docs(db: AsyncSession, agent_ids: set[str] | None) -> dict[str, _AgentDoc]:
+    """Index documents for the given active agents (all active agents if None)."""
+    agents_q = select(
+        RegisteredAgent.id,
+        RegisteredAgent.name,
+        RegisteredAgent.description,
+        RegisteredAgent.a2a_endpoint,
+        RegisteredAgent.capabilities,
+    ).where(RegisteredAgent.status == "active")
+    catalog_q = select(
+        DataCatalogEntry.agent_id,
+        DataCatalogEntry.topic,
+        DataCatalogEntry.description,
+        DataCatalogEntry.namespace,
+        DataCatalogEntry.quality_avg,
+        DataCatalogEntry.price_range_min,
+    ).where(DataCatalogEntry.status == "active")
+    reputation_q = select(ReputationScore.agent_id, ReputationScore.composite_score)
+    if agent_ids is not None:
+        ids = list(agent_ids)
+        agents_q = agents_q.where(RegisteredAgent.id.in_(ids))
+        catalog_q = catalog_q.where(DataCatalogEntry.agent_id.in_(ids))
+        reputation_q = reputation_q.where(ReputationScore.agent_id.in_(ids))
+
+    docs = {
+        agent_id: _AgentDoc(
+            agent_id=agent_id,
+            name=name,
+            description=description or "",
+            a2a_endpoint=endpoint,
+            search_text=_search_text(capabilities, description),
+        )
+        for agent_id, name, description, endpoint, capabilities in await db.execute(agents_q)
+    }
+    for agent_id, topic, description, namespace, quality, price in await db.execute(catalog_q):
+        doc = docs.get(agent_id)
+        if doc is not None:
+            doc.catalog.append(_CatalogDoc(
+                text=f"{topic or ''} {description or ''} {namespace or ''}".lower(),
+                quality=float(quality or 0),
+                price=float(price or 0),
+            ))
+    for agent_id, score in await db.execute(reputation_q):
+        doc = docs.get(agent_id)
+        if doc is not None:
+            doc.reputation = float(score or 0.5)
+    return docs
+
+
+capability_index = CapabilityIndex(
+    sync_interval_seconds=settings.capability_index_sync_interval_seconds,
+)
@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from marketplace.core.events import broadcast_event
 from marketplace.models.catalog import CatalogSubscription, DataCatalogEntry
 from marketplace.models.listing import DataListing
+from marketplace.services.capability_index import capability_index
 
 
 async def register_catalog_entry(
@@ -38,6 +39,7 @@ async def register_catalog_entry(
     db.add(entry)
     await db.commit()
     await db.refresh(entry)
+    capability_index.invalidate(agent_id)
 
     # Notify subscribers
     await notify_subscribers(db, entry)
@@ -117,6 +119,7 @@ async def update_catalog_entry(
     entry.updated_at = datetime.now(timezone.utc)
     await db.commit()
     await db.refresh(entry)
+    capability_index.invalidate(agent_id)
     return entry
 
 
@@ -126,6 +129,7 @@ async def delete_catalog_entry(db: AsyncSession, entry_id: str, agent_id: str) -
         return False
     entry.status = "retired"
     await db.commit()
+    capability_index.invalidate(agent_id)
     return True
 
 
@@ -275,6 +279,7 @@ async def auto_populate_catalog(db: AsyncSession, agent_id: str) -> list[DataCat
 
     if created:
         await db.commit()
+        capability_index.invalidate(agent_id)
         for e in created:
             await db.refresh(e)
 
@@ -2,7 +2,7 @@
 
 Tier 1 (Hot):  In-memory LFU cache, 256MB budget, sub-0.1ms
 Tier 2 (Warm): TTL cache from cache_service, ~0.5ms
-Tier 3 (Cold): HashFS disk via asyncio.to_thread(), ~1-5ms
+Tier 3 (Cold): content storage via its async I/O pool, ~1-5ms
 
 Auto-promotion: content accessed >10 times/minute → Tier 1.
 Background decay: every 60s, halve access counters.
@@ -155,8 +155,7 @@ async def get_content(content_hash: str) -> bytes | None:
         return data
 
     # Tier 3: Cold storage (HashFS on disk)
-    storage = get_storage()
-    data = await asyncio.to_thread(storage.get, content_hash)
+    data = await get_storage().aget(content_hash)
     if data is not None:
         _cdn_stats["tier3_hits"] += 1
         # Always cache in Tier 2
@@ -1,20 +1,28 @@
 """Chain Provenance Service — persistent provenance entries and timeline queries.
 
-Provides a callback factory for the orchestration engine to write provenance
-entries as nodes start, complete, or fail, plus query helpers for retrieval.
+Provides a journal for the orchestration engine to record provenance entries
+as nodes start, complete, or fail, plus query helpers for retrieval.
+
+Node events are not committed one by one. Each execution's
+``ProvenanceJournal`` buffers them and bulk-inserts the pending rows every
+``chain_provenance_flush_interval_seconds`` (sooner once
+``chain_provenance_flush_batch_size`` are pending) and when the execution
+ends. Event timestamps are strictly increasing per execution, so the
+timeline replays in the order the events were recorded.
 """
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from collections.abc import Callable, Coroutine
-from datetime import datetime, timezone
+import uuid
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Any
 
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from marketplace.config import settings
 from marketplace.models.chain_provenance import ChainProvenanceEntry
 from marketplace.services.chain_registry_service import (
     _compute_provenance_hash,
@@ -23,22 +31,45 @@ from marketplace.services.chain_registry_service import (
 
 logger = logging.getLogger(__name__)
 
+_STATUS_BY_EVENT = {
+    "node_started": "running",
+    "node_completed": "completed",
+    "node_failed": "failed",
+}
+
 
 # ---------------------------------------------------------------------------
-# Callback factory
+# Journal
 # ---------------------------------------------------------------------------
 
 
-def make_provenance_callback(
-    chain_execution_id: str,
-) -> Callable[..., Coroutine[Any, Any, None]]:
-    """Return an ``on_node_event`` callback that writes ChainProvenanceEntry rows.
+async def _payload_hash(payload: str | None) -> str | None:
+    """SHA-256 of a node's input or output JSON, off the event loop when large."""
+    if not payload:
+        return None
+    if len(payload) <= settings.chain_provenance_inline_hash_bytes:
+        return _compute_provenance_hash(payload, "")
+    return await asyncio.to_thread(_compute_provenance_hash, payload, "")
+
 
-    The callback creates its own DB session via ``async_session`` so it is
-    safe to call after the request session has been closed (background tasks).
+class ProvenanceJournal:
+    """Buffered ``on_node_event`` callback for one chain execution.
+
+    Writes through its own DB session via ``async_session`` so it is safe to
+    use after the request session has been closed (background tasks). Call
+    ``close`` when the execution ends to write the remaining events.
     """
 
-    async def _on_node_event(
+    def __init__(self, chain_execution_id: str) -> None:
+        self.chain_execution_id = chain_execution_id
+        self._pending: list[dict] = []
+        self._last_timestamp: datetime | None = None
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+        self._closed = False
+
+    async def __call__(
+        self,
         event_type: str,
         node_id: str,
         node_type: str,
@@ -50,45 +81,93 @@ def make_provenance_callback(
         duration_ms: int | None = None,
         error_message: str | None = None,
     ) -> None:
-        from marketplace.database import async_session as session_factory
-
-        status_map = {
-            "node_started": "running",
-            "node_completed": "completed",
-            "node_failed": "failed",
+        # Take the timestamp before hashing so that concurrent nodes keep the
+        # order in which the engine reported them.
+        timestamp = self._next_timestamp()
+        row = {
+            "id": str(uuid.uuid4()),
+            "chain_execution_id": self.chain_execution_id,
+            "node_id": node_id,
+            "event_type": event_type,
+            "event_timestamp": timestamp,
+            "node_type": node_type,
+            "agent_id": agent_id,
+            "input_hash_sha256": await _payload_hash(input_json),
+            "output_hash_sha256": await _payload_hash(output_json),
+            "duration_ms": duration_ms,
+            "cost_usd": cost_usd or Decimal("0"),
+            "status": _STATUS_BY_EVENT.get(event_type, event_type),
+            "error_message": error_message,
+            "attempt_number": 1,
+            "metadata_json": "{}",
+            "created_at": timestamp,
         }
-        status = status_map.get(event_type, event_type)
-
-        input_hash = _compute_provenance_hash(input_json or "", "") if input_json else None
-        output_hash = _compute_provenance_hash("", output_json or "") if output_json else None
-
-        entry = ChainProvenanceEntry(
-            chain_execution_id=chain_execution_id,
-            node_id=node_id,
-            event_type=event_type,
-            event_timestamp=datetime.now(timezone.utc),
-            node_type=node_type,
-            agent_id=agent_id,
-            input_hash_sha256=input_hash,
-            output_hash_sha256=output_hash,
-            duration_ms=duration_ms,
-            cost_usd=cost_usd or Decimal("0"),
-            status=status,
-            error_message=error_message,
-        )
+        self._pending.append(row)
+
+        if self._closed:
+            await self.flush()
+        elif len(self._pending) >= settings.chain_provenance_flush_batch_size:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    def _next_timestamp(self) -> datetime:
+        now = datetime.now(timezone.utc)
+        if self._last_timestamp is not None and now <= self._last_timestamp:
+            now = self._last_timestamp + timedelta(microseconds=1)
+        self._last_timestamp = now
+        return now
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.chain_provenance_flush_interval_seconds)
+        # Shielded: ``close`` cancels the timer, which must not abort a write in progress.
+        await asyncio.shield(self.flush())
+
+    async def flush(self) -> int:
+        """Bulk-insert the pending events. Returns the number written.
+
+        A failed write keeps the events pending for the next flush.
+        """
+        from marketplace.database import async_session as session_factory
 
-        try:
-            async with session_factory() as db:
-                db.add(entry)
-                await db.commit()
-        except Exception:
-            logger.exception(
-                "Failed to write provenance entry for chain %s node %s",
-                chain_execution_id,
-                node_id,
+        async with self._lock:
+            if not self._pending:
+                return 0
+            rows = self._pending
+            self._pending = []
+            try:
+                async with session_factory() as db:
+                    await db.execute(insert(ChainProvenanceEntry), rows)
+                    await db.commit()
+            except Exception:
+                logger.exception(
+                    "Failed to write %d provenance entries for chain %s",
+                    len(rows),
+                    self.chain_execution_id,
+                )
+                self._pending[:0] = rows
+                return 0
+            return len(rows)
+
+    async def close(self) -> None:
+        """Write everything still pending; later events are written immediately."""
+        self._closed = True
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        self._timer = None
+        await self.flush()
+        if self._pending:
+            logger.error(
+                "Dropping %d provenance entries for chain %s",
+                len(self._pending),
+                self.chain_execution_id,
             )
+            self._pending.clear()
+
 
-    return _on_node_event
+def make_provenance_callback(chain_execution_id: str) -> ProvenanceJournal:
+    """Return an ``on_node_event`` callback that journals ChainProvenanceEntry rows."""
+    return ProvenanceJournal(chain_execution_id)
 
 
 # ---------------------------------------------------------------------------
@@ -412,12 +412,19 @@ async def execute_chain(
     wf_id = resolved_workflow.id
 
     async def _run_chain():
-        from marketplace.database import async_session as session_factory
         from marketplace.services.chain_provenance_service import (
             make_provenance_callback,
         )
 
         callback = make_provenance_callback(exec_id)
+        try:
+            await _execute_chain(callback)
+        finally:
+            # Write the provenance events still buffered in the journal
+            await callback.close()
+
+    async def _execute_chain(callback):
+        from marketplace.database import async_session as session_factory
 
         async with session_factory() as exec_db:
             try:
@@ -111,6 +111,12 @@ class CircuitBreaker:
                 return True
             return False
 
+    def release(self) -> None:
+        """Give back a HALF_OPEN slot whose call was abandoned without an outcome."""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
     def reset(self) -> None:
         """Fully reset the circuit breaker to CLOSED state."""
         with self._lock:
@@ -5,154 +5,491 @@ Implements data subject rights for agents and users:
 - Right to deletion (erasure)
 - Consent management
 - Data processing records
+
+Exports and deletions for the API run as background ``ComplianceJob`` rows.
+An export streams each table through a server-side cursor into NDJSON (or a
+zip of per-table NDJSON/CSV files) on disk and stores the artifact in content
+storage, so memory stays flat however long the agent's history is. A deletion
+works through the agent's rows in bounded batches, committing a checkpoint
+with each batch; a job interrupted by a restart picks up where it stopped.
 """
 
 from __future__ import annotations
 
+import csv
+import io
 import json
 import logging
+import tempfile
 import uuid
+import zipfile
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from marketplace.config import settings
+from marketplace.core.async_tasks import fire_and_forget
+from marketplace.models.compliance_job import ComplianceJob
 
 logger = logging.getLogger(__name__)
 
+EXPORT_FORMAT_VERSION = "1.0"
+EXPORT_FORMATS = ("json", "zip", "csv")
+_MEDIA_TYPES = {
+    "json": "application/x-ndjson",
+    "zip": "application/zip",
+    "csv": "application/zip",
+}
 
-async def export_agent_data(
-    db: AsyncSession,
-    agent_id: str,
-) -> dict[str, Any]:
-    """Export all data associated with an agent (GDPR Article 20).
 
-    Returns a structured dictionary of all personal data.
-    """
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+# ---------------------------------------------------------------------------
+# Export tables: a query for one agent's rows and the shape of each record
+# ---------------------------------------------------------------------------
+
+
+def _agent_query(agent_id: str):
     from marketplace.models.agent import RegisteredAgent
+
+    return select(
+        RegisteredAgent.id,
+        RegisteredAgent.name,
+        RegisteredAgent.agent_type,
+        RegisteredAgent.description,
+        RegisteredAgent.created_at,
+    ).where(RegisteredAgent.id == agent_id)
+
+
+def _agent_record(row, agent_id: str) -> dict[str, Any]:
+    return {
+        "id": row.id,
+        "name": row.name,
+        "agent_type": row.agent_type,
+        "description": row.description or "",
+        "created_at": _iso(row.created_at),
+    }
+
+
+def _listings_query(agent_id: str):
     from marketplace.models.listing import DataListing
+
+    return select(
+        DataListing.id,
+        DataListing.title,
+        DataListing.category,
+        DataListing.price_usdc,
+        DataListing.status,
+        DataListing.created_at,
+    ).where(DataListing.seller_id == agent_id).order_by(DataListing.id)
+
+
+def _listing_record(row, agent_id: str) -> dict[str, Any]:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "category": row.category,
+        "price_usdc": float(row.price_usdc),
+        "status": row.status,
+        "created_at": _iso(row.created_at),
+    }
+
+
+def _transactions_query(agent_id: str):
     from marketplace.models.transaction import Transaction
 
-    # Agent profile
-    agent_result = await db.execute(
-        select(RegisteredAgent).where(RegisteredAgent.id == agent_id)
-    )
-    agent = agent_result.scalar_one_or_none()
-    if not agent:
-        return {"error": "Agent not found"}
+    return select(
+        Transaction.id,
+        Transaction.buyer_id,
+        Transaction.amount_usdc,
+        Transaction.status,
+        Transaction.initiated_at,
+    ).where(
+        (Transaction.buyer_id == agent_id)
+        | (Transaction.seller_id == agent_id)
+    ).order_by(Transaction.id)
+
 
-    agent_data = {
-        "id": agent.id,
-        "name": agent.name,
-        "agent_type": agent.agent_type,
-        "description": agent.description or "",
-        "created_at": agent.created_at.isoformat() if agent.created_at else None,
+def _transaction_record(row, agent_id: str) -> dict[str, Any]:
+    return {
+        "id": row.id,
+        "role": "buyer" if row.buyer_id == agent_id else "seller",
+        "amount_usdc": float(row.amount_usdc),
+        "status": row.status,
+        "created_at": _iso(row.initiated_at),
+    }
+
+
+def _reputation_query(agent_id: str):
+    from marketplace.models.reputation import ReputationScore
+
+    return select(
+        ReputationScore.total_transactions,
+        ReputationScore.successful_deliveries,
+        ReputationScore.failed_deliveries,
+        ReputationScore.verified_count,
+        ReputationScore.total_volume_usdc,
+        ReputationScore.composite_score,
+        ReputationScore.last_calculated_at,
+    ).where(ReputationScore.agent_id == agent_id)
+
+
+def _reputation_record(row, agent_id: str) -> dict[str, Any]:
+    return {
+        "total_transactions": row.total_transactions,
+        "successful_deliveries": row.successful_deliveries,
+        "failed_deliveries": row.failed_deliveries,
+        "verified_count": row.verified_count,
+        "total_volume_usdc": float(row.total_volume_usdc or 0),
+        "composite_score": float(row.composite_score or 0),
+        "last_calculated_at": _iso(row.last_calculated_at),
     }
 
-    # Listings
-    listings_result = await db.execute(
-        select(DataListing).where(DataListing.seller_id == agent_id)
-    )
-    listings = listings_result.scalars().all()
-    listings_data = [
-        {
-            "id": l.id,
-            "title": l.title,
-            "category": l.category,
-            "price_usdc": float(l.price_usdc),
-            "status": l.status,
-            "created_at": l.created_at.isoformat() if l.created_at else None,
-        }
-        for l in listings
-    ]
 
-    # Transactions
-    tx_result = await db.execute(
-        select(Transaction).where(
-            (Transaction.buyer_id == agent_id)
-            | (Transaction.seller_id == agent_id)
-        )
+# name -> (query builder, record builder, export option that enables it)
+_EXPORT_TABLES: dict[str, tuple[Callable, Callable, str | None]] = {
+    "agent": (_agent_query, _agent_record, None),
+    "listings": (_listings_query, _listing_record, "include_listings"),
+    "transactions": (_transactions_query, _transaction_record, "include_transactions"),
+    "reputation": (_reputation_query, _reputation_record, "include_reputation"),
+}
+
+
+async def _stream_records(
+    db: AsyncSession, table: str, agent_id: str,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """Yield one table's records for the agent, a cursor batch at a time."""
+    query, to_record, _ = _EXPORT_TABLES[table]
+    result = await db.stream(
+        query(agent_id).execution_options(yield_per=settings.compliance_export_batch_size)
     )
-    transactions = tx_result.scalars().all()
-    tx_data = [
-        {
-            "id": t.id,
-            "role": "buyer" if t.buyer_id == agent_id else "seller",
-            "amount_usdc": float(t.amount_usdc),
-            "status": t.status,
-            "created_at": t.initiated_at.isoformat() if t.initiated_at else None,
-        }
-        for t in transactions
-    ]
+    async for rows in result.partitions():
+        yield [to_record(row, agent_id) for row in rows]
+
+
+async def export_agent_data(
+    db: AsyncSession,
+    agent_id: str,
+) -> dict[str, Any]:
+    """Export all data associated with an agent (GDPR Article 20).
+
+    Returns a structured dictionary of all personal data. Meant for small
+    accounts; ``create_export_job`` streams large ones to a file instead.
+    """
+    sections: dict[str, list[dict[str, Any]]] = {}
+    for table in ("agent", "listings", "transactions"):
+        sections[table] = [
+            record
+            async for batch in _stream_records(db, table, agent_id)
+            for record in batch
+        ]
+    if not sections["agent"]:
+        return {"error": "Agent not found"}
 
     return {
         "export_id": str(uuid.uuid4()),
-        "agent": agent_data,
-        "listings": listings_data,
-        "transactions": tx_data,
+        "agent": sections["agent"][0],
+        "listings": sections["listings"],
+        "transactions": sections["transactions"],
         "exported_at": datetime.now(timezone.utc).isoformat(),
-        "format_version": "1.0",
+        "format_version": EXPORT_FORMAT_VERSION,
     }
 
 
-async def delete_agent_data(
+class _ExportWriter:
+    """Writes export records to a temporary file in the job's format.
+
+    ``json`` is a single NDJSON stream, each line tagged with its table.
+    ``zip`` and ``csv`` are zip archives with one member per table.
+    """
+
+    def __init__(self, fmt: str, spool) -> None:
+        self._fmt = fmt
+        self._spool = spool
+        self._zip = zipfile.ZipFile(spool, "w", zipfile.ZIP_DEFLATED) if fmt != "json" else None
+        self._member = None
+        self._text = None
+        self._csv = None
+
+    def header(self, header: dict[str, Any]) -> None:
+        if self._zip is None:
+            self._write_line({"type": "export", **header})
+        else:
+            self._zip.writestr("export.json", json.dumps(header))
+
+    def begin_table(self, table: str) -> None:
+        if self._zip is None:
+            return
+        suffix = "csv" if self._fmt == "csv" else "ndjson"
+        self._member = self._zip.open(f"{table}.{suffix}", "w", force_zip64=True)
+        self._text = io.TextIOWrapper(self._member, encoding="utf-8", newline="")
+        self._csv = None
+
+    def records(self, table: str, records: list[dict[str, Any]]) -> None:
+        if self._zip is None:
+            for record in records:
+                self._write_line({"type": table, "data": record})
+        elif self._fmt == "csv":
+            if self._csv is None and records:
+                self._csv = csv.DictWriter(self._text, fieldnames=list(records[0]))
+                self._csv.writeheader()
+            for record in records:
+                self._csv.writerow(record)
+        else:
+            for record in records:
+                self._text.write(json.dumps(record) + "\n")
+
+    def end_table(self) -> None:
+        if self._text is not None:
+            self._text.close()  # closes the zip member too
+            self._text = self._member = None
+
+    def close(self, summary: dict[str, Any]) -> None:
+        if self._zip is None:
+            self._write_line({"type": "summary", **summary})
+        else:
+            self._zip.writestr("summary.json", json.dumps(summary))
+            self._zip.close()
+
+    def _write_line(self, obj: dict[str, Any]) -> None:
+        self._spool.write((json.dumps(obj) + "\n").encode())
+
+
+def _read_chunks(spool, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    spool.seek(0)
+    while chunk := spool.read(chunk_size):
+        yield chunk
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+
+async def create_export_job(
+    db: AsyncSession,
+    agent_id: str,
+    *,
+    format: str = "json",
+    include_transactions: bool = True,
+    include_listings: bool = True,
+    include_reputation: bool = True,
+) -> ComplianceJob:
+    """Record an export job and start it in the background."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {format}")
+    job = ComplianceJob(
+        kind="export",
+        agent_id=agent_id,
+        format=format,
+        options_json=json.dumps({
+            "include_transactions": include_transactions,
+            "include_listings": include_listings,
+            "include_reputation": include_reputation,
+        }),
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    _start(db, job)
+    return job
+
+
+async def create_deletion_job(
     db: AsyncSession,
     agent_id: str,
     *,
+    reason: str = "user_request",
     soft_delete: bool = True,
+) -> ComplianceJob:
+    """Record a deletion job and start it in the background."""
+    job = ComplianceJob(
+        kind="deletion", agent_id=agent_id, reason=reason, soft_delete=soft_delete,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    _start(db, job)
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: str, kind: str | None = None) -> ComplianceJob | None:
+    job = await db.get(ComplianceJob, job_id)
+    if job is None or (kind is not None and job.kind != kind):
+        return None
+    return job
+
+
+async def open_export_artifact(job: ComplianceJob) -> tuple[AsyncIterator[bytes], str] | None:
+    """The finished export's content chunks and media type, or None."""
+    if job.kind != "export" or job.status != "completed" or not job.artifact_hash:
+        return None
+    from marketplace.services.storage_service import get_storage
+
+    chunks = await get_storage().astream(job.artifact_hash)
+    if chunks is None:
+        return None
+    return chunks, _MEDIA_TYPES.get(job.format or "json", "application/octet-stream")
+
+
+def _start(db: AsyncSession, job: ComplianceJob) -> None:
+    session_factory = async_sessionmaker(db.bind, class_=AsyncSession, expire_on_commit=False)
+    fire_and_forget(run_job(session_factory, job.id), task_name=f"compliance_{job.kind}_{job.id}")
+
+
+async def run_job(session_factory, job_id: str) -> None:
+    """Run (or resume) a job; failures are recorded on the job."""
+    async with session_factory() as db:
+        job = await db.get(ComplianceJob, job_id)
+        if job is None or job.status == "completed":
+            return
+        kind = job.kind
+        job.status = "running"
+        job.started_at = job.started_at or datetime.now(timezone.utc)
+        job.failure_reason = None
+        await db.commit()
+        try:
+            if kind == "export":
+                await _run_export(session_factory, db, job)
+            else:
+                await _erase_agent(db, job.agent_id, job.soft_delete, job=job)
+        except Exception as exc:
+            await db.rollback()
+            job.status = "failed"
+            job.failure_reason = str(exc)[:1000]
+            job.completed_at = datetime.now(timezone.utc)
+            await db.commit()
+            logger.exception("Compliance %s job %s failed", kind, job_id)
+            return
+        job.status = "completed"
+        job.completed_at = datetime.now(timezone.utc)
+        await db.commit()
+
+
+async def resume_jobs(session_factory=None) -> int:
+    """Restart jobs left pending or running by a previous process.
+
+    Deletions continue from their checkpoint; exports start over, as a
+    half-written artifact is not kept.
+    """
+    if session_factory is None:
+        from marketplace.database import async_session as session_factory
+
+    async with session_factory() as db:
+        job_ids = (await db.execute(
+            select(ComplianceJob.id).where(ComplianceJob.status.in_(("pending", "running")))
+        )).scalars().all()
+    for job_id in job_ids:
+        fire_and_forget(run_job(session_factory, job_id), task_name=f"compliance_resume_{job_id}")
+    return len(job_ids)
+
+
+async def _run_export(session_factory, job_db: AsyncSession, job: ComplianceJob) -> None:
+    options = json.loads(job.options_json or "{}")
+    tables = [
+        table for table, (_, _, option) in _EXPORT_TABLES.items()
+        if option is None or options.get(option, True)
+    ]
+    progress = {table: 0 for table in tables}
+
+    with tempfile.TemporaryFile() as spool:
+        writer = _ExportWriter(job.format or "json", spool)
+        writer.header({
+            "export_id": job.id,
+            "agent_id": job.agent_id,
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "format_version": EXPORT_FORMAT_VERSION,
+        })
+        # Reads run in their own session, so progress commits never
+        # interrupt an open server-side cursor
+        async with session_factory() as read_db:
+            for table in tables:
+                writer.begin_table(table)
+                async for records in _stream_records(read_db, table, job.agent_id):
+                    writer.records(table, records)
+                    progress[table] += len(records)
+                    job.progress_json = json.dumps(progress)
+                    await job_db.commit()
+                writer.end_table()
+                if table == "agent" and not progress["agent"]:
+                    raise ValueError("Agent not found")
+        writer.close({"counts": progress})
+        size = spool.tell()
+
+        from marketplace.services.storage_service import get_storage
+
+        job.artifact_hash = await get_storage().aput_stream(_read_chunks(spool))
+        job.artifact_size = size
+    logger.info("GDPR export %s for agent %s: %s", job.id, job.agent_id, progress)
+
+
+async def _erase_agent(
+    db: AsyncSession,
+    agent_id: str,
+    soft_delete: bool,
+    *,
+    job: ComplianceJob | None = None,
 ) -> dict[str, Any]:
-    """Delete all data associated with an agent (GDPR Article 17).
+    """Anonymize or delete the agent's listings in batches, then the agent.
 
-    By default, performs a soft delete (anonymization).
-    Set soft_delete=False for hard deletion (use with caution).
+    Every batch commits together with the job's checkpoint. Batches select
+    rows that are still to do, so re-running a step after a crash is safe.
     """
     from marketplace.models.agent import RegisteredAgent
     from marketplace.models.listing import DataListing
 
-    result = await db.execute(
-        select(RegisteredAgent).where(RegisteredAgent.id == agent_id)
-    )
-    agent = result.scalar_one_or_none()
-    if not agent:
-        return {"error": "Agent not found"}
+    checkpoint = json.loads(job.checkpoint_json or "{}") if job else {}
+    deleted_items = {"agent": False, "listings": checkpoint.get("listings", 0)}
+    batch_size = max(1, settings.compliance_deletion_batch_size)
+
+    def _save(step: str) -> None:
+        if job is not None:
+            job.checkpoint_json = json.dumps({"step": step, **deleted_items})
+            job.progress_json = json.dumps(deleted_items)
 
-    deleted_items = {"agent": False, "listings": 0}
-
-    if soft_delete:
-        # Anonymize agent data
-        agent.name = f"deleted-{agent.id[:8]}"
-        agent.description = "[REDACTED]"
-        agent.public_key = "[REDACTED]"
-        agent.wallet_address = ""
-        agent.capabilities = "[]"
-        agent.a2a_endpoint = ""
-        agent.agent_card_json = "{}"
-        agent.status = "deleted"
-        deleted_items["agent"] = True
-
-        # Anonymize listings
-        listings_result = await db.execute(
-            select(DataListing).where(DataListing.seller_id == agent_id)
-        )
-        listings = listings_result.scalars().all()
-        for listing in listings:
-            listing.title = "[REDACTED]"
-            listing.status = "deleted"
-            deleted_items["listings"] += 1
-
-    else:
-        # Hard delete (cascade)
-        listings_result = await db.execute(
-            select(DataListing).where(DataListing.seller_id == agent_id)
-        )
-        listings = listings_result.scalars().all()
-        for listing in listings:
-            await db.delete(listing)
-            deleted_items["listings"] += 1
-
-        await db.delete(agent)
-        deleted_items["agent"] = True
+    if checkpoint.get("step") != "agent":
+        pending = DataListing.seller_id == agent_id
+        if soft_delete:
+            pending = pending & (DataListing.status != "deleted")
+        while True:
+            ids = (await db.execute(
+                select(DataListing.id).where(pending).limit(batch_size)
+            )).scalars().all()
+            if not ids:
+                break
+            if soft_delete:
+                await db.execute(
+                    update(DataListing)
+                    .where(DataListing.id.in_(ids))
+                    .values(title="[REDACTED]", status="deleted")
+                )
+            else:
+                await db.execute(delete(DataListing).where(DataListing.id.in_(ids)))
+            deleted_items["listings"] += len(ids)
+            _save("listings")
+            await db.commit()
 
+    agent = (await db.execute(
+        select(RegisteredAgent).where(RegisteredAgent.id == agent_id)
+    )).scalar_one_or_none()
+    if agent is not None:
+        if soft_delete:
+            agent.name = f"deleted-{agent.id[:8]}"
+            agent.description = "[REDACTED]"
+            agent.public_key = "[REDACTED]"
+            agent.wallet_address = ""
+            agent.capabilities = "[]"
+            agent.a2a_endpoint = ""
+            agent.agent_card_json = "{}"
+            agent.status = "deleted"
+        else:
+            await db.delete(agent)
+    deleted_items["agent"] = agent is not None or checkpoint.get("step") == "agent"
+    _save("agent")
     await db.commit()
 
     logger.info(
@@ -162,6 +499,29 @@ async def delete_agent_data(
         deleted_items["agent"],
         deleted_items["listings"],
     )
+    return deleted_items
+
+
+async def delete_agent_data(
+    db: AsyncSession,
+    agent_id: str,
+    *,
+    soft_delete: bool = True,
+) -> dict[str, Any]:
+    """Delete all data associated with an agent (GDPR Article 17).
+
+    By default, performs a soft delete (anonymization).
+    Set soft_delete=False for hard deletion (use with caution).
+    """
+    from marketplace.models.agent import RegisteredAgent
+
+    exists = (await db.execute(
+        select(RegisteredAgent.id).where(RegisteredAgent.id == agent_id)
+    )).scalar_one_or_none()
+    if not exists:
+        return {"error": "Agent not found"}
+
+    deleted_items = await _erase_agent(db, agent_id, soft_delete)
 
     return {
         "deletion_id": str(uuid.uuid4()),
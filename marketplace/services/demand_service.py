@@ -1,18 +1,41 @@
-"""Demand Intelligence Service: tracks searches, aggregates demand, detects gaps and opportunities."""
+"""Demand Intelligence Service: tracks searches, aggregates demand, detects gaps and opportunities.
 
+Search events from the discover, auto-match and express routes go through
+``record_search``, which only appends to an in-process buffer. The buffer is
+bulk-inserted into ``search_logs`` by ``flush_searches`` (background loop, or
+as soon as ``demand_search_flush_batch_size`` events are pending).
+
+``aggregate_demand`` does not re-read the whole window. ``demand_aggregator``
+keeps per-pattern, five-minute buckets (counts, price sums, a category
+counter and a HyperLogLog of requesters) in memory. Each run folds in only the
+``SearchLog`` rows written since the previous run and upserts the
+``DemandSignal`` rows whose window totals changed in one set-based statement.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
 import uuid
-import json
-import math
+from collections import Counter
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
-from collections import defaultdict
 
-from sqlalchemy import select, func, delete
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from marketplace.models.search_log import SearchLog
+from marketplace.config import settings
+from marketplace.core.async_tasks import fire_and_forget
+from marketplace.core.hyperloglog import HyperLogLog
+from marketplace.database import upsert_insert
 from marketplace.models.demand_signal import DemandSignal
-from marketplace.models.opportunity import OpportunitySignal
 from marketplace.models.listing import DataListing
+from marketplace.models.opportunity import OpportunitySignal
+from marketplace.models.search_log import SearchLog
+
+logger = logging.getLogger(__name__)
+
+_BUCKET_SECONDS = 300
 
 
 def normalize_query(text: str) -> str:
@@ -21,6 +44,20 @@ def normalize_query(text: str) -> str:
     return " ".join(words)
 
 
+def _bucket_start(value: datetime) -> int:
+    return int(value.timestamp()) // _BUCKET_SECONDS * _BUCKET_SECONDS
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes for timezone-aware columns.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+# ---------------------------------------------------------------------------
+# Search event ingestion
+# ---------------------------------------------------------------------------
+
+
 async def log_search(
     db: AsyncSession,
     query_text: str,
@@ -31,7 +68,11 @@ async def log_search(
     led_to_purchase: int = 0,
     max_price: float | None = None,
 ) -> SearchLog:
-    """Insert a SearchLog row. Called from discover, auto_match, and express routes."""
+    """Insert and commit a single SearchLog row.
+
+    Request handlers use ``record_search`` instead; this is for callers that
+    need the row itself.
+    """
     log = SearchLog(
         query_text=query_text,
         category=category,
@@ -46,86 +87,295 @@ async def log_search(
     return log
 
 
-async def aggregate_demand(db: AsyncSession, time_window_hours: int = 24) -> list[DemandSignal]:
-    """Aggregate SearchLogs into DemandSignals within a time window."""
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=time_window_hours)
-
-    result = await db.execute(
-        select(SearchLog).where(SearchLog.created_at >= cutoff)
-    )
-    logs = list(result.scalars().all())
-
-    if not logs:
-        return []
+_search_buffer: list[dict] = []
+_flush_lock = asyncio.Lock()
 
-    # Group by normalized query
-    groups: dict[str, list[SearchLog]] = defaultdict(list)
-    for log in logs:
-        pattern = normalize_query(log.query_text)
-        if pattern:
-            groups[pattern].append(log)
-
-    signals = []
-    for pattern, group_logs in groups.items():
-        search_count = len(group_logs)
-        requesters = set(l.requester_id for l in group_logs if l.requester_id)
-        unique_requesters = len(requesters) if requesters else 1
-        prices = [float(l.max_price) for l in group_logs if l.max_price is not None]
-        avg_max_price = sum(prices) / len(prices) if prices else None
-        matched = sum(1 for l in group_logs if l.matched_count > 0)
-        fulfillment_rate = round(matched / search_count, 3)
-        purchased = sum(1 for l in group_logs if l.led_to_purchase)
-        conversion_rate = round(purchased / search_count, 3)
 
+def record_search(
+    query_text: str,
+    category: str | None = None,
+    source: str = "discover",
+    requester_id: str | None = None,
+    matched_count: int = 0,
+    led_to_purchase: int = 0,
+    max_price: float | None = None,
+) -> None:
+    """Buffer one search event; persisted by the next ``flush_searches``.
+
+    Called from the discover, auto_match and express routes.
+    """
+    _search_buffer.append({
+        "id": str(uuid.uuid4()),
+        "query_text": query_text,
+        "category": category,
+        "source": source,
+        "requester_id": requester_id,
+        "matched_count": matched_count,
+        "led_to_purchase": led_to_purchase,
+        "max_price": max_price,
+        "created_at": datetime.now(timezone.utc),
+    })
+    overflow = len(_search_buffer) - settings.demand_search_buffer_max
+    if overflow > 0:
+        del _search_buffer[:overflow]
+        logger.warning("Search log buffer full; dropped %d oldest events", overflow)
+    if len(_search_buffer) == settings.demand_search_flush_batch_size:
+        fire_and_forget(flush_searches(), task_name="demand_search_flush")
+
+
+async def flush_searches(db: AsyncSession | None = None) -> int:
+    """Bulk-insert buffered search events. Returns the number written.
+
+    Uses ``db`` (and commits it) when given, otherwise a fresh session. On
+    failure the events go back into the buffer for the next attempt.
+    """
+    async with _flush_lock:
+        if not _search_buffer:
+            return 0
+        drained = _search_buffer[:]
+        del _search_buffer[:len(drained)]
+        try:
+            if db is None:
+                from marketplace.database import async_session
+
+                async with async_session() as own_db:
+                    await own_db.execute(insert(SearchLog), drained)
+                    await own_db.commit()
+            else:
+                await db.execute(insert(SearchLog), drained)
+                await db.commit()
+        except Exception:
+            _search_buffer[:0] = drained
+            raise
+        return len(drained)
+
+
+async def search_flush_loop() -> None:
+    """Background task: flush buffered searches every ``demand_search_flush_interval_seconds``."""
+    while True:
+        await asyncio.sleep(settings.demand_search_flush_interval_seconds)
+        try:
+            await flush_searches()
+        except Exception:
+            logger.exception("Search log flush failed; will retry")
+
+
+# ---------------------------------------------------------------------------
+# Incremental aggregation
+# ---------------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class _Bucket:
+    searches: int = 0
+    matched: int = 0
+    purchased: int = 0
+    price_sum: float = 0.0
+    priced: int = 0
+    categories: Counter = field(default_factory=Counter)
+    requesters: HyperLogLog = field(default_factory=HyperLogLog)
+    first: datetime | None = None
+    last: datetime | None = None
+
+
+_SEARCH_COLUMNS = (
+    SearchLog.id,
+    SearchLog.query_text,
+    SearchLog.category,
+    SearchLog.requester_id,
+    SearchLog.matched_count,
+    SearchLog.led_to_purchase,
+    SearchLog.max_price,
+    SearchLog.created_at,
+)
+
+
+class DemandAggregator:
+    """Per-pattern search buckets covering the current aggregation window.
+
+    ``covered_since`` is the (bucket-aligned) start of the loaded range;
+    ``watermark`` the newest ``created_at`` folded in. Rows are re-scanned from
+    ``watermark - demand_late_arrival_seconds`` (skipping ids already folded)
+    so that buffered searches flushed late by other workers still count.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, dict[int, _Bucket]] = {}
+        self._patterns_by_bucket: dict[int, set[str]] = {}
+        self._seen: dict[str, datetime] = {}
+        self._covered_since: datetime | None = None
+        self._watermark: datetime | None = None
+        self._last_cutoff: int | None = None
+        self._last_window: int | None = None
+
+    def clear(self) -> None:
+        self.__init__()
+
+    async def changed_patterns(self, db: AsyncSession, time_window_hours: int) -> tuple[set[str], int]:
+        """Fold in new searches; return patterns whose window totals changed and the cutoff bucket."""
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=time_window_hours)
+        cutoff_bucket = _bucket_start(cutoff)
+        window_start = datetime.fromtimestamp(cutoff_bucket, timezone.utc)
+        changed: set[str] = set()
+
+        if self._covered_since is None:
+            changed |= await self._load(db, window_start, None)
+            self._covered_since = window_start
+        else:
+            if window_start < self._covered_since:
+                # Wider window than before: backfill the missing whole buckets
+                changed |= await self._load(db, window_start, self._covered_since)
+            since = self._covered_since
+            if self._watermark is not None:
+                since = max(since, self._watermark - timedelta(seconds=settings.demand_late_arrival_seconds))
+            changed |= await self._load(db, since, None)
+            self._covered_since = window_start
+
+        if self._last_window != time_window_hours:
+            changed |= set(self._buckets)
+        elif self._last_cutoff is not None:
+            # Patterns with buckets that slid out of the window since the last run
+            for start, patterns in self._patterns_by_bucket.items():
+                if self._last_cutoff <= start < cutoff_bucket:
+                    changed |= patterns
+        self._last_cutoff = cutoff_bucket
+        self._last_window = time_window_hours
+        self._expire(cutoff_bucket)
+        return changed, cutoff_bucket
+
+    def window(self, pattern: str, cutoff_bucket: int) -> list[_Bucket]:
+        return [
+            bucket for start, bucket in self._buckets.get(pattern, {}).items()
+            if start >= cutoff_bucket
+        ]
+
+    async def _load(self, db: AsyncSession, since: datetime, until: datetime | None) -> set[str]:
+        query = select(*_SEARCH_COLUMNS).where(SearchLog.created_at >= since)
+        if until is not None:
+            query = query.where(SearchLog.created_at < until)
+        changed: set[str] = set()
+        result = await db.stream(query.execution_options(yield_per=5000))
+        async for row in result:
+            if row.id in self._seen:
+                continue
+            created = _as_utc(row.created_at)
+            self._seen[row.id] = created
+            pattern = normalize_query(row.query_text)
+            if not pattern:
+                continue
+            self._fold(pattern, row, created)
+            changed.add(pattern)
+            if self._watermark is None or created > self._watermark:
+                self._watermark = created
+        return changed
+
+    def _fold(self, pattern: str, row, created: datetime) -> None:
+        start = _bucket_start(created)
+        bucket = self._buckets.setdefault(pattern, {}).get(start)
+        if bucket is None:
+            bucket = self._buckets[pattern][start] = _Bucket()
+            self._patterns_by_bucket.setdefault(start, set()).add(pattern)
+        bucket.searches += 1
+        if row.matched_count and row.matched_count > 0:
+            bucket.matched += 1
+        if row.led_to_purchase:
+            bucket.purchased += 1
+        if row.max_price is not None:
+            bucket.price_sum += float(row.max_price)
+            bucket.priced += 1
+        if row.category:
+            bucket.categories[row.category] += 1
+        if row.requester_id:
+            bucket.requesters.add(row.requester_id)
+        if bucket.first is None or created < bucket.first:
+            bucket.first = created
+        if bucket.last is None or created > bucket.last:
+            bucket.last = created
+
+    def _expire(self, cutoff_bucket: int) -> None:
+        """Drop buckets that left the window and seen ids past the late-arrival horizon."""
+        for start in [s for s in self._patterns_by_bucket if s < cutoff_bucket]:
+            for pattern in self._patterns_by_bucket.pop(start):
+                buckets = self._buckets.get(pattern)
+                if buckets is not None:
+                    buckets.pop(start, None)
+                    if not buckets:
+                        del self._buckets[pattern]
+        if self._watermark is not None:
+            horizon = self._watermark - timedelta(seconds=settings.demand_late_arrival_seconds)
+            self._seen = {sid: ts for sid, ts in self._seen.items() if ts >= horizon}
+
+
+demand_aggregator = DemandAggregator()
+
+
+def _signal_row(pattern: str, buckets: list[_Bucket], time_window_hours: int) -> dict:
+    search_count = sum(b.searches for b in buckets)
+    requesters = HyperLogLog()
+    categories: Counter = Counter()
+    for b in buckets:
+        requesters.merge(b.requesters)
+        categories.update(b.categories)
+    priced = sum(b.priced for b in buckets)
+    fulfillment_rate = round(sum(b.matched for b in buckets) / search_count, 3)
+    now = datetime.now(timezone.utc)
+    return {
+        "id": str(uuid.uuid4()),
+        "query_pattern": pattern,
+        "category": categories.most_common(1)[0][0] if categories else None,
+        "search_count": search_count,
+        "unique_requesters": requesters.count() or 1,
+        "avg_max_price": sum(b.price_sum for b in buckets) / priced if priced else None,
+        "fulfillment_rate": fulfillment_rate,
+        "conversion_rate": round(sum(b.purchased for b in buckets) / search_count, 3),
         # Velocity: searches per hour
-        span_hours = max(time_window_hours, 1)
-        velocity = round(search_count / span_hours, 2)
+        "velocity": round(search_count / max(time_window_hours, 1), 2),
+        "is_gap": 1 if fulfillment_rate < 0.2 else 0,
+        "first_searched_at": min(b.first for b in buckets),
+        "last_searched_at": max(b.last for b in buckets),
+        "updated_at": now,
+    }
 
-        is_gap = 1 if fulfillment_rate < 0.2 else 0
 
-        # Most common category in this group
-        cats = [l.category for l in group_logs if l.category]
-        category = max(set(cats), key=cats.count) if cats else None
+async def aggregate_demand(db: AsyncSession, time_window_hours: int = 24) -> list[DemandSignal]:
+    """Update DemandSignals from searches within a time window.
+
+    Only patterns whose totals changed since the previous run (new searches,
+    or searches that aged out of the window) are upserted and returned.
+    Window boundaries are resolved to five-minute buckets.
+    """
+    await flush_searches(db)
+    changed, cutoff_bucket = await demand_aggregator.changed_patterns(db, time_window_hours)
+
+    rows = []
+    for pattern in changed:
+        buckets = demand_aggregator.window(pattern, cutoff_bucket)
+        if buckets:
+            rows.append(_signal_row(pattern, buckets, time_window_hours))
+    if not rows:
+        return []
 
-        timestamps = [l.created_at for l in group_logs if l.created_at]
-        first = min(timestamps) if timestamps else datetime.now(timezone.utc)
-        last = max(timestamps) if timestamps else datetime.now(timezone.utc)
+    stmt = upsert_insert(db, DemandSignal)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["query_pattern"],
+        set_={
+            column: stmt.excluded[column]
+            for column in rows[0]
+            if column not in ("id", "query_pattern", "first_searched_at")
+        },
+    )
+    await db.execute(stmt, rows)
+    await db.commit()
 
-        # Upsert
-        existing = await db.execute(
-            select(DemandSignal).where(DemandSignal.query_pattern == pattern)
+    signals: list[DemandSignal] = []
+    patterns = [row["query_pattern"] for row in rows]
+    for i in range(0, len(patterns), 500):
+        result = await db.execute(
+            select(DemandSignal)
+            .where(DemandSignal.query_pattern.in_(patterns[i:i + 500]))
+            .execution_options(populate_existing=True)
         )
-        signal = existing.scalar_one_or_none()
-
-        if signal:
-            signal.search_count = search_count
-            signal.unique_requesters = unique_requesters
-            signal.avg_max_price = avg_max_price
-            signal.fulfillment_rate = fulfillment_rate
-            signal.conversion_rate = conversion_rate
-            signal.velocity = velocity
-            signal.is_gap = is_gap
-            signal.category = category
-            signal.last_searched_at = last
-        else:
-            signal = DemandSignal(
-                query_pattern=pattern,
-                category=category,
-                search_count=search_count,
-                unique_requesters=unique_requesters,
-                avg_max_price=avg_max_price,
-                fulfillment_rate=fulfillment_rate,
-                conversion_rate=conversion_rate,
-                velocity=velocity,
-                is_gap=is_gap,
-                first_searched_at=first,
-                last_searched_at=last,
-            )
-            db.add(signal)
-
-        signals.append(signal)
-
-    await db.commit()
+        signals.extend(result.scalars().all())
     return signals
 
 
@@ -161,18 +411,29 @@ async def generate_opportunities(db: AsyncSession) -> list[OpportunitySignal]:
     if not gaps:
         return []
 
-    # Count competing listings for each gap
+    # Active listings per category, for every gap at once
+    listing_counts = dict((await db.execute(
+        select(DataListing.category, func.count(DataListing.id))
+        .where(DataListing.status == "active")
+        .group_by(DataListing.category)
+    )).all())
+    total_listings = sum(listing_counts.values())
+
+    existing_opps: dict[str, OpportunitySignal] = {}
+    for opp in (await db.execute(
+        select(OpportunitySignal).where(
+            OpportunitySignal.demand_signal_id.in_([g.id for g in gaps]),
+            OpportunitySignal.status == "active",
+        )
+    )).scalars():
+        existing_opps.setdefault(opp.demand_signal_id, opp)
+
     opportunities = []
     max_velocity = max(float(g.velocity or 0) for g in gaps) if gaps else 1
     max_requesters = max(g.unique_requesters for g in gaps) if gaps else 1
 
     for gap in gaps:
-        # Count active listings that match this query pattern
-        keywords = gap.query_pattern.split()
-        count_query = select(func.count(DataListing.id)).where(DataListing.status == "active")
-        if gap.category:
-            count_query = count_query.where(DataListing.category == gap.category)
-        competing = (await db.execute(count_query)).scalar() or 0
+        competing = listing_counts.get(gap.category, 0) if gap.category else total_listings
 
         velocity = float(gap.velocity or 0)
         avg_price = float(gap.avg_max_price) if gap.avg_max_price else 0.005
@@ -185,13 +446,7 @@ async def generate_opportunities(db: AsyncSession) -> list[OpportunitySignal]:
         urgency = round(0.4 * norm_velocity + 0.3 * (1 - fulfillment) + 0.3 * norm_requesters, 3)
 
         # Upsert by demand_signal_id
-        existing = await db.execute(
-            select(OpportunitySignal).where(
-                OpportunitySignal.demand_signal_id == gap.id,
-                OpportunitySignal.status == "active",
-            )
-        )
-        opp = existing.scalar_one_or_none()
+        opp = existing_opps.get(gap.id)
 
         if opp:
             opp.estimated_revenue_usdc = estimated_revenue
@@ -61,6 +61,12 @@ _EVENT_POLICY: dict[str, dict[str, Any]] = {
         "public_fields": ["listing_id", "title", "category", "price", "price_usd", "price_usdc"],
         "target_keys": [],
     },
+    "listing.trust_updated": {
+        "visibility": "private",
+        "topic": _PRIVATE_TOPIC,
+        "public_fields": [],
+        "target_keys": ["seller_id"],
+    },
     "test_event": {
         "visibility": "public",
         "topic": _PUBLIC_TOPIC,
@@ -717,23 +723,8 @@ async def redact_old_webhook_deliveries(
     retention_days: int | None = None,
 ) -> int:
     """Redact raw payload/response bodies beyond retention window."""
+    from marketplace.services.retention_service import WEBHOOK_DELIVERY_BODIES, apply_policy
+
     days = retention_days if retention_days is not None else settings.security_event_retention_days
     cutoff = _utcnow() - timedelta(days=max(1, days))
-    result = await db.execute(
-        select(WebhookDelivery).where(WebhookDelivery.created_at < cutoff)
-    )
-    rows = result.scalars().all()
-    redacted = 0
-    for row in rows:
-        needs_update = False
-        if row.payload_json not in ("{}", ""):
-            row.payload_json = "{}"
-            needs_update = True
-        if row.response_body not in ("", "[redacted]"):
-            row.response_body = "[redacted]"
-            needs_update = True
-        if needs_update:
-            redacted += 1
-    if redacted:
-        await db.commit()
-    return redacted
+    return await apply_policy(db, WEBHOOK_DELIVERY_BODIES, cutoff=cutoff)
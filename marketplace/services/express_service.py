@@ -18,8 +18,10 @@ from marketplace.core.events import broadcast_event
 from marketplace.core.exceptions import InsufficientBalanceError, NotFoundError, ValidationError
 from marketplace.models.listing import DataListing
 from marketplace.models.transaction import Transaction
+from marketplace.services import abuse_detection_service
 from marketplace.services.cache_service import content_cache
 from marketplace.services.cdn_service import get_content as cdn_get_content
+from marketplace.services.fraud_graph import fraud_graph
 from marketplace.services.listing_service import get_listing
 
 
@@ -95,6 +97,8 @@ async def express_buy(db: AsyncSession, listing_id: str, buyer_id: str, payment_
 
     await db.commit()
     await db.refresh(tx)
+    abuse_detection_service.observe_transaction(tx)
+    fraud_graph.record_trade(buyer_id, seller_id)
 
     elapsed_ms = (time.monotonic() - start) * 1000
 
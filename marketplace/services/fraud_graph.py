@@ -0,0 +1,223 @@
+"""Trade graph for Sybil detection, maintained incrementally.
+
+Agents are nodes; an agent pair that has completed a trade is an edge. A
+union-find over the undirected graph keeps, for every connected component,
+its members, the number of distinct trading pairs and the total trade count,
+so a component's density is read in O(1) and adding a trade costs near-constant
+time. The directed adjacency is kept as well, for strongly-connected
+components (trade loops where value can flow all the way round).
+
+Union-find cannot remove edges, so trades that leave the
+``fraud_graph_window_days`` window are dropped by rebuilding the whole graph
+from one grouped query every ``fraud_graph_rebuild_seconds``. Between rebuilds
+completed transactions are added through ``record_trade``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.config import settings
+from marketplace.models.transaction import Transaction
+
+
+class TradeGraph:
+    """Union-find over trading agents with per-component edge and volume counts."""
+
+    def __init__(self) -> None:
+        self._parent: dict[str, str] = {}
+        self._members: dict[str, list[str]] = {}  # root -> agents in the component
+        self._pairs: dict[str, int] = {}  # root -> distinct undirected trading pairs
+        self._volume: dict[str, int] = {}  # root -> transactions inside the component
+        self._out: dict[str, set[str]] = defaultdict(set)  # buyer -> sellers
+        self._weights: dict[tuple[str, str], int] = {}  # (buyer, seller) -> transactions
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[tuple[str, str, int]]) -> TradeGraph:
+        graph = cls()
+        for buyer_id, seller_id, tx_count in edges:
+            graph.add_trade(buyer_id, seller_id, tx_count)
+        return graph
+
+    def __len__(self) -> int:
+        return len(self._parent)
+
+    def add_trade(self, buyer_id: str, seller_id: str, count: int = 1) -> None:
+        """Add ``count`` trades from buyer to seller. Self-trades are ignored."""
+        if buyer_id == seller_id:
+            return
+        new_pair = seller_id not in self._out[buyer_id] and buyer_id not in self._out[seller_id]
+        self._weights[(buyer_id, seller_id)] = self._weights.get((buyer_id, seller_id), 0) + count
+        self._out[buyer_id].add(seller_id)
+
+        root = self._union(self._find(buyer_id), self._find(seller_id))
+        self._volume[root] += count
+        if new_pair:
+            self._pairs[root] += 1
+
+    def components(self, min_size: int = 1) -> Iterable[dict[str, Any]]:
+        """Connected components with at least ``min_size`` agents."""
+        for root, members in self._members.items():
+            if len(members) < min_size:
+                continue
+            size = len(members)
+            max_pairs = size * (size - 1) / 2
+            yield {
+                "agent_ids": list(members),
+                "size": size,
+                "density": self._pairs[root] / max_pairs if max_pairs else 0.0,
+                # Counted per direction, as both agents of a pair see the edge
+                "internal_transactions": 2 * self._pairs[root],
+                "total_volume": self._volume[root],
+            }
+
+    def trade_loops(self, min_size: int = 3) -> list[dict[str, Any]]:
+        """Strongly connected components of the directed trade graph.
+
+        Every agent in one of these can be reached from every other by
+        following buyer -> seller edges, i.e. money can circulate. Uses an
+        iterative Tarjan, linear in agents plus trading pairs.
+        """
+        index: dict[str, int] = {}
+        low: dict[str, int] = {}
+        on_stack: set[str] = set()
+        stack: list[str] = []
+        loops: list[dict[str, Any]] = []
+        counter = 0
+
+        for start in list(self._parent):
+            if start in index:
+                continue
+            work = [(start, iter(self._out.get(start, ())))]
+            index[start] = low[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, successors = work[-1]
+                advanced = False
+                for succ in successors:
+                    if succ not in index:
+                        index[succ] = low[succ] = counter
+                        counter += 1
+                        stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, iter(self._out.get(succ, ()))))
+                        advanced = True
+                        break
+                    if succ in on_stack:
+                        low[node] = min(low[node], index[succ])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) >= min_size:
+                        loops.append(self._loop(component))
+        return loops
+
+    def _loop(self, component: list[str]) -> dict[str, Any]:
+        members = set(component)
+        edges = [(a, b) for a in component for b in self._out.get(a, ()) if b in members]
+        return {
+            "agent_ids": component,
+            "size": len(component),
+            "internal_edges": len(edges),
+            "total_volume": sum(self._weights[edge] for edge in edges),
+        }
+
+    def _find(self, agent_id: str) -> str:
+        parent = self._parent.get(agent_id)
+        if parent is None:
+            self._parent[agent_id] = agent_id
+            self._members[agent_id] = [agent_id]
+            self._pairs[agent_id] = 0
+            self._volume[agent_id] = 0
+            return agent_id
+        root = agent_id
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[agent_id] != root:  # path compression
+            self._parent[agent_id], agent_id = root, self._parent[agent_id]
+        return root
+
+    def _union(self, a: str, b: str) -> str:
+        if a == b:
+            return a
+        if len(self._members[a]) < len(self._members[b]):
+            a, b = b, a
+        self._parent[b] = a
+        self._members[a].extend(self._members.pop(b))
+        self._pairs[a] += self._pairs.pop(b)
+        self._volume[a] += self._volume.pop(b)
+        return a
+
+
+class FraudGraphEngine:
+    """The live trade graph, rebuilt from the database when it is too old."""
+
+    def __init__(self) -> None:
+        self._graph: TradeGraph | None = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+
+    async def graph(self, db: AsyncSession) -> TradeGraph:
+        """The current graph, rebuilding it first if it is stale."""
+        if self._graph is not None and not self._stale():
+            return self._graph
+        async with self._lock:
+            if self._graph is None or self._stale():
+                await self._rebuild(db)
+        return self._graph
+
+    def record_trade(self, buyer_id: str, seller_id: str) -> None:
+        """Add a completed transaction to the live graph (no-op until first built)."""
+        if self._graph is not None:
+            self._graph.add_trade(buyer_id, seller_id)
+
+    def clear(self) -> None:
+        self._graph = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _stale(self) -> bool:
+        return time.monotonic() - self._built_at > settings.fraud_graph_rebuild_seconds
+
+    async def _rebuild(self, db: AsyncSession) -> None:
+        since = datetime.now(timezone.utc) - timedelta(days=settings.fraud_graph_window_days)
+        result = await db.execute(
+            select(
+                Transaction.buyer_id,
+                Transaction.seller_id,
+                func.count(Transaction.id).label("tx_count"),
+            ).where(
+                and_(
+                    Transaction.status == "completed",
+                    Transaction.initiated_at >= since,
+                )
+            ).group_by(Transaction.buyer_id, Transaction.seller_id)
+        )
+        self._graph = TradeGraph.from_edges(result.all())
+        self._built_at = time.monotonic()
+        self.rebuilds += 1
+
+
+# Singleton
+fraud_graph = FraudGraphEngine()
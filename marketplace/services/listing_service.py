@@ -3,26 +3,35 @@ import logging
 from datetime import datetime, timedelta, timezone
 
 from sqlalchemy import func, select
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
 logger = logging.getLogger(__name__)
 
+from marketplace.config import settings
 from marketplace.core.events import broadcast_event
 from marketplace.core.exceptions import AuthorizationError, ListingNotFoundError
+from marketplace.models.agent import RegisteredAgent
 from marketplace.models.listing import DataListing
 from marketplace.schemas.listing import ListingCreateRequest, ListingUpdateRequest
-from marketplace.services.cache_service import listing_cache
+from marketplace.services.cache_service import listing_cache, restore, snapshot
 from marketplace.services.storage_service import get_storage
-from marketplace.services import trust_verification_service
+from marketplace.services import listing_trust_pipeline, trust_verification_service
 
 
 async def create_listing(
     db: AsyncSession, seller_id: str, req: ListingCreateRequest
 ) -> DataListing:
-    """Create a new data listing. Stores content in HashFS and computes hash."""
+    """Create a new data listing. Stores content in HashFS and computes hash.
+
+    Returns once the row and content are durable. Proof generation and strict
+    trust verification run in ``listing_trust_pipeline`` (in the background
+    unless ``settings.listing_trust_background`` is disabled).
+    """
     storage = get_storage()
     content_bytes = req.content.encode("utf-8")
-    content_hash = storage.put(content_bytes)
+    content_hash = await storage.aput(content_bytes)
     price_usd = req.price_usd if req.price_usd is not None else req.price_usdc
 
     listing = DataListing(
@@ -42,36 +51,34 @@ async def create_listing(
     await db.commit()
     await db.refresh(listing)
 
-    # Generate zero-knowledge proofs for pre-purchase verification
-    try:
-        from marketplace.services.zkp_service import generate_proofs
-        await generate_proofs(
-            db, listing.id, content_bytes, req.category,
-            len(content_bytes), listing.freshness_at,
-            float(req.quality_score) if req.quality_score else 0.5,
-        )
-        await db.commit()
-    except Exception:
-        logger.warning("ZKP generation failed for listing %s", listing.id, exc_info=True)
-
-    # Strict trust verification baseline (non-blocking for listing publish)
-    try:
-        await trust_verification_service.bootstrap_listing_trust_artifacts(
-            db,
-            listing,
-            req.metadata,
-        )
-        await trust_verification_service.run_strict_verification(
-            db,
-            listing,
+    if settings.listing_trust_background:
+        listing_trust_pipeline.schedule_listing_trust_pipeline(
+            listing.id,
+            metadata=req.metadata,
+            content=content_bytes,
             requested_by=seller_id,
-            trigger_source="listing_create",
         )
-    except Exception:
-        logger.warning("Trust verification bootstrap failed for listing %s", listing.id, exc_info=True)
+    else:
+        try:
+            await listing_trust_pipeline.run_listing_trust_pipeline(
+                db,
+                listing,
+                metadata=req.metadata,
+                content=content_bytes,
+                requested_by=seller_id,
+                trigger_source="listing_create",
+                bootstrap=True,
+                with_proofs=True,
+            )
+        except Exception:
+            await db.rollback()
+            await db.refresh(listing)
+            logger.warning("Trust verification bootstrap failed for listing %s", listing.id, exc_info=True)
 
     # Cache the new listing
-    listing_cache.put(f"listing:{listing.id}", listing)
+    cached = _listing_snapshot(listing)
+    if cached is not None:
+        await listing_cache.aput(f"listing:{listing.id}", cached)
 
     # Broadcast event
     broadcast_event("listing_created", {
@@ -86,20 +93,38 @@ async def create_listing(
     return listing
 
 
+def _listing_snapshot(listing: DataListing) -> dict | None:
+    """Cacheable snapshot of a listing and its seller, or None if not loaded."""
+    if "seller" in sa_inspect(listing).unloaded:
+        return None
+    data = snapshot(listing)
+    if data is None:
+        return None
+    seller = snapshot(listing.seller) if listing.seller is not None else None
+    return {"listing": data, "seller": seller}
+
+
 async def get_listing(db: AsyncSession, listing_id: str) -> DataListing:
     """Get a listing by ID or raise 404. Uses cache for hot listings."""
-    cached = listing_cache.get(f"listing:{listing_id}")
-    if cached is not None:
-        return cached
 
-    result = await db.execute(
-        select(DataListing).where(DataListing.id == listing_id)
-    )
-    listing = result.scalar_one_or_none()
-    if not listing:
-        raise ListingNotFoundError(listing_id)
-
-    listing_cache.put(f"listing:{listing_id}", listing)
+    async def _load() -> dict | None:
+        result = await db.execute(
+            select(DataListing).where(DataListing.id == listing_id)
+        )
+        listing = result.scalar_one_or_none()
+        if not listing:
+            raise ListingNotFoundError(listing_id)
+        return _listing_snapshot(listing)
+
+    cached = await listing_cache.get_or_load(f"listing:{listing_id}", _load)
+    if cached is None:  # loaded, but without its seller; not cacheable
+        return (await db.execute(
+            select(DataListing).where(DataListing.id == listing_id)
+        )).scalar_one()
+    listing = await restore(db, DataListing, cached["listing"])
+    if "seller" in sa_inspect(listing).unloaded:
+        seller = cached["seller"] and await restore(db, RegisteredAgent, cached["seller"])
+        set_committed_value(listing, "seller", seller)
     return listing
 
 
@@ -146,7 +171,7 @@ async def update_listing(
     listing.updated_at = datetime.now(timezone.utc)
     await db.commit()
     await db.refresh(listing)
-    listing_cache.invalidate(f"listing:{listing_id}")
+    await listing_cache.ainvalidate(f"listing:{listing_id}")
     return listing
 
 
@@ -160,7 +185,7 @@ async def delist(db: AsyncSession, listing_id: str, seller_id: str) -> DataListi
     listing.updated_at = datetime.now(timezone.utc)
     await db.commit()
     await db.refresh(listing)
-    listing_cache.invalidate(f"listing:{listing_id}")
+    await listing_cache.ainvalidate(f"listing:{listing_id}")
     return listing
 
 
@@ -0,0 +1,263 @@
+"""Background trust pipeline for published listings.
+
+``listing_service.create_listing`` returns as soon as the listing row and its
+content are durable. ZKP proofs and the five strict verification stages
+(provenance, integrity, safety, reproducibility, policy) are produced here:
+
+* one content read — or the bytes the publisher already holds — feeds every stage;
+* proof generation and stage evaluation run concurrently off the event loop;
+* receipt, manifest, proofs, job and result rows land in a single commit;
+* ``listing.trust_updated`` is broadcast once the new trust state is durable.
+* listings still pending at startup are re-queued by ``resume_pending_listings``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.config import settings
+from marketplace.core.async_tasks import fire_and_forget
+from marketplace.core.events import broadcast_event
+from marketplace.models.listing import DataListing
+from marketplace.models.zkproof import ZKProof
+from marketplace.services import trust_verification_service, zkp_service
+from marketplace.services.cache_service import listing_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _evaluate_stages(
+    listing: DataListing,
+    metadata: dict[str, Any],
+    content: bytes,
+    receipt,
+    manifest,
+) -> dict[str, bool]:
+    content_text = content.decode("utf-8", errors="ignore")
+    return trust_verification_service.evaluate_trust_stages(
+        listing, metadata, content_text, receipt, manifest
+    )
+
+
+async def _build_proofs(listing: DataListing, content: bytes) -> list[ZKProof]:
+    quality = float(listing.quality_score) if listing.quality_score else 0.5
+    return await zkp_service.build_proofs_async(
+        listing.id,
+        content,
+        listing.category,
+        len(content),
+        listing.freshness_at,
+        quality,
+    )
+
+
+async def run_listing_trust_pipeline(
+    db: AsyncSession,
+    listing: DataListing,
+    *,
+    metadata: dict[str, Any] | None = None,
+    content: bytes | None = None,
+    requested_by: str | None = None,
+    trigger_source: str = "listing_create",
+    bootstrap: bool = False,
+    with_proofs: bool = False,
+) -> dict[str, Any]:
+    """Run proofs + strict verification for one listing and commit once.
+
+    ``bootstrap`` creates the baseline receipt/manifest from ``metadata``
+    (first publish); otherwise the latest stored artifacts are used.
+    ``with_proofs`` also (re)generates the ZKP rows. A proof failure is
+    logged and does not block the verification result.
+    """
+    if metadata is None:
+        metadata = trust_verification_service.load_listing_metadata(listing)
+    if content is None:
+        content = await trust_verification_service.read_listing_content(listing)
+
+    if bootstrap:
+        receipt, manifest = await trust_verification_service.bootstrap_listing_trust_artifacts(
+            db, listing, metadata
+        )
+    else:
+        receipt, manifest = await trust_verification_service.latest_trust_artifacts(db, listing.id)
+
+    stages_task = asyncio.to_thread(_evaluate_stages, listing, metadata, content, receipt, manifest)
+    if with_proofs:
+        proofs_task = _build_proofs(listing, content)
+        stages, proofs = await asyncio.gather(stages_task, proofs_task, return_exceptions=True)
+        if isinstance(stages, BaseException):
+            raise stages
+        if isinstance(proofs, BaseException):
+            logger.warning(
+                "ZKP generation failed for listing %s", listing.id, exc_info=proofs
+            )
+        else:
+            db.add_all(proofs)
+    else:
+        stages = await stages_task
+
+    job = trust_verification_service.start_verification_job(
+        db, listing, requested_by=requested_by, trigger_source=trigger_source
+    )
+    payload = trust_verification_service.record_verification(
+        db, listing, job, stages, metadata=metadata, receipt=receipt, manifest=manifest
+    )
+    await db.commit()
+
+    await listing_cache.ainvalidate(f"listing:{listing.id}")
+    zkp_service.invalidate_proof_cache(listing.id)
+    broadcast_event("listing.trust_updated", {
+        "listing_id": listing.id,
+        "seller_id": listing.seller_id,
+        "trust_status": payload["trust_status"],
+        "trust_score": payload["trust_score"],
+        "job_id": payload["job_id"],
+        "trigger_source": trigger_source,
+    })
+    return payload
+
+
+async def _run_for_listing_id(
+    listing_id: str,
+    **pipeline_kwargs: Any,
+) -> dict[str, Any] | None:
+    """Run the pipeline in a fresh session owned by the worker."""
+    from marketplace.database import async_session
+
+    async with async_session() as db:
+        result = await db.execute(select(DataListing).where(DataListing.id == listing_id))
+        listing = result.scalar_one_or_none()
+        if listing is None:
+            logger.warning("Trust pipeline skipped: listing %s not found", listing_id)
+            return None
+        return await run_listing_trust_pipeline(db, listing, **pipeline_kwargs)
+
+
+async def _run_publish_pipeline(listing_id: str, **pipeline_kwargs: Any) -> None:
+    try:
+        await _run_for_listing_id(listing_id, **pipeline_kwargs)
+    except Exception:
+        logger.warning("Trust verification failed for listing %s", listing_id, exc_info=True)
+
+
+def schedule_listing_trust_pipeline(
+    listing_id: str,
+    *,
+    metadata: dict[str, Any],
+    content: bytes,
+    requested_by: str | None = None,
+) -> asyncio.Task[Any] | None:
+    """Queue first-publish trust work for a freshly committed listing."""
+    return fire_and_forget(
+        _run_publish_pipeline(
+            listing_id,
+            metadata=metadata,
+            content=content,
+            requested_by=requested_by,
+            trigger_source="listing_create",
+            bootstrap=True,
+            with_proofs=True,
+        ),
+        task_name=f"listing_trust:{listing_id}",
+    )
+
+
+async def _run_bounded(
+    listing_ids: list[str],
+    concurrency: int | None,
+    **pipeline_kwargs: Any,
+) -> dict[str, int]:
+    """Run the pipeline for ``listing_ids`` with at most ``concurrency`` at once.
+
+    Each worker owns its own session, so at most ``concurrency`` listings
+    (default ``settings.trust_reverify_concurrency``) hold a connection and a
+    content buffer at any time.
+    """
+    limit = max(1, concurrency or settings.trust_reverify_concurrency)
+    summary = {"total": len(listing_ids), "verified": 0, "failed": 0, "errors": 0}
+    pending = iter(listing_ids)
+
+    async def _worker() -> None:
+        for listing_id in pending:
+            try:
+                payload = await _run_for_listing_id(listing_id, **pipeline_kwargs)
+            except Exception:
+                logger.warning("Trust verification failed for listing %s", listing_id, exc_info=True)
+                summary["errors"] += 1
+                continue
+            if payload is None:
+                summary["errors"] += 1
+            elif payload["trust_status"] == trust_verification_service.TRUST_STATUS_VERIFIED:
+                summary["verified"] += 1
+            else:
+                summary["failed"] += 1
+
+    await asyncio.gather(*(_worker() for _ in range(min(limit, len(listing_ids)) or 1)))
+    return summary
+
+
+async def reverify_all_listings(
+    *,
+    status: str = "active",
+    concurrency: int | None = None,
+    requested_by: str | None = None,
+) -> dict[str, int]:
+    """Re-run strict verification for every listing with bounded parallelism."""
+    from marketplace.database import async_session
+
+    async with async_session() as db:
+        result = await db.execute(select(DataListing.id).where(DataListing.status == status))
+        listing_ids = list(result.scalars().all())
+
+    summary = await _run_bounded(
+        listing_ids, concurrency, requested_by=requested_by, trigger_source="bulk_reverify"
+    )
+    logger.info("Bulk re-verification of %s listings finished: %s", status, summary)
+    return summary
+
+
+def schedule_reverify_all_listings(
+    *,
+    status: str = "active",
+    requested_by: str | None = None,
+) -> asyncio.Task[Any] | None:
+    """Queue a bulk re-verification; progress is reported by trust events."""
+    return fire_and_forget(
+        reverify_all_listings(status=status, requested_by=requested_by),
+        task_name=f"listing_reverify:{status}",
+    )
+
+
+async def resume_pending_listings(*, concurrency: int | None = None) -> dict[str, int]:
+    """Re-run first-publish trust work for listings still pending verification.
+
+    Publish-time jobs are fire-and-forget, so a restart loses any that had not
+    committed. The pipeline commits once, so a pending listing has no trust
+    artifacts yet and is bootstrapped from its stored metadata.
+    """
+    from marketplace.database import async_session
+
+    async with async_session() as db:
+        result = await db.execute(
+            select(DataListing.id).where(
+                DataListing.trust_status == trust_verification_service.TRUST_STATUS_PENDING
+            )
+        )
+        listing_ids = list(result.scalars().all())
+    if not listing_ids:
+        return {"total": 0, "verified": 0, "failed": 0, "errors": 0}
+
+    summary = await _run_bounded(
+        listing_ids,
+        concurrency,
+        trigger_source="listing_resume",
+        bootstrap=True,
+        with_proofs=True,
+    )
+    logger.info("Resumed trust verification for pending listings: %s", summary)
+    return summary
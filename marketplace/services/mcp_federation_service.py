@@ -1,17 +1,37 @@
 """MCP Federation Service — register, discover, and route tools across federated MCP servers."""
 
+import asyncio
+import copy
 import json
 import logging
+import time
 from datetime import datetime, timezone
 
 import httpx
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from marketplace.config import settings
+from marketplace.core.metrics import MCP_FEDERATION_CALL_LATENCY, MCP_FEDERATION_COALESCED_CALLS
 from marketplace.models.mcp_server import MCPServerEntry
+from marketplace.services.mcp_health_monitor import mcp_health_monitor
+from marketplace.services.mcp_load_balancer import LoadBalanceStrategy, mcp_load_balancer
+from marketplace.services.mcp_routing_table import (  # noqa: F401 - _build_auth_headers is used by the API
+    ServerRoute,
+    _build_auth_headers,
+    mcp_routing_table,
+)
 
 logger = logging.getLogger(__name__)
 
+# Latency recorded for a failed call, so quick errors do not attract traffic.
+_FAILURE_LATENCY_MS = 5000.0
+
+# Pooled HTTP clients, one per federated server id.
+_clients: dict[str, httpx.AsyncClient] = {}
+# Coalescable tool calls in flight: (namespace, tool, agent_id, arguments) -> task.
+_inflight: dict[tuple, asyncio.Future] = {}
+
 
 async def register_server(
     db: AsyncSession,
@@ -41,6 +61,7 @@ async def register_server(
     db.add(server)
     await db.commit()
     await db.refresh(server)
+    mcp_routing_table.upsert(server)
     logger.info("Registered MCP server '%s' in namespace '%s'", name, namespace)
     return server
 
@@ -55,6 +76,10 @@ async def unregister_server(db: AsyncSession, server_id: str) -> bool:
         return False
     await db.delete(server)
     await db.commit()
+    mcp_routing_table.remove(server_id)
+    client = _clients.pop(server_id, None)
+    if client is not None:
+        await client.aclose()
     logger.info("Unregistered MCP server '%s' (id=%s)", server.name, server_id)
     return True
 
@@ -90,40 +115,33 @@ async def discover_tools(
 ) -> list[dict]:
     """Aggregate tools from all active servers, prefixing each tool name with namespace.
 
-    Returns a list of tool definition dicts ready for MCP tools/list responses.
+    Served from the routing table, which only reads ``mcp_servers`` when it is
+    stale. Returns a list of tool definition dicts ready for MCP tools/list
+    responses.
     """
-    query = select(MCPServerEntry).where(MCPServerEntry.status == "active")
-    if namespace:
-        query = query.where(MCPServerEntry.namespace == namespace)
-
-    result = await db.execute(query)
-    servers = list(result.scalars().all())
-
-    tools: list[dict] = []
-    for server in servers:
-        try:
-            cached_tools = json.loads(server.tools_json) if server.tools_json else []
-        except json.JSONDecodeError:
-            logger.warning("Invalid tools_json for server '%s'", server.name)
-            cached_tools = []
-
-        for tool in cached_tools:
-            namespaced_tool = dict(tool)
-            namespaced_tool["name"] = f"{server.namespace}.{tool['name']}"
-            namespaced_tool["_server_id"] = server.id
-            namespaced_tool["_namespace"] = server.namespace
-            tools.append(namespaced_tool)
-
-    return tools
+    await mcp_routing_table.ensure_loaded(db)
+    return list(mcp_routing_table.tools(namespace))
+
+
+def _client_for(server_id: str) -> httpx.AsyncClient:
+    """Pooled HTTP client for one federated server, created on first use."""
+    client = _clients.get(server_id)
+    if client is None or client.is_closed:
+        limit = settings.mcp_federation_max_connections_per_server
+        client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+        )
+        _clients[server_id] = client
+    return client
 
 
-def _build_auth_headers(server: MCPServerEntry) -> dict[str, str]:
-    """Build authorization headers based on the server's auth_type."""
-    if server.auth_type == "bearer" and server.auth_credential_ref:
-        return {"Authorization": f"Bearer {server.auth_credential_ref}"}
-    if server.auth_type == "api_key" and server.auth_credential_ref:
-        return {"X-API-Key": server.auth_credential_ref}
-    return {}
+async def close_federation_clients() -> None:
+    """Close the pooled connections to every federated server."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
 
 
 async def refresh_server_tools(db: AsyncSession, server_id: str) -> dict:
@@ -139,10 +157,9 @@ async def refresh_server_tools(db: AsyncSession, server_id: str) -> dict:
     headers = _build_auth_headers(server)
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.post(url, json={}, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = await _client_for(server.id).post(url, json={}, headers=headers, timeout=15.0)
+        resp.raise_for_status()
+        data = resp.json()
 
         tools = data.get("tools", data) if isinstance(data, dict) else data
         server.tools_json = json.dumps(tools)
@@ -151,6 +168,7 @@ async def refresh_server_tools(db: AsyncSession, server_id: str) -> dict:
         server.status = "active"
         await db.commit()
         await db.refresh(server)
+        mcp_routing_table.upsert(server)
         logger.info("Refreshed %d tools from server '%s'", len(tools), server.name)
         return {"tools": tools, "count": len(tools)}
 
@@ -171,42 +189,74 @@ async def route_tool_call(
     arguments: dict,
     agent_id: str,
 ) -> dict:
-    """Parse namespace from tool name, find the server, and forward a tools/call request.
+    """Parse namespace from tool name, pick a server, and forward a tools/call request.
 
     Tool name format: "namespace.tool_name" (e.g. "weather.get_forecast").
+
+    Candidates come from the routing table and the load balancer picks one
+    (``mcp_federation_lb_strategy``, peak-EWMA latency by default). Calls to
+    tools a server annotates ``readOnlyHint`` or ``idempotentHint`` are
+    coalesced: an identical call (same tool, arguments and agent) already in
+    flight is joined instead of being sent again, and every caller receives
+    its own copy of the result.
+
+    Failures are not written to the server's health score here; they are
+    reported to the health monitor, which folds them into its next probe.
     """
     if "." not in namespaced_tool_name:
         return {"error": f"Invalid namespaced tool name: {namespaced_tool_name}"}
 
     namespace, tool_name = namespaced_tool_name.split(".", 1)
 
-    result = await db.execute(
-        select(MCPServerEntry).where(
-            MCPServerEntry.namespace == namespace,
-            MCPServerEntry.status == "active",
-        )
-    )
-    servers = list(result.scalars().all())
-
-    if not servers:
+    await mcp_routing_table.ensure_loaded(db)
+    routes = mcp_routing_table.routes(namespace, tool_name)
+    if not routes:
         return {"error": f"No active server found for namespace '{namespace}'"}
 
-    # Pick the server with the highest health score
-    server = max(servers, key=lambda s: s.health_score or 0)
+    key = None
+    if mcp_routing_table.is_idempotent(namespace, tool_name):
+        key = (namespace, tool_name, agent_id, json.dumps(arguments, sort_keys=True, default=str))
+        pending = _inflight.get(key)
+        if pending is not None:
+            MCP_FEDERATION_COALESCED_CALLS.labels(namespace=namespace).inc()
+            return copy.deepcopy(await asyncio.shield(pending))
 
-    url = f"{server.base_url}/tools/call"
-    headers = _build_auth_headers(server)
+    server = mcp_load_balancer.select_server(
+        routes, namespace, strategy=LoadBalanceStrategy(settings.mcp_federation_lb_strategy),
+    )
+    call = _forward_tool_call(server, namespaced_tool_name, tool_name, arguments, agent_id)
+    if key is None:
+        return await call
+    task = asyncio.ensure_future(call)
+    _inflight[key] = task
+    task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shielded so that cancelling the first caller does not fail the joined ones.
+    return copy.deepcopy(await asyncio.shield(task))
+
+
+async def _forward_tool_call(
+    server: ServerRoute,
+    namespaced_tool_name: str,
+    tool_name: str,
+    arguments: dict,
+    agent_id: str,
+) -> dict:
+    """POST tools/call to one server and report the outcome to the health monitor."""
     payload = {
         "name": tool_name,
         "arguments": arguments,
         "meta": {"agent_id": agent_id},
     }
-
+    outcome = "error"
+    mcp_load_balancer.record_request(server.id)
+    started = time.perf_counter()
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.post(url, json=payload, headers=headers)
-            resp.raise_for_status()
-            result_data = resp.json()
+        resp = await _client_for(server.id).post(
+            f"{server.base_url}/tools/call", json=payload, headers=server.headers,
+        )
+        resp.raise_for_status()
+        result_data = resp.json()
+        outcome = "success"
 
         logger.info(
             "Routed tool call '%s' to server '%s' for agent '%s'",
@@ -217,13 +267,13 @@ async def route_tool_call(
         return result_data
 
     except httpx.HTTPStatusError as exc:
+        outcome = "http_error"
         logger.error(
             "HTTP error routing '%s' to '%s': %s",
             namespaced_tool_name,
             server.name,
             exc,
         )
-        await update_health_score(db, server.id, max(0, server.health_score - 10))
         return {"error": f"HTTP {exc.response.status_code}", "tool": namespaced_tool_name}
 
     except (httpx.RequestError, Exception) as exc:
@@ -233,9 +283,17 @@ async def route_tool_call(
             server.name,
             exc,
         )
-        await update_health_score(db, server.id, max(0, server.health_score - 20))
         return {"error": str(exc), "tool": namespaced_tool_name}
 
+    finally:
+        elapsed = time.perf_counter() - started
+        MCP_FEDERATION_CALL_LATENCY.labels(server=server.name, outcome=outcome).observe(elapsed)
+        latency_ms = elapsed * 1000
+        if outcome != "success":
+            latency_ms = max(latency_ms, _FAILURE_LATENCY_MS)
+        mcp_load_balancer.record_completion(server.id, latency_ms=latency_ms)
+        mcp_health_monitor.record_call(server.id, ok=outcome == "success")
+
 
 async def update_health_score(db: AsyncSession, server_id: str, score: int) -> None:
     """Update the health score and last_health_check for a server."""
@@ -258,6 +316,7 @@ async def update_health_score(db: AsyncSession, server_id: str, score: int) -> N
         server.status = "active"
 
     await db.commit()
+    mcp_routing_table.upsert(server)
 
 
 class MCPFederationService:
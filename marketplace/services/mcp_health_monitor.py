@@ -2,83 +2,248 @@
 
 Periodically pings federated MCP servers and updates their health scores.
 Runs as a background task in the FastAPI lifespan.
+
+Each server has its own probe schedule: stable, healthy servers back off to
+up to ``_MAX_BACKOFF`` times the base interval, degraded servers are probed
+every quarter interval, and inactive servers are still probed (slowly) so they
+can recover. Every tick probes only the servers that are due, concurrently
+and bounded by ``mcp_federation_health_max_concurrency``, and writes all new
+scores in one executemany UPDATE. Scores are computed from the rows as
+re-read in that write transaction, so a concurrent ``update_health_score``
+is built on rather than overwritten and servers unregistered mid-probe are
+skipped; schedules only advance once the write has committed.
+
+Real tool-call outcomes reported by the federation service through
+``record_call`` are folded into the next score as a penalty proportional to
+the error rate. A run of consecutive failures makes the server due
+immediately instead of waiting for its next scheduled probe.
 """
 
 import asyncio
 import logging
+import random
 import time
+from datetime import datetime, timezone
 
 import httpx
+from sqlalchemy import bindparam, select, update
 
+from marketplace.config import settings
 from marketplace.database import async_session
+from marketplace.models.mcp_server import MCPServerEntry
 
 logger = logging.getLogger(__name__)
 
 _HEALTH_INTERVAL_SECONDS = 30
 _HEALTH_TIMEOUT_SECONDS = 5
 
+_MIN_PROBE_INTERVAL_SECONDS = 5.0
+_MAX_BACKOFF = 4  # healthy servers: 1x, 2x, then 4x the base interval
+_URGENT_FAILURES = 3  # consecutive failed tool calls that force a probe
+_PASSIVE_PENALTY = 30  # score deducted at a 100% tool-call error rate
+
+
+class MCPHealthMonitor:
+    """Per-server probe schedule and passive tool-call signals."""
+
+    def __init__(self) -> None:
+        self._next_probe: dict[str, float] = {}
+        self._healthy_streak: dict[str, int] = {}
+        # server_id -> [succeeded, failed, consecutive failures]
+        self._passive: dict[str, list[int]] = {}
+
+    async def run_loop(self, db, **kwargs):
+        return await health_check_loop(db, **kwargs)
+
+    async def check_all_servers(self) -> None:
+        """Probe every federated server that is due."""
+        await _run_health_checks(self)
+
+    def record_call(self, server_id: str, ok: bool) -> None:
+        """Record the outcome of a real tool call routed to a server."""
+        stats = self._passive.setdefault(server_id, [0, 0, 0])
+        if ok:
+            stats[0] += 1
+            stats[2] = 0
+        else:
+            stats[1] += 1
+            stats[2] += 1
+            if stats[2] >= _URGENT_FAILURES:
+                self._next_probe[server_id] = 0.0
+
+    def due(self, server_id: str, now: float) -> bool:
+        return self._next_probe.get(server_id, 0.0) <= now
+
+    def error_rate(self, server_id: str) -> float | None:
+        """Tool-call error rate since the last probe (None without calls)."""
+        stats = self._passive.get(server_id)
+        if not stats or not (stats[0] + stats[1]):
+            return None
+        return stats[1] / (stats[0] + stats[1])
+
+    def take_error_rate(self, server_id: str) -> float | None:
+        """``error_rate``, then reset the server's tool-call counts."""
+        rate = self.error_rate(server_id)
+        self._passive.pop(server_id, None)
+        return rate
+
+    def forget(self, server_id: str) -> None:
+        """Drop all state of an unregistered server."""
+        self._next_probe.pop(server_id, None)
+        self._healthy_streak.pop(server_id, None)
+        self._passive.pop(server_id, None)
+
+    def schedule(self, server_id: str, status: str, interval: float, now: float) -> None:
+        """Set the next probe time from the server's new status."""
+        if status == "active":
+            streak = self._healthy_streak.get(server_id, 0) + 1
+            self._healthy_streak[server_id] = streak
+            delay = interval * min(2 ** (streak - 1), _MAX_BACKOFF)
+        else:
+            self._healthy_streak.pop(server_id, None)
+            if status == "inactive":
+                delay = interval * _MAX_BACKOFF
+            else:
+                delay = max(interval / 4, _MIN_PROBE_INTERVAL_SECONDS)
+        # Jitter so servers registered together do not stay in lockstep.
+        self._next_probe[server_id] = now + delay * random.uniform(0.9, 1.1)
+
+    def reset(self) -> None:
+        self._next_probe.clear()
+        self._healthy_streak.clear()
+        self._passive.clear()
+
 
 async def health_check_loop(interval: int = _HEALTH_INTERVAL_SECONDS) -> None:
     """Background loop that checks health of all federated MCP servers."""
     await asyncio.sleep(15)  # Initial delay to let app start
     logger.info("MCP health monitor started (interval=%ds)", interval)
 
+    # Tick faster than the base interval so degraded servers are re-probed sooner.
+    tick = max(_MIN_PROBE_INTERVAL_SECONDS, interval / 6)
     while True:
         try:
             await _run_health_checks()
         except Exception:
             logger.exception("MCP health check loop error")
-        await asyncio.sleep(interval)
+        await asyncio.sleep(tick)
+
+
+def _next_health(
+    score: int | None,
+    result: tuple[float, bool] | BaseException,
+    error_rate: float | None,
+) -> tuple[int, str]:
+    """New (health_score, status) from a probe result and the tool-call error rate."""
+    if isinstance(result, BaseException):
+        score = max(0, (score or 100) - 20)
+        status = "degraded" if score > 0 else "inactive"
+    elif result[1]:
+        score = min(100, (score or 50) + 10)
+        status = "active"
+    else:
+        score = max(0, (score or 100) - 15)
+        status = "degraded" if score > 20 else "inactive"
 
+    if error_rate:
+        score = max(0, score - round(_PASSIVE_PENALTY * error_rate))
+        if score == 0:
+            status = "inactive"
+        elif status == "active" and error_rate >= 0.5:
+            status = "degraded"
+    return score, status
 
-async def _run_health_checks() -> None:
-    """Check health of all active federated MCP servers."""
-    from marketplace.models.mcp_server import MCPServerEntry
-    from sqlalchemy import select
 
+async def _run_health_checks(monitor: MCPHealthMonitor | None = None) -> None:
+    """Probe the federated MCP servers that are due and write their scores."""
+    monitor = monitor or mcp_health_monitor
     async with async_session() as db:
-        result = await db.execute(
-            select(MCPServerEntry).where(
-                MCPServerEntry.status.in_(["active", "degraded"])
-            )
-        )
+        result = await db.execute(select(MCPServerEntry))
         servers = result.scalars().all()
 
+    now = time.monotonic()
+    servers = [s for s in servers if monitor.due(s.id, now)]
     if not servers:
         return
 
-    async with httpx.AsyncClient(timeout=_HEALTH_TIMEOUT_SECONDS) as client:
-        tasks = [_check_server(client, s) for s in servers]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    concurrency = settings.mcp_federation_health_max_concurrency
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _probe(client: httpx.AsyncClient, server) -> tuple[float, bool]:
+        async with semaphore:
+            return await _check_server(client, server)
 
-    # Update health scores in DB
-    from datetime import datetime, timezone
+    started = time.perf_counter()
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=_HEALTH_TIMEOUT_SECONDS, limits=limits) as client:
+        tasks = [_probe(client, s) for s in servers]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
+    checked_at = datetime.now(timezone.utc)
+    interval = settings.mcp_federation_health_interval_seconds
+    probed = dict(zip((s.id for s in servers), results))
     async with async_session() as db:
-        for server, result in zip(servers, results):
-            if isinstance(result, Exception):
-                new_score = max(0, (server.health_score or 100) - 20)
-                new_status = "degraded" if new_score > 0 else "inactive"
+        # Score against the rows as they are now, not the pre-probe snapshot
+        result = await db.execute(
+            select(MCPServerEntry)
+            .where(MCPServerEntry.id.in_(list(probed)))
+            .with_for_update()
+        )
+        current = result.scalars().all()
+        db.expunge_all()
+
+        rows = []
+        for server in current:
+            outcome = probed[server.id]
+            new_score, new_status = _next_health(
+                server.health_score, outcome, monitor.error_rate(server.id),
+            )
+            if isinstance(outcome, BaseException):
                 logger.warning(
                     "MCP server %s health check failed: %s (score=%d)",
-                    server.name, result, new_score,
+                    server.name, outcome, new_score,
                 )
-            else:
-                latency_ms, is_healthy = result
-                if is_healthy:
-                    new_score = min(100, (server.health_score or 50) + 10)
-                    new_status = "active"
-                else:
-                    new_score = max(0, (server.health_score or 100) - 15)
-                    new_status = "degraded" if new_score > 20 else "inactive"
-
             server.health_score = new_score
             server.status = new_status
-            server.last_health_check = datetime.now(timezone.utc)
-            db.add(server)
+            server.last_health_check = checked_at
+            rows.append({
+                "server_id": server.id,
+                "new_score": new_score,
+                "new_status": new_status,
+                "checked_at": checked_at,
+            })
 
+        if rows:
+            # One executemany UPDATE; rows deleted since the read match nothing.
+            table = MCPServerEntry.__table__
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("server_id"))
+                .values(
+                    health_score=bindparam("new_score"),
+                    status=bindparam("new_status"),
+                    last_health_check=bindparam("checked_at"),
+                    updated_at=bindparam("checked_at"),
+                ),
+                rows,
+            )
         await db.commit()
 
+    for server in current:
+        monitor.take_error_rate(server.id)
+        monitor.schedule(server.id, server.status, interval, now)
+    for server_id in probed.keys() - {s.id for s in current}:
+        monitor.forget(server_id)  # unregistered while its probe ran
+
+    from marketplace.services.mcp_routing_table import mcp_routing_table
+
+    mcp_routing_table.upsert_many(current)
+
+    logger.debug(
+        "Probed %d MCP servers in %.0fms",
+        len(servers), (time.perf_counter() - started) * 1000,
+    )
+
 
 async def _check_server(
     client: httpx.AsyncClient, server
@@ -103,8 +268,5 @@ async def _check_server(
         raise Exception(f"Connection failed: {e}")
 
 
-class MCPHealthMonitor:
-    """Class wrapper for MCP health monitor functions."""
-
-    async def run_loop(self, db, **kwargs):
-        return await health_check_loop(db, **kwargs)
+# Singleton
+mcp_health_monitor = MCPHealthMonitor()
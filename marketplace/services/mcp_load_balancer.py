@@ -1,13 +1,24 @@
-"""MCP Federation load balancer — 4 strategies for routing tool calls.
+"""MCP Federation load balancer — 5 strategies for routing tool calls.
 
 When multiple MCP servers provide the same tool in a namespace,
 selects the best server based on the chosen strategy.
+
+PEAK_EWMA tracks an exponentially weighted moving average of each server's
+observed tool-call latency that jumps straight to any sample above it and
+decays back over ``decay_seconds``. A server's cost is that latency times its
+in-flight requests (plus one), scaled by health score, so slow or saturated
+servers shed load as soon as the latency is observed. Latencies are measured
+per worker; health scores are shared through the database.
 """
 
 import logging
+import math
 import random
+import time
 from enum import Enum
 
+from marketplace.config import settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,14 +27,18 @@ class LoadBalanceStrategy(str, Enum):
     LEAST_LOADED = "least_loaded"
     WEIGHTED = "weighted"
     HEALTH_FIRST = "health_first"
+    PEAK_EWMA = "peak_ewma"
 
 
 class MCPLoadBalancer:
     """Load balancer for federated MCP server selection."""
 
-    def __init__(self):
+    def __init__(self, decay_seconds: float = 10.0, default_latency_ms: float = 100.0):
         self._round_robin_counters: dict[str, int] = {}
         self._request_counts: dict[str, int] = {}
+        self._latency: dict[str, tuple[float, float]] = {}  # server_id -> (ewma_ms, observed_at)
+        self._decay_seconds = decay_seconds
+        self._default_latency_ms = default_latency_ms
 
     def select_server(
         self,
@@ -34,7 +49,7 @@ class MCPLoadBalancer:
         """Select the best server from a list of candidates.
 
         Args:
-            servers: List of MCPServerEntry objects
+            servers: List of MCPServerEntry or ServerRoute objects
             namespace: Tool namespace for round-robin tracking
             strategy: Load balancing strategy
 
@@ -59,6 +74,8 @@ class MCPLoadBalancer:
             return self._weighted(active)
         elif strategy == LoadBalanceStrategy.HEALTH_FIRST:
             return self._health_first(active)
+        elif strategy == LoadBalanceStrategy.PEAK_EWMA:
+            return self._peak_ewma(active)
         else:
             return active[0]
 
@@ -66,10 +83,27 @@ class MCPLoadBalancer:
         """Track request count for least-loaded strategy."""
         self._request_counts[server_id] = self._request_counts.get(server_id, 0) + 1
 
-    def record_completion(self, server_id: str) -> None:
-        """Decrement active request count on completion."""
+    def record_completion(self, server_id: str, latency_ms: float | None = None) -> None:
+        """Decrement active request count on completion and fold in its latency."""
         count = self._request_counts.get(server_id, 1)
         self._request_counts[server_id] = max(0, count - 1)
+        if latency_ms is not None:
+            self._observe(server_id, latency_ms)
+
+    def latency_ms(self, server_id: str) -> float | None:
+        """Current peak-EWMA latency estimate for a server, if any was observed."""
+        entry = self._latency.get(server_id)
+        return entry[0] if entry else None
+
+    def _observe(self, server_id: str, latency_ms: float) -> None:
+        now = time.monotonic()
+        previous = self._latency.get(server_id)
+        if previous is None or latency_ms >= previous[0]:
+            ewma = latency_ms
+        else:
+            weight = math.exp(-(now - previous[1]) / self._decay_seconds)
+            ewma = previous[0] * weight + latency_ms * (1 - weight)
+        self._latency[server_id] = (ewma, now)
 
     def _round_robin(self, servers: list, namespace: str):
         """Simple round-robin selection."""
@@ -97,11 +131,24 @@ class MCPLoadBalancer:
             ),
         )
 
+    def _peak_ewma(self, servers: list):
+        """Select the server with the lowest latency x load cost, scaled by health."""
+        def cost(s) -> float:
+            entry = self._latency.get(s.id)
+            latency = entry[0] if entry else self._default_latency_ms
+            load = self._request_counts.get(s.id, 0) + 1
+            return latency * load / max(s.health_score or 0, 1)
+
+        return min(servers, key=cost)
+
     def reset(self) -> None:
         """Reset all counters."""
         self._round_robin_counters.clear()
         self._request_counts.clear()
+        self._latency.clear()
 
 
 # Singleton
-mcp_load_balancer = MCPLoadBalancer()
+mcp_load_balancer = MCPLoadBalancer(
+    decay_seconds=settings.mcp_federation_latency_decay_seconds,
+)
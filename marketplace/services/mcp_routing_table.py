@@ -0,0 +1,237 @@
+"""In-memory routing table for federated MCP tool calls.
+
+Holds one ``ServerRoute`` per registered federated server (endpoint, auth
+headers, status, health score and cached tool list) and, per namespace, a
+``tool name → servers`` map. ``mcp_federation_service.route_tool_call`` and
+``discover_tools`` read from it instead of querying ``mcp_servers`` on every
+call.
+
+The table is refreshed in two ways:
+
+* The federation service and health monitor call ``upsert(server)`` /
+  ``upsert_many(servers)`` / ``remove(server_id)`` after they write server
+  rows (registration, tool refresh, health score changes), so this worker
+  sees its own writes immediately.
+* A lookup reloads the whole table from the database once it is older than
+  ``mcp_federation_routing_ttl_seconds``, which picks up writes made by other
+  workers. Federated servers number in the tens to hundreds, so a full reload
+  is a single cheap query.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.config import settings
+from marketplace.models.mcp_server import MCPServerEntry
+
+logger = logging.getLogger(__name__)
+
+# Only active servers are routed to, as when calls queried ``mcp_servers``
+# directly; degraded and inactive ones wait for the health monitor.
+_ROUTABLE = ("active",)
+
+
+def _build_auth_headers(server: MCPServerEntry) -> dict[str, str]:
+    """Build authorization headers based on the server's auth_type."""
+    if server.auth_type == "bearer" and server.auth_credential_ref:
+        return {"Authorization": f"Bearer {server.auth_credential_ref}"}
+    if server.auth_type == "api_key" and server.auth_credential_ref:
+        return {"X-API-Key": server.auth_credential_ref}
+    return {}
+
+
+def _is_idempotent(tool: dict) -> bool:
+    annotations = tool.get("annotations") or {}
+    return bool(annotations.get("readOnlyHint") or annotations.get("idempotentHint"))
+
+
+@dataclass(slots=True)
+class ServerRoute:
+    """Routing view of one ``MCPServerEntry`` row."""
+
+    id: str
+    name: str
+    namespace: str
+    base_url: str
+    headers: dict[str, str]
+    status: str
+    health_score: int
+    tools: list[dict] = field(default_factory=list)
+    idempotent_tools: frozenset[str] = frozenset()
+
+    @classmethod
+    def from_entry(cls, server: MCPServerEntry) -> ServerRoute:
+        try:
+            tools = json.loads(server.tools_json) if server.tools_json else []
+        except (json.JSONDecodeError, TypeError):
+            logger.warning("Invalid tools_json for server '%s'", server.name)
+            tools = []
+        if not isinstance(tools, list):
+            tools = []
+        tools = [t for t in tools if isinstance(t, dict) and t.get("name")]
+        return cls(
+            id=server.id,
+            name=server.name,
+            namespace=server.namespace,
+            base_url=server.base_url.rstrip("/"),
+            headers=_build_auth_headers(server),
+            status=server.status or "active",
+            health_score=server.health_score if server.health_score is not None else 100,
+            tools=tools,
+            idempotent_tools=frozenset(t["name"] for t in tools if _is_idempotent(t)),
+        )
+
+
+class _Namespace:
+    """Servers of one namespace, indexed by the tools they advertise."""
+
+    __slots__ = ("servers", "by_tool")
+
+    def __init__(self, servers: list[ServerRoute]) -> None:
+        self.servers = servers
+        self.by_tool: dict[str, list[ServerRoute]] = {}
+        for route in servers:
+            for tool in route.tools:
+                self.by_tool.setdefault(tool["name"], []).append(route)
+
+
+class FederationRoutingTable:
+    """namespace → tool → federated servers, refreshed on write and by TTL."""
+
+    def __init__(self, ttl_seconds: float = 5.0) -> None:
+        self._ttl = ttl_seconds
+        self._servers: dict[str, ServerRoute] = {}
+        self._namespaces: dict[str, _Namespace] = {}
+        self._tools: dict[str | None, list[dict]] = {}
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Reload from the database if the table is missing or older than the TTL."""
+        if self._fresh():
+            return
+        async with self._lock:
+            if self._fresh():
+                return
+            result = await db.execute(select(MCPServerEntry))
+            self._servers = {
+                server.id: ServerRoute.from_entry(server)
+                for server in result.scalars().all()
+            }
+            self._reindex()
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def routes(self, namespace: str, tool_name: str) -> list[ServerRoute]:
+        """Routable servers for ``namespace.tool_name``.
+
+        These are the servers advertising the tool; if none do (for example
+        their tool list has not been refreshed yet), every routable server in
+        the namespace is a candidate.
+        """
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            return []
+        return ns.by_tool.get(tool_name) or ns.servers
+
+    def is_idempotent(self, namespace: str, tool_name: str) -> bool:
+        """Whether any server declares the tool read-only or idempotent."""
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            return False
+        return any(tool_name in route.idempotent_tools for route in ns.by_tool.get(tool_name, ()))
+
+    def tools(self, namespace: str | None = None) -> list[dict]:
+        """Namespaced tool definitions of active servers, built once per change.
+
+        The returned list is shared between callers and must not be mutated.
+        """
+        cached = self._tools.get(namespace)
+        if cached is None:
+            cached = []
+            for route in self._servers.values():
+                if route.status != "active" or (namespace and route.namespace != namespace):
+                    continue
+                for tool in route.tools:
+                    namespaced = dict(tool)
+                    namespaced["name"] = f"{route.namespace}.{tool['name']}"
+                    namespaced["_server_id"] = route.id
+                    namespaced["_namespace"] = route.namespace
+                    cached.append(namespaced)
+            self._tools[namespace] = cached
+        return cached
+
+    def get(self, server_id: str) -> ServerRoute | None:
+        return self._servers.get(server_id)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def upsert(self, server: MCPServerEntry) -> None:
+        """Apply a server row this worker just wrote."""
+        if self._loaded_at is None:
+            return  # the first lookup loads everything anyway
+        self._servers[server.id] = ServerRoute.from_entry(server)
+        self._reindex()
+
+    def upsert_many(self, servers: list[MCPServerEntry]) -> None:
+        """Apply several server rows with a single reindex."""
+        if self._loaded_at is None or not servers:
+            return
+        for server in servers:
+            self._servers[server.id] = ServerRoute.from_entry(server)
+        self._reindex()
+
+    def remove(self, server_id: str) -> None:
+        if self._servers.pop(server_id, None) is not None:
+            self._reindex()
+
+    def invalidate(self) -> None:
+        """Force a reload on the next lookup."""
+        self._loaded_at = None
+
+    def clear(self) -> None:
+        self._servers.clear()
+        self._namespaces.clear()
+        self._tools.clear()
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "servers": len(self._servers),
+            "namespaces": len(self._namespaces),
+            "reloads": self.reloads,
+        }
+
+    def _fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl
+
+    def _reindex(self) -> None:
+        grouped: dict[str, list[ServerRoute]] = {}
+        for route in self._servers.values():
+            if route.status in _ROUTABLE:
+                grouped.setdefault(route.namespace, []).append(route)
+        self._namespaces = {ns: _Namespace(routes) for ns, routes in grouped.items()}
+        self._tools = {}
+
+
+mcp_routing_table = FederationRoutingTable(
+    ttl_seconds=settings.mcp_federation_routing_ttl_seconds,
+)
@@ -426,18 +426,8 @@ async def redact_old_memory_verification_evidence(
     retention_days: int | None = None,
 ) -> int:
     """Redact sampled entries and detailed evidence outside retention window."""
+    from marketplace.services.retention_service import MEMORY_VERIFICATION_EVIDENCE, apply_policy
+
     days = retention_days if retention_days is not None else settings.security_event_retention_days
     cutoff = _utcnow() - timedelta(days=max(1, days))
-    result = await db.execute(
-        select(MemoryVerificationRun).where(MemoryVerificationRun.created_at < cutoff)
-    )
-    rows = result.scalars().all()
-    redacted = 0
-    for row in rows:
-        if row.sampled_entries_json != "[]" or row.evidence_json != '{"redacted":true}':
-            row.sampled_entries_json = "[]"
-            row.evidence_json = '{"redacted":true}'
-            redacted += 1
-    if redacted:
-        await db.commit()
-    return redacted
+    return await apply_policy(db, MEMORY_VERIFICATION_EVIDENCE, cutoff=cutoff)
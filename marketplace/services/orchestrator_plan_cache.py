@@ -0,0 +1,230 @@
+"""Plan cache for the SmartOrchestrator.
+
+Maps a normalized task description to the validated plan (sub-tasks,
+assignments and DAG) that the LLM produced for it, so recurring task shapes
+skip the decompose → match → build-DAG calls. With an embedding service,
+near-identical wordings also hit.
+
+A cached plan is revalidated before use: every agent it references must
+still be active. Nodes whose agent went away are rebound to the best
+currently active agent for the node's capability; if no agent remains for
+some capability the entry is dropped and the caller plans from scratch.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import math
+import re
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.config import settings
+from marketplace.core.metrics import ORCHESTRATOR_PLAN_CACHE_LOOKUPS
+from marketplace.models.agent import RegisteredAgent
+from marketplace.services.cache_service import TTLCache
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# capability -> ranked candidate agents (same shape as suggest_agents_for_capability)
+Discover = Callable[[list[str]], Awaitable[dict[str, list[dict]]]]
+
+
+def normalize_task(task_description: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a task."""
+    text = _PUNCTUATION.sub(" ", task_description.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+@dataclass
+class PlanTemplate:
+    """A validated plan plus the capability each DAG node was matched for."""
+
+    sub_tasks: list[dict]
+    assignments: list[dict]
+    dag: dict[str, Any]
+    node_capabilities: dict[str, str]
+
+    @classmethod
+    def from_plan(cls, sub_tasks: list[dict], assignments: list[dict], graph_json: str) -> PlanTemplate:
+        dag = json.loads(graph_json)
+        capability_by_task = {t.get("id"): t.get("required_capability", "") for t in sub_tasks}
+        node_capabilities = {
+            node_id: capability_by_task.get(node_id.removeprefix("node_"), "")
+            for node_id in dag.get("nodes", {})
+        }
+        return cls(copy.deepcopy(sub_tasks), copy.deepcopy(assignments), dag, node_capabilities)
+
+    def agent_ids(self) -> set[str]:
+        return {
+            node.get("config", {}).get("agent_id")
+            for node in self.dag.get("nodes", {}).values()
+            if node.get("config", {}).get("agent_id")
+        }
+
+
+class PlanCache:
+    """Exact (normalized text) and optional semantic lookup of plan templates."""
+
+    def __init__(
+        self,
+        maxsize: int = 500,
+        ttl_seconds: float = 3600.0,
+        embedding_service: Any = None,
+        similarity_threshold: float = 0.95,
+    ) -> None:
+        self._plans = TTLCache(maxsize=maxsize, default_ttl=ttl_seconds)
+        self._maxsize = maxsize
+        self._embedding_service = embedding_service
+        self._similarity_threshold = similarity_threshold
+        # normalized task -> unit embedding, for the semantic tier
+        self._vectors: dict[str, list[float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _embed(self, text: str) -> list[float]:
+        vector = await self._embedding_service.embed(text)
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else vector
+
+    async def _similar_key(self, key: str) -> str | None:
+        if self._embedding_service is None or not self._vectors:
+            return None
+        vector = await self._embed(key)
+        best_key, best_score = None, self._similarity_threshold
+        for other_key, other in list(self._vectors.items()):
+            if len(other) != len(vector):
+                continue
+            score = sum(a * b for a, b in zip(vector, other))
+            if score >= best_score:
+                best_key, best_score = other_key, score
+        return best_key
+
+    async def get(
+        self, db: AsyncSession, task_description: str, discover: Discover,
+    ) -> PlanTemplate | None:
+        """A revalidated copy of the plan cached for this task, or None."""
+        key = normalize_task(task_description)
+        template: PlanTemplate | None = self._plans.get(key)
+        result = "hit"
+        if template is None:
+            similar = await self._similar_key(key)
+            template = self._plans.get(similar) if similar else None
+            if template is None:
+                if similar:
+                    self._vectors.pop(similar, None)
+                self._miss("miss")
+                return None
+            key, result = similar, "semantic_hit"
+
+        revalidated = await _revalidate(db, template, discover)
+        if revalidated is None:
+            self.invalidate(key)
+            self._miss("stale")
+            return None
+        if revalidated is not template:
+            self._plans.put(key, revalidated)
+
+        self.hits += 1
+        ORCHESTRATOR_PLAN_CACHE_LOOKUPS.labels(result=result).inc()
+        return copy.deepcopy(revalidated)
+
+    def _miss(self, result: str) -> None:
+        self.misses += 1
+        ORCHESTRATOR_PLAN_CACHE_LOOKUPS.labels(result=result).inc()
+
+    async def put(self, task_description: str, template: PlanTemplate) -> None:
+        key = normalize_task(task_description)
+        self._plans.put(key, template)
+        if self._embedding_service is not None:
+            self._vectors[key] = await self._embed(key)
+            if len(self._vectors) > self._maxsize:
+                self._vectors.pop(next(iter(self._vectors)))
+
+    def invalidate(self, task_description: str) -> None:
+        key = normalize_task(task_description)
+        self._plans.invalidate(key)
+        self._vectors.pop(key, None)
+
+    def clear(self) -> None:
+        self._plans.clear()
+        self._vectors.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": self._plans.stats()["size"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+async def _revalidate(
+    db: AsyncSession, template: PlanTemplate, discover: Discover,
+) -> PlanTemplate | None:
+    """Check the template's agents are active, rebinding nodes whose agent is not."""
+    agent_ids = template.agent_ids()
+    result = await db.execute(
+        select(RegisteredAgent.id).where(
+            RegisteredAgent.id.in_(agent_ids),
+            RegisteredAgent.status == "active",
+        )
+    )
+    active = set(result.scalars().all())
+    if active == agent_ids:
+        return template
+
+    nodes = template.dag.get("nodes", {})
+    stale_nodes = [
+        node_id for node_id, node in nodes.items()
+        if node.get("config", {}).get("agent_id") not in active
+    ]
+    capabilities = {template.node_capabilities.get(node_id, "") for node_id in stale_nodes}
+    if "" in capabilities:
+        return None
+    candidates = await discover(sorted(capabilities))
+
+    rebound = copy.deepcopy(template)
+    replaced: dict[str, dict] = {}
+    for node_id in stale_nodes:
+        ranked = candidates.get(template.node_capabilities[node_id]) or []
+        if not ranked:
+            return None
+        old_agent = nodes[node_id].get("config", {}).get("agent_id")
+        replaced[old_agent] = ranked[0]
+        rebound.dag["nodes"][node_id].setdefault("config", {})["agent_id"] = ranked[0]["agent_id"]
+    for assignment in rebound.assignments:
+        agent = replaced.get(assignment.get("agent_id"))
+        if agent is not None:
+            assignment["agent_id"] = agent["agent_id"]
+            assignment["agent_name"] = agent.get("name", "")
+    return rebound
+
+
+def _default_embedding_service() -> Any:
+    if not settings.orchestration_plan_cache_semantic:
+        return None
+    from marketplace.memory.embedding_service import EmbeddingService
+
+    return EmbeddingService(
+        foundry_url=settings.foundry_local_base_url,
+        ollama_url=settings.ollama_base_url,
+        openai_api_key=settings.openai_api_key,
+        model=settings.memory_embedding_model,
+    )
+
+
+plan_cache = PlanCache(
+    maxsize=settings.orchestration_plan_cache_size,
+    ttl_seconds=settings.orchestration_plan_cache_ttl_seconds,
+    embedding_service=_default_embedding_service(),
+)
@@ -1,104 +1,461 @@
-"""Monthly auto-payout service for creator earnings."""
+"""Monthly auto-payout service for creator earnings.
+
+Payouts run as batches. A ``PayoutRun`` is planned into ``PayoutItem`` rows,
+one per creator (monthly) or pending redemption (dispatch), each with a unique
+idempotency key. Planning pages through the candidates by id and checkpoints
+its cursor on the run; after that the item states are the checkpoint, so a
+restarted run skips what already succeeded and picks up the rest. Items are
+processed in chunks, several chunks at a time in their own sessions, and
+calls to each payout provider are throttled separately.
+"""
+import asyncio
+import json
 import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from marketplace.config import settings
+from marketplace.database import upsert_insert
 from marketplace.models.creator import Creator
+from marketplace.models.payout import PayoutItem, PayoutRun
+from marketplace.models.redemption import RedemptionRequest
 from marketplace.models.token_account import TokenAccount
 from marketplace.services import redemption_service
 
 logger = logging.getLogger(__name__)
 
+# Creator payout_method -> redemption_type
+_TYPE_MAP = {
+    "upi": "upi",
+    "bank": "bank_withdrawal",
+    "gift_card": "gift_card",
+}
+
+# redemption_type -> redemption_service processor, looked up at call time
+_PROCESSORS = {
+    "api_credits": "process_api_credit_redemption",
+    "gift_card": "process_gift_card_redemption",
+    "bank_withdrawal": "process_bank_withdrawal",
+    "upi": "process_upi_transfer",
+}
+
+_RETRYABLE = ("pending", "failed")
+_MAX_REPORTED_ERRORS = 100
+
+# Processes one item in the given session; returns the redemption id
+ItemHandler = Callable[[AsyncSession, Any], Awaitable[str | None]]
+
+
+class _ProviderThrottle:
+    """Caps in-flight calls and call rate for one payout provider."""
+
+    def __init__(self, concurrency: int, rate_per_second: float) -> None:
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_at = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._slots:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self._interval
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+def _provider_throttles() -> dict[str, _ProviderThrottle]:
+    """One throttle per provider in ``payout_provider_rate_limits``."""
+    throttles = {}
+    for entry in settings.payout_provider_rate_limits.split(","):
+        name, _, rate = entry.partition("=")
+        if name.strip():
+            throttles[name.strip()] = _ProviderThrottle(
+                settings.payout_provider_concurrency, float(rate or 0),
+            )
+    return throttles
+
+
+async def _open_run(db: AsyncSession, kind: str, period: str) -> PayoutRun:
+    """Get the run for ``(kind, period)``, creating it if needed."""
+    stmt = upsert_insert(db, PayoutRun).values(
+        id=str(uuid.uuid4()), kind=kind, period=period, status="running",
+    ).on_conflict_do_nothing(index_elements=["kind", "period"])
+    await db.execute(stmt)
+    await db.commit()
+    result = await db.execute(
+        select(PayoutRun)
+        .where(PayoutRun.kind == kind, PayoutRun.period == period)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+async def _save_checkpoint(db: AsyncSession, run: PayoutRun, **checkpoint) -> None:
+    state = json.loads(run.checkpoint_json or "{}")
+    state.update(checkpoint)
+    run.checkpoint_json = json.dumps(state)
+    await db.commit()
+
+
+async def _plan(
+    db: AsyncSession,
+    run: PayoutRun,
+    candidates: Callable[[str, int], Any],
+    to_item: Callable[[Any], dict],
+) -> None:
+    """Page through ``candidates(cursor, limit)`` and insert an item for each.
+
+    Rows must expose ``id`` and come ordered by it. Keys that already exist
+    are left alone, except that retryable items from an earlier run are
+    moved onto this one.
+    """
+    checkpoint = json.loads(run.checkpoint_json or "{}")
+    if checkpoint.get("planned"):
+        return
+    cursor = checkpoint.get("plan_cursor", "")
+    chunk_size = max(1, settings.payout_batch_chunk_size)
+
+    while True:
+        rows = (await db.execute(candidates(cursor, chunk_size))).all()
+        if rows:
+            items = [{"id": str(uuid.uuid4()), "run_id": run.id, **to_item(row)} for row in rows]
+            await db.execute(
+                upsert_insert(db, PayoutItem).on_conflict_do_nothing(
+                    index_elements=["idempotency_key"],
+                ),
+                items,
+            )
+            await db.execute(
+                update(PayoutItem)
+                .where(
+                    PayoutItem.idempotency_key.in_([item["idempotency_key"] for item in items]),
+                    PayoutItem.run_id != run.id,
+                    PayoutItem.state.in_(_RETRYABLE),
+                    PayoutItem.attempts < settings.payout_max_attempts,
+                )
+                .values(run_id=run.id)
+            )
+            cursor = rows[-1].id
+        await _save_checkpoint(db, run, plan_cursor=cursor, planned=len(rows) < chunk_size)
+        if len(rows) < chunk_size:
+            return
+
+
+async def _process_item(
+    session: AsyncSession,
+    item: Any,
+    handler: ItemHandler,
+    throttle: _ProviderThrottle | None,
+) -> None:
+    # Claim the item. The handler's own commit persists the claim together
+    # with its work, so "submitted" only survives once the payout exists.
+    claimed = await session.execute(
+        update(PayoutItem)
+        .where(PayoutItem.id == item.id, PayoutItem.state.in_(_RETRYABLE))
+        .values(state="submitted", attempts=item.attempts + 1, error=None)
+    )
+    if claimed.rowcount == 0:
+        await session.rollback()
+        return
+
+    try:
+        if throttle is None:
+            redemption_id = await handler(session, item)
+        else:
+            async with throttle.slot():
+                redemption_id = await handler(session, item)
+    except Exception as e:
+        await session.rollback()
+        await session.execute(
+            update(PayoutItem)
+            .where(PayoutItem.id == item.id)
+            .values(state="failed", attempts=item.attempts + 1, error=str(e)[:1000])
+        )
+        await session.commit()
+        logger.error("Payout item %s failed: %s", item.idempotency_key, e)
+        return
+
+    await session.execute(
+        update(PayoutItem)
+        .where(PayoutItem.id == item.id)
+        .values(state="succeeded", redemption_id=redemption_id or item.redemption_id)
+    )
+    await session.commit()
+
+
+async def _execute(
+    db: AsyncSession,
+    run: PayoutRun,
+    handler: ItemHandler,
+    throttled: bool,
+) -> None:
+    """Process the run's retryable items, chunk by chunk."""
+    # A "submitted" item was committed together with its payout, so the only
+    # thing a crash can have lost is the final state change.
+    await db.execute(
+        update(PayoutItem)
+        .where(PayoutItem.run_id == run.id, PayoutItem.state == "submitted")
+        .values(state="succeeded")
+    )
+    await db.commit()
+
+    bind = db.bind
+    session_factory = async_sessionmaker(bind, class_=AsyncSession, expire_on_commit=False)
+    throttles = _provider_throttles() if throttled else {}
+
+    async def _chunks():
+        cursor = ""
+        chunk_size = max(1, settings.payout_batch_chunk_size)
+        while True:
+            chunk = (await db.execute(
+                select(
+                    PayoutItem.id,
+                    PayoutItem.idempotency_key,
+                    PayoutItem.creator_id,
+                    PayoutItem.redemption_id,
+                    PayoutItem.provider,
+                    PayoutItem.amount_usd,
+                    PayoutItem.attempts,
+                )
+                .where(
+                    PayoutItem.run_id == run.id,
+                    PayoutItem.state.in_(_RETRYABLE),
+                    PayoutItem.attempts < settings.payout_max_attempts,
+                    PayoutItem.id > cursor,
+                )
+                .order_by(PayoutItem.id)
+                .limit(chunk_size)
+            )).all()
+            if not chunk:
+                return
+            cursor = chunk[-1].id
+            yield chunk
+
+    async def _run_chunk(chunk: list) -> None:
+        async with session_factory() as session:
+            for item in chunk:
+                await _process_item(session, item, handler, throttles.get(item.provider))
+
+    # SQLite has a single writer, so chunks go one at a time
+    if bind.dialect.name == "sqlite" or settings.payout_batch_concurrency <= 1:
+        async for chunk in _chunks():
+            await _run_chunk(chunk)
+        return
+
+    slots = asyncio.Semaphore(settings.payout_batch_concurrency)
+
+    async def _run_chunk_in_slot(chunk: list) -> None:
+        try:
+            await _run_chunk(chunk)
+        finally:
+            slots.release()
+
+    async with asyncio.TaskGroup() as tasks:
+        async for chunk in _chunks():
+            await slots.acquire()
+            tasks.create_task(_run_chunk_in_slot(chunk))
+
+
+async def _finish(db: AsyncSession, run: PayoutRun) -> dict:
+    """Count item states, store the summary on the run and return it."""
+    counts = dict((await db.execute(
+        select(PayoutItem.state, func.count(PayoutItem.id))
+        .where(PayoutItem.run_id == run.id)
+        .group_by(PayoutItem.state)
+    )).all())
+    retryable = (await db.execute(
+        select(func.count(PayoutItem.id)).where(
+            PayoutItem.run_id == run.id,
+            PayoutItem.state.in_(_RETRYABLE),
+            PayoutItem.attempts < settings.payout_max_attempts,
+        )
+    )).scalar() or 0
+    failures = (await db.execute(
+        select(PayoutItem.creator_id, PayoutItem.redemption_id, PayoutItem.error)
+        .where(PayoutItem.run_id == run.id, PayoutItem.state == "failed")
+        .order_by(PayoutItem.updated_at)
+        .limit(_MAX_REPORTED_ERRORS)
+    )).all()
+
+    summary = {
+        "run_id": run.id,
+        "total": sum(counts.values()),
+        "succeeded": counts.get("succeeded", 0),
+        "failed": counts.get("failed", 0),
+        "skipped": counts.get("skipped", 0),
+        "pending": counts.get("pending", 0),
+        "errors": [
+            {"creator_id": f.creator_id, "redemption_id": f.redemption_id, "error": f.error}
+            for f in failures
+        ],
+    }
+    now = datetime.now(timezone.utc)
+    run.summary_json = json.dumps(summary)
+    run.status = "incomplete" if retryable else "completed"
+    run.updated_at = now
+    run.completed_at = None if retryable else now
+    await db.commit()
+    logger.info(
+        "Payout run %s %s: %d succeeded, %d failed, %d skipped of %d",
+        run.kind, run.period, summary["succeeded"], summary["failed"],
+        summary["skipped"], summary["total"],
+    )
+    return summary
+
+
+async def _run_batch(
+    db: AsyncSession,
+    run: PayoutRun,
+    candidates: Callable[[str, int], Any],
+    to_item: Callable[[Any], dict],
+    handler: ItemHandler,
+    throttled: bool,
+) -> dict:
+    if run.status == "completed":
+        return json.loads(run.summary_json or "{}")
+    await _plan(db, run, candidates, to_item)
+    await _execute(db, run, handler, throttled)
+    return await _finish(db, run)
+
 
 async def run_monthly_payout(db: AsyncSession) -> dict:
     """Auto-generate payouts for all creators above minimum threshold.
 
-    Called on the 1st of each month (or manually via admin).
+    Called on the 1st of each month (or manually via admin). Calling it again
+    in the same month resumes that month's run; a completed run is not redone.
     """
     now = datetime.now(timezone.utc)
     month_key = f"{now.year}-{now.month:02d}"
     min_balance = settings.creator_min_withdrawal_usd
 
-    # Find all creators with sufficient balance
-    result = await db.execute(
-        select(TokenAccount, Creator)
-        .join(Creator, TokenAccount.creator_id == Creator.id)
-        .where(
-            TokenAccount.creator_id.isnot(None),
-            TokenAccount.balance >= min_balance,
-            Creator.status == "active",
-            Creator.payout_method != "none",
+    def _candidates(cursor: str, limit: int):
+        return (
+            select(Creator.id, Creator.payout_method, TokenAccount.balance)
+            .join(Creator, TokenAccount.creator_id == Creator.id)
+            .where(
+                TokenAccount.creator_id.isnot(None),
+                TokenAccount.balance >= min_balance,
+                Creator.status == "active",
+                Creator.payout_method != "none",
+                Creator.id > cursor,
+            )
+            .order_by(Creator.id)
+            .limit(limit)
         )
-    )
-    rows = result.all()
-
-    processed = 0
-    skipped = 0
-    errors = []
 
-    for acct, creator in rows:
-        # Idempotency: check if already paid out this month
-        idempotency_key = f"monthly-{creator.id}-{month_key}"
+    def _to_item(row) -> dict:
+        redemption_type = _TYPE_MAP.get(row.payout_method)
+        return {
+            "idempotency_key": f"monthly-{row.id}-{month_key}",
+            "creator_id": row.id,
+            "provider": redemption_type,
+            "amount_usd": row.balance,
+            "state": "pending" if redemption_type else "skipped",
+            "error": None if redemption_type else f"Unsupported payout method: {row.payout_method}",
+        }
 
-        try:
-            payout_method = creator.payout_method
-            if payout_method not in ("upi", "bank", "gift_card"):
-                skipped += 1
-                continue
-
-            # Map creator payout_method to redemption_type
-            type_map = {
-                "upi": "upi",
-                "bank": "bank_withdrawal",
-                "gift_card": "gift_card",
-            }
-            redemption_type = type_map.get(payout_method, "bank_withdrawal")
-
-            await redemption_service.create_redemption(
-                db, creator.id, redemption_type, float(acct.balance),
-            )
-            processed += 1
-            logger.info(
-                "Monthly payout created: creator=%s amount=%.2f type=%s",
-                creator.id, float(acct.balance), redemption_type,
-            )
-        except Exception as e:
-            errors.append({"creator_id": creator.id, "error": str(e)})
-            logger.error("Monthly payout failed for %s: %s", creator.id, e)
+    async def _create(session: AsyncSession, item) -> str:
+        redemption = await redemption_service.create_redemption(
+            session, item.creator_id, item.provider, float(item.amount_usd),
+        )
+        logger.info(
+            "Monthly payout created: creator=%s amount=%.2f type=%s",
+            item.creator_id, float(item.amount_usd), item.provider,
+        )
+        return redemption["id"]
 
+    run = await _open_run(db, "monthly", month_key)
+    summary = await _run_batch(db, run, _candidates, _to_item, _create, throttled=False)
     return {
         "month": month_key,
-        "processed": processed,
-        "skipped": skipped,
-        "errors": errors,
+        "run_id": run.id,
+        "processed": summary.get("succeeded", 0),
+        "skipped": summary.get("skipped", 0),
+        "failed": summary.get("failed", 0),
+        "errors": [
+            {"creator_id": e["creator_id"], "error": e["error"]}
+            for e in summary.get("errors", [])
+        ],
     }
 
 
 async def process_pending_payouts(db: AsyncSession) -> dict:
-    """Process all pending redemption requests."""
-    from marketplace.models.redemption import RedemptionRequest
+    """Process all pending redemption requests.
 
+    An interrupted dispatch is resumed by the next call; otherwise each call
+    starts a new run, which also retries redemptions whose earlier dispatch
+    failed.
+    """
     result = await db.execute(
-        select(RedemptionRequest).where(RedemptionRequest.status == "pending")
+        select(PayoutRun)
+        .where(PayoutRun.kind == "dispatch", PayoutRun.status == "running")
+        .order_by(PayoutRun.started_at.desc())
+        .limit(1)
     )
-    pending = result.scalars().all()
+    run = result.scalar_one_or_none()
+    if run is None:
+        run = await _open_run(db, "dispatch", datetime.now(timezone.utc).isoformat())
 
-    processed = 0
-    for redemption in pending:
-        try:
-            if redemption.redemption_type == "api_credits":
-                await redemption_service.process_api_credit_redemption(db, redemption.id)
-            elif redemption.redemption_type == "gift_card":
-                await redemption_service.process_gift_card_redemption(db, redemption.id)
-            elif redemption.redemption_type == "bank_withdrawal":
-                await redemption_service.process_bank_withdrawal(db, redemption.id)
-            elif redemption.redemption_type == "upi":
-                await redemption_service.process_upi_transfer(db, redemption.id)
-            processed += 1
-        except Exception as e:
-            logger.error("Failed to process redemption %s: %s", redemption.id, e)
-
-    return {"processed": processed, "total_pending": len(pending)}
+    def _candidates(cursor: str, limit: int):
+        return (
+            select(
+                RedemptionRequest.id,
+                RedemptionRequest.creator_id,
+                RedemptionRequest.redemption_type,
+                RedemptionRequest.amount_usd,
+            )
+            .where(RedemptionRequest.status == "pending", RedemptionRequest.id > cursor)
+            .order_by(RedemptionRequest.id)
+            .limit(limit)
+        )
+
+    def _to_item(row) -> dict:
+        known = row.redemption_type in _PROCESSORS
+        return {
+            "idempotency_key": f"dispatch-{row.id}",
+            "creator_id": row.creator_id,
+            "redemption_id": row.id,
+            "provider": row.redemption_type,
+            "amount_usd": row.amount_usd,
+            "state": "pending" if known else "skipped",
+            "error": None if known else f"Unknown redemption type: {row.redemption_type}",
+        }
+
+    async def _dispatch(session: AsyncSession, item) -> str:
+        processor = getattr(redemption_service, _PROCESSORS[item.provider])
+        await processor(session, item.redemption_id)
+        return item.redemption_id
+
+    summary = await _run_batch(db, run, _candidates, _to_item, _dispatch, throttled=True)
+    return {
+        "run_id": run.id,
+        "processed": summary.get("succeeded", 0),
+        "failed": summary.get("failed", 0),
+        "total_pending": summary.get("total", 0),
+        "errors": summary.get("errors", []),
+    }
+
+
+async def get_payout_run(db: AsyncSession, run_id: str) -> dict | None:
+    """Status, checkpoint and summary report of a payout run."""
+    run = await db.get(PayoutRun, run_id)
+    if run is None:
+        return None
+    return {
+        "id": run.id,
+        "kind": run.kind,
+        "period": run.period,
+        "status": run.status,
+        "checkpoint": json.loads(run.checkpoint_json or "{}"),
+        "summary": json.loads(run.summary_json or "{}"),
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "completed_at": run.completed_at.isoformat() if run.completed_at else None,
+    }
@@ -19,8 +19,8 @@ from marketplace.services.billing_v2_service import (
     get_plan,
     get_plan_limits,
     get_subscription,
+    get_period_usage,
     get_subscription_with_plan,
-    get_usage,
     list_plans,
     plan_to_response,
 )
@@ -104,12 +104,9 @@ async def recommend_plan(
     _, current_plan_obj = await get_subscription_with_plan(db, agent_id)
     current_plan_limits = get_plan_limits(current_plan_obj) if current_plan_obj else {}
 
-    # Gather current usage across metrics (1 query per metric)
-    period_start = _current_period_start()
-    usage_by_metric: dict[str, float] = {}
-    for metric in METRICS:
-        usage_records = await get_usage(db, agent_id, metric, period_start)
-        usage_by_metric[metric] = sum(float(u.value) for u in usage_records)
+    # Current-period totals for every metric in one query
+    period_usage = await get_period_usage(db, agent_id)
+    usage_by_metric = {metric: period_usage.get(metric, 0.0) for metric in METRICS}
 
     # Score all plans
     plans = await list_plans(db)
@@ -208,11 +205,11 @@ async def forecast_usage(
     _, plan = await get_subscription_with_plan(db, agent_id)
     limits = get_plan_limits(plan) if plan else {}
 
+    period_usage = await get_period_usage(db, agent_id)
     forecasts: list[UsageForecastResponse] = []
 
     for metric in METRICS:
-        usage_records = await get_usage(db, agent_id, metric, period_start)
-        current = sum(float(u.value) for u in usage_records)
+        current = period_usage.get(metric, 0.0)
         limit = limits.get(metric, 0)
 
         # Linear projection
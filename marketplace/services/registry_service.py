@@ -9,7 +9,9 @@ from marketplace.core.exceptions import AgentAlreadyExistsError, AgentNotFoundEr
 from marketplace.models.agent import RegisteredAgent
 from marketplace.models.reputation import ReputationScore
 from marketplace.schemas.agent import AgentRegisterRequest, AgentRegisterResponse, AgentUpdateRequest
-from marketplace.services.cache_service import agent_cache
+from marketplace.services.abuse_detection_service import abuse_stream
+from marketplace.services.cache_service import agent_cache, restore, snapshot
+from marketplace.services.capability_index import capability_index
 
 
 async def register_agent(
@@ -50,6 +52,8 @@ async def register_agent(
 
     await db.commit()
     await db.refresh(agent)
+    capability_index.invalidate(agent.id)
+    abuse_stream.note_agent(agent.id, agent.created_at)
 
     token = create_access_token(agent.id, agent.name)
     a2a_url = f"{req.a2a_endpoint}/.well-known/agent.json" if req.a2a_endpoint else ""
@@ -65,19 +69,18 @@ async def register_agent(
 
 async def get_agent(db: AsyncSession, agent_id: str) -> RegisteredAgent:
     """Get an agent by ID or raise 404. Uses cache for hot agents."""
-    cached = agent_cache.get(f"agent:{agent_id}")
-    if cached is not None:
-        return cached
 
-    result = await db.execute(
-        select(RegisteredAgent).where(RegisteredAgent.id == agent_id)
-    )
-    agent = result.scalar_one_or_none()
-    if not agent:
-        raise AgentNotFoundError(agent_id)
+    async def _load() -> dict:
+        result = await db.execute(
+            select(RegisteredAgent).where(RegisteredAgent.id == agent_id)
+        )
+        agent = result.scalar_one_or_none()
+        if not agent:
+            raise AgentNotFoundError(agent_id)
+        return snapshot(agent)
 
-    agent_cache.put(f"agent:{agent_id}", agent)
-    return agent
+    cached = await agent_cache.get_or_load(f"agent:{agent_id}", _load)
+    return await restore(db, RegisteredAgent, cached)
 
 
 async def get_agent_by_name(db: AsyncSession, name: str) -> RegisteredAgent:
@@ -134,12 +137,17 @@ async def update_agent(
     agent.updated_at = datetime.now(timezone.utc)
     await db.commit()
     await db.refresh(agent)
-    agent_cache.invalidate(f"agent:{agent_id}")
+    await agent_cache.ainvalidate(f"agent:{agent_id}")
+    capability_index.invalidate(agent_id)
     return agent
 
 
 async def heartbeat(db: AsyncSession, agent_id: str) -> RegisteredAgent:
-    """Update the agent's last_seen_at timestamp."""
+    """Update the agent's last_seen_at timestamp.
+
+    The cached agent snapshot is left alone: heartbeats are frequent, and
+    ``last_seen_at`` read through ``get_agent`` may lag by the cache TTL.
+    """
     agent = await get_agent(db, agent_id)
     agent.last_seen_at = datetime.now(timezone.utc)
     await db.commit()
@@ -154,5 +162,6 @@ async def deactivate_agent(db: AsyncSession, agent_id: str) -> RegisteredAgent:
     agent.updated_at = datetime.now(timezone.utc)
     await db.commit()
     await db.refresh(agent)
-    agent_cache.invalidate(f"agent:{agent_id}")
+    await agent_cache.ainvalidate(f"agent:{agent_id}")
+    capability_index.invalidate(agent_id)
     return agent
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from marketplace.models.reputation import ReputationScore
 from marketplace.models.transaction import Transaction
+from marketplace.services.capability_index import capability_index
 
 
 async def calculate_reputation(db: AsyncSession, agent_id: str) -> ReputationScore:
@@ -69,6 +70,7 @@ async def calculate_reputation(db: AsyncSession, agent_id: str) -> ReputationSco
 
     await db.commit()
     await db.refresh(rep)
+    capability_index.invalidate(agent_id)
     return rep
 
 
@@ -3,33 +3,49 @@
 Provides a class-based ReputationV2Service with feature extraction, ML-based
 scoring (when scikit-learn/lightgbm are available), batch updates, history,
 and anomaly detection.
+
+Batch recomputation is set-based: features for a chunk of agents come from
+grouped aggregates (a fixed number of queries per chunk), scores from one
+vectorized prediction over the NumPy feature matrix, and rows are written
+with a single bulk upsert per chunk.
 """
 
 from __future__ import annotations
 
 import logging
+from collections.abc import Sequence
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
-from sqlalchemy import func, select
+from sqlalchemy import case, exists, func, literal, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from marketplace.database import upsert_insert
 from marketplace.models.agent import RegisteredAgent
 from marketplace.models.listing import DataListing
 from marketplace.models.reputation import ReputationScore
 from marketplace.models.transaction import Transaction
+from marketplace.services.capability_index import capability_index
 
 logger = logging.getLogger(__name__)
 
 # Try to import the ML model wrapper — optional dependency
 try:
-    from marketplace.ml.reputation_model import ReputationModel
+    from marketplace.ml.reputation_model import FEATURE_NAMES, ReputationModel
 
     _HAS_ML_MODEL = True
 except ImportError:
     _HAS_ML_MODEL = False
     logger.info("marketplace.ml.reputation_model not available — using weighted formula only.")
 
+try:
+    import numpy as np
+
+    _HAS_NUMPY = True
+except ImportError:
+    _HAS_NUMPY = False
+    logger.info("numpy is not installed — batch reputation scoring runs row by row.")
+
 
 # ---------------------------------------------------------------------------
 # Default feature weights for the fallback weighted formula
@@ -45,6 +61,27 @@ _DEFAULT_WEIGHTS = {
     "unique_buyers": 0.10,
 }
 
+# Column order of batch feature matrices (the ML model's training order)
+_FEATURE_ORDER = list(FEATURE_NAMES) if _HAS_ML_MODEL else list(_DEFAULT_WEIGHTS)
+
+# Divisors that normalise unbounded features to 0-1 (capped at 1.0)
+_NORMALISATION_CAPS = {
+    "transaction_count": 100.0,
+    "age_days": 365.0,
+    "listing_count": 50.0,
+    "unique_buyers": 50.0,
+}
+
+_BATCH_SIZE = 1000  # agents per aggregate round trip and bulk upsert
+_FAILED_STATUSES = ("disputed", "failed")
+_TRANSACTION_TIMESTAMPS = (
+    Transaction.initiated_at,
+    Transaction.paid_at,
+    Transaction.delivered_at,
+    Transaction.verified_at,
+    Transaction.completed_at,
+)
+
 
 # ---------------------------------------------------------------------------
 # ReputationV2Service
@@ -79,100 +116,120 @@ class ReputationV2Service:
             transaction_count, avg_rating, dispute_rate, response_time_avg,
             successful_delivery_rate, age_days, listing_count, unique_buyers
         """
-        # --- Agent age ---
-        agent_result = await db.execute(
-            select(RegisteredAgent).where(RegisteredAgent.id == agent_id)
-        )
-        agent = agent_result.scalar_one_or_none()
-        if agent and agent.created_at:
-            created = agent.created_at
-            if created.tzinfo is None:
-                created = created.replace(tzinfo=timezone.utc)
-            age_days = max((datetime.now(timezone.utc) - created).days, 0)
-        else:
-            age_days = 0
-
-        # --- Transactions as seller ---
-        seller_txns_result = await db.execute(
-            select(Transaction).where(Transaction.seller_id == agent_id)
-        )
-        seller_txns = list(seller_txns_result.scalars().all())
+        features, _ = await self._extract_features(db, [agent_id])
+        return features[agent_id]
+
+    async def compute_features_batch(
+        self, db: AsyncSession, agent_ids: Sequence[str]
+    ) -> dict[str, dict[str, float]]:
+        """Extract features for many agents with grouped SQL aggregates.
 
-        # --- Transactions as buyer ---
-        buyer_txns_result = await db.execute(
-            select(Transaction).where(Transaction.buyer_id == agent_id)
+        Issues four queries per chunk of ``_BATCH_SIZE`` agents regardless of
+        how many transactions they have.
+        """
+        features: dict[str, dict[str, float]] = {}
+        for start in range(0, len(agent_ids), _BATCH_SIZE):
+            chunk_features, _ = await self._extract_features(
+                db, agent_ids[start:start + _BATCH_SIZE]
+            )
+            features.update(chunk_features)
+        return features
+
+    async def _extract_features(
+        self, db: AsyncSession, agent_ids: Sequence[str]
+    ) -> tuple[dict[str, dict[str, float]], set[str]]:
+        """Features for one chunk plus the subset of ids that are registered agents."""
+        agent_ids = list(agent_ids)
+        now = datetime.now(timezone.utc)
+
+        created_rows = await db.execute(
+            select(RegisteredAgent.id, RegisteredAgent.created_at).where(
+                RegisteredAgent.id.in_(agent_ids)
+            )
         )
-        buyer_txns = list(buyer_txns_result.scalars().all())
-
-        all_txns = seller_txns + buyer_txns
-        transaction_count = len(all_txns)
-
-        # --- Successful delivery rate ---
-        completed = [t for t in seller_txns if t.status == "completed"]
-        successful_delivery_rate = len(completed) / max(len(seller_txns), 1)
-
-        # --- Dispute rate ---
-        disputed = [t for t in all_txns if t.status in ("disputed", "failed")]
-        dispute_rate = len(disputed) / max(transaction_count, 1)
-
-        # --- Average rating ---
-        ratings: list[float] = []
-        for t in all_txns:
-            if hasattr(t, "rating") and t.rating is not None:
-                try:
-                    ratings.append(float(t.rating))
-                except (ValueError, TypeError):
-                    pass
-        avg_rating = sum(ratings) / len(ratings) if ratings else 0.5
-
-        # --- Response time average ---
-        response_times: list[float] = []
-        for txn in seller_txns:
-            if hasattr(txn, "initiated_at") and hasattr(txn, "delivered_at"):
-                if txn.initiated_at and txn.delivered_at:
-                    delta = txn.delivered_at - txn.initiated_at
-                    response_times.append(delta.total_seconds())
-        response_time_avg = (
-            sum(response_times) / len(response_times) if response_times else 0.0
+        created_at = dict(created_rows.all())
+
+        # Seller side: volume, outcomes, distinct buyers, mean delivery latency
+        seller_rows = await db.execute(
+            select(
+                Transaction.seller_id,
+                func.count(Transaction.id),
+                func.sum(case((Transaction.status == "completed", 1), else_=0)),
+                func.sum(case((Transaction.status.in_(_FAILED_STATUSES), 1), else_=0)),
+                func.count(func.distinct(Transaction.buyer_id)),
+                func.avg(_seconds_between(db, Transaction.initiated_at, Transaction.delivered_at)),
+            )
+            .where(Transaction.seller_id.in_(agent_ids))
+            .group_by(Transaction.seller_id)
         )
-        # Normalise: cap at 1 hour, invert so lower is better (0-1 scale)
-        if response_time_avg > 0:
-            response_time_avg = min(response_time_avg / 3600.0, 1.0)
+        seller_stats = {row[0]: row[1:] for row in seller_rows.all()}
 
-        # --- Listing count ---
-        listing_result = await db.execute(
-            select(func.count(DataListing.id)).where(DataListing.seller_id == agent_id)
+        buyer_rows = await db.execute(
+            select(
+                Transaction.buyer_id,
+                func.count(Transaction.id),
+                func.sum(case((Transaction.status.in_(_FAILED_STATUSES), 1), else_=0)),
+            )
+            .where(Transaction.buyer_id.in_(agent_ids))
+            .group_by(Transaction.buyer_id)
         )
-        listing_count = listing_result.scalar() or 0
+        buyer_stats = {row[0]: row[1:] for row in buyer_rows.all()}
 
-        # --- Unique buyers ---
-        unique_buyers_result = await db.execute(
-            select(func.count(func.distinct(Transaction.buyer_id))).where(
-                Transaction.seller_id == agent_id
-            )
+        listing_rows = await db.execute(
+            select(DataListing.seller_id, func.count(DataListing.id))
+            .where(DataListing.seller_id.in_(agent_ids))
+            .group_by(DataListing.seller_id)
         )
-        unique_buyers = unique_buyers_result.scalar() or 0
+        listing_counts = dict(listing_rows.all())
 
-        return {
-            "transaction_count": float(transaction_count),
-            "avg_rating": float(avg_rating),
-            "dispute_rate": float(dispute_rate),
-            "response_time_avg": float(response_time_avg),
-            "successful_delivery_rate": float(successful_delivery_rate),
-            "age_days": float(age_days),
-            "listing_count": float(listing_count),
-            "unique_buyers": float(unique_buyers),
-        }
+        features: dict[str, dict[str, float]] = {}
+        for agent_id in agent_ids:
+            sold, completed, seller_failed, unique_buyers, response_avg = seller_stats.get(
+                agent_id, (0, 0, 0, 0, None)
+            )
+            bought, buyer_failed = buyer_stats.get(agent_id, (0, 0))
+            transaction_count = int(sold) + int(bought)
+
+            created = created_at.get(agent_id)
+            if created is not None:
+                if created.tzinfo is None:
+                    created = created.replace(tzinfo=timezone.utc)
+                age_days = max((now - created).days, 0)
+            else:
+                age_days = 0
+
+            # Normalise: cap at 1 hour, invert so lower is better (0-1 scale)
+            response_time_avg = float(response_avg or 0.0)
+            if response_time_avg > 0:
+                response_time_avg = min(response_time_avg / 3600.0, 1.0)
+
+            features[agent_id] = {
+                "transaction_count": float(transaction_count),
+                # Transactions carry no rating column yet; neutral default.
+                "avg_rating": 0.5,
+                "dispute_rate": float(
+                    (int(seller_failed or 0) + int(buyer_failed or 0)) / max(transaction_count, 1)
+                ),
+                "response_time_avg": float(response_time_avg),
+                "successful_delivery_rate": float(int(completed or 0) / max(int(sold), 1)),
+                "age_days": float(age_days),
+                "listing_count": float(listing_counts.get(agent_id, 0)),
+                "unique_buyers": float(unique_buyers or 0),
+            }
+        return features, set(created_at)
 
     # ----- prediction -------------------------------------------------------
 
+    def _model_ready(self) -> bool:
+        return self._model is not None and getattr(self._model, "_model", None) is not None
+
     def predict_reputation_score(self, features: dict[str, float]) -> float:
         """Predict a reputation score (0.0-1.0) from computed features.
 
         Uses an ML model if available, otherwise falls back to a weighted formula.
         """
         # Try ML model first
-        if self._model is not None and getattr(self._model, "_model", None) is not None:
+        if self._model_ready():
             try:
                 score = self._model.predict(features)
                 return max(0.0, min(1.0, score))
@@ -182,20 +239,48 @@ class ReputationV2Service:
         # Weighted formula fallback
         return self._weighted_score(features)
 
+    def predict_reputation_scores(self, feature_matrix: Any) -> list[float]:
+        """Predict scores for a feature matrix (columns in ``_FEATURE_ORDER``).
+
+        One vectorized model call when an ML model is loaded, otherwise the
+        weighted formula applied to the whole matrix at once.
+        """
+        if len(feature_matrix) == 0:
+            return []
+        if self._model_ready():
+            try:
+                return [float(score) for score in self._model.predict_batch(feature_matrix)]
+            except Exception:
+                logger.exception("Batch ML prediction failed — falling back to weighted formula.")
+        return self._weighted_scores(feature_matrix)
+
+    @classmethod
+    def _weighted_scores(cls, feature_matrix: Any) -> list[float]:
+        """Vectorized ``_weighted_score`` over a feature matrix."""
+        if not _HAS_NUMPY:
+            return [cls._weighted_score(dict(zip(_FEATURE_ORDER, row))) for row in feature_matrix]
+
+        matrix = np.asarray(feature_matrix, dtype=float)
+        normalised = matrix.copy()
+        for name, cap in _NORMALISATION_CAPS.items():
+            column = _FEATURE_ORDER.index(name)
+            normalised[:, column] = np.minimum(matrix[:, column] / cap, 1.0)
+        weights = np.array([_DEFAULT_WEIGHTS[name] for name in _FEATURE_ORDER])
+        scores = np.clip(np.round(normalised @ weights, 4), 0.0, 1.0)
+        return [float(score) for score in scores]
+
     @staticmethod
     def _weighted_score(features: dict[str, float]) -> float:
         """Compute a reputation score using a simple weighted formula."""
         # Normalise features to 0-1 range
         normalised = {
-            "transaction_count": min(features.get("transaction_count", 0) / 100.0, 1.0),
             "avg_rating": features.get("avg_rating", 0.5),
             "dispute_rate": features.get("dispute_rate", 0.0),
             "response_time_avg": features.get("response_time_avg", 0.0),
             "successful_delivery_rate": features.get("successful_delivery_rate", 0.0),
-            "age_days": min(features.get("age_days", 0) / 365.0, 1.0),
-            "listing_count": min(features.get("listing_count", 0) / 50.0, 1.0),
-            "unique_buyers": min(features.get("unique_buyers", 0) / 50.0, 1.0),
         }
+        for name, cap in _NORMALISATION_CAPS.items():
+            normalised[name] = min(features.get(name, 0) / cap, 1.0)
 
         score = 0.0
         for feature_name, weight in _DEFAULT_WEIGHTS.items():
@@ -215,10 +300,7 @@ class ReputationV2Service:
         """
         features = await self.compute_features(db, agent_id)
         score = self.predict_reputation_score(features)
-        model_used = (
-            self._model is not None
-            and getattr(self._model, "_model", None) is not None
-        )
+        model_used = self._model_ready()
 
         # Update or create ReputationScore record
         result = await db.execute(
@@ -241,6 +323,7 @@ class ReputationV2Service:
 
         await db.commit()
         await db.refresh(rep)
+        capability_index.invalidate(agent_id)
 
         return {
             "agent_id": agent_id,
@@ -253,28 +336,130 @@ class ReputationV2Service:
         self,
         db: AsyncSession,
         agent_ids: list[str] | None = None,
+        *,
+        incremental: bool = False,
+        since: datetime | None = None,
     ) -> list[dict[str, Any]]:
         """Batch update reputation scores for multiple agents.
 
-        If agent_ids is None, update all active agents.
+        If agent_ids is None, update all active agents — or, with
+        ``incremental``, only those touched since their last calculation
+        (see ``agents_touched_since``). Each chunk of ``_BATCH_SIZE`` agents
+        costs a fixed number of queries, one vectorized prediction and one
+        bulk upsert + commit.
         """
         if agent_ids is None:
-            result = await db.execute(
-                select(RegisteredAgent.id).where(RegisteredAgent.status == "active")
-            )
-            agent_ids = [row[0] for row in result.fetchall()]
+            if incremental:
+                agent_ids = await self.agents_touched_since(db, since)
+            else:
+                result = await db.execute(
+                    select(RegisteredAgent.id).where(RegisteredAgent.status == "active")
+                )
+                agent_ids = [row[0] for row in result.fetchall()]
 
         results: list[dict[str, Any]] = []
-        for aid in agent_ids:
+        for start in range(0, len(agent_ids), _BATCH_SIZE):
+            chunk = agent_ids[start:start + _BATCH_SIZE]
             try:
-                update_result = await self.update_agent_reputation(db, aid)
-                results.append(update_result)
+                results.extend(await self._update_chunk(db, chunk))
             except Exception:
-                logger.exception("Failed to update reputation for agent %s", aid)
-                results.append({"agent_id": aid, "error": "update_failed"})
+                logger.exception("Failed to update reputation for %d agents", len(chunk))
+                await db.rollback()
+                results.extend({"agent_id": aid, "error": "update_failed"} for aid in chunk)
 
         return results
 
+    async def _update_chunk(
+        self, db: AsyncSession, agent_ids: Sequence[str]
+    ) -> list[dict[str, Any]]:
+        features, known_ids = await self._extract_features(db, agent_ids)
+        scored_ids = [aid for aid in dict.fromkeys(agent_ids) if aid in known_ids]
+        matrix = [[features[aid][name] for name in _FEATURE_ORDER] for aid in scored_ids]
+        if _HAS_NUMPY:
+            matrix = np.asarray(matrix, dtype=float).reshape(len(scored_ids), len(_FEATURE_ORDER))
+        scores = dict(zip(scored_ids, self.predict_reputation_scores(matrix)))
+        model_used = self._model_ready()
+
+        if scored_ids:
+            now = datetime.now(timezone.utc)
+            rows = []
+            for aid in scored_ids:
+                agent_features = features[aid]
+                transaction_count = agent_features["transaction_count"]
+                rows.append({
+                    "agent_id": aid,
+                    "composite_score": round(scores[aid], 3),
+                    "total_transactions": int(transaction_count),
+                    "successful_deliveries": int(
+                        agent_features["successful_delivery_rate"] * transaction_count
+                    ),
+                    "failed_deliveries": int(agent_features["dispute_rate"] * transaction_count),
+                    "last_calculated_at": now,
+                })
+            stmt = upsert_insert(db, ReputationScore)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["agent_id"],
+                set_={
+                    column: getattr(stmt.excluded, column)
+                    for column in (
+                        "composite_score",
+                        "total_transactions",
+                        "successful_deliveries",
+                        "failed_deliveries",
+                        "last_calculated_at",
+                    )
+                },
+            )
+            await db.execute(stmt, rows)
+            await db.commit()
+            # The new last_calculated_at watermark tells the index which agents to reload.
+            capability_index.invalidate()
+
+        return [
+            {
+                "agent_id": aid,
+                "score": scores[aid],
+                "features": features[aid],
+                "model_used": model_used,
+            }
+            if aid in scores
+            else {"agent_id": aid, "error": "agent_not_found"}
+            for aid in agent_ids
+        ]
+
+    async def agents_touched_since(
+        self, db: AsyncSession, since: datetime | None = None
+    ) -> list[str]:
+        """Active agents whose features may have changed since the last run.
+
+        An agent is touched when it has no reputation row yet, or when one of
+        its transactions (as buyer or seller) changed state, or it created a
+        listing, after ``since`` — by default after its own
+        ``last_calculated_at``. ``age_days`` drift is not tracked; a periodic
+        full run picks it up.
+        """
+        cutoff = literal(since) if since is not None else ReputationScore.last_calculated_at
+        tx_changed = or_(*(column > cutoff for column in _TRANSACTION_TIMESTAMPS))
+
+        stmt = (
+            select(RegisteredAgent.id)
+            .outerjoin(ReputationScore, ReputationScore.agent_id == RegisteredAgent.id)
+            .where(
+                RegisteredAgent.status == "active",
+                or_(
+                    ReputationScore.id.is_(None) if since is None else RegisteredAgent.created_at > cutoff,
+                    exists().where(Transaction.seller_id == RegisteredAgent.id, tx_changed),
+                    exists().where(Transaction.buyer_id == RegisteredAgent.id, tx_changed),
+                    exists().where(
+                        DataListing.seller_id == RegisteredAgent.id,
+                        DataListing.created_at > cutoff,
+                    ),
+                ),
+            )
+        )
+        result = await db.execute(stmt)
+        return [row[0] for row in result.all()]
+
     async def get_reputation_history(
         self,
         db: AsyncSession,
@@ -309,6 +494,13 @@ class ReputationV2Service:
         ]
 
 
+def _seconds_between(db: AsyncSession, start, end):
+    """SQL expression for ``end - start`` in seconds (NULL if either is NULL)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 86400.0
+    return func.extract("epoch", end - start)
+
+
 # ---------------------------------------------------------------------------
 # Singleton factory
 # ---------------------------------------------------------------------------
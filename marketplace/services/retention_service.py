@@ -0,0 +1,275 @@
+"""Data retention: declarative per-table policies applied as set-based batches.
+
+A ``RetentionPolicy`` names a table, the timestamp column that ages its rows,
+and whether aged rows are redacted in place or deleted. Policies run as
+repeated ``UPDATE``/``DELETE ... WHERE <key> IN (SELECT <key> ... LIMIT n)``
+statements, one committed batch at a time, so no rows are loaded into Python
+and locks stay short. Redaction only matches rows that still hold data, which
+makes every batch, and every re-run, idempotent.
+
+On PostgreSQL batches are keyed by ``ctid``, and a table that has been turned
+into a range-partitioned table on the policy's age column (monthly partitions
+named ``<table>_pYYYYMM``) is handled partition-wise: delete policies drop
+partitions that lie wholly before the cutoff, and upcoming partitions are
+created ahead of time. Partitioning is an operator opt-in; plain tables work
+unchanged.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from sqlalchemy import case, delete, literal_column, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.config import settings
+from marketplace.core.metrics import (
+    RETENTION_PARTITIONS_DROPPED,
+    RETENTION_ROWS_PROCESSED,
+    RETENTION_RUN_SECONDS,
+)
+from marketplace.models.agent_trust import MemoryVerificationRun, WebhookDelivery
+from marketplace.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """How long rows of one table keep their data, and what happens after."""
+
+    name: str
+    model: Any
+    age_column: str
+    action: str  # redact | delete
+    retention: Callable[[], timedelta]  # read at run time, so settings changes apply
+    # Redact only: column -> new value, and the condition for rows still to redact
+    values: dict[str, Any] = field(default_factory=dict)
+    unredacted: Any = None
+
+    def __post_init__(self) -> None:
+        if self.action not in ("redact", "delete"):
+            raise ValueError(f"Unknown retention action: {self.action!r}")
+        if self.action == "redact" and (not self.values or self.unredacted is None):
+            raise ValueError(f"Redact policy {self.name!r} needs values and unredacted")
+
+    @property
+    def table_name(self) -> str:
+        return self.model.__tablename__
+
+
+def _security_retention() -> timedelta:
+    return timedelta(days=max(1, settings.security_event_retention_days))
+
+
+# ── Policies ──
+
+_payload = WebhookDelivery.payload_json
+_response = WebhookDelivery.response_body
+
+WEBHOOK_DELIVERY_BODIES = RetentionPolicy(
+    name="webhook_delivery_bodies",
+    model=WebhookDelivery,
+    age_column="created_at",
+    action="redact",
+    retention=_security_retention,
+    values={
+        "payload_json": case((_payload.in_(("{}", "")), _payload), else_="{}"),
+        "response_body": case((_response.in_(("", "[redacted]")), _response), else_="[redacted]"),
+    },
+    unredacted=or_(
+        _payload.is_(None), _payload.not_in(("{}", "")),
+        _response.is_(None), _response.not_in(("", "[redacted]")),
+    ),
+)
+
+MEMORY_VERIFICATION_EVIDENCE = RetentionPolicy(
+    name="memory_verification_evidence",
+    model=MemoryVerificationRun,
+    age_column="created_at",
+    action="redact",
+    retention=_security_retention,
+    values={"sampled_entries_json": "[]", "evidence_json": '{"redacted":true}'},
+    unredacted=or_(
+        MemoryVerificationRun.sampled_entries_json.is_(None),
+        MemoryVerificationRun.sampled_entries_json != "[]",
+        MemoryVerificationRun.evidence_json.is_(None),
+        MemoryVerificationRun.evidence_json != '{"redacted":true}',
+    ),
+)
+
+# A revocation only has to outlive the token it revokes
+EXPIRED_REVOKED_TOKENS = RetentionPolicy(
+    name="expired_revoked_tokens",
+    model=RevokedToken,
+    age_column="expires_at",
+    action="delete",
+    retention=lambda: timedelta(0),
+)
+
+POLICIES: tuple[RetentionPolicy, ...] = (
+    WEBHOOK_DELIVERY_BODIES,
+    MEMORY_VERIFICATION_EVIDENCE,
+    EXPIRED_REVOKED_TOKENS,
+)
+
+
+# ── Execution ──
+
+async def apply_policy(
+    db: AsyncSession,
+    policy: RetentionPolicy,
+    *,
+    cutoff: datetime | None = None,
+    now: datetime | None = None,
+) -> int:
+    """Redact or delete every row of ``policy`` aged past ``cutoff``.
+
+    ``cutoff`` defaults to ``now - policy.retention()``. Returns the number of
+    rows changed by statements; rows removed by dropping whole partitions
+    are not counted.
+    """
+    now = now or datetime.now(timezone.utc)
+    if cutoff is None:
+        cutoff = now - policy.retention()
+    started = time.perf_counter()
+
+    dialect = db.get_bind().dialect.name
+    partitioned = False
+    if dialect == "postgresql":
+        partitioned = await _is_partitioned(db, policy.table_name)
+        if partitioned:
+            await _ensure_partitions(db, policy, now)
+            if policy.action == "delete":
+                await _drop_expired_partitions(db, policy, cutoff)
+
+    processed = 0
+    batch_size = max(1, settings.retention_batch_size)
+    statement = _batch_statement(dialect, policy, cutoff, batch_size, partitioned)
+    while True:
+        result = await db.execute(
+            statement, execution_options={"synchronize_session": "fetch"},
+        )
+        await db.commit()
+        changed = result.rowcount or 0
+        processed += changed
+        if changed < batch_size:
+            break
+
+    RETENTION_ROWS_PROCESSED.labels(policy=policy.name, action=policy.action).inc(processed)
+    RETENTION_RUN_SECONDS.labels(policy=policy.name).observe(time.perf_counter() - started)
+    if processed:
+        logger.info("Retention %s: %s %d rows", policy.name, policy.action, processed)
+    return processed
+
+
+async def run_retention(
+    db: AsyncSession,
+    policies: tuple[RetentionPolicy, ...] = POLICIES,
+    *,
+    now: datetime | None = None,
+) -> dict[str, int]:
+    """Apply each policy in turn; one failing policy does not stop the rest."""
+    now = now or datetime.now(timezone.utc)
+    processed: dict[str, int] = {}
+    for policy in policies:
+        try:
+            processed[policy.name] = await apply_policy(db, policy, now=now)
+        except Exception:
+            await db.rollback()
+            logger.exception("Retention policy %s failed", policy.name)
+    return processed
+
+
+def _batch_statement(
+    dialect: str,
+    policy: RetentionPolicy,
+    cutoff: datetime,
+    batch_size: int,
+    partitioned: bool,
+):
+    model = policy.model
+    conditions = [getattr(model, policy.age_column) < cutoff]
+    if policy.action == "redact":
+        conditions.append(policy.unredacted)
+
+    if dialect == "postgresql" and not partitioned:
+        # ctid is only unique within one partition
+        key = literal_column("ctid")
+        batch = select(key).select_from(model).where(*conditions).limit(batch_size)
+        # Concurrent workers take disjoint batches instead of queueing on locks
+        batch = batch.with_for_update(skip_locked=True)
+    else:
+        key = model.__mapper__.primary_key[0]
+        batch = select(key).where(*conditions).limit(batch_size)
+
+    if policy.action == "delete":
+        return delete(model).where(key.in_(batch))
+    return update(model).where(key.in_(batch)).values(**policy.values)
+
+
+# ── PostgreSQL partitions ──
+
+async def _is_partitioned(db: AsyncSession, table: str) -> bool:
+    relkind = (await db.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table},
+    )).scalar_one_or_none()
+    return relkind == "p"
+
+
+def _month_start(moment: datetime, offset: int = 0) -> datetime:
+    month = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+async def _ensure_partitions(db: AsyncSession, policy: RetentionPolicy, now: datetime) -> None:
+    """Create this month's partition and ``retention_partitions_ahead`` more."""
+    table = policy.table_name
+    for offset in range(max(0, settings.retention_partitions_ahead) + 1):
+        start, end = _month_start(now, offset), _month_start(now, offset + 1)
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_p{start:%Y%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+    await db.commit()
+
+
+async def _drop_expired_partitions(
+    db: AsyncSession, policy: RetentionPolicy, cutoff: datetime,
+) -> int:
+    """Drop partitions whose whole range lies before ``cutoff``."""
+    rows = (await db.execute(
+        text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": policy.table_name},
+    )).all()
+
+    dropped = 0
+    for partition, bound in rows:
+        match = _PARTITION_UPPER_BOUND_RE.search(bound or "")
+        if match is None:  # DEFAULT or MAXVALUE partition
+            continue
+        upper = datetime.fromisoformat(match.group(1))
+        if upper.tzinfo is None:
+            upper = upper.replace(tzinfo=timezone.utc)
+        if upper > cutoff:
+            continue
+        await db.execute(text(f'DROP TABLE IF EXISTS "{partition}"'))
+        await db.commit()
+        dropped += 1
+        logger.info("Retention %s: dropped partition %s", policy.name, partition)
+    RETENTION_PARTITIONS_DROPPED.labels(policy=policy.name).inc(dropped)
+    return dropped
@@ -1,15 +1,31 @@
-"""Azure Service Bus producer/consumer service for reliable messaging.
+"""Message queues for reliable, async messaging (webhook delivery and events).
 
-Provides queue-based messaging with dead-letter support for webhook delivery
-and async event processing.  Falls back to a no-op stub when the SDK or
-connection string is not available.
+Two interchangeable backends expose the same async API:
+
+* ``ServiceBusService`` — Azure Service Bus through the async SDK, with
+  long-lived senders and receivers per queue, receiver prefetch and
+  concurrent settlement of a batch of messages.
+* ``LocalQueueBackend`` — an in-process queue stored in SQLite (a file, or
+  memory by default) with Service Bus semantics: peek-lock receive with a
+  visibility timeout, complete / abandon / dead-letter settlement, a
+  dead-letter sub-queue and a max delivery count. It lets the webhook
+  pipeline run, and be load-tested, without Azure.
+
+``get_servicebus_service()`` returns the Azure backend when the SDK is
+installed and ``AZURE_SERVICEBUS_CONNECTION`` is set, otherwise the local one.
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-from typing import Any
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Protocol
 
 from marketplace.config import settings
 
@@ -19,33 +35,88 @@ logger = logging.getLogger(__name__)
 # Graceful SDK import
 # ---------------------------------------------------------------------------
 try:
-    from azure.servicebus import ServiceBusClient, ServiceBusMessage
-    from azure.servicebus.exceptions import ServiceBusError
+    from azure.servicebus import ServiceBusMessage, ServiceBusSubQueue
+    from azure.servicebus.aio import ServiceBusClient
 
     _HAS_SERVICEBUS = True
 except ImportError:
     _HAS_SERVICEBUS = False
-    logger.warning(
-        "azure-servicebus is not installed — ServiceBusService will use stub implementation. "
-        "Install with: pip install azure-servicebus"
-    )
 
 
 # ---------------------------------------------------------------------------
-# ServiceBusService
+# Common message type and interface
 # ---------------------------------------------------------------------------
 
-class ServiceBusService:
-    """Azure Service Bus integration for the AgentChains marketplace.
 
-    Provides reliable queue-based messaging with dead-letter support.
-    Falls back to a no-op stub when the SDK or connection string is not available.
+@dataclass
+class QueueMessage:
+    """A received (locked) message. ``str(message)`` is its body."""
+
+    body: str
+    queue_name: str
+    message_id: str = ""
+    properties: dict[str, str] = field(default_factory=dict)
+    delivery_count: int = 0
+    lock_token: str = ""
+    dead_letter_reason: str | None = None
+    raw: Any = None  # the SDK message, for the Azure backend
+
+    def __str__(self) -> str:
+        return self.body
+
+
+class MessageQueue(Protocol):
+    """Interface shared by the Azure and local queue backends."""
+
+    async def send_message(
+        self, queue_name: str, message_body: str | dict, properties: dict[str, str] | None = None,
+    ) -> bool: ...
+
+    async def send_batch(self, queue_name: str, messages: list[str | dict]) -> int: ...
+
+    async def receive_messages(
+        self, queue_name: str, max_messages: int = 10, max_wait_time: float = 5,
+    ) -> list[QueueMessage]: ...
+
+    async def complete_message(self, message: QueueMessage) -> bool: ...
+
+    async def complete_messages(self, messages: list[QueueMessage]) -> int: ...
+
+    async def abandon_message(self, message: QueueMessage) -> bool: ...
+
+    async def dead_letter_message(self, message: QueueMessage, reason: str = "") -> bool: ...
+
+    async def peek_dead_letters(self, queue_name: str, max_count: int = 10) -> list[QueueMessage]: ...
+
+    async def close(self) -> None: ...
+
+
+def _encode(message_body: str | dict) -> str:
+    return json.dumps(message_body) if isinstance(message_body, dict) else message_body
+
+
+# ---------------------------------------------------------------------------
+# Azure Service Bus backend
+# ---------------------------------------------------------------------------
+
+
+class ServiceBusService:
+    """Azure Service Bus backend using the async SDK.
+
+    Senders and receivers are opened once per queue and reused; receivers
+    prefetch ``prefetch_count`` messages so a consumer loop does not pay a
+    round trip per receive. A receiver that fails is closed and dropped, and
+    the error is raised so the consumer backs off; the next receive opens a
+    fresh link. Without a client (no SDK or connection string) every
+    operation logs and reports failure.
     """
 
-    def __init__(self, connection_string: str = "") -> None:
+    def __init__(self, connection_string: str = "", prefetch_count: int = 20) -> None:
         self._connection_string = connection_string
+        self._prefetch_count = prefetch_count
         self._client: Any | None = None
         self._senders: dict[str, Any] = {}
+        self._receivers: dict[str, Any] = {}
 
         if _HAS_SERVICEBUS and self._connection_string:
             try:
@@ -57,11 +128,11 @@ class ServiceBusService:
             except Exception:
                 logger.exception("Failed to initialise Service Bus client.")
                 self._client = None
-        else:
-            if self._connection_string and not _HAS_SERVICEBUS:
-                logger.warning("Service Bus connection string provided but SDK not installed.")
-            elif not self._connection_string:
-                logger.info("Service Bus connection string not configured — stub mode.")
+        elif self._connection_string:
+            logger.warning(
+                "Service Bus connection string provided but azure-servicebus is not installed. "
+                "Install with: pip install azure-servicebus"
+            )
 
     # ----- helpers ----------------------------------------------------------
 
@@ -73,238 +144,466 @@ class ServiceBusService:
             self._senders[queue_name] = self._client.get_queue_sender(queue_name=queue_name)
         return self._senders[queue_name]
 
+    def _get_receiver(self, queue_name: str) -> Any | None:
+        """Return a cached peek-lock receiver for the given queue."""
+        if not self._client:
+            return None
+        if queue_name not in self._receivers:
+            self._receivers[queue_name] = self._client.get_queue_receiver(
+                queue_name=queue_name,
+                prefetch_count=self._prefetch_count,
+            )
+        return self._receivers[queue_name]
+
+    async def _drop_receiver(self, queue_name: str) -> None:
+        """Close and forget the cached receiver for ``queue_name``."""
+        receiver = self._receivers.pop(queue_name, None)
+        if receiver is None:
+            return
+        try:
+            await receiver.close()
+        except Exception:
+            logger.warning("Failed to close Service Bus receiver for '%s'", queue_name, exc_info=True)
+
+    @staticmethod
+    def _wrap(queue_name: str, message: Any) -> QueueMessage:
+        properties = {
+            (k.decode() if isinstance(k, bytes) else str(k)): (v.decode() if isinstance(v, bytes) else str(v))
+            for k, v in (message.application_properties or {}).items()
+        }
+        return QueueMessage(
+            body=str(message),
+            queue_name=queue_name,
+            message_id=str(message.message_id or ""),
+            properties=properties,
+            delivery_count=message.delivery_count or 0,
+            lock_token=str(message.lock_token or ""),
+            dead_letter_reason=getattr(message, "dead_letter_reason", None),
+            raw=message,
+        )
+
     # ----- sending ----------------------------------------------------------
 
-    def send_message(
+    async def send_message(
         self,
         queue_name: str,
         message_body: str | dict,
         properties: dict[str, str] | None = None,
     ) -> bool:
-        """Send a single message to a Service Bus queue.
-
-        Args:
-            queue_name: Target queue name.
-            message_body: Message body (str or dict serialised to JSON).
-            properties: Optional application properties to attach.
-
-        Returns:
-            True if message was sent, False on error or stub mode.
-        """
-        body = json.dumps(message_body) if isinstance(message_body, dict) else message_body
-
-        if not self._client:
-            logger.info(
-                "[ServiceBus Stub] queue=%s body=%s properties=%s",
-                queue_name,
-                body[:500],
-                properties,
-            )
+        """Send a single message. Returns True if it was accepted by the broker."""
+        sender = self._get_sender(queue_name)
+        if sender is None:
+            logger.warning("Service Bus not configured — dropping message for queue '%s'", queue_name)
             return False
-
         try:
-            sender = self._get_sender(queue_name)
-            msg = ServiceBusMessage(body)
+            msg = ServiceBusMessage(_encode(message_body))
             if properties:
-                msg.application_properties = {k: v for k, v in properties.items()}
-            sender.send_messages(msg)
-            logger.debug("Sent message to queue '%s'", queue_name)
+                msg.application_properties = dict(properties)
+            await sender.send_messages(msg)
             return True
         except Exception:
             logger.exception("Failed to send message to queue '%s'", queue_name)
             return False
 
-    def send_batch(
-        self,
-        queue_name: str,
-        messages: list[str | dict],
-    ) -> int:
-        """Send a batch of messages to a Service Bus queue.
-
-        Args:
-            queue_name: Target queue name.
-            messages: List of message bodies.
-
-        Returns:
-            Number of messages sent successfully.
-        """
-        if not self._client:
-            logger.info(
-                "[ServiceBus Stub] batch queue=%s count=%d",
-                queue_name,
-                len(messages),
-            )
+    async def send_batch(self, queue_name: str, messages: list[str | dict]) -> int:
+        """Send messages in as few size-limited batches as possible. Returns the count sent."""
+        sender = self._get_sender(queue_name)
+        if sender is None:
+            logger.warning("Service Bus not configured — dropping %d messages", len(messages))
             return 0
-
+        sent = 0
         try:
-            sender = self._get_sender(queue_name)
-            batch = sender.create_message_batch()
-            sent = 0
+            batch = await sender.create_message_batch()
+            pending = 0
             for msg_body in messages:
-                body = json.dumps(msg_body) if isinstance(msg_body, dict) else msg_body
+                msg = ServiceBusMessage(_encode(msg_body))
                 try:
-                    batch.add_message(ServiceBusMessage(body))
-                    sent += 1
+                    batch.add_message(msg)
                 except ValueError:
                     # Batch is full — send it and start a new one
-                    sender.send_messages(batch)
-                    batch = sender.create_message_batch()
-                    batch.add_message(ServiceBusMessage(body))
-                    sent += 1
-            # Send remaining messages
-            if sent > 0:
-                sender.send_messages(batch)
-            logger.debug("Sent batch of %d messages to queue '%s'", sent, queue_name)
+                    await sender.send_messages(batch)
+                    sent += pending
+                    batch = await sender.create_message_batch()
+                    batch.add_message(msg)
+                    pending = 0
+                pending += 1
+            if pending:
+                await sender.send_messages(batch)
+                sent += pending
             return sent
         except Exception:
             logger.exception("Failed to send batch to queue '%s'", queue_name)
-            return 0
+            return sent
 
     # ----- receiving --------------------------------------------------------
 
-    def receive_messages(
+    async def receive_messages(
         self,
         queue_name: str,
         max_messages: int = 10,
-        max_wait_time: int = 5,
-    ) -> list[Any]:
-        """Receive messages from a Service Bus queue.
-
-        Args:
-            queue_name: Source queue name.
-            max_messages: Maximum number of messages to receive.
-            max_wait_time: Maximum time in seconds to wait for messages.
+        max_wait_time: float = 5,
+    ) -> list[QueueMessage]:
+        """Receive up to ``max_messages`` locked messages, waiting at most ``max_wait_time``.
 
-        Returns:
-            List of received messages (ServiceBusReceivedMessage objects).
+        On failure the receiver is closed and dropped before the error is
+        re-raised, so the caller can back off and retry on a fresh link.
         """
         if not self._client:
-            logger.debug("receive_messages: no client — returning empty list.")
             return []
-
         try:
-            receiver = self._client.get_queue_receiver(
-                queue_name=queue_name,
+            receiver = self._get_receiver(queue_name)
+            messages = await receiver.receive_messages(
+                max_message_count=max_messages,
                 max_wait_time=max_wait_time,
             )
-            with receiver:
-                messages = receiver.receive_messages(
-                    max_message_count=max_messages,
-                    max_wait_time=max_wait_time,
-                )
-                return list(messages)
         except Exception:
             logger.exception("Failed to receive messages from queue '%s'", queue_name)
-            return []
+            await self._drop_receiver(queue_name)
+            raise
+        return [self._wrap(queue_name, m) for m in messages]
 
     # ----- message lifecycle ------------------------------------------------
 
-    def complete_message(self, message: Any) -> bool:
-        """Mark a message as completed (removes from queue).
-
-        Args:
-            message: The received message to complete.
-
-        Returns:
-            True if the message was completed successfully.
-        """
-        if not self._client:
+    async def _settle(self, action: str, message: QueueMessage, **kwargs: Any) -> bool:
+        receiver = self._receivers.get(message.queue_name)
+        if receiver is None or message.raw is None:
             return False
         try:
-            message.complete()
+            await getattr(receiver, action)(message.raw, **kwargs)
             return True
-        except AttributeError:
-            logger.warning("Message does not support .complete() — skipping.")
-            return False
         except Exception:
-            logger.exception("Failed to complete message.")
+            logger.exception("Failed to %s on queue '%s'", action.replace("_", " "), message.queue_name)
             return False
 
-    def dead_letter_message(self, message: Any, reason: str = "") -> bool:
-        """Send a message to the dead-letter queue.
-
-        Args:
-            message: The received message to dead-letter.
-            reason: Reason for dead-lettering.
+    async def complete_message(self, message: QueueMessage) -> bool:
+        """Remove a received message from the queue."""
+        return await self._settle("complete_message", message)
 
-        Returns:
-            True if the message was dead-lettered.
-        """
-        if not self._client:
-            return False
-        try:
-            message.dead_letter(reason=reason, error_description=reason)
-            return True
-        except AttributeError:
-            logger.warning("Message does not support .dead_letter() — skipping.")
-            return False
-        except Exception:
-            logger.exception("Failed to dead-letter message.")
-            return False
+    async def complete_messages(self, messages: list[QueueMessage]) -> int:
+        """Complete a batch of messages concurrently over the receiver link."""
+        results = await asyncio.gather(*(self.complete_message(m) for m in messages))
+        return sum(results)
 
-    def peek_dead_letters(
-        self,
-        queue_name: str,
-        max_count: int = 10,
-    ) -> list[Any]:
-        """Peek at messages in the dead-letter sub-queue.
+    async def abandon_message(self, message: QueueMessage) -> bool:
+        """Release the lock so the message is redelivered."""
+        return await self._settle("abandon_message", message)
 
-        Args:
-            queue_name: The parent queue name.
-            max_count: Maximum number of DLQ messages to peek.
+    async def dead_letter_message(self, message: QueueMessage, reason: str = "") -> bool:
+        """Move a message to the queue's dead-letter sub-queue."""
+        return await self._settle(
+            "dead_letter_message", message, reason=reason, error_description=reason,
+        )
 
-        Returns:
-            List of peeked dead-letter messages.
-        """
+    async def peek_dead_letters(self, queue_name: str, max_count: int = 10) -> list[QueueMessage]:
+        """Peek (without locking) at messages in the dead-letter sub-queue."""
         if not self._client:
-            logger.debug("peek_dead_letters: no client — returning empty list.")
             return []
-
-        dlq_name = f"{queue_name}/$deadletterqueue"
         try:
             receiver = self._client.get_queue_receiver(
-                queue_name=dlq_name,
-                max_wait_time=5,
+                queue_name=queue_name,
+                sub_queue=ServiceBusSubQueue.DEAD_LETTER,
             )
-            with receiver:
-                messages = receiver.peek_messages(max_message_count=max_count)
-                return list(messages)
+            async with receiver:
+                messages = await receiver.peek_messages(max_message_count=max_count)
+            return [self._wrap(queue_name, m) for m in messages]
         except Exception:
             logger.exception("Failed to peek DLQ for queue '%s'", queue_name)
             return []
 
     # ----- lifecycle --------------------------------------------------------
 
-    def close(self) -> None:
-        """Close the Service Bus client and all cached senders."""
-        for sender in self._senders.values():
+    async def close(self) -> None:
+        """Close all cached senders and receivers, then the client."""
+        for link in [*self._senders.values(), *self._receivers.values()]:
             try:
-                sender.close()
+                await link.close()
             except Exception:
-                logger.warning("Failed to close Service Bus sender", exc_info=True)
+                logger.warning("Failed to close Service Bus link", exc_info=True)
         self._senders.clear()
+        self._receivers.clear()
 
         if self._client:
             try:
-                self._client.close()
+                await self._client.close()
             except Exception:
                 logger.warning("Failed to close Service Bus client", exc_info=True)
             self._client = None
-        logger.info("Service Bus client closed.")
+
+
+# ---------------------------------------------------------------------------
+# Local backend
+# ---------------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    queue TEXT NOT NULL,
+    body TEXT NOT NULL,
+    properties TEXT NOT NULL DEFAULT '{}',
+    visible_at REAL NOT NULL,
+    delivery_count INTEGER NOT NULL DEFAULT 0,
+    lock_token TEXT,
+    dead_lettered INTEGER NOT NULL DEFAULT 0,
+    dead_letter_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_queue_messages_ready
+    ON queue_messages (queue, dead_lettered, visible_at, seq);
+"""
+
+
+class LocalQueueBackend:
+    """In-process queue with peek-lock semantics, stored in SQLite.
+
+    A received message is hidden for ``visibility_timeout`` seconds; if it is
+    not completed, abandoned or dead-lettered in time it becomes visible
+    again. A message delivered ``max_delivery_count`` times without being
+    completed is moved to the dead-letter sub-queue, as Service Bus does.
+    With a file ``path`` several processes can share the queue; receivers
+    then also poll for messages sent by other processes.
+    """
+
+    _POLL_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        path: str = "",
+        visibility_timeout: float = 30.0,
+        max_delivery_count: int = 10,
+    ) -> None:
+        self._path = path or ":memory:"
+        self._visibility_timeout = visibility_timeout
+        self._max_delivery_count = max_delivery_count
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._arrivals: dict[str, asyncio.Event] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            if self._path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    async def _run(self, fn, *args):
+        def _locked():
+            with self._lock:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    result = fn(conn, *args)
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+                return result
+
+        return await asyncio.to_thread(_locked)
+
+    def _arrival(self, queue_name: str) -> asyncio.Event:
+        event = self._arrivals.get(queue_name)
+        if event is None:
+            event = self._arrivals[queue_name] = asyncio.Event()
+        return event
+
+    # ----- sending ----------------------------------------------------------
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, queue_name: str, rows: list[tuple[str, str]]) -> int:
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO queue_messages (id, queue, body, properties, visible_at) VALUES (?, ?, ?, ?, ?)",
+            [(str(uuid.uuid4()), queue_name, body, properties, now) for body, properties in rows],
+        )
+        return len(rows)
+
+    async def send_message(
+        self,
+        queue_name: str,
+        message_body: str | dict,
+        properties: dict[str, str] | None = None,
+    ) -> bool:
+        await self._run(self._insert, queue_name, [(_encode(message_body), json.dumps(properties or {}))])
+        self._arrival(queue_name).set()
+        return True
+
+    async def send_batch(self, queue_name: str, messages: list[str | dict]) -> int:
+        if not messages:
+            return 0
+        sent = await self._run(self._insert, queue_name, [(_encode(m), "{}") for m in messages])
+        self._arrival(queue_name).set()
+        return sent
+
+    # ----- receiving --------------------------------------------------------
+
+    def _claim(self, conn: sqlite3.Connection, queue_name: str, max_messages: int) -> list[QueueMessage]:
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, body, properties, delivery_count FROM queue_messages "
+            "WHERE queue = ? AND dead_lettered = 0 AND visible_at <= ? ORDER BY seq LIMIT ?",
+            (queue_name, now, max_messages),
+        ).fetchall()
+        claimed: list[QueueMessage] = []
+        for message_id, body, properties, delivery_count in rows:
+            if delivery_count >= self._max_delivery_count:
+                conn.execute(
+                    "UPDATE queue_messages SET dead_lettered = 1, lock_token = NULL, "
+                    "dead_letter_reason = 'MaxDeliveryCountExceeded' WHERE id = ?",
+                    (message_id,),
+                )
+                continue
+            lock_token = str(uuid.uuid4())
+            conn.execute(
+                "UPDATE queue_messages SET visible_at = ?, delivery_count = delivery_count + 1, "
+                "lock_token = ? WHERE id = ?",
+                (now + self._visibility_timeout, lock_token, message_id),
+            )
+            claimed.append(QueueMessage(
+                body=body,
+                queue_name=queue_name,
+                message_id=message_id,
+                properties=json.loads(properties),
+                delivery_count=delivery_count + 1,
+                lock_token=lock_token,
+            ))
+        return claimed
+
+    async def receive_messages(
+        self,
+        queue_name: str,
+        max_messages: int = 10,
+        max_wait_time: float = 5,
+    ) -> list[QueueMessage]:
+        """Lock and return up to ``max_messages`` visible messages, long-polling if none are."""
+        deadline = time.monotonic() + max_wait_time
+        arrival = self._arrival(queue_name)
+        while True:
+            arrival.clear()
+            messages = await self._run(self._claim, queue_name, max_messages)
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return messages
+            try:
+                await asyncio.wait_for(arrival.wait(), timeout=min(remaining, self._POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+
+    # ----- message lifecycle ------------------------------------------------
+
+    @staticmethod
+    def _settle(conn: sqlite3.Connection, sql: str, params: list[tuple]) -> int:
+        return sum(conn.execute(sql, p).rowcount for p in params)
+
+    async def complete_message(self, message: QueueMessage) -> bool:
+        return await self.complete_messages([message]) == 1
+
+    async def complete_messages(self, messages: list[QueueMessage]) -> int:
+        """Delete messages whose lock is still held; returns how many were completed."""
+        if not messages:
+            return 0
+        return await self._run(
+            self._settle,
+            "DELETE FROM queue_messages WHERE id = ? AND lock_token = ?",
+            [(m.message_id, m.lock_token) for m in messages],
+        )
+
+    async def abandon_message(self, message: QueueMessage) -> bool:
+        released = await self._run(
+            self._settle,
+            "UPDATE queue_messages SET visible_at = ?, lock_token = NULL WHERE id = ? AND lock_token = ?",
+            [(time.time(), message.message_id, message.lock_token)],
+        )
+        if released:
+            self._arrival(message.queue_name).set()
+        return released == 1
+
+    async def dead_letter_message(self, message: QueueMessage, reason: str = "") -> bool:
+        return await self._run(
+            self._settle,
+            "UPDATE queue_messages SET dead_lettered = 1, dead_letter_reason = ?, lock_token = NULL "
+            "WHERE id = ? AND lock_token = ?",
+            [(reason, message.message_id, message.lock_token)],
+        ) == 1
+
+    async def peek_dead_letters(self, queue_name: str, max_count: int = 10) -> list[QueueMessage]:
+        def _peek(conn: sqlite3.Connection) -> list[QueueMessage]:
+            rows = conn.execute(
+                "SELECT id, body, properties, delivery_count, dead_letter_reason FROM queue_messages "
+                "WHERE queue = ? AND dead_lettered = 1 ORDER BY seq LIMIT ?",
+                (queue_name, max_count),
+            ).fetchall()
+            return [
+                QueueMessage(
+                    body=body,
+                    queue_name=queue_name,
+                    message_id=message_id,
+                    properties=json.loads(properties),
+                    delivery_count=delivery_count,
+                    dead_letter_reason=reason,
+                )
+                for message_id, body, properties, delivery_count, reason in rows
+            ]
+
+        return await self._run(_peek)
+
+    async def queue_depth(self, queue_name: str) -> dict[str, int]:
+        """Counts of visible, locked and dead-lettered messages (for monitoring and load tests)."""
+        def _depth(conn: sqlite3.Connection) -> dict[str, int]:
+            active, locked, dead = conn.execute(
+                "SELECT "
+                "COALESCE(SUM(dead_lettered = 0 AND visible_at <= ?), 0), "
+                "COALESCE(SUM(dead_lettered = 0 AND visible_at > ?), 0), "
+                "COALESCE(SUM(dead_lettered = 1), 0) "
+                "FROM queue_messages WHERE queue = ?",
+                (time.time(), time.time(), queue_name),
+            ).fetchone()
+            return {"active": active, "locked": locked, "dead_lettered": dead}
+
+        return await self._run(_depth)
+
+    # ----- lifecycle --------------------------------------------------------
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
 
 
 # ---------------------------------------------------------------------------
 # Singleton factory
 # ---------------------------------------------------------------------------
 
-_servicebus_service: ServiceBusService | None = None
+_servicebus_service: MessageQueue | None = None
 
 
-def get_servicebus_service() -> ServiceBusService:
-    """Return the singleton ServiceBusService, lazily initialised from settings."""
+def get_servicebus_service() -> MessageQueue:
+    """Return the singleton queue backend, lazily initialised from settings."""
     global _servicebus_service
     if _servicebus_service is None:
-        _servicebus_service = ServiceBusService(
-            connection_string=settings.azure_servicebus_connection,
-        )
+        if _HAS_SERVICEBUS and settings.azure_servicebus_connection:
+            _servicebus_service = ServiceBusService(
+                connection_string=settings.azure_servicebus_connection,
+                prefetch_count=settings.azure_servicebus_prefetch_count,
+            )
+        else:
+            if settings.azure_servicebus_connection:
+                logger.warning(
+                    "AZURE_SERVICEBUS_CONNECTION is set but azure-servicebus is not installed — "
+                    "using the local queue backend."
+                )
+            _servicebus_service = LocalQueueBackend(
+                path=settings.local_queue_path,
+                visibility_timeout=settings.local_queue_visibility_timeout_seconds,
+                max_delivery_count=settings.local_queue_max_delivery_count,
+            )
     return _servicebus_service
+
+
+async def close_servicebus_service() -> None:
+    """Close and forget the singleton backend (application shutdown)."""
+    global _servicebus_service
+    if _servicebus_service is not None:
+        await _servicebus_service.close()
+        _servicebus_service = None
@@ -10,6 +10,10 @@ Architecture (LangGraph path):
 
 Fallback path (no LangGraph or no LLM client):
     Uses keyword-based capability extraction from auto_chain_service.
+
+Plans (sub-tasks, assignments, DAG) are cached by normalized task
+description; a revalidated cached plan skips the three planning LLM calls
+and goes straight to execute_chain.
 """
 
 from __future__ import annotations
@@ -17,10 +21,15 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import time
 from typing import Any, TypedDict
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from marketplace.config import settings
+from marketplace.core.metrics import ORCHESTRATOR_PLANNING_SECONDS
+from marketplace.services.orchestrator_plan_cache import PlanCache, PlanTemplate
+from marketplace.services.orchestrator_plan_cache import plan_cache as default_plan_cache
 from marketplace.services.orchestrator_prompts import (
     BUILD_DAG_PROMPT,
     DECOMPOSE_TASK_PROMPT,
@@ -63,6 +72,7 @@ class OrchestratorState(TypedDict, total=False):
     final_result: str
     error: str
     retry_count: int
+    planning_started_at: float
 
 
 # ---------------------------------------------------------------------------
@@ -92,10 +102,12 @@ class SmartOrchestrator:
         db: AsyncSession,
         llm_client: Any = None,
         auto_approve: bool = True,
+        plan_cache: PlanCache | None = default_plan_cache,
     ) -> None:
         self.db = db
         self.llm_client = llm_client
         self.auto_approve = auto_approve
+        self.plan_cache = plan_cache
         self._graph = self._build_graph() if LANGGRAPH_AVAILABLE and llm_client else None
 
     # ------------------------------------------------------------------
@@ -172,7 +184,7 @@ class SmartOrchestrator:
 
         for attempt in range(max_retries + 1):
             try:
-                raw = await self._call_llm(prompt)
+                raw = await self._call_llm(prompt, refresh=attempt > 0)
                 data = _parse_json_response(raw)
                 sub_tasks: list[dict] = data.get("sub_tasks", [])
                 if not sub_tasks:
@@ -215,26 +227,17 @@ class SmartOrchestrator:
             return {"error": "match_agents: no sub_tasks to match", "assignments": []}
 
         # Discover candidate agents for each required capability
-        from marketplace.services.auto_chain_service import suggest_agents_for_capability
-
-        capabilities: set[str] = {t.get("required_capability", "") for t in sub_tasks}
+        capabilities = sorted({t.get("required_capability", "") for t in sub_tasks} - {""})
+        discovered = await self._discover_agents(capabilities, max_results=3)
         available_agents: list[dict] = []
         seen_ids: set[str] = set()
 
         for cap in capabilities:
-            if not cap:
-                continue
-            try:
-                agents = await suggest_agents_for_capability(
-                    self.db, cap, max_results=3
-                )
-                for agent in agents:
-                    if agent["agent_id"] not in seen_ids:
-                        agent["capability_match"] = cap
-                        available_agents.append(agent)
-                        seen_ids.add(agent["agent_id"])
-            except Exception as exc:
-                logger.warning("match_agents: agent discovery for '%s' failed: %s", cap, exc)
+            for agent in discovered.get(cap, []):
+                if agent["agent_id"] not in seen_ids:
+                    agent["capability_match"] = cap
+                    available_agents.append(agent)
+                    seen_ids.add(agent["agent_id"])
 
         max_retries: int = 2
         for attempt in range(max_retries + 1):
@@ -243,7 +246,7 @@ class SmartOrchestrator:
                     sub_tasks_json=json.dumps(sub_tasks, indent=2),
                     agents_json=json.dumps(available_agents, indent=2),
                 )
-                raw = await self._call_llm(prompt)
+                raw = await self._call_llm(prompt, refresh=attempt > 0)
                 data = _parse_json_response(raw)
                 assignments: list[dict] = data.get("assignments", [])
                 if not assignments:
@@ -295,7 +298,7 @@ class SmartOrchestrator:
                     assignments_json=json.dumps(assignments, indent=2),
                     sub_tasks_json=json.dumps(sub_tasks, indent=2),
                 )
-                raw = await self._call_llm(prompt)
+                raw = await self._call_llm(prompt, refresh=attempt > 0)
                 dag = _parse_json_response(raw)
 
                 # Validate DAG structure (detects cycles and missing nodes)
@@ -311,6 +314,7 @@ class SmartOrchestrator:
                     len(dag.get("nodes", {})),
                     attempt + 1,
                 )
+                await self._remember_plan(state, graph_json)
                 return {"graph_json": graph_json}
 
             except (ValueError, KeyError, json.JSONDecodeError) as exc:
@@ -428,6 +432,75 @@ class SmartOrchestrator:
                 "final_result": json.dumps(agent_outputs, indent=2, default=str)
             }
 
+    # ------------------------------------------------------------------
+    # Agent discovery and plan cache
+    # ------------------------------------------------------------------
+
+    async def _discover_agents(
+        self,
+        capabilities: list[str],
+        max_results: int,
+    ) -> dict[str, list[dict]]:
+        """Ranked candidate agents per capability.
+
+        Lookups run concurrently, each in its own session on the caller's
+        engine (bounded by ``orchestration_discovery_concurrency``). SQLite
+        serialises on a single connection, so there they run in turn on
+        ``self.db``. A failed lookup yields no candidates for that capability.
+        """
+        from marketplace.services import auto_chain_service
+
+        async def _lookup(db: AsyncSession, cap: str) -> list[dict]:
+            try:
+                return await auto_chain_service.suggest_agents_for_capability(
+                    db, cap, max_results=max_results
+                )
+            except Exception as exc:
+                logger.warning("agent discovery for capability '%s' failed: %s", cap, exc)
+                return []
+
+        bind = getattr(self.db, "bind", None)
+        if len(capabilities) < 2 or bind is None or bind.dialect.name == "sqlite":
+            return {cap: await _lookup(self.db, cap) for cap in capabilities}
+
+        session_factory = async_sessionmaker(bind, class_=AsyncSession, expire_on_commit=False)
+        limit = asyncio.Semaphore(max(1, settings.orchestration_discovery_concurrency))
+
+        async def _lookup_in_own_session(cap: str) -> list[dict]:
+            async with limit, session_factory() as db:
+                return await _lookup(db, cap)
+
+        results = await asyncio.gather(*(_lookup_in_own_session(cap) for cap in capabilities))
+        return dict(zip(capabilities, results))
+
+    async def _cached_plan(self, task_description: str) -> PlanTemplate | None:
+        if self.plan_cache is None:
+            return None
+        try:
+            return await self.plan_cache.get(
+                self.db,
+                task_description,
+                lambda capabilities: self._discover_agents(capabilities, max_results=1),
+            )
+        except Exception as exc:
+            logger.warning("plan cache lookup failed: %s", exc)
+            return None
+
+    async def _remember_plan(self, state: OrchestratorState, graph_json: str) -> None:
+        """Record planning latency and cache the validated plan."""
+        started = state.get("planning_started_at")
+        if started is not None:
+            ORCHESTRATOR_PLANNING_SECONDS.labels(source="llm").observe(time.perf_counter() - started)
+        if self.plan_cache is None or not state.get("task_description"):
+            return
+        try:
+            template = PlanTemplate.from_plan(
+                state.get("sub_tasks", []), state.get("assignments", []), graph_json,
+            )
+            await self.plan_cache.put(state["task_description"], template)
+        except Exception as exc:
+            logger.warning("plan cache store failed: %s", exc)
+
     # ------------------------------------------------------------------
     # Execution paths
     # ------------------------------------------------------------------
@@ -447,6 +520,14 @@ class SmartOrchestrator:
             Structured result dict with sub_tasks, assignments, graph_json,
             final_result, error, and method="langgraph".
         """
+        planning_started_at = time.perf_counter()
+        plan = await self._cached_plan(task_description)
+        if plan is not None:
+            ORCHESTRATOR_PLANNING_SECONDS.labels(source="cache").observe(
+                time.perf_counter() - planning_started_at
+            )
+            return await self._execute_cached_plan(task_description, plan)
+
         initial_state: OrchestratorState = {
             "task_description": task_description,
             "sub_tasks": [],
@@ -459,6 +540,7 @@ class SmartOrchestrator:
             "final_result": "",
             "error": "",
             "retry_count": 0,
+            "planning_started_at": planning_started_at,
         }
 
         try:
@@ -484,6 +566,37 @@ class SmartOrchestrator:
             "final_result": result.get("final_result", ""),
             "error": result.get("error", ""),
             "method": "langgraph",
+            "plan_cached": False,
+        }
+
+    async def _execute_cached_plan(
+        self,
+        task_description: str,
+        plan: PlanTemplate,
+    ) -> dict[str, Any]:
+        """Run a cached plan through the execute and synthesize nodes only."""
+        state: OrchestratorState = {
+            "task_description": task_description,
+            "sub_tasks": plan.sub_tasks,
+            "assignments": plan.assignments,
+            "graph_json": json.dumps(plan.dag),
+            "plan_approved": self.auto_approve,
+            "error": "",
+        }
+        state.update(await self._execute_chain(state))
+        if state.get("error") and self.plan_cache is not None:
+            self.plan_cache.invalidate(task_description)
+        state.update(await self._synthesize_result(state))
+        return {
+            "task_description": task_description,
+            "sub_tasks": state["sub_tasks"],
+            "assignments": state["assignments"],
+            "graph_json": state["graph_json"],
+            "chain_execution_id": state.get("chain_execution_id", ""),
+            "final_result": state.get("final_result", ""),
+            "error": state.get("error", ""),
+            "method": "langgraph",
+            "plan_cached": True,
         }
 
     async def _execute_with_fallback(
@@ -502,10 +615,7 @@ class SmartOrchestrator:
         Returns:
             Structured result dict with capabilities, assignments, and method="fallback".
         """
-        from marketplace.services.auto_chain_service import (
-            extract_capabilities,
-            suggest_agents_for_capability,
-        )
+        from marketplace.services.auto_chain_service import extract_capabilities
 
         capabilities = extract_capabilities(task_description)
         if not capabilities:
@@ -520,25 +630,19 @@ class SmartOrchestrator:
                 "method": "fallback",
             }
 
+        discovered = await self._discover_agents(capabilities, max_results=1)
         assignments: list[dict] = []
         for cap in capabilities:
-            try:
-                agents = await suggest_agents_for_capability(
-                    self.db, cap, max_results=1
-                )
-                if agents:
-                    assignments.append(
-                        {
-                            "capability": cap,
-                            "agent": agents[0],
-                        }
-                    )
-                else:
-                    logger.debug("fallback: no agents found for capability '%s'", cap)
-            except Exception as exc:
-                logger.warning(
-                    "fallback: agent lookup for capability '%s' failed: %s", cap, exc
+            agents = discovered.get(cap)
+            if agents:
+                assignments.append(
+                    {
+                        "capability": cap,
+                        "agent": agents[0],
+                    }
                 )
+            else:
+                logger.debug("fallback: no agents found for capability '%s'", cap)
 
         logger.info(
             "fallback: matched %d/%d capabilities to agents",
@@ -557,16 +661,20 @@ class SmartOrchestrator:
     # LLM client abstraction
     # ------------------------------------------------------------------
 
-    async def _call_llm(self, prompt: str) -> str:
+    async def _call_llm(self, prompt: str, *, refresh: bool = False) -> str:
         """Call the configured LLM client and return the response text.
 
         Supports:
+        - ``ModelRouter``, called at temperature 0 so repeated prompts hit its
+          completion cache.
         - OpenAI-compatible clients (``client.chat.completions.create``).
         - Async callables: ``async def f(prompt: str) -> str``.
         - Sync callables: ``def f(prompt: str) -> str``.
 
         Args:
             prompt: The full prompt string to send to the LLM.
+            refresh: Bypass the router's completion cache (used on retries,
+                so an unparseable cached answer is not served again).
 
         Returns:
             Raw text response from the model.
@@ -577,6 +685,18 @@ class SmartOrchestrator:
         if self.llm_client is None:
             raise ValueError("No LLM client configured")
 
+        from marketplace.model_layer.router import ModelRouter
+        from marketplace.model_layer.types import CompletionRequest
+
+        # ModelRouter
+        if isinstance(self.llm_client, ModelRouter):
+            response = await self.llm_client.complete(CompletionRequest(
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0,
+                cache=False if refresh else None,
+            ))
+            return response.content
+
         # OpenAI-style client
         if hasattr(self.llm_client, "chat") and hasattr(
             self.llm_client.chat, "completions"
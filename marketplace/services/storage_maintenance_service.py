@@ -0,0 +1,246 @@
+"""Content storage maintenance: garbage collection, scrubbing and stats.
+
+Works with any backend that offers ``inventory()``, ``stats()``,
+``quarantine()``, ``collect_chunks()``, ``delete()`` and ``delete_stale()`` — HashFS and
+AzureBlobStore both do.
+
+GC is mark-and-sweep: every content hash still referenced by the database
+is marked, then blobs outside that set are deleted, and after them the
+chunks that only deleted content used. Blobs and chunks stored within the
+grace period are kept, as an upload is written before the row that will
+reference it is committed. The scrubber re-hashes blobs in hash order at a
+bounded read rate, quarantining any whose content no longer matches.
+
+Only one process maintains a store: workers sharing a HashFS root elect one
+through a lock file, replicas sharing an Azure container through a Redis
+lease (without Redis every replica runs it).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.config import settings
+from marketplace.core.metrics import (
+    CONTENT_GC_SWEPT,
+    CONTENT_SCRUB_BYTES,
+    CONTENT_SCRUB_FAILURES,
+    CONTENT_STORE_BYTES,
+    CONTENT_STORE_OBJECTS,
+)
+from marketplace.models.compliance_job import ComplianceJob
+from marketplace.models.listing import DataListing
+from marketplace.services.cache_service import get_shared_redis
+from marketplace.services.storage_service import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Columns holding content hashes whose blobs must be kept
+_REFERENCES = (DataListing.content_hash, ComplianceJob.artifact_hash)
+
+_MARK_BATCH = 5000
+_LEADER_KEY = "storage:maintenance:leader"
+_INSTANCE_ID = uuid.uuid4().hex
+_MAX_REPORTED = 100
+
+
+def _digest(content_hash: str | None) -> bytes | None:
+    hex_hash = (content_hash or "").removeprefix("sha256:").lower()
+    try:
+        digest = bytes.fromhex(hex_hash)
+    except ValueError:
+        return None
+    return digest if len(digest) == 32 else None
+
+
+async def _mark(db: AsyncSession) -> set[bytes]:
+    """Digests of every blob the database still references."""
+    live: set[bytes] = set()
+    for column in _REFERENCES:
+        result = await db.stream(
+            select(column).where(column.is_not(None)).distinct()
+            .execution_options(yield_per=_MARK_BATCH)
+        )
+        async for partition in result.partitions():
+            live.update(d for (value,) in partition if (d := _digest(value)) is not None)
+    return live
+
+
+async def collect_garbage(
+    db: AsyncSession,
+    storage=None,
+    *,
+    grace_hours: float | None = None,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    """Delete blobs that nothing references and that are past the grace period."""
+    storage = storage or get_storage()
+    grace = settings.content_gc_grace_hours if grace_hours is None else grace_hours
+    cutoff = time.time() - grace * 3600
+    live = await _mark(db)
+
+    def _sweep() -> dict[str, Any]:
+        scanned = swept = freed = 0
+        for blob in storage.inventory():
+            scanned += 1
+            if blob.stored_at > cutoff or bytes.fromhex(blob.hex_hash) in live:
+                continue
+            # Conditional: a put since the inventory read renews the blob
+            if dry_run or storage.delete_stale(blob.content_hash, cutoff):
+                swept += 1
+                freed += blob.size
+        chunks_swept = chunk_bytes = 0
+        if not dry_run:
+            chunks_swept, chunk_bytes = storage.collect_chunks(cutoff)
+        return {
+            "scanned": scanned, "swept": swept, "bytes_freed": freed,
+            "chunks_swept": chunks_swept, "chunk_bytes_freed": chunk_bytes,
+        }
+
+    report = await asyncio.to_thread(_sweep)
+    report.update(live=len(live), dry_run=dry_run)
+    if not dry_run:
+        CONTENT_GC_SWEPT.inc(report["swept"])
+        if report["swept"]:
+            logger.info(
+                "Storage GC swept %d of %d blobs (%d bytes)",
+                report["swept"], report["scanned"], report["bytes_freed"],
+            )
+    return report
+
+
+def scrub(
+    storage=None,
+    *,
+    after: str | None = None,
+    max_objects: int | None = None,
+    bytes_per_second: int | None = None,
+) -> dict[str, Any]:
+    """Re-hash up to ``max_objects`` blobs that sort after ``after``.
+
+    Blocking; run it in a thread. Damaged blobs are quarantined, and
+    inventory entries whose blob has vanished are dropped. The returned
+    ``cursor`` is where the next pass should start, or None once the whole
+    store has been covered.
+    """
+    storage = storage or get_storage()
+    limit = max_objects or settings.content_scrub_batch_objects
+    rate = settings.content_scrub_bytes_per_second if bytes_per_second is None else bytes_per_second
+    checked = read = 0
+    corrupt: list[str] = []
+    missing: list[str] = []
+    cursor = after
+    started = time.monotonic()
+
+    for blob in storage.inventory(after):
+        if checked >= limit:
+            break
+        checked += 1
+        cursor = blob.hex_hash
+        chunks = storage.get_stream(blob.content_hash)
+        if chunks is None:
+            storage.delete(blob.content_hash)
+            missing.append(blob.content_hash)
+            continue
+        digest = hashlib.sha256()
+        try:
+            for chunk in chunks:
+                digest.update(chunk)
+                read += len(chunk)
+                if rate > 0:
+                    ahead = read / rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (OSError, ValueError):  # a chunk is missing or undecodable
+            digest = None
+        except Exception:
+            # Not evidence of corruption (e.g. zstandard not installed here):
+            # leave the blob alone and move on so the cursor still advances.
+            logger.exception("Scrub: could not read %s; skipped", blob.content_hash)
+            continue
+        if digest is None or digest.hexdigest() != blob.hex_hash:
+            storage.quarantine(blob.content_hash)
+            corrupt.append(blob.content_hash)
+    else:
+        cursor = None
+
+    CONTENT_SCRUB_BYTES.inc(read)
+    CONTENT_SCRUB_FAILURES.labels(reason="corrupt").inc(len(corrupt))
+    CONTENT_SCRUB_FAILURES.labels(reason="missing").inc(len(missing))
+    for content_hash in corrupt:
+        logger.error("Scrub: %s does not match its hash; quarantined", content_hash)
+    return {
+        "checked": checked,
+        "bytes": read,
+        "corrupt": corrupt[:_MAX_REPORTED],
+        "missing": missing[:_MAX_REPORTED],
+        "cursor": cursor,
+    }
+
+
+def storage_stats(storage=None) -> dict[str, Any]:
+    """Object and byte counts of the content store; cheap to call."""
+    stats = (storage or get_storage()).stats()
+    CONTENT_STORE_OBJECTS.set(stats["objects"])
+    CONTENT_STORE_BYTES.set(stats["bytes"])
+    return stats
+
+
+async def is_maintenance_leader(storage=None) -> bool:
+    """Whether this process should maintain the store this cycle.
+
+    The Redis lease outlives a few cycles, so a crashed leader's replicas
+    take over after at most three intervals.
+    """
+    from marketplace.storage.hashfs import HashFS
+
+    storage = storage or get_storage()
+    if isinstance(storage, HashFS):
+        return await asyncio.to_thread(storage.try_lock_maintenance)
+    redis = await get_shared_redis()
+    if redis is None:
+        return True
+    lease_ms = int((settings.content_scrub_interval_seconds or 600) * 3 * 1000)
+    try:
+        if await redis.set(_LEADER_KEY, _INSTANCE_ID, nx=True, px=lease_ms):
+            return True
+        if await redis.get(_LEADER_KEY) != _INSTANCE_ID.encode():
+            return False
+        await redis.set(_LEADER_KEY, _INSTANCE_ID, px=lease_ms)  # renew
+        return True
+    except Exception:
+        logger.warning("Storage maintenance lease unavailable; skipping this cycle")
+        return False
+
+
+async def storage_maintenance_loop() -> None:
+    """Background task: scrub continuously and collect garbage periodically.
+
+    Runs in every worker; only the elected leader does the work.
+    """
+    from marketplace.database import async_session
+
+    cursor: str | None = None
+    next_gc = time.monotonic() + 600  # first GC well after startup
+    while True:
+        await asyncio.sleep(settings.content_scrub_interval_seconds or 600)
+        try:
+            if not await is_maintenance_leader():
+                continue
+            if settings.content_scrub_interval_seconds > 0:
+                cursor = (await asyncio.to_thread(scrub, after=cursor))["cursor"]
+            if settings.content_gc_interval_hours > 0 and time.monotonic() >= next_gc:
+                async with async_session() as db:
+                    await collect_garbage(db)
+                next_gc = time.monotonic() + settings.content_gc_interval_hours * 3600
+            await asyncio.to_thread(storage_stats)
+        except Exception:
+            logger.exception("Storage maintenance failed; will retry")
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+
 from marketplace.config import settings
 
 # Singleton storage instance
@@ -26,3 +28,20 @@ def get_storage():
 
             _storage = HashFS(root_dir=settings.content_store_path)
     return _storage
+
+
+async def open_storage():
+    """Create the storage instance and index a pre-inventory HashFS root.
+
+    Called at application startup; the tree walk runs on a worker thread so
+    it never blocks the event loop.
+    """
+    storage = get_storage()
+    await asyncio.to_thread(storage.ensure_indexed)
+    return storage
+
+
+def close_storage() -> None:
+    """Stop the storage I/O pool; called at application shutdown."""
+    if _storage is not None:
+        _storage.shutdown_io()
@@ -14,6 +14,8 @@ from marketplace.core.exceptions import (
 )
 from marketplace.models.listing import DataListing
 from marketplace.models.transaction import Transaction
+from marketplace.services import abuse_detection_service
+from marketplace.services.fraud_graph import fraud_graph
 from marketplace.services.listing_service import get_listing
 from marketplace.services.payment_service import payment_service
 from marketplace.services.storage_service import get_storage
@@ -45,6 +47,7 @@ async def initiate_transaction(
     db.add(tx)
     await db.commit()
     await db.refresh(tx)
+    abuse_detection_service.observe_transaction(tx)
 
     payment_details = payment_service.build_payment_requirements(
         amount_usdc=float(listing.price_usdc),
@@ -184,6 +187,8 @@ async def verify_delivery(db: AsyncSession, tx_id: str, buyer_id: str) -> Transa
 
     await db.commit()
     await db.refresh(tx)
+    if matches:
+        fraud_graph.record_trade(tx.buyer_id, tx.seller_id)
 
     _broadcast("transaction_completed" if matches else "transaction_disputed", {
         "transaction_id": tx.id,
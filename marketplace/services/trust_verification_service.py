@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import hashlib
 import json
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
@@ -92,32 +93,68 @@ def _compute_trust_status(stage_map: dict[str, bool]) -> tuple[str, int]:
     return TRUST_STATUS_FAILED, score
 
 
-async def _latest_receipt(db: AsyncSession, listing_id: str) -> SourceReceipt | None:
+async def _latest_manifest(db: AsyncSession, listing_id: str) -> ArtifactManifest | None:
     result = await db.execute(
-        select(SourceReceipt)
-        .where(SourceReceipt.listing_id == listing_id)
-        .order_by(SourceReceipt.created_at.desc())
+        select(ArtifactManifest)
+        .where(ArtifactManifest.listing_id == listing_id)
+        .order_by(ArtifactManifest.created_at.desc())
         .limit(1)
     )
     return result.scalar_one_or_none()
 
 
-async def _latest_manifest(db: AsyncSession, listing_id: str) -> ArtifactManifest | None:
-    result = await db.execute(
-        select(ArtifactManifest)
+async def latest_trust_artifacts(
+    db: AsyncSession, listing_id: str
+) -> tuple[SourceReceipt | None, ArtifactManifest | None]:
+    """Fetch the latest receipt and manifest for a listing in one round trip."""
+    receipt_id = (
+        select(SourceReceipt.id)
+        .where(SourceReceipt.listing_id == listing_id)
+        .order_by(SourceReceipt.created_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    manifest_id = (
+        select(ArtifactManifest.id)
         .where(ArtifactManifest.listing_id == listing_id)
         .order_by(ArtifactManifest.created_at.desc())
         .limit(1)
+        .scalar_subquery()
     )
-    return result.scalar_one_or_none()
+    result = await db.execute(
+        select(SourceReceipt, ArtifactManifest)
+        .select_from(DataListing)
+        .outerjoin(SourceReceipt, SourceReceipt.id == receipt_id)
+        .outerjoin(ArtifactManifest, ArtifactManifest.id == manifest_id)
+        .where(DataListing.id == listing_id)
+    )
+    row = result.first()
+    if row is None:
+        return None, None
+    return row[0], row[1]
+
+
+def load_listing_metadata(listing: DataListing) -> dict[str, Any]:
+    return _safe_json_load(getattr(listing, "metadata_json", "{}"), {})
+
+
+async def read_listing_content(listing: DataListing) -> bytes:
+    """Read listing content from storage without blocking the event loop."""
+    storage = get_storage()
+    return await storage.aget(listing.content_hash) or b""
 
 
 async def bootstrap_listing_trust_artifacts(
     db: AsyncSession,
     listing: DataListing,
     metadata: dict[str, Any],
-) -> None:
-    """Create baseline provenance and manifest rows when listing is first published."""
+) -> tuple[SourceReceipt, ArtifactManifest]:
+    """Create baseline provenance and manifest rows when listing is first published.
+
+    Rows are flushed, not committed, so callers can fold them into the same
+    transaction as the verification result. The new rows are returned so the
+    verification stages don't have to query them back.
+    """
     manifest = ArtifactManifest(
         listing_id=listing.id,
         canonical_hash=listing.content_hash,
@@ -151,34 +188,17 @@ async def bootstrap_listing_trust_artifacts(
     )
     db.add(receipt)
     await db.flush()
+    return receipt, manifest
 
 
-async def run_strict_verification(
-    db: AsyncSession,
+def evaluate_trust_stages(
     listing: DataListing,
-    *,
-    requested_by: str | None = None,
-    trigger_source: str = "manual",
-) -> dict[str, Any]:
-    """Run strict verification checks and persist result + listing trust state."""
-    metadata = _safe_json_load(getattr(listing, "metadata_json", "{}"), {})
-    storage = get_storage()
-    raw = storage.get(listing.content_hash) or b""
-    content_text = raw.decode("utf-8", errors="ignore")
-
-    job = VerificationJob(
-        listing_id=listing.id,
-        status="running",
-        trigger_source=trigger_source,
-        requested_by=requested_by,
-        started_at=_utcnow(),
-    )
-    db.add(job)
-    await db.flush()
-
-    receipt = await _latest_receipt(db, listing.id)
-    manifest = await _latest_manifest(db, listing.id)
-
+    metadata: dict[str, Any],
+    content_text: str,
+    receipt: SourceReceipt | None,
+    manifest: ArtifactManifest | None,
+) -> dict[str, bool]:
+    """Evaluate the five strict stages. Pure CPU work — safe to run in a thread."""
     provenance_passed = bool(
         receipt
         and receipt.provider in _ALLOWED_SOURCE_PROVIDERS
@@ -196,7 +216,7 @@ async def run_strict_verification(
 
     safety_passed = not _contains_injection_risk(content_text, metadata)
 
-    expected_repro_hash = str(metadata.get("reproducibility_hash") or metadata.get("source_response_hash") or "")
+    expected_repro_hash = _expected_reproducibility_hash(metadata)
     reproducibility_passed = bool(
         expected_repro_hash
         and expected_repro_hash.startswith("sha256:")
@@ -209,14 +229,35 @@ async def run_strict_verification(
     metadata_required = all(key in metadata for key in ("source_provider", "source_query"))
     policy_passed = provider_ok and metadata_required and _utcnow() <= freshness_deadline
 
-    stages = {
+    return {
         "provenance": provenance_passed,
         "integrity": integrity_passed,
         "safety": safety_passed,
         "reproducibility": reproducibility_passed,
         "policy": policy_passed,
     }
+
+
+def _expected_reproducibility_hash(metadata: dict[str, Any]) -> str:
+    return str(metadata.get("reproducibility_hash") or metadata.get("source_response_hash") or "")
+
+
+def record_verification(
+    db: AsyncSession,
+    listing: DataListing,
+    job: VerificationJob,
+    stages: dict[str, bool],
+    *,
+    metadata: dict[str, Any],
+    receipt: SourceReceipt | None,
+    manifest: ArtifactManifest | None,
+) -> dict[str, Any]:
+    """Stage the result row and listing/job trust state on the session.
+
+    Nothing is flushed or committed here; the caller owns the transaction.
+    """
     trust_status, trust_score = _compute_trust_status(stages)
+    expected_repro_hash = _expected_reproducibility_hash(metadata)
 
     evidence = {
         "stages": stages,
@@ -229,38 +270,37 @@ async def run_strict_verification(
         "reproducibility_expected_hash": expected_repro_hash or None,
     }
 
-    result = VerificationResult(
-        job_id=job.id,
-        listing_id=listing.id,
-        passed=(trust_status == TRUST_STATUS_VERIFIED),
-        trust_score=trust_score,
-        provenance_passed=provenance_passed,
-        integrity_passed=integrity_passed,
-        safety_passed=safety_passed,
-        reproducibility_passed=reproducibility_passed,
-        policy_passed=policy_passed,
-        evidence_json=json.dumps(evidence),
+    db.add(
+        VerificationResult(
+            job_id=job.id,
+            listing_id=listing.id,
+            passed=(trust_status == TRUST_STATUS_VERIFIED),
+            trust_score=trust_score,
+            provenance_passed=stages["provenance"],
+            integrity_passed=stages["integrity"],
+            safety_passed=stages["safety"],
+            reproducibility_passed=stages["reproducibility"],
+            policy_passed=stages["policy"],
+            evidence_json=json.dumps(evidence),
+        )
     )
-    db.add(result)
 
+    verification_summary = {
+        "status": trust_status,
+        "score": trust_score,
+        "stages": stages,
+        "job_id": job.id,
+    }
+    provenance = {
+        "source": receipt.provider if receipt else None,
+        "fetched_at": _as_utc(receipt.fetched_at).isoformat() if receipt else None,
+        "receipt_id": receipt.id if receipt else None,
+        "reproducibility_state": "passed" if stages["reproducibility"] else "failed",
+    }
     listing.trust_status = trust_status
     listing.trust_score = trust_score
-    listing.verification_summary_json = json.dumps(
-        {
-            "status": trust_status,
-            "score": trust_score,
-            "stages": stages,
-            "job_id": job.id,
-        }
-    )
-    listing.provenance_json = json.dumps(
-        {
-            "source": receipt.provider if receipt else None,
-            "fetched_at": _as_utc(receipt.fetched_at).isoformat() if receipt else None,
-            "receipt_id": receipt.id if receipt else None,
-            "reproducibility_state": "passed" if reproducibility_passed else "failed",
-        }
-    )
+    listing.verification_summary_json = json.dumps(verification_summary)
+    listing.provenance_json = json.dumps(provenance)
     listing.verification_updated_at = _utcnow()
 
     job.status = "completed" if trust_status == TRUST_STATUS_VERIFIED else "failed"
@@ -268,20 +308,67 @@ async def run_strict_verification(
     job.failure_reason = None if trust_status == TRUST_STATUS_VERIFIED else "One or more strict checks failed"
     job.completed_at = _utcnow()
 
-    await db.commit()
-    await db.refresh(listing)
-    await db.refresh(job)
-
     return {
         "listing_id": listing.id,
         "trust_status": trust_status,
         "trust_score": trust_score,
-        "verification_summary": _safe_json_load(listing.verification_summary_json, {}),
-        "provenance": _safe_json_load(listing.provenance_json, {}),
+        "verification_summary": verification_summary,
+        "provenance": provenance,
         "job_id": job.id,
     }
 
 
+def start_verification_job(
+    db: AsyncSession,
+    listing: DataListing,
+    *,
+    requested_by: str | None,
+    trigger_source: str,
+) -> VerificationJob:
+    job = VerificationJob(
+        id=str(uuid.uuid4()),
+        listing_id=listing.id,
+        status="running",
+        trigger_source=trigger_source,
+        requested_by=requested_by,
+        started_at=_utcnow(),
+    )
+    db.add(job)
+    return job
+
+
+async def run_strict_verification(
+    db: AsyncSession,
+    listing: DataListing,
+    *,
+    requested_by: str | None = None,
+    trigger_source: str = "manual",
+    content: bytes | None = None,
+) -> dict[str, Any]:
+    """Run strict verification checks and persist result + listing trust state.
+
+    ``content`` may be passed by callers that already hold the listing bytes;
+    otherwise it is read from storage off the event loop. All rows are written
+    in a single commit.
+    """
+    metadata = load_listing_metadata(listing)
+    if content is None:
+        content = await read_listing_content(listing)
+    content_text = content.decode("utf-8", errors="ignore")
+
+    receipt, manifest = await latest_trust_artifacts(db, listing.id)
+    job = start_verification_job(
+        db, listing, requested_by=requested_by, trigger_source=trigger_source
+    )
+    stages = evaluate_trust_stages(listing, metadata, content_text, receipt, manifest)
+    payload = record_verification(
+        db, listing, job, stages, metadata=metadata, receipt=receipt, manifest=manifest
+    )
+
+    await db.commit()
+    return payload
+
+
 async def run_strict_verification_by_listing_id(
     db: AsyncSession,
     listing_id: str,
@@ -0,0 +1,292 @@
+"""Usage metering: in-process counters flushed to per-period totals.
+
+``record`` only bumps an in-memory counter keyed by (agent, metric, period).
+``flush_usage`` drains the buffer in one transaction: one upsert per key into
+``usage_counters`` (the running total) plus one coalesced ``UsageMeter`` row
+per key for history. Limit checks read the running total, which is the
+persisted counter plus whatever is still buffered, so their cost does not
+depend on how many data points were recorded this period.
+
+Counters created after usage was already metered are seeded from the
+``UsageMeter`` history by ``backfill_counters`` at startup, so a deploy does
+not reset anyone's quota.
+
+Running totals are cached per process (at most
+``settings.usage_counter_cache_size`` keys, least recently used first out)
+and re-read after ``settings.usage_counter_ttl_seconds`` to pick up usage
+flushed by other workers. Counter reads wait for an in-progress flush, so a
+total never counts a delta both in the database and in the buffer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.config import settings
+from marketplace.database import upsert_insert
+from marketplace.models.billing import UsageCounter, UsageMeter
+
+logger = logging.getLogger(__name__)
+
+UsageKey = tuple[str, str, datetime]  # (agent_id, metric_name, period_start)
+
+
+def period_end_for(period_start: datetime) -> datetime:
+    """End of the monthly billing period starting at ``period_start``."""
+    next_month = (period_start.month % 12) + 1
+    year = period_start.year + (1 if next_month == 1 else 0)
+    return period_start.replace(year=year, month=next_month)
+
+
+class UsageBuffer:
+    """Pending usage deltas and cached running totals for this process.
+
+    Single-threaded (event loop) access only. Deltas drained for a flush stay
+    visible as ``in_flight`` until the flush commits or is restored. At most
+    ``max_totals`` running totals are kept; expired ones are dropped on read.
+    """
+
+    def __init__(self, max_totals: int = 10_000) -> None:
+        self._pending: dict[UsageKey, float] = {}
+        self._in_flight: dict[UsageKey, float] = {}
+        # key -> (total, loaded_at), least recently used first
+        self._totals: OrderedDict[UsageKey, tuple[float, float]] = OrderedDict()
+        self._max_totals = max_totals
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, key: UsageKey, value: float) -> None:
+        self._pending[key] = self._pending.get(key, 0.0) + value
+        cached = self._totals.get(key)
+        if cached is not None:
+            self._totals[key] = (cached[0] + value, cached[1])
+
+    def unflushed(self, key: UsageKey) -> float:
+        return self._pending.get(key, 0.0) + self._in_flight.get(key, 0.0)
+
+    def cached_total(self, key: UsageKey, ttl: float) -> float | None:
+        cached = self._totals.get(key)
+        if cached is None:
+            return None
+        if time.monotonic() - cached[1] > ttl:
+            del self._totals[key]
+            return None
+        self._totals.move_to_end(key)
+        return cached[0]
+
+    def store_total(self, key: UsageKey, total: float) -> None:
+        self._totals[key] = (total, time.monotonic())
+        self._totals.move_to_end(key)
+        while len(self._totals) > self._max_totals:
+            self._totals.popitem(last=False)
+
+    def drain(self) -> dict[UsageKey, float]:
+        drained = self._pending
+        self._pending = {}
+        for key, value in drained.items():
+            self._in_flight[key] = self._in_flight.get(key, 0.0) + value
+        return drained
+
+    def settle(self, drained: dict[UsageKey, float]) -> None:
+        """Drop committed deltas from ``in_flight``."""
+        for key, value in drained.items():
+            remaining = self._in_flight.get(key, 0.0) - value
+            if abs(remaining) < 1e-9:
+                self._in_flight.pop(key, None)
+            else:
+                self._in_flight[key] = remaining
+
+    def restore(self, drained: dict[UsageKey, float]) -> None:
+        """Put deltas from a failed flush back into the pending buffer."""
+        self.settle(drained)
+        for key, value in drained.items():
+            self._pending[key] = self._pending.get(key, 0.0) + value
+
+    def pending_for(self, agent_id: str, period_start: datetime) -> dict[str, float]:
+        usage: dict[str, float] = {}
+        for source in (self._pending, self._in_flight):
+            for (aid, metric, start), value in source.items():
+                if aid == agent_id and start == period_start:
+                    usage[metric] = usage.get(metric, 0.0) + value
+        return usage
+
+    def clear(self) -> None:
+        self._pending.clear()
+        self._in_flight.clear()
+        self._totals.clear()
+
+
+usage_buffer = UsageBuffer(max_totals=settings.usage_counter_cache_size)
+_flush_lock = asyncio.Lock()
+
+
+def record(agent_id: str, metric_name: str, value: float, period_start: datetime) -> None:
+    """Buffer one usage data point; persisted by the next ``flush_usage``."""
+    usage_buffer.add((agent_id, metric_name, period_start), float(value))
+
+
+async def flush_usage(db: AsyncSession | None = None) -> int:
+    """Write buffered usage in one transaction. Returns the number of keys flushed.
+
+    The write always runs in a session of its own, so the caller's
+    transaction is neither committed nor left failed; ``db`` only picks the
+    engine (defaults to the application's). On failure that session is
+    rolled back and the deltas go back into the buffer for the next attempt.
+    """
+    async with _flush_lock:
+        drained = usage_buffer.drain()
+        if not drained:
+            return 0
+        try:
+            if db is None:
+                from marketplace.database import async_session
+
+                own_db = async_session()
+            else:
+                own_db = AsyncSession(bind=db.bind, expire_on_commit=False)
+            async with own_db:
+                await _write_usage(own_db, drained)
+        except Exception:
+            usage_buffer.restore(drained)
+            raise
+        usage_buffer.settle(drained)
+        return len(drained)
+
+
+async def _write_usage(db: AsyncSession, drained: dict[UsageKey, float]) -> None:
+    await db.execute(insert(UsageMeter), [
+        {
+            "agent_id": agent_id,
+            "metric_name": metric,
+            "value": Decimal(str(value)),
+            "period_start": period_start,
+            "period_end": period_end_for(period_start),
+        }
+        for (agent_id, metric, period_start), value in drained.items()
+    ])
+    await _upsert_counters(db, drained)
+    await db.commit()
+
+
+async def _upsert_counters(db: AsyncSession, drained: dict[UsageKey, float]) -> None:
+    """Add deltas to ``usage_counters`` with one ON CONFLICT upsert."""
+    stmt = upsert_insert(db, UsageCounter)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["agent_id", "metric_name", "period_start"],
+        set_={
+            "value": UsageCounter.value + stmt.excluded.value,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await db.execute(stmt, [
+        {
+            "agent_id": agent_id,
+            "metric_name": metric,
+            "period_start": period_start,
+            "value": Decimal(str(value)),
+        }
+        for (agent_id, metric, period_start), value in drained.items()
+    ])
+
+
+async def backfill_counters(db: AsyncSession) -> int:
+    """Seed missing ``usage_counters`` rows from ``UsageMeter`` history.
+
+    Sums the metered values per (agent, metric, period) for every key that
+    has history but no counter yet. Keys that already have a counter are left
+    alone, so this is safe to run on every startup. Returns the number of
+    counters created.
+    """
+    has_counter = select(UsageCounter.id).where(
+        UsageCounter.agent_id == UsageMeter.agent_id,
+        UsageCounter.metric_name == UsageMeter.metric_name,
+        UsageCounter.period_start == UsageMeter.period_start,
+    ).exists()
+    result = await db.execute(
+        select(
+            UsageMeter.agent_id,
+            UsageMeter.metric_name,
+            UsageMeter.period_start,
+            func.sum(UsageMeter.value),
+        )
+        .where(UsageMeter.period_start.is_not(None), ~has_counter)
+        .group_by(UsageMeter.agent_id, UsageMeter.metric_name, UsageMeter.period_start)
+    )
+    rows = [
+        {
+            "agent_id": agent_id,
+            "metric_name": metric,
+            "period_start": period_start,
+            "value": Decimal(str(total or 0)),
+        }
+        for agent_id, metric, period_start, total in result.all()
+    ]
+    if rows:
+        stmt = upsert_insert(db, UsageCounter).on_conflict_do_nothing(
+            index_elements=["agent_id", "metric_name", "period_start"],
+        )
+        await db.execute(stmt, rows)
+    await db.commit()
+    if rows:
+        logger.info("Backfilled %d usage counters from metered history", len(rows))
+    return len(rows)
+
+
+async def current_usage(
+    db: AsyncSession, agent_id: str, metric_name: str, period_start: datetime,
+) -> float:
+    """Running total for one metric: persisted counter plus unflushed deltas."""
+    key = (agent_id, metric_name, period_start)
+    total = usage_buffer.cached_total(key, settings.usage_counter_ttl_seconds)
+    if total is not None:
+        return total
+    # Holding the flush lock keeps a committing flush from being counted
+    # twice: once in the counter row and again as in-flight deltas.
+    async with _flush_lock:
+        result = await db.execute(
+            select(UsageCounter.value).where(
+                UsageCounter.agent_id == agent_id,
+                UsageCounter.metric_name == metric_name,
+                UsageCounter.period_start == period_start,
+            )
+        )
+        total = float(result.scalar_one_or_none() or 0) + usage_buffer.unflushed(key)
+    usage_buffer.store_total(key, total)
+    return total
+
+
+async def period_usage(
+    db: AsyncSession, agent_id: str, period_start: datetime,
+) -> dict[str, float]:
+    """All metric totals for an agent's period in a single query."""
+    async with _flush_lock:  # see current_usage
+        result = await db.execute(
+            select(UsageCounter.metric_name, UsageCounter.value).where(
+                UsageCounter.agent_id == agent_id,
+                UsageCounter.period_start == period_start,
+            )
+        )
+        usage = {metric: float(value) for metric, value in result.all()}
+        pending = usage_buffer.pending_for(agent_id, period_start)
+    for metric, value in pending.items():
+        usage[metric] = usage.get(metric, 0.0) + value
+    return usage
+
+
+async def usage_flush_loop() -> None:
+    """Background task: flush buffered usage every ``usage_flush_interval_seconds``."""
+    while True:
+        await asyncio.sleep(settings.usage_flush_interval_seconds)
+        try:
+            await flush_usage()
+        except Exception:
+            logger.exception("Usage flush failed; will retry")
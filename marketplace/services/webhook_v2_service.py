@@ -1,7 +1,8 @@
-"""Webhook v2 delivery service — enqueue webhook events via Service Bus with retry and DLQ support."""
+"""Webhook v2 delivery service — enqueue webhook events on a message queue with retry and DLQ support."""
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import uuid
@@ -19,6 +20,8 @@ logger = logging.getLogger(__name__)
 
 WEBHOOK_QUEUE = "webhooks"
 MAX_DELIVERY_ATTEMPTS = 3
+CONSUMER_BACKOFF_SECONDS = 5.0  # first retry delay after a failed receive
+CONSUMER_MAX_BACKOFF_SECONDS = 60.0
 
 
 # ---------------------------------------------------------------------------
@@ -31,10 +34,11 @@ async def enqueue_webhook_delivery(
     subscription_id: str,
     event: dict,
 ) -> dict:
-    """Put a webhook event on the webhooks Service Bus queue for async delivery.
+    """Put a webhook event on the webhooks queue for async delivery.
 
-    Instead of fire-and-forget HTTP, this enqueues the event on Service Bus so
-    that delivery is retried with dead-letter support on failure.
+    Instead of fire-and-forget HTTP, this enqueues the event (Service Bus or
+    the local queue backend) so that delivery is retried with dead-letter
+    support on failure.
 
     Also creates a pending DeliveryAttempt record for tracking.
     """
@@ -60,7 +64,7 @@ async def enqueue_webhook_delivery(
     await db.commit()
     await db.refresh(attempt)
 
-    sent = svc.send_message(
+    sent = await svc.send_message(
         WEBHOOK_QUEUE,
         message,
         properties={"subscription_id": subscription_id, "attempt": "1"},
@@ -83,12 +87,19 @@ async def enqueue_webhook_delivery(
 # ---------------------------------------------------------------------------
 
 
-async def process_webhook_queue(db: AsyncSession) -> dict:
+async def process_webhook_queue(
+    db: AsyncSession,
+    max_messages: int = 10,
+    max_wait_time: float = 5,
+) -> dict:
     """Consumer loop: pull messages from the webhooks queue and deliver them.
 
     For each message, attempt HTTP POST to the subscription's callback URL.
     On failure, retry up to MAX_DELIVERY_ATTEMPTS. After exhaustion, dead-letter.
 
+    Each message is settled as soon as it is handled, while its lock is
+    still fresh; one that raises unexpectedly is abandoned for redelivery.
+    Receive errors propagate so the caller can back off.
     Returns summary statistics.
     """
     svc = get_servicebus_service()
@@ -96,7 +107,7 @@ async def process_webhook_queue(db: AsyncSession) -> dict:
     failed = 0
     dead_lettered = 0
 
-    messages = svc.receive_messages(WEBHOOK_QUEUE, max_messages=10, max_wait_time=5)
+    messages = await svc.receive_messages(WEBHOOK_QUEUE, max_messages=max_messages, max_wait_time=max_wait_time)
 
     for msg in messages:
         try:
@@ -127,7 +138,7 @@ async def process_webhook_queue(db: AsyncSession) -> dict:
                 attempt.status = "failed"
                 attempt.error_message = "No callback_url provided"
                 await db.commit()
-                svc.complete_message(msg)
+                await svc.complete_message(msg)
                 failed += 1
                 continue
 
@@ -141,7 +152,7 @@ async def process_webhook_queue(db: AsyncSession) -> dict:
                 attempt.status = "blocked"
                 attempt.error_message = f"URL validation failed: {url_err}"
                 await db.commit()
-                svc.complete_message(msg)
+                await svc.complete_message(msg)
                 failed += 1
                 continue
 
@@ -154,7 +165,7 @@ async def process_webhook_queue(db: AsyncSession) -> dict:
                     if 200 <= resp.status_code < 300:
                         attempt.status = "delivered"
                         await db.commit()
-                        svc.complete_message(msg)
+                        await svc.complete_message(msg)
                         delivered += 1
                         logger.info("Delivered webhook to '%s' (attempt %d)", callback_url, attempt_num)
                         continue
@@ -181,7 +192,7 @@ async def process_webhook_queue(db: AsyncSession) -> dict:
                 db.add(entry)
                 await db.commit()
 
-                svc.dead_letter_message(msg, reason=f"Exhausted {MAX_DELIVERY_ATTEMPTS} delivery attempts")
+                await svc.dead_letter_message(msg, reason=f"Exhausted {MAX_DELIVERY_ATTEMPTS} delivery attempts")
                 dead_lettered += 1
                 logger.warning(
                     "Webhook for subscription '%s' dead-lettered after %d attempts",
@@ -192,16 +203,18 @@ async def process_webhook_queue(db: AsyncSession) -> dict:
                 # Re-enqueue with incremented attempt counter
                 retry_body = dict(body)
                 retry_body["attempt"] = attempt_num + 1
-                svc.send_message(
+                await svc.send_message(
                     WEBHOOK_QUEUE,
                     retry_body,
                     properties={"subscription_id": subscription_id, "attempt": str(attempt_num + 1)},
                 )
-                svc.complete_message(msg)
+                await svc.complete_message(msg)
                 failed += 1
 
         except Exception:
             logger.exception("Error processing webhook message")
+            await db.rollback()
+            await svc.abandon_message(msg)
             failed += 1
 
     return {
@@ -211,13 +224,36 @@ async def process_webhook_queue(db: AsyncSession) -> dict:
     }
 
 
+async def webhook_consumer_loop(initial_delay: float = 10.0) -> None:
+    """Background task: process the webhook queue until cancelled.
+
+    ``receive_messages`` long-polls, so an idle queue does not spin. After a
+    failure the loop sleeps, doubling the delay up to
+    ``CONSUMER_MAX_BACKOFF_SECONDS`` while failures continue.
+    """
+    from marketplace.database import async_session
+
+    await asyncio.sleep(initial_delay)
+    backoff = CONSUMER_BACKOFF_SECONDS
+    while True:
+        try:
+            async with async_session() as queue_db:
+                await process_webhook_queue(queue_db)
+        except Exception:
+            logger.exception("Webhook queue consumer error; retrying in %.0fs", backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, CONSUMER_MAX_BACKOFF_SECONDS)
+        else:
+            backoff = CONSUMER_BACKOFF_SECONDS
+
+
 # ---------------------------------------------------------------------------
 # Dead-letter management
 # ---------------------------------------------------------------------------
 
 
 async def retry_dead_letters(db: AsyncSession) -> list[dict]:
-    """Replay all un-retried dead-letter entries by re-enqueuing to Service Bus.
+    """Replay all un-retried dead-letter entries by re-enqueuing them.
 
     Returns a list of results for each entry.
     """
@@ -241,7 +277,7 @@ async def retry_dead_letters(db: AsyncSession) -> list[dict]:
         original_message["attempt"] = 1  # Reset attempt counter
         subscription_id = original_message.get("subscription_id", "")
 
-        sent = svc.send_message(
+        sent = await svc.send_message(
             WEBHOOK_QUEUE,
             original_message,
             properties={"subscription_id": subscription_id, "attempt": "1", "retried_from_dlq": entry.id},
@@ -335,7 +371,7 @@ async def retry_dead_letter(db: AsyncSession, entry_id: str) -> dict:
     original_message["attempt"] = 1  # Reset attempt counter
     subscription_id = original_message.get("subscription_id", "")
 
-    sent = svc.send_message(
+    sent = await svc.send_message(
         WEBHOOK_QUEUE,
         original_message,
         properties={"subscription_id": subscription_id, "attempt": "1", "retried_from_dlq": entry_id},
@@ -6,24 +6,67 @@ Four proof types per listing:
 3. Bloom Filter — 256-byte bloom filter of content keywords (3 hash functions)
 4. Metadata     — Hash commitment of (size, category, freshness, quality)
 
-All proofs use Python stdlib only (hashlib, json, math).
+Merkle leaves, keyword tokens and the bloom filter are produced by a single
+streaming pass (``ProofBuilder``) over the content, so memory stays bounded by
+the leaf digests and the JSON schema parse. Large blobs are proved in a
+process pool to keep CPU work off the event loop.
+
+Every Merkle level is persisted packed in ``proof_blob`` so per-chunk
+inclusion proofs, and verified partial downloads, need no content rehash.
+
+All proofs use Python stdlib only (hashlib, json, re).
 """
 
+import asyncio
+import base64
+import codecs
 import hashlib
 import json
-import math
-from datetime import datetime, timezone
+import logging
+import re
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
-from sqlalchemy import select
+from sqlalchemy import case, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from marketplace.core.exceptions import AuthorizationError, ConflictError, NotFoundError
+from marketplace.models.listing import DataListing
+from marketplace.models.transaction import Transaction
 from marketplace.models.zkproof import ZKProof
+from marketplace.services.cache_service import merkle_tree_cache, proof_cache
+from marketplace.services.storage_service import get_storage
 
+logger = logging.getLogger(__name__)
 
 CHUNK_SIZE = 1024  # 1KB chunks for Merkle tree
 BLOOM_SIZE = 256   # 256 bytes = 2048 bits
 BLOOM_HASHES = 3   # 3 independent hash functions
 
+STREAM_READ_SIZE = 1024 * 1024  # bytes fed to ProofBuilder per update
+SCHEMA_PARSE_LIMIT = 32 * 1024 * 1024  # larger JSON falls back to text-mode stats
+PROCESS_POOL_THRESHOLD = 8 * 1024 * 1024  # blobs at or above this size use the pool
+PROCESS_POOL_WORKERS = 2
+
+# Merkle internal nodes hash the raw 32-byte child digests. Older rows hashed
+# the concatenated hex strings and carry no ``hash_scheme`` marker.
+MERKLE_SCHEME = "sha256-binary"
+_LEGACY_MERKLE_SCHEME = "sha256-hex"
+# Bloom bit positions come from one SHA-256 digest via double hashing
+# (h1 + i*h2). Older rows used one seeded SHA-256 per hash function.
+BLOOM_SCHEME = "sha256-double"
+_LEGACY_BLOOM_SCHEME = "sha256-seeded"
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_ASCII_TOKEN_TABLE = bytes(c if chr(c).isalnum() and c < 128 else 0x20 for c in range(256))
+_TOKEN_DEDUP_LIMIT = 100_000
+_MAX_TOKEN_LENGTH = 256  # longer alphanumeric runs are not indexed
+
+MAX_CHUNKS_PER_REQUEST = 256  # partial delivery cap (256KB of content)
+# Buyers in these transaction states may fetch verified chunk ranges.
+_CONTENT_ACCESS_STATUSES = ("payment_confirmed", "delivered", "completed", "disputed")
+
 
 # ── Merkle Tree ──────────────────────────────────────────────
 
@@ -31,37 +74,158 @@ def _sha256(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
+def _merkle_parent(left: bytes, right: bytes, scheme: str = MERKLE_SCHEME) -> bytes:
+    if scheme == _LEGACY_MERKLE_SCHEME:
+        return hashlib.sha256((left.hex() + right.hex()).encode()).digest()
+    return hashlib.sha256(left + right).digest()
+
+
+def merkle_levels(leaves: list[bytes], scheme: str = MERKLE_SCHEME) -> list[list[bytes]]:
+    """Build every level of the tree from raw leaf digests (leaves first).
+
+    An odd node at the end of a level is paired with itself.
+    """
+    levels = [leaves]
+    current = leaves
+    while len(current) > 1:
+        nxt = []
+        for i in range(0, len(current), 2):
+            left = current[i]
+            right = current[i + 1] if i + 1 < len(current) else left
+            nxt.append(_merkle_parent(left, right, scheme))
+        levels.append(nxt)
+        current = nxt
+    return levels
+
+
 def build_merkle_tree(content: bytes) -> dict:
     """Build a SHA-256 Merkle tree from 1KB content chunks.
 
     Returns {root, leaf_count, depth, leaves (hashes only)}.
     """
-    chunks = [content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE)]
-    if not chunks:
-        chunks = [b""]
-
-    leaves = [_sha256(chunk) for chunk in chunks]
-    depth = 0
-
-    current_level = leaves[:]
-    while len(current_level) > 1:
-        next_level = []
-        for i in range(0, len(current_level), 2):
-            left = current_level[i]
-            right = current_level[i + 1] if i + 1 < len(current_level) else left
-            combined = _sha256((left + right).encode())
-            next_level.append(combined)
-        current_level = next_level
-        depth += 1
-
+    view = memoryview(content)
+    leaves = [
+        hashlib.sha256(view[i:i + CHUNK_SIZE]).digest()
+        for i in range(0, len(view), CHUNK_SIZE)
+    ] or [hashlib.sha256(b"").digest()]
+    levels = merkle_levels(leaves)
     return {
-        "root": current_level[0],
+        "root": levels[-1][0].hex(),
         "leaf_count": len(leaves),
-        "depth": depth,
-        "leaves": leaves,
+        "depth": len(levels) - 1,
+        "leaves": [leaf.hex() for leaf in leaves],
     }
 
 
+# ── Inclusion Proofs ─────────────────────────────────────────
+
+def merkle_level_sizes(leaf_count: int) -> list[int]:
+    """Node count of every level, leaves first, for a tree of ``leaf_count``."""
+    sizes = [max(leaf_count, 1)]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def pack_merkle_levels(levels: list[list[bytes]]) -> bytes:
+    """Concatenate every level's raw 32-byte digests, leaves first."""
+    return b"".join(b"".join(level) for level in levels)
+
+
+class MerkleTree:
+    """Read-only view over a packed tree (see ``pack_merkle_levels``).
+
+    Level boundaries are derived from ``leaf_count``, so the blob holds
+    nothing but digests: about 64 bytes per 1KB chunk of content.
+    ``scheme`` is how internal nodes were hashed from their children.
+    """
+
+    DIGEST_SIZE = 32
+
+    def __init__(self, blob: bytes, leaf_count: int, scheme: str = MERKLE_SCHEME) -> None:
+        sizes = merkle_level_sizes(leaf_count)
+        if len(blob) != sum(sizes) * self.DIGEST_SIZE:
+            raise ValueError("Merkle blob does not match leaf count")
+        self.scheme = scheme
+        self._blob = bytes(blob)
+        self._sizes = sizes
+        self._offsets = []
+        offset = 0
+        for size in sizes:
+            self._offsets.append(offset)
+            offset += size * self.DIGEST_SIZE
+
+    @classmethod
+    def from_content(cls, content: bytes, scheme: str = MERKLE_SCHEME) -> "MerkleTree":
+        leaves = [
+            hashlib.sha256(chunk).digest() for chunk in iter_chunks(content, CHUNK_SIZE)
+        ] or [hashlib.sha256(b"").digest()]
+        return cls(pack_merkle_levels(merkle_levels(leaves, scheme)), len(leaves), scheme)
+
+    @property
+    def leaf_count(self) -> int:
+        return self._sizes[0]
+
+    @property
+    def depth(self) -> int:
+        return len(self._sizes) - 1
+
+    @property
+    def root(self) -> str:
+        return self.node(self.depth, 0).hex()
+
+    @property
+    def blob(self) -> bytes:
+        return self._blob
+
+    def node(self, level: int, index: int) -> bytes:
+        start = self._offsets[level] + index * self.DIGEST_SIZE
+        return self._blob[start:start + self.DIGEST_SIZE]
+
+    def leaf(self, index: int) -> str:
+        return self.node(0, index).hex()
+
+    def inclusion_proof(self, index: int) -> list[dict]:
+        """Sibling path from leaf ``index`` to the root (O(log n) hashes).
+
+        ``position`` says which side the sibling sits on when hashing the
+        pair; a node without a sibling is paired with itself.
+        """
+        if not 0 <= index < self.leaf_count:
+            raise IndexError(f"chunk index {index} out of range")
+        path = []
+        for level in range(self.depth):
+            sibling = index ^ 1
+            if sibling >= self._sizes[level]:
+                sibling = index
+            path.append({
+                "hash": self.node(level, sibling).hex(),
+                "position": "left" if sibling < index else "right",
+            })
+            index //= 2
+        return path
+
+
+def verify_inclusion(
+    leaf_hash: str, path: list[dict], root: str, scheme: str = MERKLE_SCHEME,
+) -> bool:
+    """Recompute the root from a leaf digest and its sibling path.
+
+    ``scheme`` is the ``hash_scheme`` the proof was served with.
+    """
+    try:
+        node = bytes.fromhex(leaf_hash)
+        for step in path:
+            sibling = bytes.fromhex(step["hash"])
+            if step["position"] == "left":
+                node = _merkle_parent(sibling, node, scheme)
+            else:
+                node = _merkle_parent(node, sibling, scheme)
+    except (KeyError, TypeError, ValueError):
+        return False
+    return node.hex() == root
+
+
 # ── Schema Proof ─────────────────────────────────────────────
 
 def extract_schema(content: bytes) -> dict:
@@ -107,50 +271,266 @@ def _schema_from_value(value) -> dict:
 # ── Bloom Filter ─────────────────────────────────────────────
 
 def _bloom_hash(word: str, seed: int) -> int:
-    """Hash a word with a seed to get a bit position in the bloom filter."""
+    """Legacy seeded hash — one SHA-256 per hash function."""
     h = hashlib.sha256(f"{seed}:{word}".encode()).digest()
     return int.from_bytes(h[:4], "big") % (BLOOM_SIZE * 8)
 
 
-def build_bloom_filter(content: bytes) -> bytes:
-    """Build a 256-byte bloom filter from content words."""
-    text = content.decode("utf-8", errors="replace").lower()
-    # Extract words (alphanumeric sequences)
-    words = set()
-    current = []
-    for ch in text:
-        if ch.isalnum():
-            current.append(ch)
-        else:
-            if current:
-                words.add("".join(current))
-                current = []
-    if current:
-        words.add("".join(current))
+def _token_positions(token: bytes) -> list[int]:
+    """Double hashing: all bit positions derived from one SHA-256 digest."""
+    digest = hashlib.sha256(token).digest()
+    h1 = int.from_bytes(digest[:4], "big")
+    h2 = int.from_bytes(digest[4:8], "big") | 1
+    bits = BLOOM_SIZE * 8
+    return [(h1 + i * h2) % bits for i in range(BLOOM_HASHES)]
 
-    bloom = bytearray(BLOOM_SIZE)
-    for word in words:
-        for seed in range(BLOOM_HASHES):
-            bit_pos = _bloom_hash(word, seed)
-            byte_idx = bit_pos // 8
-            bit_idx = bit_pos % 8
-            bloom[byte_idx] |= (1 << bit_idx)
 
-    return bytes(bloom)
+def _bloom_positions(word: str, scheme: str = BLOOM_SCHEME) -> list[int]:
+    if scheme == _LEGACY_BLOOM_SCHEME:
+        return [_bloom_hash(word, seed) for seed in range(BLOOM_HASHES)]
+    return _token_positions(word.encode())
 
 
-def check_bloom(bloom_bytes: bytes, word: str) -> bool:
+def build_bloom_filter(content: bytes) -> bytes:
+    """Build a 256-byte bloom filter from content words."""
+    builder = ProofBuilder(schema=False)
+    for chunk in iter_chunks(content):
+        builder.update(chunk)
+    return builder.bloom()
+
+
+def check_bloom(bloom_bytes: bytes, word: str, scheme: str = BLOOM_SCHEME) -> bool:
     """Check if a word is probably in the bloom filter."""
     word = word.lower()
-    for seed in range(BLOOM_HASHES):
-        bit_pos = _bloom_hash(word, seed)
-        byte_idx = bit_pos // 8
-        bit_idx = bit_pos % 8
-        if not (bloom_bytes[byte_idx] & (1 << bit_idx)):
+    for bit_pos in _bloom_positions(word, scheme):
+        if not (bloom_bytes[bit_pos >> 3] & (1 << (bit_pos & 7))):
             return False
     return True  # Probably present (may be false positive)
 
 
+# ── Streaming Proof Builder ──────────────────────────────────
+
+def iter_chunks(content: bytes, size: int = STREAM_READ_SIZE) -> Iterator[memoryview]:
+    """Yield zero-copy slices of ``content``."""
+    view = memoryview(content)
+    for i in range(0, len(view), size):
+        yield view[i:i + size]
+
+
+class ProofBuilder:
+    """Single pass over content chunks feeding every content-derived proof.
+
+    Each ``update`` extends the Merkle leaves (raw digests of 1KB chunks) and
+    tokenizes the chunk into the bloom filter; ASCII chunks are tokenized as
+    bytes without decoding. With ``schema`` set, bytes are retained up to
+    ``SCHEMA_PARSE_LIMIT`` for JSON fingerprinting; past that the builder
+    switches to streaming text-mode counters.
+    """
+
+    def __init__(self, *, schema: bool = True) -> None:
+        self._leaves: list[bytes] = []
+        self._pending = bytearray()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._bloom = bytearray(BLOOM_SIZE)
+        self._seen: set[bytes] = set()
+        self._carry = b""
+        self._skipping_token = False
+        self._finished = False
+        self._schema_buf: bytearray | None = bytearray() if schema else None
+        self._stats_decoder = None
+        self._line_count = 1
+        self._word_count = 0
+        self._char_count = 0
+        self._in_word = False
+        self.size = 0
+
+    def update(self, data: bytes | memoryview) -> None:
+        data = bytes(data)
+        self.size += len(data)
+        self._feed_leaves(data)
+        self._feed_schema(data)
+        if data.isascii() and not self._decoder.getstate()[0]:
+            self._feed_tokens(data.lower(), _ASCII_TOKEN_TABLE)
+        else:
+            text = self._decoder.decode(data)
+            if text:
+                self._feed_tokens(text.lower().encode(), None)
+
+    # ── Merkle leaves ──
+
+    def _feed_leaves(self, data: bytes) -> None:
+        view = memoryview(data)
+        if self._pending:
+            need = CHUNK_SIZE - len(self._pending)
+            self._pending += view[:need]
+            view = view[need:]
+            if len(self._pending) < CHUNK_SIZE:
+                return
+            self._leaves.append(hashlib.sha256(self._pending).digest())
+            self._pending.clear()
+        full = len(view) - len(view) % CHUNK_SIZE
+        for i in range(0, full, CHUNK_SIZE):
+            self._leaves.append(hashlib.sha256(view[i:i + CHUNK_SIZE]).digest())
+        self._pending += view[full:]
+
+    # ── Bloom tokens ──
+
+    def _feed_tokens(self, lowered: bytes, table: bytes | None) -> None:
+        """Tokenize lowercased UTF-8 into alphanumeric runs.
+
+        ``table`` maps every non-alphanumeric ASCII byte to a space (fast
+        path); without it the text is split with the unicode-aware regex.
+        """
+        buf = self._carry + lowered
+        if table is not None and self._carry.isascii():
+            tokens = buf.translate(table).split()
+            starts_in_word = buf[:1].isalnum()
+            ends_in_word = buf[-1:].isalnum()
+        else:
+            text = buf.decode("utf-8", errors="replace")
+            tokens = [t.encode() for t in _WORD_RE.findall(text)]
+            starts_in_word = text[:1].isalnum()
+            ends_in_word = text[-1:].isalnum()
+
+        if self._skipping_token and tokens and starts_in_word:
+            # Leading run continues an over-long token; drop it.
+            tokens.pop(0)
+            if not tokens and ends_in_word:
+                return
+        self._skipping_token = False
+
+        # A trailing token may continue in the next chunk; hold it back.
+        self._carry = tokens.pop() if tokens and ends_in_word else b""
+        if len(self._carry) > _MAX_TOKEN_LENGTH:
+            self._carry = b""
+            self._skipping_token = True
+        self._add_tokens(tokens)
+
+    def _add_tokens(self, tokens: Iterable[bytes]) -> None:
+        new_tokens = set(tokens)
+        new_tokens -= self._seen
+        if not new_tokens:
+            return
+        if len(self._seen) + len(new_tokens) > _TOKEN_DEDUP_LIMIT:
+            self._seen.clear()  # bits are idempotent; dedup only saves hashing
+        self._seen |= new_tokens
+        bloom = self._bloom
+        for token in new_tokens:
+            if len(token) > _MAX_TOKEN_LENGTH:
+                continue
+            for bit_pos in _token_positions(token):
+                bloom[bit_pos >> 3] |= 1 << (bit_pos & 7)
+
+    # ── Schema ──
+
+    def _feed_schema(self, data: bytes) -> None:
+        if self._schema_buf is not None:
+            if len(self._schema_buf) + len(data) <= SCHEMA_PARSE_LIMIT:
+                self._schema_buf += data
+                return
+            # Too large to parse as JSON: switch to streaming text counters.
+            self._stats_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            self._count_text(self._stats_decoder.decode(self._schema_buf))
+            self._schema_buf = None
+        if self._stats_decoder is not None:
+            self._count_text(self._stats_decoder.decode(data))
+
+    def _count_text(self, text: str) -> None:
+        if not text:
+            return
+        self._char_count += len(text)
+        self._line_count += text.count("\n")
+        words = len(text.split())
+        if words and self._in_word and not text[0].isspace():
+            words -= 1  # word continues across the chunk boundary
+        self._word_count += words
+        self._in_word = not text[-1].isspace()
+
+    # ── Results ──
+
+    def _finish_stream(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            self._feed_tokens(tail.lower().encode(), None)
+        if self._carry:
+            self._add_tokens([self._carry])
+            self._carry = b""
+        if self._stats_decoder is not None:
+            self._count_text(self._stats_decoder.decode(b"", final=True))
+        if self._pending or not self._leaves:
+            self._leaves.append(hashlib.sha256(self._pending).digest())
+            self._pending.clear()
+
+    def leaves(self) -> list[bytes]:
+        self._finish_stream()
+        return self._leaves
+
+    def bloom(self) -> bytes:
+        self._finish_stream()
+        return bytes(self._bloom)
+
+    def schema(self) -> dict:
+        self._finish_stream()
+        if self._schema_buf is not None:
+            return extract_schema(bytes(self._schema_buf))
+        return {
+            "mode": "text",
+            "line_count": self._line_count,
+            "word_count": self._word_count,
+            "char_count": self._char_count,
+        }
+
+
+def compute_proof_material(content: bytes) -> dict:
+    """Run one streaming pass and return the content-derived proof inputs.
+
+    Module-level and picklable so it can run in ``ProcessPoolExecutor``.
+    """
+    builder = ProofBuilder()
+    for chunk in iter_chunks(content):
+        builder.update(chunk)
+    levels = merkle_levels(builder.leaves())
+    return {
+        "merkle_root": levels[-1][0].hex(),
+        "leaf_count": len(levels[0]),
+        "depth": len(levels) - 1,
+        "merkle_levels": pack_merkle_levels(levels),
+        "bloom": builder.bloom(),
+        "schema": builder.schema(),
+    }
+
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS)
+    return _process_pool
+
+
+async def compute_proof_material_async(content: bytes) -> dict:
+    """Compute proof material off the event loop.
+
+    Blobs of ``PROCESS_POOL_THRESHOLD`` bytes or more go to a process pool so
+    hashing doesn't contend for the GIL with request handling; smaller ones
+    use a worker thread. Falls back to a thread if the pool is unavailable.
+    """
+    loop = asyncio.get_running_loop()
+    if len(content) >= PROCESS_POOL_THRESHOLD:
+        try:
+            return await loop.run_in_executor(
+                _get_process_pool(), compute_proof_material, content
+            )
+        except Exception:
+            logger.warning("ZKP process pool unavailable; proving in a thread", exc_info=True)
+    return await asyncio.to_thread(compute_proof_material, content)
+
+
 # ── Metadata Commitment ──────────────────────────────────────
 
 def build_metadata_commitment(
@@ -190,20 +570,79 @@ async def generate_proofs(
     quality_score: float,
 ) -> list[ZKProof]:
     """Generate all 4 proof types for a listing and store in DB."""
+    proofs = await build_proofs_async(
+        listing_id, content, category, content_size, freshness_at, quality_score,
+    )
+    for p in proofs:
+        db.add(p)
+    await db.flush()
+    invalidate_proof_cache(listing_id)
+
+    return proofs
+
+
+def build_proofs(
+    listing_id: str,
+    content: bytes,
+    category: str,
+    content_size: int,
+    freshness_at: datetime,
+    quality_score: float,
+) -> list[ZKProof]:
+    """Compute all 4 proof rows synchronously without touching the DB."""
+    return _proof_rows(
+        listing_id, compute_proof_material(content),
+        category, content_size, freshness_at, quality_score,
+    )
+
+
+async def build_proofs_async(
+    listing_id: str,
+    content: bytes,
+    category: str,
+    content_size: int,
+    freshness_at: datetime,
+    quality_score: float,
+) -> list[ZKProof]:
+    """Compute all 4 proof rows off the event loop without touching the DB."""
+    material = await compute_proof_material_async(content)
+    return _proof_rows(
+        listing_id, material, category, content_size, freshness_at, quality_score,
+    )
+
+
+def _proof_rows(
+    listing_id: str,
+    material: dict,
+    category: str,
+    content_size: int,
+    freshness_at: datetime,
+    quality_score: float,
+) -> list[ZKProof]:
     proofs = []
 
-    # 1. Merkle Root
-    merkle = build_merkle_tree(content)
+    # 1. Merkle Root — every level stored packed in proof_blob
+    merkle_public = {
+        "root": material["merkle_root"],
+        "leaf_count": material["leaf_count"],
+        "depth": material["depth"],
+        "hash_scheme": MERKLE_SCHEME,
+    }
     proofs.append(ZKProof(
         listing_id=listing_id,
         proof_type="merkle_root",
-        commitment=merkle["root"],
-        proof_data=json.dumps({"leaf_count": merkle["leaf_count"], "depth": merkle["depth"]}),
-        public_inputs=json.dumps({"root": merkle["root"], "leaf_count": merkle["leaf_count"], "depth": merkle["depth"]}),
+        commitment=material["merkle_root"],
+        proof_data=json.dumps({
+            "leaf_count": material["leaf_count"],
+            "depth": material["depth"],
+            "hash_scheme": MERKLE_SCHEME,
+        }),
+        public_inputs=json.dumps(merkle_public),
+        proof_blob=material["merkle_levels"],
     ))
 
     # 2. Schema Proof
-    schema = extract_schema(content)
+    schema = material["schema"]
     schema_hash = _sha256(json.dumps(schema, sort_keys=True).encode())
     proofs.append(ZKProof(
         listing_id=listing_id,
@@ -213,16 +652,16 @@ async def generate_proofs(
         public_inputs=json.dumps(_public_schema(schema)),
     ))
 
-    # 3. Bloom Filter
-    bloom = build_bloom_filter(content)
-    bloom_hex = bloom.hex()
-    bloom_hash = _sha256(bloom)
+    # 3. Bloom Filter — bits stored raw in proof_blob
+    bloom = material["bloom"]
+    bloom_params = {"size_bytes": BLOOM_SIZE, "hash_count": BLOOM_HASHES, "hash_scheme": BLOOM_SCHEME}
     proofs.append(ZKProof(
         listing_id=listing_id,
         proof_type="bloom_filter",
-        commitment=bloom_hash,
-        proof_data=json.dumps({"bloom_hex": bloom_hex, "size_bytes": BLOOM_SIZE, "hash_count": BLOOM_HASHES}),
-        public_inputs=json.dumps({"bloom_hex": bloom_hex, "size_bytes": BLOOM_SIZE, "hash_count": BLOOM_HASHES}),
+        commitment=_sha256(bloom),
+        proof_data=json.dumps(bloom_params),
+        public_inputs=json.dumps(bloom_params),
+        proof_blob=bloom,
     ))
 
     # 4. Metadata Commitment
@@ -235,13 +674,44 @@ async def generate_proofs(
         public_inputs=json.dumps(meta["public_inputs"]),
     ))
 
-    for p in proofs:
-        db.add(p)
-    await db.flush()
-
     return proofs
 
 
+def bloom_from_proof(proof: ZKProof) -> tuple[bytes, str]:
+    """Return (bloom bits, hash scheme) for a bloom_filter proof row.
+
+    Rows written before the raw-bytes format keep the bits as ``bloom_hex``
+    in ``proof_data`` and use the legacy seeded hashing.
+    """
+    return _bloom_bits(json.loads(proof.proof_data or "{}"), proof.proof_blob)
+
+
+def _bloom_bits(data: dict, blob: bytes | None) -> tuple[bytes, str]:
+    if blob is not None:
+        return bytes(blob), data.get("hash_scheme", BLOOM_SCHEME)
+    return bytes.fromhex(data["bloom_hex"]), data.get("hash_scheme", _LEGACY_BLOOM_SCHEME)
+
+
+def _merkle_tree(data: dict, blob: bytes | None) -> MerkleTree | None:
+    """Packed tree for a merkle_root row, or None for rows without one."""
+    if blob is None or data.get("hash_scheme") != MERKLE_SCHEME:
+        return None
+    try:
+        return MerkleTree(blob, int(data["leaf_count"]))
+    except (KeyError, TypeError, ValueError):
+        logger.warning("Ignoring malformed Merkle blob", exc_info=True)
+        return None
+
+
+def public_inputs_for(proof: ZKProof) -> dict:
+    """Public inputs for API responses; bloom bits are rendered as hex."""
+    public = json.loads(proof.public_inputs)
+    if proof.proof_type == "bloom_filter" and "bloom_hex" not in public:
+        bloom, _ = bloom_from_proof(proof)
+        public["bloom_hex"] = bloom.hex()
+    return public
+
+
 def _public_schema(schema: dict) -> dict:
     """Extract public-safe schema info (field names and types, not values)."""
     if schema.get("mode") == "text":
@@ -273,6 +743,54 @@ async def get_proofs(db: AsyncSession, listing_id: str) -> list[ZKProof]:
     return list(result.scalars().all())
 
 
+def _decode_proof(proof) -> dict:
+    data = json.loads(proof.proof_data or "{}")
+    entry = {
+        "id": proof.id,
+        "commitment": proof.commitment,
+        "data": data,
+        "public": json.loads(proof.public_inputs or "{}"),
+    }
+    if proof.proof_type == "bloom_filter":
+        entry["bloom"] = _bloom_bits(data, proof.proof_blob)
+    return entry
+
+
+async def get_decoded_proofs(db: AsyncSession, listing_id: str) -> dict[str, dict]:
+    """Proof headers keyed by type with JSON and bloom bits already decoded.
+
+    The Merkle tree blob (about 64 bytes per 1KB of content) is not loaded
+    here; ``get_merkle_tree`` reads and caches it separately. Cached per
+    listing in ``proof_cache``; listings without proofs are not cached so
+    freshly generated proofs show up immediately.
+    """
+    key = f"proofs:{listing_id}"
+    decoded = proof_cache.get(key)
+    if decoded is not None:
+        return decoded
+    result = await db.execute(
+        select(
+            ZKProof.id,
+            ZKProof.proof_type,
+            ZKProof.commitment,
+            ZKProof.proof_data,
+            ZKProof.public_inputs,
+            case(
+                (ZKProof.proof_type == "merkle_root", None), else_=ZKProof.proof_blob,
+            ).label("proof_blob"),
+        ).where(ZKProof.listing_id == listing_id)
+    )
+    decoded = {row.proof_type: _decode_proof(row) for row in result.all()}
+    if decoded:
+        proof_cache.put(key, decoded)
+    return decoded
+
+
+def invalidate_proof_cache(listing_id: str) -> None:
+    proof_cache.invalidate(f"proofs:{listing_id}")
+    merkle_tree_cache.invalidate(f"merkle:{listing_id}")
+
+
 async def verify_listing(
     db: AsyncSession,
     listing_id: str,
@@ -285,21 +803,18 @@ async def verify_listing(
 
     Returns pass/fail for each requested check.
     """
-    proofs = await get_proofs(db, listing_id)
-    if not proofs:
+    proof_map = await get_decoded_proofs(db, listing_id)
+    if not proof_map:
         return {"listing_id": listing_id, "error": "No proofs found", "verified": False}
 
-    proof_map = {p.proof_type: p for p in proofs}
     checks = {}
 
     # Keyword check via bloom filter
     if keywords and "bloom_filter" in proof_map:
-        bloom_proof = proof_map["bloom_filter"]
-        bloom_data = json.loads(bloom_proof.proof_data)
-        bloom_bytes = bytes.fromhex(bloom_data["bloom_hex"])
+        bloom_bytes, scheme = proof_map["bloom_filter"]["bloom"]
         keyword_results = {}
         for kw in keywords:
-            keyword_results[kw] = check_bloom(bloom_bytes, kw)
+            keyword_results[kw] = check_bloom(bloom_bytes, kw, scheme)
         checks["keywords"] = {
             "passed": all(keyword_results.values()),
             "details": keyword_results,
@@ -308,7 +823,7 @@ async def verify_listing(
     # Schema field check
     if schema_has_fields and "schema" in proof_map:
         schema_proof = proof_map["schema"]
-        public = json.loads(schema_proof.public_inputs)
+        public = schema_proof["public"]
         field_names = public.get("field_names", [])
         field_results = {}
         for field in schema_has_fields:
@@ -321,7 +836,7 @@ async def verify_listing(
     # Size check via metadata commitment
     if min_size is not None and "metadata" in proof_map:
         meta_proof = proof_map["metadata"]
-        public = json.loads(meta_proof.public_inputs)
+        public = meta_proof["public"]
         actual_size = public.get("content_size", 0)
         checks["min_size"] = {
             "passed": actual_size >= min_size,
@@ -332,7 +847,7 @@ async def verify_listing(
     # Quality check via metadata commitment
     if min_quality is not None and "metadata" in proof_map:
         meta_proof = proof_map["metadata"]
-        public = json.loads(meta_proof.public_inputs)
+        public = meta_proof["public"]
         actual_quality = public.get("quality_score", 0)
         checks["min_quality"] = {
             "passed": actual_quality >= min_quality,
@@ -352,16 +867,12 @@ async def verify_listing(
 
 async def bloom_check_word(db: AsyncSession, listing_id: str, word: str) -> dict:
     """Quick single-word bloom filter check."""
-    result = await db.execute(
-        select(ZKProof).where(ZKProof.listing_id == listing_id, ZKProof.proof_type == "bloom_filter")
-    )
-    proof = result.scalar_one_or_none()
+    proof = (await get_decoded_proofs(db, listing_id)).get("bloom_filter")
     if not proof:
         return {"listing_id": listing_id, "word": word, "error": "No bloom filter proof found"}
 
-    bloom_data = json.loads(proof.proof_data)
-    bloom_bytes = bytes.fromhex(bloom_data["bloom_hex"])
-    probably_present = check_bloom(bloom_bytes, word)
+    bloom_bytes, scheme = proof["bloom"]
+    probably_present = check_bloom(bloom_bytes, word, scheme)
 
     return {
         "listing_id": listing_id,
@@ -369,3 +880,137 @@ async def bloom_check_word(db: AsyncSession, listing_id: str, word: str) -> dict
         "probably_present": probably_present,
         "note": "Bloom filters may have false positives but never false negatives",
     }
+
+
+# ── Verified Partial Delivery ────────────────────────────────
+
+async def get_merkle_tree(db: AsyncSession, listing_id: str) -> MerkleTree:
+    """Packed Merkle tree for a listing.
+
+    Rows written without a packed tree keep their published root: the tree
+    is rebuilt in memory from content with the legacy hex hashing and
+    checked against the stored commitment, and nothing is written back.
+    Cached in ``merkle_tree_cache``, which is bounded by bytes rather than
+    entries since a tree grows with its listing's content.
+    """
+    key = f"merkle:{listing_id}"
+    tree = merkle_tree_cache.get(key)
+    if tree is not None:
+        return tree
+    entry = (await get_decoded_proofs(db, listing_id)).get("merkle_root")
+    if entry is None:
+        raise NotFoundError(f"No Merkle proof found for listing {listing_id}")
+    result = await db.execute(
+        select(ZKProof.proof_blob).where(ZKProof.id == entry["id"])
+    )
+    tree = _merkle_tree(entry["data"], result.scalar_one_or_none())
+    if tree is None:
+        listing = await _get_listing(db, listing_id)
+        scheme = entry["data"].get("hash_scheme", _LEGACY_MERKLE_SCHEME)
+        tree = await asyncio.to_thread(
+            MerkleTree.from_content, await _read_content(listing), scheme,
+        )
+        if tree.root != entry["commitment"]:
+            raise ConflictError(
+                f"Content for listing {listing_id} no longer matches its Merkle root"
+            )
+    merkle_tree_cache.put(key, tree)
+    return tree
+
+
+async def _get_listing(db: AsyncSession, listing_id: str) -> DataListing:
+    result = await db.execute(select(DataListing).where(DataListing.id == listing_id))
+    listing = result.scalar_one_or_none()
+    if listing is None:
+        raise NotFoundError(f"Listing {listing_id} not found")
+    return listing
+
+
+async def _read_content(listing: DataListing) -> bytes:
+    from marketplace.services import cdn_service
+
+    content = await cdn_service.get_content(listing.content_hash)
+    if content is None:
+        raise NotFoundError(f"Content for listing {listing.id} not found")
+    return content
+
+
+async def get_inclusion_proof(db: AsyncSession, listing_id: str, chunk: int) -> dict:
+    """O(log n) inclusion proof for one 1KB chunk of a listing."""
+    tree = await get_merkle_tree(db, listing_id)
+    if not 0 <= chunk < tree.leaf_count:
+        raise NotFoundError(f"Chunk {chunk} out of range (leaf_count={tree.leaf_count})")
+    return {
+        "listing_id": listing_id,
+        "root": tree.root,
+        "chunk": chunk,
+        "leaf_hash": tree.leaf(chunk),
+        "proof": tree.inclusion_proof(chunk),
+        "leaf_count": tree.leaf_count,
+        "depth": tree.depth,
+        "hash_scheme": tree.scheme,
+    }
+
+
+async def _ensure_content_access(db: AsyncSession, listing: DataListing, agent_id: str) -> None:
+    if listing.seller_id == agent_id:
+        return
+    result = await db.execute(
+        select(Transaction.id).where(
+            Transaction.listing_id == listing.id,
+            Transaction.buyer_id == agent_id,
+            Transaction.status.in_(_CONTENT_ACCESS_STATUSES),
+        ).limit(1)
+    )
+    if result.scalar_one_or_none() is None:
+        raise AuthorizationError("Content chunks are available to the seller and paying buyers only")
+
+
+async def get_verified_chunks(
+    db: AsyncSession,
+    listing_id: str,
+    agent_id: str,
+    start: int,
+    count: int,
+) -> dict:
+    """Ship chunks ``[start, start + count)`` with their inclusion proofs.
+
+    Each chunk's SHA-256 plus its sibling path recomputes the published
+    Merkle root, so a buyer can verify a partial download on its own. Only
+    the requested byte range is read from storage.
+    """
+    listing = await _get_listing(db, listing_id)
+    await _ensure_content_access(db, listing, agent_id)
+    tree = await get_merkle_tree(db, listing_id)
+
+    if not 0 <= start < tree.leaf_count:
+        raise NotFoundError(f"Chunk {start} out of range (leaf_count={tree.leaf_count})")
+    end = min(start + min(count, MAX_CHUNKS_PER_REQUEST), tree.leaf_count)
+    content = await get_storage().aget_range(
+        listing.content_hash, start * CHUNK_SIZE, (end - start) * CHUNK_SIZE,
+    )
+    if content is None:
+        raise NotFoundError(f"Content for listing {listing.id} not found")
+    view = memoryview(content)
+    chunks = []
+    for index in range(start, end):
+        offset = (index - start) * CHUNK_SIZE
+        data = view[offset:offset + CHUNK_SIZE]
+        chunks.append({
+            "index": index,
+            "data": base64.b64encode(data).decode("ascii"),
+            "leaf_hash": tree.leaf(index),
+            "proof": tree.inclusion_proof(index),
+        })
+
+    return {
+        "listing_id": listing_id,
+        "root": tree.root,
+        "chunk_size": CHUNK_SIZE,
+        "leaf_count": tree.leaf_count,
+        "depth": tree.depth,
+        "hash_scheme": tree.scheme,
+        "start": start,
+        "count": len(chunks),
+        "chunks": chunks,
+    }
@@ -0,0 +1,89 @@
+"""Async interface of the content storage backends.
+
+HashFS and AzureBlobStore do blocking I/O (disk, or the Azure SDK's HTTP
+pipeline). ``AsyncStorageMixin`` gives both the same ``aget``/``aget_range``/
+``aput``/``aexists``/``adelete``/``aput_stream``/``astream`` methods, which run the
+blocking call on a small thread pool owned by the store — so request
+handlers never block the event loop, and a burst of storage traffic queues
+for at most ``content_store_io_workers`` threads instead of crowding every
+other ``asyncio.to_thread`` user out of the default executor.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
+
+from marketplace.config import settings
+
+_DONE = object()
+
+
+class AsyncStorageMixin:
+    """Awaitable counterparts of the blocking storage methods."""
+
+    _executor: ThreadPoolExecutor | None = None
+    _executor_lock = threading.Lock()
+
+    def _io_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=max(1, settings.content_store_io_workers),
+                        thread_name_prefix=f"{type(self).__name__.lower()}-io",
+                    )
+        return self._executor
+
+    async def _run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._io_executor(), functools.partial(fn, *args, **kwargs),
+        )
+
+    async def aget(self, content_hash: str) -> bytes | None:
+        return await self._run(self.get, content_hash)
+
+    async def aget_range(self, content_hash: str, offset: int, length: int) -> bytes | None:
+        return await self._run(self.get_range, content_hash, offset, length)
+
+    async def aput(self, content: bytes) -> str:
+        return await self._run(self.put, content)
+
+    async def aput_stream(self, chunks: Iterable[bytes]) -> str:
+        """Store content from a blocking iterable, consumed on the I/O pool."""
+        return await self._run(self.put_stream, chunks)
+
+    async def aexists(self, content_hash: str) -> bool:
+        return await self._run(self.exists, content_hash)
+
+    async def adelete(self, content_hash: str) -> bool:
+        return await self._run(self.delete, content_hash)
+
+    async def astream(self, content_hash: str) -> AsyncIterator[bytes] | None:
+        """Content as an async iterator of chunks, or None if not found.
+
+        Each chunk is read on the I/O pool as it is consumed.
+        """
+        chunks = await self._run(self.get_stream, content_hash)
+        if chunks is None:
+            return None
+        return self._drain(chunks)
+
+    async def _drain(self, chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+        try:
+            while (chunk := await self._run(next, chunks, _DONE)) is not _DONE:
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                await self._run(close)
+
+    def shutdown_io(self) -> None:
+        """Stop the I/O pool; it is recreated on next use."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
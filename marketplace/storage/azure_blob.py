@@ -1,7 +1,8 @@
 """Azure Blob Storage adapter for content storage.
 
 Re-enabled for v1.0 with the azure-storage-blob SDK.
-Supports async upload/download/delete/exists operations.
+Async callers use the ``a``-prefixed methods of ``AsyncStorageMixin``, which
+run the blocking SDK calls on the store's I/O pool over one shared client.
 
 Requires: AZURE_BLOB_CONNECTION and AZURE_BLOB_CONTAINER env vars.
 """
@@ -9,8 +10,16 @@ Requires: AZURE_BLOB_CONNECTION and AZURE_BLOB_CONTAINER env vars.
 from __future__ import annotations
 
 import hashlib
+import itertools
 import logging
-from typing import Optional
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+from marketplace.config import settings
+from marketplace.storage import chunking
+from marketplace.storage.aio import AsyncStorageMixin
+from marketplace.storage.inventory import BlobInfo
 
 try:
     from azure.storage.blob import BlobServiceClient
@@ -20,13 +29,31 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
-class AzureBlobStore:
+def _is_not_found(error: Exception) -> bool:
+    return "BlobNotFound" in str(error) or "ResourceNotFoundError" in str(type(error))
+
+
+def _is_condition_not_met(error: Exception) -> bool:
+    return "ConditionNotMet" in str(error) or "ResourceModifiedError" in str(type(error))
+
+
+class AzureBlobStore(AsyncStorageMixin):
     """Azure Blob Storage backend for content storage.
 
     Interface-compatible with HashFS: put() returns 'sha256:<hex>',
     get/exists/delete/get_url accept 'sha256:<hex>' or bare hex.
+
+    Large content uses the chunked format of ``marketplace.storage.chunking``:
+    a manifest blob (metadata ``format=chunked``) under the content's name
+    and compressed chunk blobs under ``chunks/``, uploaded once each.
+
+    Blob listings are the inventory here. The container has no cheap size
+    query, so stats() reports the totals of the last complete inventory()
+    walk (run by storage GC) rather than live figures.
     """
 
+    _stats_snapshot: dict | None = None
+
     def __init__(self, connection_string: str, container_name: str = "content-store") -> None:
         if not connection_string:
             raise ValueError(
@@ -88,6 +115,11 @@ class AzureBlobStore:
         else:
             hex_hash = self._strip_prefix(content_hash)
 
+        if chunking.should_chunk(content):
+            _, _, manifest = chunking.write_chunked([content], self._store_chunk)
+            self._upload_manifest(hex_hash, manifest)
+            return f"sha256:{hex_hash}"
+
         blob_name = self._blob_path(hex_hash)
         blob_client = self._blob_client(blob_name)
 
@@ -100,6 +132,58 @@ class AzureBlobStore:
 
         return f"sha256:{hex_hash}"
 
+    def put_stream(self, chunks: Iterable[bytes]) -> str:
+        """Upload content arriving in chunks.
+
+        Large content is chunked as it arrives, so nothing is spooled; only
+        content too small to chunk is buffered and uploaded whole.
+        """
+        chunks = iter(chunks)
+        head: list[bytes] = []
+        buffered = 0
+        for piece in chunks:
+            head.append(piece)
+            buffered += len(piece)
+            if buffered >= settings.content_chunking_min_bytes:
+                break
+        else:
+            content = b"".join(head)
+            if not chunking.should_chunk(content):
+                return self.put(content)
+
+        hex_hash, _, manifest = chunking.write_chunked(
+            itertools.chain(head, chunks), self._store_chunk,
+        )
+        self._upload_manifest(hex_hash, manifest)
+        return f"sha256:{hex_hash}"
+
+    def get_stream(self, content_hash: str) -> Iterator[bytes] | None:
+        """Download content in chunks. Returns None if not found.
+
+        Chunked content is fetched and decompressed one stored chunk at a time.
+        """
+        blob_name = self._blob_path(self._strip_prefix(content_hash))
+        try:
+            download = self._blob_client(blob_name).download_blob()
+        except Exception as e:
+            if "BlobNotFound" in str(e) or "ResourceNotFoundError" in str(type(e)):
+                return None
+            logger.exception("Failed to download blob: %s", blob_name)
+            raise
+
+        def _chunks() -> Iterator[bytes]:
+            pieces = download.chunks()
+            head = next(pieces, b"")
+            if chunking.is_manifest(head):
+                manifest = head + b"".join(pieces)
+                yield from chunking.read_chunked(manifest, self._load_chunk)
+                return
+            if head:
+                yield head
+            yield from pieces
+
+        return _chunks()
+
     def get(self, content_hash: str) -> bytes | None:
         """Download content from Azure Blob Storage by hash."""
         hex_hash = self._strip_prefix(content_hash)
@@ -108,12 +192,35 @@ class AzureBlobStore:
 
         try:
             download = blob_client.download_blob()
-            return download.readall()
+            content = download.readall()
         except Exception as e:
             if "BlobNotFound" in str(e) or "ResourceNotFoundError" in str(type(e)):
                 return None
             logger.exception("Failed to download blob: %s", blob_name)
             raise
+        if chunking.is_manifest(content):
+            return b"".join(chunking.read_chunked(content, self._load_chunk))
+        return content
+
+    def get_range(self, content_hash: str, offset: int, length: int) -> bytes | None:
+        """Bytes ``[offset, offset + length)`` of stored content, or None if not found.
+
+        Plain blobs are read with a ranged download; for chunked content only
+        the chunks covering the range are fetched.
+        """
+        blob_name = self._blob_path(self._strip_prefix(content_hash))
+        blob_client = self._blob_client(blob_name)
+        try:
+            properties = blob_client.get_blob_properties()
+            if (properties.metadata or {}).get("format") == "chunked":
+                manifest = blob_client.download_blob().readall()
+                return chunking.read_chunked_range(manifest, self._load_chunk, offset, length)
+            return blob_client.download_blob(offset=offset, length=length).readall()
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            logger.exception("Failed to download blob range: %s", blob_name)
+            raise
 
     def exists(self, content_hash: str) -> bool:
         """Check if content exists in Azure Blob Storage."""
@@ -143,6 +250,135 @@ class AzureBlobStore:
             logger.exception("Failed to delete blob: %s", blob_name)
             raise
 
+    def delete_stale(self, content_hash: str, stored_before: float) -> bool:
+        """Delete content unless it was uploaded again since ``stored_before``.
+
+        put() overwrites, so a re-upload moves ``last_modified`` and the
+        conditional delete is refused.
+        """
+        blob_name = self._blob_path(self._strip_prefix(content_hash))
+        try:
+            self._blob_client(blob_name).delete_blob(
+                if_unmodified_since=datetime.fromtimestamp(stored_before, tz=timezone.utc),
+            )
+            return True
+        except Exception as e:
+            if _is_not_found(e) or _is_condition_not_met(e):
+                return False
+            logger.exception("Failed to delete blob: %s", blob_name)
+            raise
+
+    def ensure_indexed(self) -> bool:
+        """Nothing to index: the container listing is the inventory."""
+        return False
+
+    def stats(self) -> dict:
+        """Object and byte counts as of the last full inventory walk."""
+        if self._stats_snapshot is None:
+            return {"objects": 0, "bytes": 0, "as_of": None}
+        return dict(self._stats_snapshot)
+
+    def inventory(self, after: str | None = None) -> Iterator[BlobInfo]:
+        """Yield every stored blob in hash order, starting after ``after``.
+
+        Blob names sort by hash, since the shard prefixes are the hash's own
+        leading characters.
+        """
+        container = self._get_client().get_container_client(self._container_name)
+        objects = total_bytes = 0
+        for blob in container.list_blobs(name_starts_with="sha256/"):
+            hex_hash = blob.name.rsplit("/", 1)[-1]
+            if after is not None and hex_hash <= after:
+                continue
+            objects += 1
+            total_bytes += blob.size or 0
+            last_access = getattr(blob, "last_accessed_on", None)
+            yield BlobInfo(
+                hex_hash=hex_hash,
+                size=blob.size or 0,
+                # put() overwrites, so last_modified is the latest store
+                stored_at=blob.last_modified.timestamp() if blob.last_modified else time.time(),
+                last_access=last_access.timestamp() if last_access else None,
+            )
+        if after is None:
+            self._stats_snapshot = {"objects": objects, "bytes": total_bytes, "as_of": time.time()}
+
+    def collect_chunks(self, stored_before: float) -> tuple[int, int]:
+        """Delete chunk blobs that no manifest references.
+
+        Chunks touched since ``stored_before`` are kept: a put renews the
+        chunks it reuses before uploading the manifest that will mark them.
+        Returns ``(chunks, bytes)`` freed.
+        """
+        container = self._get_client().get_container_client(self._container_name)
+        live: set[str] = set()
+        for blob in container.list_blobs(name_starts_with="sha256/", include=["metadata"]):
+            if (blob.metadata or {}).get("format") != "chunked":
+                continue
+            manifest = self._blob_client(blob.name).download_blob().readall()
+            live.update(h for h, _ in chunking.read_manifest(manifest)["chunks"])
+
+        freed = freed_bytes = 0
+        for blob in container.list_blobs(name_starts_with="chunks/"):
+            hex_hash = blob.name.rsplit("/", 1)[-1]
+            modified = blob.last_modified.timestamp() if blob.last_modified else time.time()
+            if hex_hash in live or modified >= stored_before:
+                continue
+            try:
+                # A put that reuses the chunk renews it in the meantime
+                self._blob_client(blob.name).delete_blob(
+                    if_unmodified_since=datetime.fromtimestamp(stored_before, tz=timezone.utc),
+                )
+            except Exception as e:
+                if _is_not_found(e) or _is_condition_not_met(e):
+                    continue
+                raise
+            freed += 1
+            freed_bytes += blob.size or 0
+        return freed, freed_bytes
+
+    def quarantine(self, content_hash: str) -> bool:
+        """Copy a blob to ``quarantine/<hex>`` and remove it from the store."""
+        hex_hash = self._strip_prefix(content_hash)
+        source = self._blob_client(self._blob_path(hex_hash))
+        target = self._blob_client(f"quarantine/{hex_hash}")
+        try:
+            target.start_copy_from_url(source.url, requires_sync=True)
+        except Exception as e:
+            if "BlobNotFound" in str(e) or "ResourceNotFoundError" in str(type(e)):
+                return False
+            logger.exception("Failed to quarantine blob: %s", hex_hash)
+            raise
+        return self.delete(hex_hash)
+
+    def _chunk_path(self, hex_hash: str) -> str:
+        return f"chunks/{hex_hash[:2]}/{hex_hash[2:4]}/{hex_hash}"
+
+    def _store_chunk(self, hex_hash: str, raw: bytes) -> None:
+        blob_client = self._blob_client(self._chunk_path(hex_hash))
+        try:
+            # Renews last_modified, which protects the chunk from GC's grace cutoff
+            blob_client.set_blob_metadata({"reused": str(int(time.time()))})
+            return
+        except Exception as e:
+            if "BlobNotFound" not in str(e) and "ResourceNotFoundError" not in str(type(e)):
+                raise
+        blob_client.upload_blob(chunking.encode_chunk(raw), overwrite=True)
+
+    def _load_chunk(self, hex_hash: str) -> bytes:
+        return self._blob_client(self._chunk_path(hex_hash)).download_blob().readall()
+
+    def _upload_manifest(self, hex_hash: str, manifest: bytes) -> None:
+        blob_name = self._blob_path(hex_hash)
+        try:
+            self._blob_client(blob_name).upload_blob(
+                manifest, overwrite=True, metadata={"format": "chunked"},
+            )
+            logger.debug("Uploaded manifest: %s (%d bytes)", blob_name, len(manifest))
+        except Exception:
+            logger.exception("Failed to upload blob: %s", blob_name)
+            raise
+
     def get_url(self, content_hash: str) -> str:
         """Get the URL for a blob (without SAS token — internal use only)."""
         hex_hash = self._strip_prefix(content_hash)
@@ -0,0 +1,240 @@
+"""Chunked storage format: content-defined chunking, compression, manifests.
+
+Large content is split at content-defined boundaries, so an edit early in a
+file moves only the chunks around it and successive versions of a dataset
+share most chunks. Each chunk is addressed by the SHA-256 of its raw bytes
+and stored once, compressed when that pays off. The content itself is then
+stored as a small manifest listing its chunks, still under the SHA-256 of
+the whole uncompressed content — ``content_hash`` keeps its meaning.
+
+Boundaries come from a gear hash over the last 32 bytes, so they do not
+depend on where a chunk started and can be found for a whole buffer at once
+with numpy; the pure-Python path finds the same boundaries.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import Callable, Iterable, Iterator
+
+from marketplace.config import settings
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_MAGIC = b"ACM-CHUNKS-1\n"
+
+MIN_CHUNK = 16 * 1024
+AVG_CHUNK_BITS = 16  # boundaries every ~64 KiB
+MAX_CHUNK = 256 * 1024
+
+# Chunk encodings: the first byte of a stored chunk
+RAW = b"\x00"
+ZSTD = b"\x01"
+
+_WINDOW = 32
+_MASK32 = 0xFFFFFFFF
+_BOUNDARY_MASK = ((1 << AVG_CHUNK_BITS) - 1) << (32 - AVG_CHUNK_BITS)
+# Fixed table, so every process and release cuts the same content the same way
+_GEAR = tuple(
+    int.from_bytes(hashlib.sha256(b"gear" + bytes([i])).digest()[:4], "big") for i in range(256)
+)
+_GEAR_NP = np.array(_GEAR, dtype=np.uint32) if np is not None else None
+
+_warned_no_zstd = False
+
+
+def is_manifest(head: bytes) -> bool:
+    return head.startswith(MANIFEST_MAGIC)
+
+
+def should_chunk(content: bytes) -> bool:
+    """Whether ``content`` is stored chunked rather than verbatim.
+
+    Verbatim content that happened to begin with the manifest magic would be
+    misread, so such content is always chunked.
+    """
+    return len(content) >= settings.content_chunking_min_bytes or is_manifest(content)
+
+
+# ── Boundaries ──
+
+def _candidates(data: bytes, context: bytes) -> list[int]:
+    """Offsets in ``data`` right after a byte whose gear hash hits the mask.
+
+    ``context`` is the data that preceded ``data`` (only its last 31 bytes
+    matter); the hash at each position covers the 32 bytes ending there.
+    """
+    context = context[-(_WINDOW - 1):]
+    if _GEAR_NP is not None:
+        buf = np.frombuffer(context + data, dtype=np.uint8)
+        gear = _GEAR_NP[buf]
+        hashes = gear.copy()
+        for k in range(1, _WINDOW):
+            hashes[k:] += gear[:-k] << np.uint32(k)
+        hits = np.flatnonzero((hashes[len(context):] & np.uint32(_BOUNDARY_MASK)) == 0)
+        return (hits + 1).tolist()
+
+    h = 0
+    for byte in context:
+        h = ((h << 1) + _GEAR[byte]) & _MASK32
+    hits = []
+    for i, byte in enumerate(data):
+        h = ((h << 1) + _GEAR[byte]) & _MASK32
+        if not h & _BOUNDARY_MASK:
+            hits.append(i + 1)
+    return hits
+
+
+def _cuts(candidates: list[int], length: int, final: bool) -> list[int]:
+    """Chunk end offsets: the first candidate past MIN_CHUNK, at most MAX_CHUNK.
+
+    Without ``final``, the tail whose end is not yet decided is left out.
+    """
+    cuts = []
+    start = 0
+    pending = iter(candidates)
+    candidate = next(pending, None)
+    while length - start > (0 if final else MAX_CHUNK):
+        while candidate is not None and candidate < start + MIN_CHUNK:
+            candidate = next(pending, None)
+        if candidate is not None and candidate <= start + MAX_CHUNK:
+            cut = candidate
+        else:
+            cut = min(start + MAX_CHUNK, length)
+        cuts.append(cut)
+        start = cut
+    return cuts
+
+
+def split(stream: Iterable[bytes]) -> Iterator[bytes]:
+    """Cut a stream of bytes into content-defined chunks."""
+    parts: list[bytes] = []
+    buffered = 0
+    pending = b""
+    context = b""
+    for piece in stream:
+        parts.append(piece)
+        buffered += len(piece)
+        if buffered < 4 * MAX_CHUNK:
+            continue
+        pending = b"".join(parts)
+        start = 0
+        for cut in _cuts(_candidates(pending, context), len(pending), final=False):
+            yield pending[start:cut]
+            start = cut
+        context = pending[max(0, start - _WINDOW):start]
+        parts = [pending[start:]]
+        buffered = len(parts[0])
+    pending = b"".join(parts)
+    start = 0
+    for cut in _cuts(_candidates(pending, context), len(pending), final=True):
+        yield pending[start:cut]
+        start = cut
+
+
+# ── Chunk encoding ──
+
+def encode_chunk(raw: bytes) -> bytes:
+    """Compress a chunk if that saves space; the first byte names the encoding."""
+    global _warned_no_zstd
+    if settings.content_compression == "zstd":
+        if zstandard is None:
+            if not _warned_no_zstd:
+                logger.warning("zstandard is not installed — content chunks are stored uncompressed.")
+                _warned_no_zstd = True
+        else:
+            packed = zstandard.ZstdCompressor(level=settings.content_compression_level).compress(raw)
+            if len(packed) < len(raw):
+                return ZSTD + packed
+    return RAW + raw
+
+
+def decode_chunk(stored: bytes) -> bytes:
+    """Raw bytes of a stored chunk.
+
+    Raises ValueError for any chunk that cannot be decoded, including
+    compressed data zstandard rejects; RuntimeError if zstandard is needed
+    but not installed.
+    """
+    encoding, body = stored[:1], stored[1:]
+    if encoding == RAW:
+        return body
+    if encoding == ZSTD:
+        if zstandard is None:
+            raise RuntimeError(
+                "zstandard is required to read compressed content. "
+                "Install with: pip install zstandard"
+            )
+        try:
+            return zstandard.ZstdDecompressor().decompress(body)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupt compressed chunk: {e}") from e
+    raise ValueError(f"Unknown chunk encoding: {encoding!r}")
+
+
+# ── Manifests ──
+
+def write_chunked(
+    stream: Iterable[bytes],
+    store_chunk: Callable[[str, bytes], None],
+) -> tuple[str, int, bytes]:
+    """Chunk ``stream``, hand each chunk to ``store_chunk(hex_hash, raw)``.
+
+    Returns the content's hex hash, its size and the manifest to store
+    under that hash.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    chunks = []
+    for raw in split(stream):
+        digest.update(raw)
+        size += len(raw)
+        chunk_hash = hashlib.sha256(raw).hexdigest()
+        store_chunk(chunk_hash, raw)
+        chunks.append([chunk_hash, len(raw)])
+    manifest = MANIFEST_MAGIC + json.dumps(
+        {"size": size, "chunks": chunks}, separators=(",", ":"),
+    ).encode()
+    return digest.hexdigest(), size, manifest
+
+
+def read_manifest(manifest: bytes) -> dict:
+    return json.loads(manifest[len(MANIFEST_MAGIC):])
+
+
+def read_chunked(manifest: bytes, load_chunk: Callable[[str], bytes]) -> Iterator[bytes]:
+    """Yield the content of a manifest, one decompressed chunk at a time."""
+    for chunk_hash, _ in read_manifest(manifest)["chunks"]:
+        yield decode_chunk(load_chunk(chunk_hash))
+
+
+def read_chunked_range(
+    manifest: bytes, load_chunk: Callable[[str], bytes], offset: int, length: int,
+) -> bytes:
+    """Bytes ``[offset, offset + length)`` of a manifest's content.
+
+    Only the chunks overlapping the range are loaded and decompressed.
+    """
+    end = offset + length
+    pieces = []
+    position = 0
+    for chunk_hash, size in read_manifest(manifest)["chunks"]:
+        if position >= end:
+            break
+        if position + size > offset:
+            raw = decode_chunk(load_chunk(chunk_hash))
+            pieces.append(raw[max(offset - position, 0):end - position])
+        position += size
+    return b"".join(pieces)
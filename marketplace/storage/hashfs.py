@@ -1,8 +1,27 @@
 import hashlib
+import itertools
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
 from pathlib import Path
+from typing import Iterable, Iterator
 
+from marketplace.config import settings
+from marketplace.storage import chunking
+from marketplace.storage.aio import AsyncStorageMixin
+from marketplace.storage.inventory import BlobInfo, Inventory
 
-class HashFS:
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+_HEX_NAME_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class HashFS(AsyncStorageMixin):
     """Content-addressed file storage using SHA-256 hashes.
 
     Files are stored in a sharded directory structure:
@@ -10,6 +29,20 @@ class HashFS:
 
     The first `depth` segments of `width` hex characters each become
     subdirectories, preventing any single directory from holding too many files.
+
+    An inventory (``root/.inventory.db``, see ``marketplace.storage.inventory``)
+    tracks every blob, so re-storing known content touches no files and
+    ``size()``/``stats()`` do not walk the tree. A store created before the
+    inventory existed is indexed once by ``ensure_indexed()``, which the
+    application runs off the event loop at startup.
+
+    Content of ``content_chunking_min_bytes`` or more is stored in the chunked
+    format of ``marketplace.storage.chunking``: the file at the content's path
+    holds a manifest, and its compressed chunks live once each under
+    ``root/.chunks``. Reads reassemble it transparently.
+
+    The ``a``-prefixed methods (see ``marketplace.storage.aio``) are the ones
+    to use from async code.
     """
 
     def __init__(self, root_dir: str, depth: int = 2, width: int = 2):
@@ -17,14 +50,50 @@ class HashFS:
         self.depth = depth
         self.width = width
         self.root.mkdir(parents=True, exist_ok=True)
+        self._known_dirs: set[Path] = set()
+        self._inventory = Inventory(self.root / ".inventory.db")
+        self._needs_index = self._inventory.created
+        self._index_lock = threading.Lock()
+        self._maintenance_fd: int | None = None
 
     def put(self, content: bytes) -> str:
         """Store content and return its prefixed SHA-256 hash."""
         hex_hash = hashlib.sha256(content).hexdigest()
-        path = self._hash_to_path(hex_hash)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        if not path.exists():
-            path.write_bytes(content)
+        if self._inventory.reference(hex_hash):
+            return f"sha256:{hex_hash}"
+        if chunking.should_chunk(content):
+            _, size, manifest = chunking.write_chunked([content], self._store_chunk)
+            self._write_blob(hex_hash, manifest, size)
+        else:
+            self._write_blob(hex_hash, content, len(content))
+        return f"sha256:{hex_hash}"
+
+    def put_stream(self, chunks: Iterable[bytes]) -> str:
+        """Store content arriving in chunks, without holding it all in memory."""
+        chunks = iter(chunks)
+        head: list[bytes] = []
+        buffered = 0
+        for piece in chunks:
+            head.append(piece)
+            buffered += len(piece)
+            if buffered >= settings.content_chunking_min_bytes:
+                break
+        else:
+            content = b"".join(head)
+            if not chunking.should_chunk(content):
+                return self.put(content)
+
+        stored: list[str] = []
+
+        def _store(chunk_hash: str, raw: bytes) -> None:
+            self._store_chunk(chunk_hash, raw)
+            stored.append(chunk_hash)
+
+        hex_hash, size, manifest = chunking.write_chunked(itertools.chain(head, chunks), _store)
+        if self._inventory.reference(hex_hash):
+            self._inventory.release_chunks(stored)
+        else:
+            self._write_blob(hex_hash, manifest, size)
         return f"sha256:{hex_hash}"
 
     def get(self, content_hash: str) -> bytes | None:
@@ -34,9 +103,62 @@ class HashFS:
             return None
         path = self._safe_path(hex_hash)
         if path is not None and path.is_file():
-            return path.read_bytes()
+            content = path.read_bytes()
+            if chunking.is_manifest(content):
+                content = b"".join(chunking.read_chunked(content, self._load_chunk))
+            self._inventory.touch(hex_hash)
+            return content
         return None
 
+    def get_stream(self, content_hash: str, chunk_size: int = 1 << 20) -> Iterator[bytes] | None:
+        """Yield stored content in chunks. Returns None if not found.
+
+        Chunked content is decompressed one stored chunk at a time.
+        """
+        hex_hash = self._normalize_hash(content_hash)
+        if hex_hash is None:
+            return None
+        path = self._safe_path(hex_hash)
+        if path is None or not path.is_file():
+            return None
+        self._inventory.touch(hex_hash)
+
+        def _chunks() -> Iterator[bytes]:
+            with path.open("rb") as f:
+                head = f.read(len(chunking.MANIFEST_MAGIC))
+                if chunking.is_manifest(head):
+                    yield from chunking.read_chunked(head + f.read(), self._load_chunk)
+                    return
+                if head:
+                    yield head
+                while chunk := f.read(chunk_size):
+                    yield chunk
+
+        return _chunks()
+
+    def get_range(self, content_hash: str, offset: int, length: int) -> bytes | None:
+        """Bytes ``[offset, offset + length)`` of stored content, or None if not found.
+
+        Reads only the part of the file, or the stored chunks, covering the range.
+        """
+        hex_hash = self._normalize_hash(content_hash)
+        if hex_hash is None:
+            return None
+        path = self._safe_path(hex_hash)
+        if path is None or not path.is_file():
+            return None
+        with path.open("rb") as f:
+            head = f.read(len(chunking.MANIFEST_MAGIC))
+            if chunking.is_manifest(head):
+                data = chunking.read_chunked_range(
+                    head + f.read(), self._load_chunk, offset, length,
+                )
+            else:
+                f.seek(offset)
+                data = f.read(length)
+        self._inventory.touch(hex_hash)
+        return data
+
     def exists(self, content_hash: str) -> bool:
         """Check whether content with the given hash exists."""
         hex_hash = self._normalize_hash(content_hash)
@@ -51,11 +173,39 @@ class HashFS:
         if hex_hash is None:
             return False
         path = self._safe_path(hex_hash)
+        self._inventory.remove(hex_hash)
         if path is not None and path.is_file():
+            self._release_manifest(path)
             path.unlink()
             return True
         return False
 
+    def delete_stale(self, content_hash: str, stored_before: float) -> bool:
+        """Delete content unless it was stored (again) since ``stored_before``.
+
+        For GC: a put of known content only renews its inventory row, so the
+        file is moved aside first and moved back if the conditional delete
+        of that row finds it renewed.
+        """
+        hex_hash = self._normalize_hash(content_hash)
+        if hex_hash is None:
+            return False
+        path = self._safe_path(hex_hash)
+        if path is None:
+            return False
+        doomed = path.with_name(f"{hex_hash}.gc")
+        try:
+            os.replace(path, doomed)
+        except FileNotFoundError:
+            self._inventory.remove_stored_before(hex_hash, stored_before)
+            return False
+        if not self._inventory.remove_stored_before(hex_hash, stored_before):
+            os.replace(doomed, path)
+            return False
+        self._release_manifest(doomed)
+        doomed.unlink()
+        return True
+
     def verify(self, content: bytes, expected_hash: str) -> bool:
         """Verify that content matches the expected hash."""
         hex_hash = self._normalize_hash(expected_hash)
@@ -70,7 +220,176 @@ class HashFS:
 
     def size(self) -> int:
         """Total number of stored objects."""
-        return sum(1 for _ in self.root.rglob("*") if _.is_file())
+        return self._inventory.totals()[0]
+
+    def stats(self) -> dict:
+        """Object and byte counts, read from the inventory.
+
+        ``bytes`` is the uncompressed size of all content; ``chunk_bytes`` is
+        what the deduplicated, compressed chunks take on disk.
+        """
+        objects, total_bytes = self._inventory.totals()
+        chunks, chunk_bytes = self._inventory.chunk_totals()
+        return {"objects": objects, "bytes": total_bytes, "chunks": chunks, "chunk_bytes": chunk_bytes}
+
+    def inventory(self, after: str | None = None, page_size: int = 1000) -> Iterator[BlobInfo]:
+        """Yield every stored blob in hash order, starting after ``after``."""
+        while page := self._inventory.page(after, page_size):
+            yield from page
+            after = page[-1].hex_hash
+
+    def quarantine(self, content_hash: str) -> bool:
+        """Move a blob out of the store into ``root/.quarantine`` for inspection."""
+        hex_hash = self._normalize_hash(content_hash)
+        if hex_hash is None:
+            return False
+        self._inventory.remove(hex_hash)
+        path = self._safe_path(hex_hash)
+        if path is None or not path.is_file():
+            return False
+        self._release_manifest(path)
+        target = self.root / ".quarantine"
+        target.mkdir(exist_ok=True)
+        os.replace(path, target / hex_hash)
+        return True
+
+    def collect_chunks(self, stored_before: float) -> tuple[int, int]:
+        """Delete chunks no manifest has used since ``stored_before``.
+
+        Returns ``(chunks, bytes)`` freed. A chunk is moved aside before its
+        inventory row is dropped, and moved back if a concurrent put took it
+        again in between.
+        """
+        freed = freed_bytes = 0
+        for hex_hash, stored_size in self._inventory.unused_chunks(stored_before):
+            path = self._chunk_path(hex_hash)
+            doomed = path.with_name(f"{hex_hash}.gc")
+            try:
+                os.replace(path, doomed)
+            except FileNotFoundError:
+                self._inventory.drop_unused_chunk(hex_hash, stored_before)
+                continue
+            if self._inventory.drop_unused_chunk(hex_hash, stored_before):
+                doomed.unlink()
+                freed += 1
+                freed_bytes += stored_size
+            else:
+                os.replace(doomed, path)
+        return freed, freed_bytes
+
+    def try_lock_maintenance(self) -> bool:
+        """Claim GC and scrubbing of this root for the calling process.
+
+        Every worker sharing the root competes for an exclusive ``flock`` on
+        ``root/.maintenance.lock``; the winner keeps it until it exits, when
+        the OS releases it for another worker to take over.
+        """
+        if fcntl is None or self._maintenance_fd is not None:
+            return True
+        fd = os.open(self.root / ".maintenance.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._maintenance_fd = fd
+        return True
+
+    def ensure_indexed(self) -> bool:
+        """Index a store whose inventory was just created. True if it did.
+
+        Walks the whole tree, so call it from a worker thread.
+        """
+        with self._index_lock:
+            if not self._needs_index:
+                return False
+            self.rebuild_inventory()
+            self._needs_index = False
+            return True
+
+    def rebuild_inventory(self) -> int:
+        """Re-index the store from the files on disk. Returns the object count."""
+        chunk_refs: Counter[str] = Counter()
+        return self._inventory.replace_all(
+            self._walk_blobs(chunk_refs), self._walk_chunks(chunk_refs),
+        )
+
+    def _walk_blobs(self, chunk_refs: Counter) -> Iterator[tuple[str, int, float]]:
+        def _walk(directory: Path, level: int) -> Iterator[tuple[str, int, float]]:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if level < self.depth:
+                        if entry.is_dir(follow_symlinks=False):
+                            yield from _walk(Path(entry.path), level + 1)
+                    elif entry.is_file(follow_symlinks=False) and _HEX_NAME_RE.match(entry.name):
+                        info = entry.stat()
+                        size = info.st_size
+                        with open(entry.path, "rb") as f:
+                            head = f.read(len(chunking.MANIFEST_MAGIC))
+                            if chunking.is_manifest(head):
+                                manifest = chunking.read_manifest(head + f.read())
+                                size = manifest["size"]
+                                chunk_refs.update(h for h, _ in manifest["chunks"])
+                        yield entry.name, size, info.st_mtime
+
+        return _walk(self.root, 0)
+
+    def _walk_chunks(self, chunk_refs: Counter) -> Iterator[tuple[str, int, int, float]]:
+        chunk_root = self.root / ".chunks"
+        if not chunk_root.is_dir():
+            return
+        for path in chunk_root.glob("*/*/*"):
+            if _HEX_NAME_RE.match(path.name):
+                info = path.stat()
+                yield path.name, info.st_size, chunk_refs[path.name], info.st_mtime
+
+    def _write_blob(self, hex_hash: str, data: bytes, size: int) -> None:
+        path = self._hash_to_path(hex_hash)
+        self._ensure_dir(path.parent)
+        if not path.exists():
+            path.write_bytes(data)
+        elif chunking.is_manifest(data):
+            # Stored by a concurrent put; its manifest holds the chunk references
+            self._inventory.release_chunks(h for h, _ in chunking.read_manifest(data)["chunks"])
+        self._inventory.add(hex_hash, size)
+
+    def _store_chunk(self, hex_hash: str, raw: bytes) -> None:
+        if self._inventory.acquire_chunk(hex_hash):
+            return
+        encoded = chunking.encode_chunk(raw)
+        path = self._chunk_path(hex_hash)
+        self._ensure_dir(path.parent)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(encoded)
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        self._inventory.add_chunk(hex_hash, len(encoded))
+
+    def _load_chunk(self, hex_hash: str) -> bytes:
+        return self._chunk_path(hex_hash).read_bytes()
+
+    def _release_manifest(self, path: Path) -> None:
+        with path.open("rb") as f:
+            head = f.read(len(chunking.MANIFEST_MAGIC))
+            if not chunking.is_manifest(head):
+                return
+            manifest = chunking.read_manifest(head + f.read())
+        self._inventory.release_chunks(h for h, _ in manifest["chunks"])
+
+    def _chunk_path(self, hex_hash: str) -> Path:
+        return self.root / ".chunks" / hex_hash[:2] / hex_hash[2:4] / hex_hash
+
+    def _ensure_dir(self, directory: Path) -> None:
+        if directory not in self._known_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(directory)
 
     def _hash_to_path(self, hex_hash: str) -> Path:
         parts = [
@@ -0,0 +1,264 @@
+"""Inventory of stored blobs, shared by the content storage backends.
+
+``BlobInfo`` is what every backend reports per blob. ``Inventory`` is the
+on-disk index HashFS keeps next to its files: one SQLite row per blob
+(hash, size, reference count, last store and last access time) and a single
+totals row kept current by triggers, so object and byte counts are read in
+constant time instead of walking the tree. Chunks of chunked content (see
+``marketplace.storage.chunking``) are indexed the same way, with a count of
+the manifests that use them.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash BLOB PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 1,
+    stored_at REAL NOT NULL,
+    last_access REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    objects INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS blobs_added AFTER INSERT ON blobs BEGIN
+    UPDATE totals SET objects = objects + 1, bytes = bytes + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS blobs_removed AFTER DELETE ON blobs BEGIN
+    UPDATE totals SET objects = objects - 1, bytes = bytes - OLD.size;
+END;
+CREATE TABLE IF NOT EXISTS chunks (
+    hash BLOB PRIMARY KEY,
+    stored_size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 1,
+    stored_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chunk_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    objects INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO chunk_totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS chunks_added AFTER INSERT ON chunks BEGIN
+    UPDATE chunk_totals SET objects = objects + 1, bytes = bytes + NEW.stored_size;
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_removed AFTER DELETE ON chunks BEGIN
+    UPDATE chunk_totals SET objects = objects - 1, bytes = bytes - OLD.stored_size;
+END;
+"""
+
+# Last-access times are buffered and written in one statement per flush
+_TOUCH_FLUSH_COUNT = 256
+_TOUCH_FLUSH_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    """One stored blob, as listed by a storage backend."""
+
+    hex_hash: str
+    size: int
+    stored_at: float  # unix seconds of the latest put of this content
+    refcount: int = 1
+    last_access: float | None = None
+
+    @property
+    def content_hash(self) -> str:
+        return f"sha256:{self.hex_hash}"
+
+
+class Inventory:
+    """SQLite index of the blobs in one HashFS root.
+
+    Safe to share between threads; several processes may use the same file,
+    as SQLite serializes their writes.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.created = not path.exists()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(path), isolation_level=None, check_same_thread=False, timeout=30.0,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._touched: dict[bytes, float] = {}
+        self._last_flush = time.monotonic()
+
+    def reference(self, hex_hash: str) -> bool:
+        """Count another put of a known blob. False if the blob is not listed."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE blobs SET refcount = refcount + 1, stored_at = ? WHERE hash = ?",
+                (time.time(), bytes.fromhex(hex_hash)),
+            )
+        return cursor.rowcount == 1
+
+    def add(self, hex_hash: str, size: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO blobs (hash, size, stored_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET "
+                "refcount = refcount + 1, stored_at = excluded.stored_at",
+                (bytes.fromhex(hex_hash), size, time.time()),
+            )
+
+    def remove(self, hex_hash: str) -> bool:
+        key = bytes.fromhex(hex_hash)
+        with self._lock:
+            self._touched.pop(key, None)
+            cursor = self._conn.execute("DELETE FROM blobs WHERE hash = ?", (key,))
+        return cursor.rowcount == 1
+
+    def remove_stored_before(self, hex_hash: str, stored_before: float) -> bool:
+        """Forget a blob, unless it was stored again since ``stored_before``."""
+        key = bytes.fromhex(hex_hash)
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM blobs WHERE hash = ? AND stored_at < ?", (key, stored_before),
+            )
+            if cursor.rowcount == 1:
+                self._touched.pop(key, None)
+        return cursor.rowcount == 1
+
+    def touch(self, hex_hash: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._touched[bytes.fromhex(hex_hash)] = now
+            due = (
+                len(self._touched) >= _TOUCH_FLUSH_COUNT
+                or time.monotonic() - self._last_flush >= _TOUCH_FLUSH_SECONDS
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+            if touched:
+                self._conn.executemany(
+                    "UPDATE blobs SET last_access = ? WHERE hash = ?",
+                    [(at, key) for key, at in touched.items()],
+                )
+
+    def totals(self) -> tuple[int, int]:
+        """(objects, bytes), read from the trigger-maintained totals row."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT objects, bytes FROM totals WHERE id = 0"
+            ).fetchone()
+
+    def chunk_totals(self) -> tuple[int, int]:
+        """(chunks, bytes on disk) of the chunk store."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT objects, bytes FROM chunk_totals WHERE id = 0"
+            ).fetchone()
+
+    def acquire_chunk(self, hex_hash: str) -> bool:
+        """Reference a stored chunk from one more manifest. False if unknown.
+
+        Also renews ``stored_at``, which keeps the chunk out of reach of GC
+        for a grace period even while its refcount is still zero.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE chunks SET refcount = refcount + 1, stored_at = ? WHERE hash = ?",
+                (time.time(), bytes.fromhex(hex_hash)),
+            )
+        return cursor.rowcount == 1
+
+    def add_chunk(self, hex_hash: str, stored_size: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO chunks (hash, stored_size, stored_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET "
+                "refcount = refcount + 1, stored_at = excluded.stored_at",
+                (bytes.fromhex(hex_hash), stored_size, time.time()),
+            )
+
+    def release_chunks(self, hex_hashes: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET refcount = refcount - 1 WHERE hash = ?",
+                [(bytes.fromhex(h),) for h in hex_hashes],
+            )
+
+    def unused_chunks(self, stored_before: float) -> list[tuple[str, int]]:
+        """``(hex_hash, stored_size)`` of chunks no manifest uses any more."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, stored_size FROM chunks WHERE refcount <= 0 AND stored_at < ?",
+                (stored_before,),
+            ).fetchall()
+        return [(key.hex(), stored_size) for key, stored_size in rows]
+
+    def drop_unused_chunk(self, hex_hash: str, stored_before: float) -> bool:
+        """Forget a chunk, unless it was referenced again in the meantime."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM chunks WHERE hash = ? AND refcount <= 0 AND stored_at < ?",
+                (bytes.fromhex(hex_hash), stored_before),
+            )
+        return cursor.rowcount == 1
+
+    def page(self, after: str | None = None, limit: int = 1000) -> list[BlobInfo]:
+        """Blobs in hash order, starting after ``after``."""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, size, stored_at, refcount, last_access FROM blobs "
+                "WHERE hash > ? ORDER BY hash LIMIT ?",
+                (bytes.fromhex(after) if after else b"", limit),
+            ).fetchall()
+        return [
+            BlobInfo(key.hex(), size, stored_at, refcount, last_access)
+            for key, size, stored_at, refcount, last_access in rows
+        ]
+
+    def replace_all(
+        self,
+        blobs: Iterable[tuple[str, int, float]],
+        chunks: Iterable[tuple[str, int, int, float]] = (),
+    ) -> int:
+        """Rebuild the index from ``(hex_hash, size, stored_at)`` blob entries
+        and ``(hex_hash, stored_size, refcount, stored_at)`` chunk entries."""
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM blobs")
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO blobs (hash, size, stored_at) VALUES (?, ?, ?)",
+                    ((bytes.fromhex(h), size, stored_at) for h, size, stored_at in blobs),
+                )
+                self._conn.execute("DELETE FROM chunks")
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO chunks (hash, stored_size, refcount, stored_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    ((bytes.fromhex(h), size, refs, at) for h, size, refs, at in chunks),
+                )
+                count = self._conn.execute("SELECT objects FROM totals WHERE id = 0").fetchone()[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -4,6 +4,7 @@ Uses an in-memory SQLite database with StaticPool so all sessions share the
 same connection (committed data is visible across sessions).
 """
 
+import asyncio
 import uuid
 from decimal import Decimal
 
@@ -69,15 +70,51 @@ async def _setup_db():
     )
 
     # Clear all singleton caches before test
-    from marketplace.services.cache_service import listing_cache, content_cache, agent_cache
+    from marketplace.services.cache_service import (
+        agent_cache, content_cache, listing_cache, merkle_tree_cache, plan_limits_cache,
+        proof_cache,
+    )
+    from marketplace.services.capability_index import capability_index
+    from marketplace.services.orchestrator_plan_cache import plan_cache
+    from marketplace.services import usage_metering_service
     listing_cache.clear()
     content_cache.clear()
     agent_cache.clear()
+    proof_cache.clear()
+    merkle_tree_cache.clear()
+    plan_limits_cache.clear()
+    usage_metering_service.usage_buffer.clear()
+    usage_metering_service._flush_lock = asyncio.Lock()
+    plan_cache.clear()
+    capability_index.clear()
 
     # Clear rate limiter buckets
     from marketplace.core.rate_limiter import rate_limiter
     rate_limiter._buckets.clear()
 
+    # Fresh (in-memory) local message queue per test
+    import marketplace.services.servicebus_service as servicebus_service
+    servicebus_service._servicebus_service = None
+
+    # MCP federation routing table and pooled server connections
+    from marketplace.services import mcp_federation_service
+    mcp_federation_service.mcp_routing_table.clear()
+    mcp_federation_service._clients.clear()
+    mcp_federation_service._inflight.clear()
+    mcp_federation_service.mcp_health_monitor.reset()
+
+    # Buffered search events and the incremental demand aggregator
+    from marketplace.services import demand_service
+    demand_service._search_buffer.clear()
+    demand_service._flush_lock = asyncio.Lock()
+    demand_service.demand_aggregator.clear()
+
+    # Streaming abuse detection windows
+    from marketplace.services.abuse_detection_service import abuse_stream
+    abuse_stream.reset()
+    from marketplace.services.fraud_graph import fraud_graph
+    fraud_graph.clear()
+
     # Clear CDN hot cache and stats
     from marketplace.services import cdn_service
     cdn_service._hot_cache._store.clear()
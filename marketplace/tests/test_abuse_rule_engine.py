@@ -0,0 +1,200 @@
+"""Tests for the set-based abuse rule engine and streaming detection."""
+
+from __future__ import annotations
+
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import event, insert
+
+from marketplace.models.agent import RegisteredAgent
+from marketplace.models.transaction import Transaction
+from marketplace.services import abuse_detection_service
+from marketplace.services.abuse_detection_service import (
+    StreamingAnomalyDetector,
+    TransactionEvent,
+    detect_anomalies,
+    scan_all_agents,
+)
+
+
+def _id() -> str:
+    return str(uuid.uuid4())
+
+
+async def _agents(db, count: int, created_at: datetime | None = None) -> list[str]:
+    created_at = created_at or datetime.now(timezone.utc) - timedelta(days=30)
+    rows = [
+        {"id": _id(), "name": f"agent-{i}-{_id()[:8]}", "agent_type": "both",
+         "public_key": "ssh-rsa test", "status": "active", "created_at": created_at}
+        for i in range(count)
+    ]
+    await db.execute(insert(RegisteredAgent), rows)
+    await db.commit()
+    return [r["id"] for r in rows]
+
+
+async def _trades(db, pairs, amount="1", at: datetime | None = None) -> None:
+    at = at or datetime.now(timezone.utc)
+    rows = [
+        {"id": _id(), "listing_id": _id(), "buyer_id": buyer, "seller_id": seller,
+         "amount_usdc": Decimal(amount), "status": "completed",
+         "content_hash": "sha256:" + "0" * 64, "initiated_at": at}
+        for buyer, seller in pairs
+    ]
+    await db.execute(insert(Transaction), rows)
+    await db.commit()
+
+
+def _rules(anomalies) -> set[tuple[str, str]]:
+    return {(agent_id, a["rule"]) for agent_id, found in anomalies.items() for a in found}
+
+
+async def test_scan_evaluates_all_agents_with_one_query_per_rule(db) -> None:
+    agents = await _agents(db, 3000)
+    busy, quiet, washer, whale = agents[:4]
+    await _trades(db, [(busy, agents[10 + i % 50]) for i in range(60)])
+    await _trades(db, [(quiet, agents[5])] * 3)
+    await _trades(db, [(washer, washer)])
+    await _trades(db, [(agents[6], whale)], amount="2500")
+
+    statements = []
+    engine = db.bind.sync_engine
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    started = time.perf_counter()
+    try:
+        found = await scan_all_agents(db, limit=None)
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert time.perf_counter() - started < 5
+    assert len(statements) == len(abuse_detection_service.DEFAULT_RULES)
+    assert _rules(found) == {
+        (busy, "rapid_transactions"),
+        (washer, "self_trading"),
+        (whale, "large_transaction"),
+        (agents[6], "large_transaction"),
+    }
+    assert found[busy][0]["value"] == 60
+
+
+async def test_scan_limit_restricts_the_agent_scope(db) -> None:
+    first, second = await _agents(db, 2)
+    await _trades(db, [(first, first), (second, second)])
+
+    found = await scan_all_agents(db, limit=1)
+    assert len(found) == 1
+
+
+async def test_single_agent_detection_matches_the_batch_rules(db) -> None:
+    (new_agent,) = await _agents(db, 1, created_at=datetime.now(timezone.utc) - timedelta(hours=2))
+    (other,) = await _agents(db, 1)
+    await _trades(db, [(new_agent, other)] * 6 + [(other, new_agent)] * 6)
+
+    anomalies = await detect_anomalies(db, new_agent)
+    assert [a["rule"] for a in anomalies] == ["new_account_high_volume"]
+    assert anomalies[0]["value"] == 12
+    assert await detect_anomalies(db, other) == []
+
+
+async def test_stream_raises_once_when_the_window_crosses_the_threshold() -> None:
+    stream = StreamingAnomalyDetector()
+    now = datetime.now(timezone.utc)
+
+    raised = []
+    for i in range(55):
+        raised += stream.observe(TransactionEvent(_id(), "a", f"s{i}", 1, now + timedelta(seconds=i)))
+
+    assert [(a["agent_id"], a["rule"], a["value"]) for a in raised] == [("a", "rapid_transactions", 50)]
+    # Two hours later the window has emptied and counting starts over.
+    later = now + timedelta(hours=2)
+    assert stream.observe(TransactionEvent(_id(), "a", "s0", 1, later)) == []
+    assert stream.count_since("a", later - timedelta(hours=1)) == 1
+
+
+async def test_stream_is_primed_from_history(db) -> None:
+    (new_agent,) = await _agents(db, 1, created_at=datetime.now(timezone.utc) - timedelta(hours=1))
+    (seller,) = await _agents(db, 1)
+    await _trades(db, [(new_agent, seller)] * 9)
+
+    stream = StreamingAnomalyDetector()
+    assert await stream.prime(db) == 18
+    assert stream.created_at(seller) is None
+
+    tx = Transaction(
+        id=_id(), listing_id=_id(), buyer_id=new_agent, seller_id=seller,
+        amount_usdc=Decimal("5000"), status="completed", content_hash="sha256:x",
+        initiated_at=datetime.now(timezone.utc),
+    )
+    raised = stream.observe(TransactionEvent.from_transaction(tx))
+
+    assert {(a["agent_id"], a["rule"]) for a in raised} == {
+        (new_agent, "new_account_high_volume"),
+        (new_agent, "large_transaction"),
+        (seller, "large_transaction"),
+    }
+
+
+async def test_transaction_observed_before_priming_is_counted_once(db) -> None:
+    buyer, seller = await _agents(db, 2)
+    at = datetime.now(timezone.utc)
+    tx_id = _id()
+    await db.execute(insert(Transaction), [{
+        "id": tx_id, "listing_id": _id(), "buyer_id": buyer, "seller_id": seller,
+        "amount_usdc": Decimal("1"), "status": "completed",
+        "content_hash": "sha256:" + "0" * 64, "initiated_at": at,
+    }])
+    await db.commit()
+
+    stream = StreamingAnomalyDetector()
+    stream.observe(TransactionEvent(tx_id, buyer, seller, 1, at))
+    assert await stream.prime(db) == 0
+
+    assert stream.count_since(buyer, at - timedelta(minutes=1)) == 1
+    assert stream.count_since(seller, at - timedelta(minutes=1)) == 1
+
+
+async def test_transaction_primed_then_observed_live_is_counted_once(db) -> None:
+    buyer, seller = await _agents(db, 2)
+    at = datetime.now(timezone.utc)
+    tx_id = _id()
+    await db.execute(insert(Transaction), [{
+        "id": tx_id, "listing_id": _id(), "buyer_id": buyer, "seller_id": seller,
+        "amount_usdc": Decimal("1"), "status": "completed",
+        "content_hash": "sha256:" + "0" * 64, "initiated_at": at,
+    }])
+    await db.commit()
+
+    stream = StreamingAnomalyDetector()
+    # The live observe lands while priming is still in progress.
+    assert await stream._prime(db) == 2
+    stream.observe(TransactionEvent(tx_id, buyer, seller, 1, at))
+
+    assert stream.count_since(buyer, at - timedelta(minutes=1)) == 1
+    assert stream.count_since(seller, at - timedelta(minutes=1)) == 1
+
+
+async def test_transactions_and_registrations_feed_the_shared_stream(
+    db, make_agent, make_listing,
+) -> None:
+    from marketplace.schemas.agent import AgentRegisterRequest
+    from marketplace.services.registry_service import register_agent
+    from marketplace.services.transaction_service import initiate_transaction
+
+    seller, _ = await make_agent()
+    listing = await make_listing(seller.id)
+    buyer = await register_agent(db, AgentRegisterRequest(
+        name="fresh-buyer", agent_type="buyer", public_key="ssh-rsa " + "A" * 40,
+    ))
+    assert abuse_detection_service.abuse_stream.created_at(buyer.id) is not None
+
+    for _ in range(10):
+        await initiate_transaction(db, listing.id, buyer.id)
+
+    assert abuse_detection_service.abuse_stream.raised == {"new_account_high_volume": 1}
@@ -1,6 +1,7 @@
-"""Tests for TTLCache and SlidingWindowRateLimiter — 30 tests total.
+"""Tests for TTLCache and SlidingWindowRateLimiter — 31 tests total.
 
-TTLCache: 15 tests covering put/get, expiry, LRU eviction, stats, singletons.
+TTLCache: 16 tests covering put/get, expiry, LRU eviction, stats, singletons,
+and the byte budget of SizedTTLCache.
 SlidingWindowRateLimiter: 15 tests covering limits, headers, cleanup, key isolation.
 """
 
@@ -9,6 +10,7 @@ import time
 import pytest
 
 from marketplace.services.cache_service import (
+    SizedTTLCache,
     TTLCache,
     listing_cache,
     content_cache,
@@ -18,7 +20,7 @@ from marketplace.core.rate_limiter import SlidingWindowRateLimiter
 
 
 # ═══════════════════════════════════════════════════════════════════════════
-# TTLCache — 15 tests
+# TTLCache — 16 tests
 # ═══════════════════════════════════════════════════════════════════════════
 
 
@@ -179,6 +181,23 @@ class TestTTLCache:
         assert agent_cache._maxsize == 256
         assert agent_cache._default_ttl == 600.0
 
+    # 16
+    def test_sized_cache_evicts_lru_entries_to_fit_its_byte_budget(self):
+        """SizedTTLCache evicts by bytes and never caches oversized values."""
+        cache = SizedTTLCache(max_bytes=100, maxsize=10, default_ttl=10.0)
+        cache.put("a", b"x" * 40)
+        cache.put("b", b"x" * 40)
+        cache.get("a")  # "b" becomes least recently used
+        cache.put("c", b"x" * 40)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["bytes_used"] == 80
+
+        cache.put("huge", b"x" * 101)
+        assert cache.get("huge") is None
+        cache.put("a", b"x" * 10)  # replacing an entry frees its old size
+        assert cache.stats()["bytes_used"] == 50
+
 
 # ═══════════════════════════════════════════════════════════════════════════
 # SlidingWindowRateLimiter — 15 tests
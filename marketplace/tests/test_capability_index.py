@@ -0,0 +1,127 @@
+"""Tests for the in-memory capability index behind suggest_agents_for_capability."""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from sqlalchemy import delete, select
+
+from marketplace.models.agent import RegisteredAgent
+from marketplace.models.catalog import DataCatalogEntry
+from marketplace.models.reputation import ReputationScore
+from marketplace.services import catalog_service
+from marketplace.services.capability_index import CapabilityIndex
+
+_DATA = ["search", "fetch"]
+
+
+async def _ids(index: CapabilityIndex, db, keywords=_DATA) -> list[str]:
+    return [c.agent_id for c in await index.candidates(db, "data", keywords)]
+
+
+async def _searcher(make_agent):
+    agent, _ = await make_agent()
+    agent.capabilities = json.dumps(["web-search"])
+    return agent
+
+
+async def test_lookup_within_sync_interval_issues_no_queries(db, make_agent) -> None:
+    agent = await _searcher(make_agent)
+    await db.commit()
+    index = CapabilityIndex(sync_interval_seconds=60)
+    assert await _ids(index, db) == [agent.id]
+
+    with patch.object(db, "execute", side_effect=AssertionError("query issued")):
+        assert await _ids(index, db) == [agent.id]
+
+
+async def test_invalidate_reloads_only_that_agent(db, make_agent) -> None:
+    agent = await _searcher(make_agent)
+    other, _ = await make_agent()
+    await db.commit()
+    index = CapabilityIndex(sync_interval_seconds=60)
+    assert await _ids(index, db) == [agent.id]
+
+    other.description = "Fetches exchange rates"
+    await db.commit()
+    assert await _ids(index, db) == [agent.id]  # not yet re-synced
+    index.invalidate(other.id)
+
+    assert set(await _ids(index, db)) == {agent.id, other.id}
+    assert index.rebuilds == 1
+
+
+async def test_watermark_picks_up_writes_that_bypass_services(db, make_agent) -> None:
+    agent = await _searcher(make_agent)
+    await db.commit()
+    index = CapabilityIndex(sync_interval_seconds=0)
+    assert await _ids(index, db) == [agent.id]
+
+    agent.status = "suspended"
+    await db.commit()
+
+    assert await _ids(index, db) == []
+    assert index.rebuilds == 1
+
+
+async def test_reputation_update_changes_candidate_score(db, make_agent) -> None:
+    agent = await _searcher(make_agent)
+    db.add(ReputationScore(agent_id=agent.id, composite_score=0.4))
+    await db.commit()
+    index = CapabilityIndex(sync_interval_seconds=0)
+    assert (await index.candidates(db, "data", _DATA))[0].reputation_score == 0.4
+
+    rep = (await db.execute(
+        select(ReputationScore).where(ReputationScore.agent_id == agent.id)
+    )).scalar_one()
+    rep.composite_score = 0.9
+    rep.last_calculated_at = datetime.now(timezone.utc)
+    await db.commit()
+
+    assert (await index.candidates(db, "data", _DATA))[0].reputation_score == 0.9
+
+
+async def test_catalog_entries_are_prejoined_and_retirement_drops_them(
+    db, make_agent, make_catalog_entry,
+) -> None:
+    agent, _ = await make_agent()
+    cheap = await make_catalog_entry(agent.id, topic="fetch prices", price_range_min=0.5, quality_avg=0.6)
+    await make_catalog_entry(agent.id, topic="search news", price_range_min=2.0, quality_avg=0.9)
+    index = CapabilityIndex(sync_interval_seconds=60)
+
+    (candidate,) = await index.candidates(db, "data", _DATA)
+    assert (candidate.match_source, candidate.catalog_quality, candidate.avg_price) == ("catalog", 0.9, 0.5)
+
+    # delete_catalog_entry invalidates the shared singleton; forward that to this index.
+    with patch("marketplace.services.catalog_service.capability_index", index):
+        await catalog_service.delete_catalog_entry(db, cheap.id, agent.id)
+
+    (candidate,) = await index.candidates(db, "data", _DATA)
+    assert candidate.avg_price == 2.0
+
+
+async def test_hard_delete_triggers_rebuild(db, make_agent) -> None:
+    agent = await _searcher(make_agent)
+    await db.commit()
+    index = CapabilityIndex(sync_interval_seconds=0)
+    assert await _ids(index, db) == [agent.id]
+
+    await db.execute(delete(ReputationScore).where(ReputationScore.agent_id == agent.id))
+    await db.execute(delete(DataCatalogEntry).where(DataCatalogEntry.agent_id == agent.id))
+    await db.execute(delete(RegisteredAgent).where(RegisteredAgent.id == agent.id))
+    await db.commit()
+
+    assert await _ids(index, db) == []
+    assert index.rebuilds == 2
+
+
+async def test_adhoc_capability_keywords_are_indexed_separately(db, make_agent) -> None:
+    agent, _ = await make_agent()
+    agent.capabilities = json.dumps(["ocr"])
+    await db.commit()
+    index = CapabilityIndex()
+
+    assert [c.agent_id for c in await index.candidates(db, "ocr", ["ocr"])] == [agent.id]
+    assert await _ids(index, db) == []
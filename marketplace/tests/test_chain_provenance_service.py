@@ -1,5 +1,7 @@
 """Unit tests for the chain_provenance_service module."""
 
+import asyncio
+import hashlib
 import json
 import uuid
 from datetime import datetime, timezone
@@ -74,6 +76,7 @@ async def _seed_chain_execution(db, make_agent):
 # The callback creates its own DB session via async_session. In tests,
 # we monkeypatch async_session to use the test session factory so the
 # callback writes to the same in-memory database as the test fixture.
+# Events are buffered until the journal is flushed or closed.
 # ---------------------------------------------------------------------------
 
 
@@ -90,6 +93,7 @@ class TestMakeProvenanceCallback:
         ):
             callback = make_provenance_callback(execution.id)
             await callback("node_started", "n0", "agent_call", agent_id=agent.id)
+            await callback.close()
 
         entries, total = await chain_provenance_service.get_provenance_entries(
             db, execution.id
@@ -119,6 +123,7 @@ class TestMakeProvenanceCallback:
                 cost_usd=Decimal("0.05"),
                 duration_ms=150,
             )
+            await callback.close()
 
         entries, total = await chain_provenance_service.get_provenance_entries(
             db, execution.id, event_type="node_completed"
@@ -146,6 +151,7 @@ class TestMakeProvenanceCallback:
                 agent_id=agent.id,
                 error_message="Connection timeout",
             )
+            await callback.close()
 
         entries, _ = await chain_provenance_service.get_provenance_entries(
             db, execution.id, event_type="node_failed"
@@ -154,6 +160,74 @@ class TestMakeProvenanceCallback:
         assert entries[0].error_message == "Connection timeout"
         assert entries[0].status == "failed"
 
+    @pytest.mark.asyncio
+    async def test_events_are_buffered_and_written_in_one_batch(self, db, make_agent):
+        from marketplace.tests.conftest import _test_sessionmaker
+
+        agent, _, execution = await _seed_chain_execution(db, make_agent)
+        sessions = []
+
+        def _session():
+            sessions.append(1)
+            return _test_sessionmaker()
+
+        with patch("marketplace.database.async_session", new=_session):
+            callback = make_provenance_callback(execution.id)
+            for i in range(50):
+                await callback("node_started", f"n{i}", "agent_call", agent_id=agent.id)
+                await callback("node_completed", f"n{i}", "agent_call", output_json="{}")
+            _, before_close = await chain_provenance_service.get_provenance_entries(
+                db, execution.id
+            )
+            await callback.close()
+
+        _, total = await chain_provenance_service.get_provenance_entries(
+            db, execution.id, limit=200
+        )
+        assert before_close == 0
+        assert total == 100
+        assert len(sessions) == 1
+
+    @pytest.mark.asyncio
+    async def test_timeline_replays_in_recorded_order(self, db, make_agent):
+        from marketplace.tests.conftest import _test_sessionmaker
+
+        _, _, execution = await _seed_chain_execution(db, make_agent)
+        big = json.dumps({"blob": "x" * 200_000})
+
+        with patch("marketplace.database.async_session", new=_test_sessionmaker), \
+                patch.object(chain_provenance_service.settings, "chain_provenance_flush_batch_size", 7):
+            callback = make_provenance_callback(execution.id)
+            for i in range(20):
+                await callback("node_started", f"n{i}", "agent_call")
+                await callback("node_completed", f"n{i}", "agent_call", input_json=big)
+            await callback.close()
+
+        timeline = await chain_provenance_service.get_provenance_timeline(db, execution.id)
+        assert [(t["node_id"], t["event_type"]) for t in timeline] == [
+            (f"n{i}", event)
+            for i in range(20)
+            for event in ("node_started", "node_completed")
+        ]
+        assert timeline[1]["input_hash_sha256"] == hashlib.sha256(big.encode()).hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_pending_events_flush_after_the_interval(self, db, make_agent):
+        from marketplace.tests.conftest import _test_sessionmaker
+
+        _, _, execution = await _seed_chain_execution(db, make_agent)
+
+        with patch("marketplace.database.async_session", new=_test_sessionmaker), \
+                patch.object(chain_provenance_service.settings, "chain_provenance_flush_interval_seconds", 0.01):
+            callback = make_provenance_callback(execution.id)
+            await callback("node_started", "n0", "agent_call")
+            await asyncio.sleep(0.1)
+
+            _, total = await chain_provenance_service.get_provenance_entries(db, execution.id)
+            await callback.close()
+
+        assert total == 1
+
 
 # ---------------------------------------------------------------------------
 # get_provenance_entries tests
@@ -0,0 +1,247 @@
+"""Tests for marketplace.model_layer.completion_cache and its ModelRouter wiring."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from marketplace.core.metrics import MODEL_CACHE_LOOKUPS
+from marketplace.model_layer import completion_cache
+from marketplace.model_layer.completion_cache import (
+    CompletionCache,
+    SQLiteCompletionStore,
+    completion_cache_key,
+)
+from marketplace.model_layer.config import ModelLayerConfig, ProviderConfig
+from marketplace.model_layer.router import ModelRouter
+from marketplace.model_layer.types import (
+    CompletionRequest,
+    CompletionResponse,
+    ModelProvider,
+    ToolCall,
+)
+from marketplace.services.smart_orchestrator import SmartOrchestrator
+
+
+def _response(content: str = "answer") -> CompletionResponse:
+    return CompletionResponse(
+        content=content,
+        tool_calls=[ToolCall(id="t1", name="lookup", arguments="{}")],
+        model="test-model",
+        provider=ModelProvider.OPENAI,
+        prompt_tokens=10,
+        completion_tokens=5,
+        latency_ms=120.0,
+    )
+
+
+def _request(prompt: str = "hello", **kwargs) -> CompletionRequest:
+    kwargs.setdefault("temperature", 0.0)
+    return CompletionRequest(messages=[{"role": "user", "content": prompt}], **kwargs)
+
+
+def _router(cache: CompletionCache) -> tuple[ModelRouter, MagicMock]:
+    backend = MagicMock()
+    backend.complete = AsyncMock(side_effect=lambda request: _response(request.messages[-1]["content"]))
+    backend.close = AsyncMock()
+    config = ModelLayerConfig(
+        default_provider=ModelProvider.OPENAI,
+        fallback_order=[ModelProvider.OPENAI],
+        openai=ProviderConfig(default_model="test-model"),
+    )
+    router = ModelRouter(config, cache=cache)
+    router.register_provider(ModelProvider.OPENAI, backend)
+    return router, backend
+
+
+class _FakeEmbeddings:
+    """Maps prompts to fixed vectors so similarity is controlled by the test."""
+
+    def __init__(self, vectors: dict[str, list[float]]) -> None:
+        self._vectors = vectors
+
+    async def embed(self, text: str) -> list[float]:
+        return self._vectors[text.split(": ", 1)[1]]
+
+
+def _lookups(result: str) -> float:
+    return MODEL_CACHE_LOOKUPS.labels(result=result)._value.get()
+
+
+async def test_exact_hit_skips_provider_and_marks_cached() -> None:
+    router, backend = _router(CompletionCache())
+
+    first = await router.complete(_request())
+    second = await router.complete(_request())
+
+    assert backend.complete.await_count == 1
+    assert first.cached is False
+    assert second.cached is True
+    assert second.content == first.content
+
+
+async def test_key_covers_temperature_tools_and_max_tokens() -> None:
+    base = completion_cache_key(_request())
+    assert completion_cache_key(_request()) == base
+    assert completion_cache_key(_request(temperature=0.7)) != base
+    assert completion_cache_key(_request(max_tokens=10)) != base
+    assert completion_cache_key(_request(tools=[{"name": "lookup"}])) != base
+    assert completion_cache_key(_request(model="other")) != base
+
+
+async def test_ttl_expiry_and_lru_bound() -> None:
+    cache = CompletionCache(maxsize=2, ttl_seconds=0.05)
+    router, backend = _router(cache)
+
+    await router.complete(_request("a"))
+    await router.complete(_request("b"))
+    await router.complete(_request("c"))
+    assert len(cache) == 2
+
+    await router.complete(_request("a"))  # evicted by the LRU bound
+    assert backend.complete.await_count == 4
+
+    await asyncio.sleep(0.06)
+    await router.complete(_request("c"))  # expired
+    assert backend.complete.await_count == 5
+
+
+async def test_semantic_hit_for_similar_deterministic_prompt() -> None:
+    embeddings = _FakeEmbeddings({
+        "summarise the report": [1.0, 0.0, 0.1],
+        "summarize the report": [1.0, 0.0, 0.12],
+        "write a poem": [0.0, 1.0, 0.0],
+    })
+    router, backend = _router(CompletionCache(embedding_service=embeddings, semantic_threshold=0.95))
+    before = _lookups("semantic_hit")
+
+    await router.complete(_request("summarise the report"))
+    similar = await router.complete(_request("summarize the report"))
+    other = await router.complete(_request("write a poem"))
+
+    assert similar.cached is True
+    assert similar.content == "summarise the report"
+    assert other.cached is False
+    assert backend.complete.await_count == 2
+    assert _lookups("semantic_hit") == before + 1
+
+
+async def test_semantic_scan_runs_off_the_event_loop() -> None:
+    import threading
+
+    embeddings = _FakeEmbeddings({"a": [1.0, 0.0], "a!": [1.0, 0.0]})
+    router, _ = _router(CompletionCache(embedding_service=embeddings))
+    loop_thread = threading.get_ident()
+    scanned_on: list[int] = []
+    real_best_match = completion_cache._best_match
+
+    def _tracking(*args):
+        scanned_on.append(threading.get_ident())
+        return real_best_match(*args)
+
+    with patch.object(completion_cache, "_best_match", _tracking):
+        await router.complete(_request("a"))
+        similar = await router.complete(_request("a!"))
+
+    assert similar.cached is True
+    assert scanned_on and loop_thread not in scanned_on
+
+
+async def test_semantic_tier_ignores_sampled_requests() -> None:
+    embeddings = _FakeEmbeddings({"a": [1.0, 0.0], "a!": [1.0, 0.0]})
+    router, backend = _router(CompletionCache(embedding_service=embeddings))
+
+    await router.complete(_request("a", temperature=0.7, cache=True))
+    await router.complete(_request("a!", temperature=0.7, cache=True))
+
+    assert backend.complete.await_count == 2
+
+
+async def test_sampled_requests_are_cached_only_on_opt_in() -> None:
+    router, backend = _router(CompletionCache())
+
+    await router.complete(_request(temperature=0.7))
+    sampled = await router.complete(_request(temperature=0.7))
+    assert sampled.cached is False
+    assert backend.complete.await_count == 2
+
+    await router.complete(_request(temperature=0.7, cache=True))
+    opted_in = await router.complete(_request(temperature=0.7, cache=True))
+    assert opted_in.cached is True
+    assert backend.complete.await_count == 3
+
+
+async def test_sqlite_store_survives_new_cache_instance(tmp_path) -> None:
+    path = str(tmp_path / "cache" / "completions.db")
+    first_router, first_backend = _router(CompletionCache(store=SQLiteCompletionStore(path)))
+    await first_router.complete(_request())
+    await first_router.close()
+
+    second_router, second_backend = _router(CompletionCache(store=SQLiteCompletionStore(path)))
+    response = await second_router.complete(_request())
+    await second_router.close()
+
+    assert second_backend.complete.await_count == 0
+    assert response.cached is True
+    assert response.tool_calls == [ToolCall(id="t1", name="lookup", arguments="{}")]
+    assert response.provider is ModelProvider.OPENAI
+
+
+async def test_concurrent_identical_requests_share_one_call() -> None:
+    router, backend = _router(CompletionCache())
+    release = asyncio.Event()
+
+    async def slow(request):
+        await release.wait()
+        return _response()
+
+    backend.complete = AsyncMock(side_effect=slow)
+    tasks = [asyncio.create_task(router.complete(_request())) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert backend.complete.await_count == 1
+    assert sum(result.cached for result in results) == 4
+
+
+async def test_refresh_bypasses_lookup_and_replaces_entry() -> None:
+    router, backend = _router(CompletionCache())
+    backend.complete = AsyncMock(side_effect=[_response("stale"), _response("fresh")])
+    before = _lookups("bypass")
+
+    await router.complete(_request())
+    refreshed = await router.complete(_request(cache=False))
+    cached = await router.complete(_request())
+
+    assert refreshed.content == "fresh"
+    assert cached.content == "fresh" and cached.cached is True
+    assert _lookups("bypass") == before + 1
+
+
+async def test_failed_call_is_not_cached() -> None:
+    router, backend = _router(CompletionCache())
+    backend.complete = AsyncMock(side_effect=[RuntimeError("boom"), _response()])
+
+    try:
+        await router.complete(_request())
+    except RuntimeError:
+        pass
+    response = await router.complete(_request())
+
+    assert response.cached is False
+    assert backend.complete.await_count == 2
+
+
+async def test_orchestrator_reuses_router_cache(db) -> None:
+    router, backend = _router(CompletionCache())
+    orchestrator = SmartOrchestrator(db=db, llm_client=router)
+
+    first = await orchestrator._call_llm("decompose: fetch prices")
+    second = await orchestrator._call_llm("decompose: fetch prices")
+    retried = await orchestrator._call_llm("decompose: fetch prices", refresh=True)
+
+    assert first == second == retried == "decompose: fetch prices"
+    assert backend.complete.await_count == 2
+    request = backend.complete.await_args.args[0]
+    assert request.temperature == 0.0
@@ -0,0 +1,173 @@
+"""Tests for background GDPR export and deletion jobs."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event, func, insert, select
+
+from marketplace.models.compliance_job import ComplianceJob
+from marketplace.models.listing import DataListing
+from marketplace.models.transaction import Transaction
+from marketplace.services import compliance_service, storage_service
+from marketplace.storage.hashfs import HashFS
+
+
+@pytest.fixture
+def store(tmp_path):
+    storage = HashFS(str(tmp_path / "store"))
+    with patch.object(storage_service, "_storage", storage):
+        yield storage
+
+
+async def _listings(db, seller_id: str, count: int) -> None:
+    await db.execute(insert(DataListing), [
+        {"id": str(uuid.uuid4()), "seller_id": seller_id, "title": f"listing {i}",
+         "category": "web_search", "content_hash": "sha256:" + "0" * 64,
+         "content_size": 10, "price_usdc": Decimal("1"), "status": "active"}
+        for i in range(count)
+    ])
+    await db.commit()
+
+
+async def _transactions(db, buyer_id: str, seller_id: str, count: int) -> None:
+    await db.execute(insert(Transaction), [
+        {"id": str(uuid.uuid4()), "listing_id": str(uuid.uuid4()), "buyer_id": buyer_id,
+         "seller_id": seller_id, "amount_usdc": Decimal("1"), "status": "completed",
+         "content_hash": "sha256:" + "0" * 64, "initiated_at": datetime.now(timezone.utc)}
+        for _ in range(count)
+    ])
+    await db.commit()
+
+
+async def _run(db, job: ComplianceJob) -> ComplianceJob:
+    from marketplace.tests.conftest import _test_sessionmaker
+
+    await compliance_service.run_job(_test_sessionmaker, job.id)
+    return (await db.execute(
+        select(ComplianceJob).where(ComplianceJob.id == job.id)
+        .execution_options(populate_existing=True)
+    )).scalar_one()
+
+
+def _artifact(store: HashFS, job: ComplianceJob) -> bytes:
+    return b"".join(store.get_stream(job.artifact_hash))
+
+
+async def test_ndjson_export_streams_every_row(db, make_agent, store) -> None:
+    agent, _ = await make_agent(name="busy-seller")
+    other, _ = await make_agent()
+    await _listings(db, agent.id, 250)
+    await _transactions(db, other.id, agent.id, 300)
+    await _transactions(db, agent.id, other.id, 20)
+
+    with patch.object(compliance_service, "_start"), \
+            patch.object(compliance_service.settings, "compliance_export_batch_size", 64):
+        job = await compliance_service.create_export_job(db, agent.id, include_reputation=False)
+        job = await _run(db, job)
+
+    assert job.status == "completed"
+    assert json.loads(job.progress_json) == {"agent": 1, "listings": 250, "transactions": 320}
+    lines = [json.loads(line) for line in _artifact(store, job).splitlines()]
+    assert job.artifact_size == sum(len(json.dumps(line)) + 1 for line in lines)
+    assert lines[0]["type"] == "export" and lines[0]["agent_id"] == agent.id
+    assert lines[1] == {"type": "agent", "data": lines[1]["data"]}
+    assert lines[1]["data"]["name"] == "busy-seller"
+    roles = [line["data"]["role"] for line in lines if line["type"] == "transactions"]
+    assert roles.count("seller") == 300 and roles.count("buyer") == 20
+    assert lines[-1] == {"type": "summary", "counts": json.loads(job.progress_json)}
+
+
+async def test_csv_export_is_a_zip_of_tables(db, make_agent, store) -> None:
+    agent, _ = await make_agent()
+    await _listings(db, agent.id, 5)
+
+    with patch.object(compliance_service, "_start"):
+        job = await compliance_service.create_export_job(db, agent.id, format="csv")
+        job = await _run(db, job)
+
+    archive = zipfile.ZipFile(io.BytesIO(_artifact(store, job)))
+    assert sorted(archive.namelist()) == [
+        "agent.csv", "export.json", "listings.csv", "reputation.csv",
+        "summary.json", "transactions.csv",
+    ]
+    listing_rows = archive.read("listings.csv").decode().splitlines()
+    assert listing_rows[0] == "id,title,category,price_usdc,status,created_at"
+    assert len(listing_rows) == 6
+    assert archive.read("transactions.csv") == b""
+
+
+async def test_export_of_a_missing_agent_fails_the_job(db, store) -> None:
+    with patch.object(compliance_service, "_start"):
+        job = await compliance_service.create_export_job(db, str(uuid.uuid4()))
+        job = await _run(db, job)
+
+    assert (job.status, job.failure_reason, job.artifact_hash) == ("failed", "Agent not found", None)
+
+
+async def test_deletion_resumes_from_its_checkpoint(db, make_agent) -> None:
+    agent, _ = await make_agent()
+    await _listings(db, agent.id, 7)
+
+    engine = db.bind.sync_engine
+    updates = 0
+
+    def _fail_third_batch(conn, cursor, statement, parameters, context, executemany):
+        nonlocal updates
+        if statement.startswith("UPDATE data_listings"):
+            updates += 1
+            if updates == 3:
+                raise ConnectionError("database went away")
+
+    with patch.object(compliance_service, "_start"), \
+            patch.object(compliance_service.settings, "compliance_deletion_batch_size", 2):
+        job = await compliance_service.create_deletion_job(db, agent.id)
+        event.listen(engine, "before_cursor_execute", _fail_third_batch)
+        try:
+            job = await _run(db, job)
+        finally:
+            event.remove(engine, "before_cursor_execute", _fail_third_batch)
+
+        assert job.status == "failed"
+        assert json.loads(job.checkpoint_json) == {"step": "listings", "agent": False, "listings": 4}
+
+        job = await _run(db, job)
+
+    assert job.status == "completed"
+    assert json.loads(job.progress_json) == {"agent": True, "listings": 7}
+    remaining = (await db.execute(
+        select(func.count()).select_from(DataListing)
+        .where(DataListing.seller_id == agent.id, DataListing.status != "deleted")
+    )).scalar()
+    assert remaining == 0
+
+
+async def test_export_download_endpoint_streams_the_artifact(client, make_agent, store) -> None:
+    agent, token = await make_agent(name="downloader")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = (await client.post(
+        "/api/v2/compliance/data-export", json={"format": "json"}, headers=headers,
+    )).json()
+    for _ in range(100):
+        status = (await client.get(
+            f"/api/v2/compliance/data-export/{created['job_id']}", headers=headers,
+        )).json()
+        if status["status"] == "completed":
+            break
+        await asyncio.sleep(0.02)
+
+    response = await client.get(status["download_url"], headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[1]["data"]["name"] == "downloader"
+    assert status["progress"]["agent"] == 1
@@ -0,0 +1,159 @@
+"""Tests for chunked content storage: boundaries, dedup, compression and GC."""
+
+from __future__ import annotations
+
+import random
+import time
+
+import pytest
+
+from marketplace.services import storage_maintenance_service as maintenance
+from marketplace.storage import chunking
+from marketplace.storage.hashfs import HashFS
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HashFS(str(tmp_path / "store"))
+
+
+def _data(size: int, seed: int = 1) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def test_numpy_and_python_boundaries_agree(monkeypatch) -> None:
+    pytest.importorskip("numpy")
+    data = _data(600_000)
+    vectorized = chunking._candidates(data[100:], data[:100])
+    monkeypatch.setattr(chunking, "_GEAR_NP", None)
+    assert chunking._candidates(data[100:], data[:100]) == vectorized
+    assert vectorized  # random data has boundaries
+
+
+def test_boundaries_do_not_depend_on_how_the_stream_is_split() -> None:
+    data = _data(2_000_000)
+    whole = list(chunking.split([data]))
+    pieces = list(chunking.split(data[i:i + 7000] for i in range(0, len(data), 7000)))
+    assert pieces == whole
+    assert b"".join(whole) == data
+    assert all(len(c) <= chunking.MAX_CHUNK for c in whole)
+
+
+def test_an_edit_moves_only_nearby_chunks() -> None:
+    data = _data(3_000_000)
+    edited = data[:1_500_000] + b"inserted" + data[1_500_000:]
+    before = set(chunking.split([data]))
+    after = list(chunking.split([edited]))
+    assert sum(c not in before for c in after) <= 2
+
+
+def test_large_content_round_trips_and_dedups_across_versions(store) -> None:
+    v1 = _data(1_000_000)
+    v2 = v1[:500_000] + b"v2" + v1[500_000:]
+    first = store.put(v1)
+    _, after_v1 = store.stats()["chunks"], store.stats()["chunk_bytes"]
+    second = store.put_stream(v2[i:i + 4096] for i in range(0, len(v2), 4096))
+
+    assert store.get(first) == v1
+    assert b"".join(store.get_stream(second)) == v2
+    stats = store.stats()
+    assert stats["objects"] == 2 and stats["bytes"] == len(v1) + len(v2)
+    assert stats["chunk_bytes"] - after_v1 < len(v2) // 3
+    assert store._hash_to_path(first.removeprefix("sha256:")).stat().st_size < 10_000
+
+
+def test_small_content_is_stored_verbatim(store) -> None:
+    content_hash = store.put_stream([b"small ", b"file"])
+    assert store._hash_to_path(content_hash.removeprefix("sha256:")).read_bytes() == b"small file"
+    assert store.stats()["chunks"] == 0
+
+
+def test_content_that_looks_like_a_manifest_is_chunked(store) -> None:
+    tricky = chunking.MANIFEST_MAGIC + b'{"size": 0, "chunks": []}'
+    assert store.get(store.put(tricky)) == tricky
+
+
+def test_deleted_content_releases_chunks_for_gc(store) -> None:
+    shared = _data(400_000)
+    kept = store.put(shared + b"kept")
+    dropped = store.put(_data(400_000, seed=2) + shared)
+    chunks_before = store.stats()["chunks"]
+
+    store.delete(dropped)
+    assert store.collect_chunks(time.time() - 3600) == (0, 0)  # grace period
+    freed, freed_bytes = store.collect_chunks(time.time() + 1)
+
+    assert 0 < freed < chunks_before and freed_bytes > 0
+    assert store.stats()["chunks"] == chunks_before - freed
+    assert store.get(kept) == shared + b"kept"
+
+
+def test_rebuild_recounts_chunk_references(store) -> None:
+    content = _data(300_000)
+    content_hash = store.put(content)
+    store.put(content[:200_000])
+    expected = store.stats()
+
+    store.rebuild_inventory()
+
+    assert store.stats() == expected
+    store.delete(content_hash)
+    assert store.collect_chunks(time.time() + 1)[0] > 0
+    assert store.get(store.compute_hash(content[:200_000])) == content[:200_000]
+
+
+def test_chunks_are_compressed_when_zstandard_is_available(store) -> None:
+    pytest.importorskip("zstandard")
+    content = b"highly repetitive line\n" * 20_000
+    assert store.get(store.put(content)) == content
+    assert store.stats()["chunk_bytes"] < len(content) // 10
+
+
+def test_range_reads_load_only_the_chunks_they_cover(store, monkeypatch) -> None:
+    content = _data(1_000_000)
+    chunked = store.put(content)
+    plain = store.put(content[:1000])
+    loaded = []
+    load_chunk = store._load_chunk
+    monkeypatch.setattr(store, "_load_chunk", lambda h: loaded.append(h) or load_chunk(h))
+
+    assert store.get_range(chunked, 500_000, 3000) == content[500_000:503_000]
+    assert 1 <= len(loaded) <= 2
+    assert store.get_range(chunked, 999_000, 5000) == content[999_000:]
+    assert store.get_range(plain, 100, 50) == content[100:150]
+    assert store.get_range("sha256:" + "0" * 64, 0, 10) is None
+
+
+def test_without_zstandard_chunks_are_stored_raw(monkeypatch) -> None:
+    monkeypatch.setattr(chunking, "zstandard", None)
+    monkeypatch.setattr(chunking, "_warned_no_zstd", False)
+    encoded = chunking.encode_chunk(b"abc" * 1000)
+    assert encoded[:1] == chunking.RAW
+    assert chunking.decode_chunk(encoded) == b"abc" * 1000
+
+
+class _BrokenZstd:
+    """Stands in for zstandard: every frame is rejected with its own error type."""
+
+    class ZstdError(Exception):
+        pass
+
+    class ZstdDecompressor:
+        def decompress(self, body):
+            raise _BrokenZstd.ZstdError("bad frame")
+
+
+def test_scrub_quarantines_a_corrupt_compressed_chunk_and_moves_on(store, monkeypatch) -> None:
+    content_hash = store.put(_data(300_000))
+    chunk = next(p for p in (store.root / ".chunks").rglob("*") if p.is_file())
+    chunk.write_bytes(chunking.ZSTD + b"not a zstd frame")
+
+    monkeypatch.setattr(chunking, "zstandard", None)  # can't tell: skip, don't loop
+    report = maintenance.scrub(store, bytes_per_second=0)
+    assert (report["checked"], report["corrupt"], report["cursor"]) == (1, [], None)
+
+    monkeypatch.setattr(chunking, "zstandard", _BrokenZstd)
+    with pytest.raises(ValueError):
+        chunking.decode_chunk(chunk.read_bytes())
+    report = maintenance.scrub(store, bytes_per_second=0)
+    assert (report["corrupt"], report["cursor"]) == ([content_hash], None)
@@ -0,0 +1,129 @@
+"""Tests for buffered search logging and incremental demand aggregation."""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from sqlalchemy import event, func, select
+
+from marketplace.core.hyperloglog import HyperLogLog
+from marketplace.models.search_log import SearchLog
+from marketplace.services import demand_service
+
+
+@contextmanager
+def _statements(db, needle: str):
+    seen: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if needle in statement:
+            seen.append(statement)
+
+    engine = db.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+async def test_record_search_is_buffered_until_flushed(db) -> None:
+    for i in range(5):
+        demand_service.record_search("weather data", requester_id=f"agent-{i}")
+
+    assert await db.scalar(select(func.count(SearchLog.id))) == 0
+    assert await demand_service.flush_searches(db) == 5
+    assert await db.scalar(select(func.count(SearchLog.id))) == 5
+    assert await demand_service.flush_searches(db) == 0
+
+
+async def test_full_buffer_triggers_a_flush_and_drops_oldest_past_the_cap() -> None:
+    with patch.object(demand_service.settings, "demand_search_flush_batch_size", 3), \
+            patch.object(demand_service.settings, "demand_search_buffer_max", 4), \
+            patch.object(demand_service, "fire_and_forget") as spawn:
+        for i in range(6):
+            demand_service.record_search(f"query {i}")
+
+    spawn.call_args.args[0].close()
+    assert spawn.call_count == 1
+    assert [e["query_text"] for e in demand_service._search_buffer] == [
+        "query 2", "query 3", "query 4", "query 5",
+    ]
+
+
+async def test_aggregation_folds_in_only_new_rows(db, make_search_log) -> None:
+    for _ in range(3):
+        await make_search_log(query_text="python tutorial")
+    await make_search_log(query_text="rust book")
+    first = await demand_service.aggregate_demand(db)
+    assert {s.query_pattern: s.search_count for s in first} == {"python tutorial": 3, "book rust": 1}
+
+    demand_service.record_search("Tutorial Python")
+    second = await demand_service.aggregate_demand(db)
+
+    # Unchanged patterns are neither rewritten nor returned
+    assert [(s.query_pattern, s.search_count) for s in second] == [("python tutorial", 4)]
+    assert await demand_service.aggregate_demand(db) == []
+
+
+async def test_wider_window_backfills_older_rows(db, make_search_log) -> None:
+    old = await make_search_log(query_text="old query")
+    old.created_at = datetime.now(timezone.utc) - timedelta(hours=30)
+    await db.commit()
+
+    assert await demand_service.aggregate_demand(db, time_window_hours=24) == []
+    signals = await demand_service.aggregate_demand(db, time_window_hours=48)
+    assert [(s.query_pattern, s.search_count) for s in signals] == [("old query", 1)]
+
+
+async def test_unique_requesters_are_estimated_across_buckets(db) -> None:
+    now = datetime.now(timezone.utc)
+    db.add_all(
+        SearchLog(
+            query_text="market data",
+            requester_id=f"agent-{i % 40}",
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(200)
+    )
+    await db.commit()
+
+    (signal,) = await demand_service.aggregate_demand(db)
+    assert signal.search_count == 200
+    assert abs(signal.unique_requesters - 40) <= 2
+
+
+async def test_opportunities_count_competing_listings_in_one_query(
+    db, make_agent, make_listing, make_search_log,
+) -> None:
+    seller, _ = await make_agent()
+    for _ in range(2):
+        await make_listing(seller.id, category="web_search")
+    for pattern, category in (("alpha", "web_search"), ("beta", "web_search"), ("gamma", "finance")):
+        for _ in range(3):
+            await make_search_log(query_text=pattern, category=category, matched_count=0)
+    await demand_service.aggregate_demand(db)
+
+    with _statements(db, "FROM data_listings") as statements:
+        opps = await demand_service.generate_opportunities(db)
+
+    assert len(statements) == 1
+    assert {o.query_pattern: o.competing_listings for o in opps} == {
+        "alpha": 2, "beta": 2, "gamma": 0,
+    }
+
+
+def test_hyperloglog_estimates_and_merges() -> None:
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(5000):
+        (a if i % 2 else b).add(f"user-{i}")
+    assert a.count() == len(a)
+    a.merge(b)
+    assert abs(a.count() - 5000) / 5000 < 0.1
+
+    small = HyperLogLog()
+    for value in ("x", "y", "x"):
+        small.add(value)
+    assert small.count() == 2
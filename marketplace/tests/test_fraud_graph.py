@@ -0,0 +1,132 @@
+"""Tests for the incremental trade graph behind Sybil detection."""
+
+from __future__ import annotations
+
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+from sqlalchemy import insert
+
+from marketplace.models.agent import RegisteredAgent
+from marketplace.models.transaction import Transaction
+from marketplace.services import fraud_prevention_service
+from marketplace.services.fraud_graph import TradeGraph, fraud_graph
+
+
+def _naive_components(edges):
+    """Reference: BFS components with pair and volume counts."""
+    adjacency: dict[str, set[str]] = {}
+    for a, b, _ in edges:
+        if a != b:
+            adjacency.setdefault(a, set()).add(b)
+            adjacency.setdefault(b, set()).add(a)
+    seen, result = set(), {}
+    for node in adjacency:
+        if node in seen:
+            continue
+        members, frontier = set(), [node]
+        while frontier:
+            current = frontier.pop()
+            if current not in members:
+                members.add(current)
+                frontier.extend(adjacency[current] - members)
+        seen |= members
+        pairs = sum(len(adjacency[m]) for m in members) // 2
+        volume = sum(c for a, b, c in edges if a != b and a in members)
+        result[frozenset(members)] = (pairs, volume)
+    return result
+
+
+def test_components_match_a_full_recomputation() -> None:
+    rng = random.Random(7)
+    agents = [f"a{i}" for i in range(300)]
+    edges = [(rng.choice(agents), rng.choice(agents), rng.randint(1, 5)) for _ in range(400)]
+
+    graph = TradeGraph.from_edges(edges)
+    got = {
+        frozenset(c["agent_ids"]): (c["internal_transactions"] // 2, c["total_volume"])
+        for c in graph.components()
+    }
+    assert got == _naive_components(edges)
+
+
+def test_trade_loops_are_strongly_connected_components() -> None:
+    graph = TradeGraph.from_edges([
+        ("a", "b", 1), ("b", "c", 1), ("c", "a", 2),  # loop
+        ("c", "d", 1), ("d", "e", 1),  # tail out of the loop
+        ("x", "y", 1), ("y", "x", 1),  # two-agent loop
+    ])
+
+    loops = graph.trade_loops(min_size=2)
+    assert sorted(sorted(loop["agent_ids"]) for loop in loops) == [["a", "b", "c"], ["x", "y"]]
+    abc = next(loop for loop in loops if "a" in loop["agent_ids"])
+    assert abc["internal_edges"] == 3 and abc["total_volume"] == 4
+
+
+def test_large_graph_builds_in_near_linear_time() -> None:
+    rng = random.Random(1)
+    agents = [str(i) for i in range(50_000)]
+    edges = [(rng.choice(agents), rng.choice(agents), 1) for _ in range(150_000)]
+
+    started = time.perf_counter()
+    graph = TradeGraph.from_edges(edges)
+    list(graph.components(min_size=3))
+    graph.trade_loops()
+    assert time.perf_counter() - started < 5
+
+
+async def _agents(db, created: list[datetime]) -> list[str]:
+    rows = [
+        {"id": str(uuid.uuid4()), "name": f"burst-{i}", "agent_type": "both",
+         "public_key": "ssh-rsa test", "status": "active", "created_at": at}
+        for i, at in enumerate(created)
+    ]
+    await db.execute(insert(RegisteredAgent), rows)
+    await db.commit()
+    return [r["id"] for r in rows]
+
+
+async def test_overlapping_registration_windows_merge_into_one_burst(db) -> None:
+    base = datetime.now(timezone.utc) - timedelta(hours=12)
+    # 15 registrations a minute apart, a quiet gap, then 10 more.
+    await _agents(db, [base + timedelta(minutes=i) for i in range(15)]
+                  + [base + timedelta(hours=3, minutes=i) for i in range(10)])
+
+    bursts = await fraud_prevention_service.detect_registration_bursts(
+        db, window_minutes=60, threshold=10,
+    )
+
+    assert [(b["count"], b["peak_count"], b["risk_level"]) for b in bursts] == [
+        (15, 15, "medium"),
+        (10, 10, "medium"),
+    ]
+
+
+async def test_completed_trades_update_the_live_graph_until_it_is_rebuilt(db) -> None:
+    a, b, c = await _agents(db, [datetime.now(timezone.utc) - timedelta(days=30)] * 3)
+    rows = [
+        {"id": str(uuid.uuid4()), "listing_id": str(uuid.uuid4()), "buyer_id": buyer,
+         "seller_id": seller, "amount_usdc": Decimal("1"), "status": "completed",
+         "content_hash": "sha256:" + "0" * 64, "initiated_at": datetime.now(timezone.utc)}
+        for buyer, seller in ((a, b), (b, c))
+    ]
+    await db.execute(insert(Transaction), rows)
+    await db.commit()
+
+    # Path a-b-c: one pair short of a clique, density 2/3
+    (cluster,) = await fraud_prevention_service.detect_sybil_clusters(db)
+    assert cluster["risk_level"] == "high"
+
+    fraud_graph.record_trade(c, a)
+    (cluster,) = await fraud_prevention_service.detect_sybil_clusters(db)
+    assert cluster["density"] == 1.0 and fraud_graph.rebuilds == 1
+    assert [len(loop["agent_ids"]) for loop in await fraud_prevention_service.detect_trade_loops(db)] == [3]
+
+    # A rebuild reflects the database again
+    with patch.object(fraud_prevention_service.fraud_graph, "_stale", return_value=True):
+        (cluster,) = await fraud_prevention_service.detect_sybil_clusters(db)
+    assert cluster["risk_level"] == "high" and fraud_graph.rebuilds == 2
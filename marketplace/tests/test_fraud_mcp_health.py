@@ -747,6 +747,7 @@ class TestRunHealthChecks:
         mock_db_write = AsyncMock(spec=AsyncSession)
         mock_db_write.add = MagicMock()
         mock_db_write.commit = AsyncMock()
+        mock_db_write.execute = AsyncMock(return_value=mock_result_read)  # re-read rows
 
         def _make_ctx(db):
             ctx = AsyncMock()
@@ -800,6 +801,7 @@ class TestRunHealthChecks:
         mock_db_write = AsyncMock(spec=AsyncSession)
         mock_db_write.add = MagicMock()
         mock_db_write.commit = AsyncMock()
+        mock_db_write.execute = AsyncMock(return_value=mock_result_read)  # re-read rows
 
         def _make_ctx(db):
             ctx = AsyncMock()
@@ -851,6 +853,7 @@ class TestRunHealthChecks:
         mock_db_write = AsyncMock(spec=AsyncSession)
         mock_db_write.add = MagicMock()
         mock_db_write.commit = AsyncMock()
+        mock_db_write.execute = AsyncMock(return_value=mock_result_read)  # re-read rows
 
         def _make_ctx(db):
             ctx = AsyncMock()
@@ -900,6 +903,7 @@ class TestRunHealthChecks:
         mock_db_write = AsyncMock(spec=AsyncSession)
         mock_db_write.add = MagicMock()
         mock_db_write.commit = AsyncMock()
+        mock_db_write.execute = AsyncMock(return_value=mock_result_read)  # re-read rows
 
         def _make_ctx(db):
             ctx = AsyncMock()
@@ -950,6 +954,7 @@ class TestRunHealthChecks:
         mock_db_write = AsyncMock(spec=AsyncSession)
         mock_db_write.add = MagicMock()
         mock_db_write.commit = AsyncMock()
+        mock_db_write.execute = AsyncMock(return_value=mock_result_read)  # re-read rows
 
         def _make_ctx(db):
             ctx = AsyncMock()
@@ -1003,6 +1008,7 @@ class TestRunHealthChecks:
         mock_db_write = AsyncMock(spec=AsyncSession)
         mock_db_write.add = MagicMock()
         mock_db_write.commit = AsyncMock()
+        mock_db_write.execute = AsyncMock(return_value=mock_result_read)  # re-read rows
 
         def _make_ctx(db):
             ctx = AsyncMock()
@@ -0,0 +1,164 @@
+"""Tests for request-scoped DataLoader batching, query limits and persisted queries."""
+
+import hashlib
+
+from sqlalchemy import event
+
+from marketplace.graphql.dataloaders import create_loaders
+from marketplace.graphql.persisted_queries import persisted_query_cache
+from marketplace.graphql.schema import schema
+
+
+class _StatementCounter:
+    def __init__(self, db):
+        self.engine = db.get_bind()
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+_NESTED_LISTINGS = """
+query {
+  listings(limit: 100) {
+    id
+    seller { id name }
+    transactions(limit: 5) { id buyer { id } }
+  }
+}
+"""
+
+
+async def _execute(db, query, **kwargs):
+    return await schema.execute(query, context_value={"db": db, "user": None}, **kwargs)
+
+
+async def _seed(make_agent, make_listing, make_transaction, listings: int):
+    sellers = [(await make_agent())[0] for _ in range(5)]
+    buyer, _ = await make_agent()
+    for i in range(listings):
+        listing = await make_listing(sellers[i % len(sellers)].id)
+        await make_transaction(buyer.id, listing.seller_id, listing.id)
+
+
+async def test_nested_query_statement_count_is_constant(
+    db, make_agent, make_listing, make_transaction
+):
+    await _seed(make_agent, make_listing, make_transaction, listings=10)
+    with _StatementCounter(db) as small:
+        result = await _execute(db, _NESTED_LISTINGS)
+    assert result.errors is None
+    assert len(result.data["listings"]) == 10
+
+    await _seed(make_agent, make_listing, make_transaction, listings=90)
+    with _StatementCounter(db) as large:
+        result = await _execute(db, _NESTED_LISTINGS)
+    assert result.errors is None
+    assert len(result.data["listings"]) == 100
+
+    # listings, sellers, transactions, buyers: one statement per level.
+    assert large.count == small.count == 4
+    row = result.data["listings"][0]
+    assert row["seller"]["id"]
+    assert len(row["transactions"]) == 1
+
+
+async def test_loaders_cache_within_request(db, make_agent):
+    agent, _ = await make_agent()
+    loaders = create_loaders(db)
+
+    with _StatementCounter(db) as counter:
+        first = await loaders.agent.load(agent.id)
+        second = await loaders.agent.load(agent.id)
+
+    assert first is second
+    assert counter.count == 1
+
+
+async def test_depth_limit_rejects_deep_query(db):
+    query = """
+    query {
+      listings(limit: 1) {
+        seller { listings(limit: 1) { transactions(limit: 1) { buyer { workflows { id } } } } }
+      }
+    }
+    """
+    result = await _execute(db, query)
+    assert result.errors
+    assert "exceeds maximum operation depth" in result.errors[0].message
+
+
+async def test_complexity_limit_rejects_expensive_query(db):
+    query = """
+    query {
+      agents(limit: 100) { listings(limit: 100) { transactions(limit: 100) { id } } }
+    }
+    """
+    result = await _execute(db, query)
+    assert result.errors
+    assert "Query complexity" in result.errors[0].message
+    assert result.data is None
+
+
+async def test_complexity_counts_fragments(db):
+    query = """
+    query { agents(limit: 100) { ...Deep } }
+    fragment Deep on AgentType { listings(limit: 100) { transactions(limit: 100) { id } } }
+    """
+    result = await _execute(db, query)
+    assert result.errors
+    assert "Query complexity" in result.errors[0].message
+
+
+async def test_persisted_query_roundtrip(client, make_agent):
+    agent, _ = await make_agent(name="apq-agent")
+    query = "query ($id: String!) { agent(id: $id) { id name } }"
+    digest = hashlib.sha256(query.encode()).hexdigest()
+    persisted_query_cache.clear()
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": digest}}
+
+    miss = await client.post("/graphql", json={
+        "variables": {"id": agent.id}, "extensions": extensions,
+    })
+    assert miss.status_code == 200
+    assert miss.json()["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+    register = await client.post("/graphql", json={
+        "query": query, "variables": {"id": agent.id}, "extensions": extensions,
+    })
+    assert register.json()["data"]["agent"]["name"] == "apq-agent"
+
+    hit = await client.post("/graphql", json={
+        "variables": {"id": agent.id}, "extensions": extensions,
+    })
+    assert hit.json()["data"]["agent"]["id"] == agent.id
+
+
+async def test_persisted_query_hash_mismatch_rejected(client):
+    response = await client.post("/graphql", json={
+        "query": "query { agents { id } }",
+        "extensions": {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}},
+    })
+    assert response.json()["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_INVALID"
+
+
+async def test_persisted_query_resolved_by_schema_extension(db):
+    query = "query { agents(limit: 1) { id } }"
+    digest = hashlib.sha256(query.encode()).hexdigest()
+    persisted_query_cache.clear()
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": digest}}
+
+    miss = await _execute(db, None, operation_extensions=extensions)
+    assert miss.errors[0].extensions["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+    assert not (await _execute(db, query, operation_extensions=extensions)).errors
+    hit = await _execute(db, None, operation_extensions=extensions)
+    assert not hit.errors
+    assert hit.data == {"agents": []}
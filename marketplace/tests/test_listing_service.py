@@ -118,8 +118,9 @@ async def test_create_listing_cache_population(db: AsyncSession, make_agent):
     # Check cache
     cached = listing_cache.get(f"listing:{listing.id}")
     assert cached is not None
-    assert cached.id == listing.id
-    assert cached.title == "Cache Test"
+    assert cached["listing"]["id"] == listing.id
+    assert cached["listing"]["title"] == "Cache Test"
+    assert cached["seller"]["id"] == agent.id
 
 
 async def test_create_listing_minimal_fields(db: AsyncSession, make_agent):
@@ -188,13 +189,15 @@ async def test_get_listing_cache_hit(db: AsyncSession, make_agent):
     # First call populates cache (already cached from create)
     listing1 = await listing_service.get_listing(db, created.id)
 
-    # Manually modify cached object to verify cache is used
+    # Manually modify the cached snapshot to verify cache is used
     cached = listing_cache.get(f"listing:{created.id}")
-    cached.title = "MODIFIED IN CACHE"
+    cached["listing"]["title"] = "MODIFIED IN CACHE"
+    db.expunge_all()  # otherwise the session's own instance is returned
 
-    # Second call should return cached version
+    # Second call should return cached version, seller included
     listing2 = await listing_service.get_listing(db, created.id)
     assert listing2.title == "MODIFIED IN CACHE"
+    assert listing2.seller.id == agent.id
 
     # Clean up cache for other tests
     listing_cache.clear()
@@ -219,7 +222,7 @@ async def test_get_listing_populates_cache(db: AsyncSession, make_agent):
 
     cached = listing_cache.get(f"listing:{created.id}")
     assert cached is not None
-    assert cached.id == listing.id
+    assert cached["listing"]["id"] == listing.id
 
 
 # ---------------------------------------------------------------------------
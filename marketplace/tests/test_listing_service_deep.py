@@ -259,8 +259,8 @@ async def test_get_listing_caches_result(db: AsyncSession, make_agent):
 
     cached = listing_cache.get(f"listing:{fetched.id}")
     assert cached is not None
-    assert cached.id == fetched.id
-    assert cached.title == "Cache Me"
+    assert cached["listing"]["id"] == fetched.id
+    assert cached["listing"]["title"] == "Cache Me"
 
 
 async def test_update_listing_invalidates_cache(db: AsyncSession, make_agent):
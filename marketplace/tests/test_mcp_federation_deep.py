@@ -366,8 +366,8 @@ class TestMCPFederationService:
 
         with patch("marketplace.services.mcp_federation_service.httpx.AsyncClient") as mock_client_cls:
             mock_client = AsyncMock()
-            mock_client_cls.return_value.__aenter__ = AsyncMock(return_value=mock_client)
-            mock_client_cls.return_value.__aexit__ = AsyncMock(return_value=False)
+            mock_client.is_closed = False
+            mock_client_cls.return_value = mock_client
 
             mock_resp = MagicMock()
             mock_resp.json.return_value = {"result": "ok"}
@@ -0,0 +1,195 @@
+"""Tests for the concurrent, adaptively scheduled MCP health monitor."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from sqlalchemy import delete, select
+
+from marketplace.models.mcp_server import MCPServerEntry
+from marketplace.services import mcp_federation_service
+from marketplace.services.mcp_health_monitor import (
+    MCPHealthMonitor,
+    _run_health_checks,
+)
+from marketplace.tests.conftest import TestSession
+
+
+async def _servers(db, count: int, **kwargs) -> list[MCPServerEntry]:
+    servers = [
+        MCPServerEntry(name=f"srv-{i}", base_url=f"https://srv-{i}.example.com", namespace="ns", **kwargs)
+        for i in range(count)
+    ]
+    db.add_all(servers)
+    await db.commit()
+    return servers
+
+
+def _fake_upstream(latency: float = 0.0):
+    """Patch the monitor's HTTP client with a transport that answers /mcp/health."""
+    state = {"in_flight": 0, "peak": 0, "probes": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        state["probes"] += 1
+        await asyncio.sleep(latency)
+        state["in_flight"] -= 1
+        return httpx.Response(200, json={"status": "ok"})
+
+    real_client = httpx.AsyncClient
+
+    def client(**kwargs):
+        return real_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    return state, patch("marketplace.services.mcp_health_monitor.httpx.AsyncClient", side_effect=client)
+
+
+async def _scores(db) -> dict[str, tuple[int, str]]:
+    db.expire_all()
+    rows = (await db.execute(select(MCPServerEntry))).scalars().all()
+    return {s.name: (s.health_score, s.status) for s in rows}
+
+
+async def test_sweep_probes_concurrently_and_writes_every_score(db) -> None:
+    await _servers(db, 1000, health_score=80)
+    state, client_patch = _fake_upstream(latency=0.02)
+
+    started = time.perf_counter()
+    with client_patch, patch("marketplace.services.mcp_health_monitor.async_session", TestSession), \
+            patch("marketplace.services.mcp_health_monitor.settings.mcp_federation_health_max_concurrency", 100):
+        await _run_health_checks(MCPHealthMonitor())
+
+    assert time.perf_counter() - started < 5
+    assert state["probes"] == 1000
+    assert 1 < state["peak"] <= 100
+    assert set((await _scores(db)).values()) == {(90, "active")}
+
+
+async def test_stable_servers_back_off_and_degraded_ones_are_probed_sooner() -> None:
+    monitor = MCPHealthMonitor()
+    for _ in range(3):
+        monitor.schedule("stable", "active", 30, now=0)
+    monitor.schedule("flaky", "degraded", 30, now=0)
+
+    assert monitor.due("flaky", 9) and not monitor.due("stable", 9)
+    assert not monitor.due("stable", 100) and monitor.due("stable", 140)
+
+
+async def test_only_due_servers_are_probed(db) -> None:
+    await _servers(db, 3)
+    state, client_patch = _fake_upstream()
+    monitor = MCPHealthMonitor()
+
+    with client_patch, patch("marketplace.services.mcp_health_monitor.async_session", TestSession):
+        await _run_health_checks(monitor)
+        await _run_health_checks(monitor)
+
+    assert state["probes"] == 3
+
+
+async def test_failed_tool_calls_force_a_probe_and_lower_the_score(db) -> None:
+    (server,) = await _servers(db, 1, health_score=90)
+    state, client_patch = _fake_upstream()
+    monitor = MCPHealthMonitor()
+
+    with client_patch, patch("marketplace.services.mcp_health_monitor.async_session", TestSession):
+        await _run_health_checks(monitor)
+        for _ in range(3):
+            monitor.record_call(server.id, ok=False)
+        monitor.record_call(server.id, ok=True)
+        await _run_health_checks(monitor)
+
+    assert state["probes"] == 2
+    # +10 per healthy probe (capped at 100), then -30 * 3/4 error rate.
+    assert await _scores(db) == {"srv-0": (78, "degraded")}
+
+
+async def test_sweep_updates_the_routing_table_in_one_batch(db) -> None:
+    await _servers(db, 5, health_score=80)
+    _, client_patch = _fake_upstream()
+    table = mcp_federation_service.mcp_routing_table
+    await table.ensure_loaded(db)
+
+    with client_patch, patch("marketplace.services.mcp_health_monitor.async_session", TestSession), \
+            patch.object(table, "upsert", side_effect=AssertionError("per-server upsert")), \
+            patch.object(table, "_reindex", wraps=table._reindex) as reindex:
+        await _run_health_checks(MCPHealthMonitor())
+
+    assert reindex.call_count == 1
+    assert {route.health_score for route in table._servers.values()} == {90}
+
+
+async def test_route_failure_is_reported_to_the_monitor_not_written(db) -> None:
+    (server,) = await _servers(db, 1, tools_json='[{"name": "t"}]')
+    client = AsyncMock()
+    client.is_closed = False
+    client.post = AsyncMock(side_effect=httpx.ConnectError("refused"))
+
+    with patch("marketplace.services.mcp_federation_service.httpx.AsyncClient", return_value=client), \
+            patch.object(mcp_federation_service, "update_health_score", AsyncMock()) as update:
+        result = await mcp_federation_service.route_tool_call(db, "ns.t", {}, "agent-1")
+
+    assert "error" in result
+    update.assert_not_awaited()
+    assert mcp_federation_service.mcp_health_monitor.take_error_rate(server.id) == 1.0
+
+
+async def test_server_unregistered_mid_probe_does_not_lose_the_sweep(db) -> None:
+    gone_id, kept_id = (s.id for s in await _servers(db, 2, health_score=80))
+    _, client_patch = _fake_upstream()
+    monitor = MCPHealthMonitor()
+
+    async def _probe_while_unregistering(client, server):
+        if server.id == gone_id:
+            async with TestSession() as other:
+                await other.execute(delete(MCPServerEntry).where(MCPServerEntry.id == gone_id))
+                await other.commit()
+        return 5.0, True
+
+    with client_patch, patch("marketplace.services.mcp_health_monitor.async_session", TestSession), \
+            patch("marketplace.services.mcp_health_monitor._check_server", _probe_while_unregistering):
+        await _run_health_checks(monitor)
+
+    assert await _scores(db) == {"srv-1": (90, "active")}
+    assert not monitor.due(kept_id, time.monotonic()) and monitor.due(gone_id, time.monotonic())
+
+
+async def test_sweep_builds_on_scores_written_during_the_probe(db) -> None:
+    (server,) = await _servers(db, 1, health_score=80)
+    _, client_patch = _fake_upstream()
+
+    async def _probe_during_update(client, probed):
+        async with TestSession() as other:
+            await mcp_federation_service.update_health_score(other, probed.id, 30)
+        return 5.0, True
+
+    with client_patch, patch("marketplace.services.mcp_health_monitor.async_session", TestSession), \
+            patch("marketplace.services.mcp_health_monitor._check_server", _probe_during_update):
+        await _run_health_checks(MCPHealthMonitor())
+
+    assert await _scores(db) == {"srv-0": (40, "active")}  # 30 + 10, not 80 + 10
+
+
+async def test_failed_score_write_leaves_servers_due(db) -> None:
+    (server,) = await _servers(db, 1)
+    server_id = server.id
+    _, client_patch = _fake_upstream()
+    monitor = MCPHealthMonitor()
+    monitor.record_call(server_id, ok=False)
+
+    def failing():
+        session = TestSession()
+        session.commit = AsyncMock(side_effect=RuntimeError("db down"))
+        return session
+
+    with client_patch, patch("marketplace.services.mcp_health_monitor.async_session", failing):
+        with pytest.raises(RuntimeError):
+            await _run_health_checks(monitor)
+
+    assert monitor.due(server_id, time.monotonic())
+    assert monitor.error_rate(server_id) == 1.0
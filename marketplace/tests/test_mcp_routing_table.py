@@ -0,0 +1,159 @@
+"""Tests for the federated MCP routing table, peak-EWMA selection and call coalescing."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from marketplace.models.mcp_server import MCPServerEntry
+from marketplace.services import mcp_federation_service
+from marketplace.services.mcp_load_balancer import LoadBalanceStrategy, MCPLoadBalancer
+from marketplace.services.mcp_routing_table import FederationRoutingTable, mcp_routing_table
+
+_READ_ONLY = {"name": "forecast", "annotations": {"readOnlyHint": True}}
+_WRITE = {"name": "subscribe"}
+
+
+async def _server(db, name: str, namespace: str = "weather", tools=(_READ_ONLY, _WRITE), **kwargs):
+    server = MCPServerEntry(
+        name=name,
+        base_url=f"https://{name}.example.com",
+        namespace=namespace,
+        tools_json=json.dumps(list(tools)),
+        **kwargs,
+    )
+    db.add(server)
+    await db.commit()
+    return server
+
+
+def _pooled_client(result: dict, delay: float = 0.0) -> AsyncMock:
+    async def post(url, **kwargs):
+        await asyncio.sleep(delay)
+        resp = MagicMock()
+        resp.json.return_value = result
+        return resp
+
+    client = AsyncMock()
+    client.is_closed = False
+    client.post = AsyncMock(side_effect=post)
+    return client
+
+
+async def test_lookups_within_ttl_issue_no_queries(db) -> None:
+    await _server(db, "wx-1")
+    table = FederationRoutingTable(ttl_seconds=60)
+    await table.ensure_loaded(db)
+
+    with patch.object(db, "execute", side_effect=AssertionError("query issued")):
+        await table.ensure_loaded(db)
+        assert [r.name for r in table.routes("weather", "forecast")] == ["wx-1"]
+        assert [t["name"] for t in table.tools()] == ["weather.forecast", "weather.subscribe"]
+    assert table.reloads == 1
+
+
+async def test_routes_prefer_servers_advertising_the_tool(db) -> None:
+    await _server(db, "wx-full")
+    await _server(db, "wx-bare", tools=())
+    table = FederationRoutingTable(ttl_seconds=60)
+    await table.ensure_loaded(db)
+
+    assert [r.name for r in table.routes("weather", "forecast")] == ["wx-full"]
+    assert {r.name for r in table.routes("weather", "unknown")} == {"wx-full", "wx-bare"}
+    assert table.is_idempotent("weather", "forecast")
+    assert not table.is_idempotent("weather", "subscribe")
+
+
+async def test_health_update_reroutes_without_reload(db) -> None:
+    server = await _server(db, "wx-1")
+    await mcp_routing_table.ensure_loaded(db)
+
+    await mcp_federation_service.update_health_score(db, server.id, 0)
+
+    assert mcp_routing_table.routes("weather", "forecast") == []
+    assert mcp_routing_table.reloads == 1
+
+
+def test_peak_ewma_prefers_faster_server_and_reacts_to_spikes() -> None:
+    lb = MCPLoadBalancer(decay_seconds=10)
+    fast = MagicMock(id="fast", status="active", health_score=100)
+    slow = MagicMock(id="slow", status="active", health_score=100)
+    lb.record_completion("fast", latency_ms=20)
+    lb.record_completion("slow", latency_ms=200)
+    assert lb.select_server([slow, fast], "ns", LoadBalanceStrategy.PEAK_EWMA) is fast
+
+    lb.record_completion("fast", latency_ms=900)  # a spike is taken at face value
+    assert lb.latency_ms("fast") == 900
+    assert lb.select_server([slow, fast], "ns", LoadBalanceStrategy.PEAK_EWMA) is slow
+
+
+async def test_identical_idempotent_calls_are_coalesced(db) -> None:
+    await _server(db, "wx-1")
+    client = _pooled_client({"result": "sunny"}, delay=0.05)
+
+    with patch("marketplace.services.mcp_federation_service.httpx.AsyncClient", return_value=client):
+        results = await asyncio.gather(*(
+            mcp_federation_service.route_tool_call(db, "weather.forecast", {"city": "Oslo"}, "agent-1")
+            for _ in range(5)
+        ))
+
+    assert results == [{"result": "sunny"}] * 5
+    assert client.post.await_count == 1
+    assert mcp_federation_service._inflight == {}
+
+
+async def test_non_idempotent_calls_are_not_coalesced(db) -> None:
+    await _server(db, "wx-1")
+    client = _pooled_client({"result": "ok"}, delay=0.01)
+
+    with patch("marketplace.services.mcp_federation_service.httpx.AsyncClient", return_value=client):
+        await asyncio.gather(*(
+            mcp_federation_service.route_tool_call(db, "weather.subscribe", {"city": "Oslo"}, "agent-1")
+            for _ in range(3)
+        ))
+
+    assert client.post.await_count == 3
+
+
+async def test_degraded_servers_are_not_routed(db) -> None:
+    """Only active servers take calls, as before the routing table existed."""
+    await _server(db, "wx-degraded", status="degraded", health_score=40)
+    healthy = await _server(db, "wx-active")
+    await mcp_routing_table.ensure_loaded(db)
+
+    assert [r.name for r in mcp_routing_table.routes("weather", "forecast")] == ["wx-active"]
+
+    await mcp_federation_service.update_health_score(db, healthy.id, 40)
+    assert mcp_routing_table.routes("weather", "forecast") == []
+    result = await mcp_federation_service.route_tool_call(db, "weather.forecast", {}, "agent-1")
+    assert "No active server" in result["error"]
+
+
+async def test_upsert_many_reindexes_once(db) -> None:
+    servers = [await _server(db, f"wx-{i}") for i in range(3)]
+    table = FederationRoutingTable(ttl_seconds=60)
+    await table.ensure_loaded(db)
+    for server in servers:
+        server.status = "inactive"
+
+    with patch.object(table, "_reindex", wraps=table._reindex) as reindex:
+        table.upsert_many(servers)
+
+    assert reindex.call_count == 1
+    assert table.routes("weather", "forecast") == []
+
+
+async def test_coalesced_callers_get_their_own_result(db) -> None:
+    await _server(db, "wx-1")
+    client = _pooled_client({"result": {"temps": [1, 2]}}, delay=0.05)
+
+    with patch("marketplace.services.mcp_federation_service.httpx.AsyncClient", return_value=client):
+        first, second = await asyncio.gather(*(
+            mcp_federation_service.route_tool_call(db, "weather.forecast", {"city": "Oslo"}, "agent-1")
+            for _ in range(2)
+        ))
+
+    assert client.post.await_count == 1
+    first["result"]["temps"].append(3)
+    assert second == {"result": {"temps": [1, 2]}}
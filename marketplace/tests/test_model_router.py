@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
+import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from marketplace.model_layer.config import ModelLayerConfig, ProviderConfig
+from marketplace.model_layer.config import ModelLayerConfig, ProviderConfig, RoutingConfig
 from marketplace.model_layer.router import FallbackChain, ModelRouter
 from marketplace.model_layer.types import (
     CompletionRequest,
@@ -426,3 +428,159 @@ async def test_complete_all_fail_error_includes_provider_names() -> None:
     error_text = str(exc_info.value)
     assert "foundry_local" in error_text
     assert "openai" in error_text
+
+
+# ---------------------------------------------------------------------------
+# ModelRouter — adaptive routing, hedging, breakers
+# ---------------------------------------------------------------------------
+
+
+def _slow_backend(delay: float, provider: ModelProvider, content: str = "slow") -> MagicMock:
+    backend = _make_backend(content=content, provider=provider)
+
+    async def _complete(request):
+        await asyncio.sleep(delay)
+        return CompletionResponse(content=content, model=request.model, provider=provider)
+
+    backend.complete = AsyncMock(side_effect=_complete)
+    return backend
+
+
+def _two_provider_router(**routing) -> ModelRouter:
+    config = _make_config(fallback_order=[ModelProvider.OLLAMA, ModelProvider.OPENAI])
+    config.routing = RoutingConfig(**routing)
+    return ModelRouter(config)
+
+
+async def test_complete_does_not_mutate_request_model() -> None:
+    router = _two_provider_router()
+    router.register_provider(ModelProvider.OLLAMA, _make_backend(fail=True))
+    openai = _make_backend(provider=ModelProvider.OPENAI)
+    router.register_provider(ModelProvider.OPENAI, openai)
+
+    req = CompletionRequest(messages=[{"role": "user", "content": "hi"}])
+    await router.complete(req)
+
+    assert req.model == ""
+    assert openai.complete.call_args[0][0].model == "gpt-4o-mini"
+
+
+async def test_slow_provider_is_demoted_after_observed_latency() -> None:
+    router = _two_provider_router(slow_factor=2.0)
+    router.register_provider(ModelProvider.OLLAMA, _make_backend(provider=ModelProvider.OLLAMA))
+    router.register_provider(ModelProvider.OPENAI, _make_backend(provider=ModelProvider.OPENAI))
+    router._stats[ModelProvider.OLLAMA].record_success(5000.0)
+    router._stats[ModelProvider.OPENAI].record_success(400.0)
+
+    assert router._candidates() == [ModelProvider.OPENAI, ModelProvider.OLLAMA]
+
+    result = await router.complete(CompletionRequest(messages=[]))
+    assert result.provider == ModelProvider.OPENAI
+
+
+async def test_ordered_routing_keeps_configured_order() -> None:
+    router = _two_provider_router(adaptive=False)
+    router.register_provider(ModelProvider.OLLAMA, _make_backend(provider=ModelProvider.OLLAMA))
+    router.register_provider(ModelProvider.OPENAI, _make_backend(provider=ModelProvider.OPENAI))
+    router._stats[ModelProvider.OLLAMA].record_success(5000.0)
+    router._stats[ModelProvider.OPENAI].record_success(400.0)
+
+    assert router._candidates() == [ModelProvider.OLLAMA, ModelProvider.OPENAI]
+
+
+async def test_open_circuit_skips_provider() -> None:
+    router = _two_provider_router(breaker_failure_threshold=2, breaker_recovery_seconds=60)
+    failing = _make_backend(fail=True)
+    openai = _make_backend(content="fallback", provider=ModelProvider.OPENAI)
+    router.register_provider(ModelProvider.OLLAMA, failing)
+    router.register_provider(ModelProvider.OPENAI, openai)
+
+    for _ in range(3):
+        await router.complete(CompletionRequest(messages=[]))
+
+    # Two failures trip the breaker; the third request never reaches Ollama.
+    assert failing.complete.await_count == 2
+    assert router.provider_stats()[ModelProvider.OLLAMA]["circuit"] == "open"
+
+
+async def test_hedged_request_returns_fastest_provider() -> None:
+    router = _two_provider_router(hedge_enabled=True, hedge_min_samples=5, slow_factor=1000)
+    slow = _slow_backend(1.0, ModelProvider.OLLAMA)
+    fast = _slow_backend(0.01, ModelProvider.OPENAI, content="fast")
+    router.register_provider(ModelProvider.OLLAMA, slow)
+    router.register_provider(ModelProvider.OPENAI, fast)
+    for _ in range(5):
+        router._stats[ModelProvider.OLLAMA].record_success(20.0)
+
+    start = time.perf_counter()
+    result = await router.complete(CompletionRequest(messages=[]))
+
+    assert result.content == "fast"
+    assert time.perf_counter() - start < 0.5
+    slow.complete.assert_awaited_once()
+    await asyncio.sleep(0.01)  # let the cancelled loser unwind
+    assert router._stats[ModelProvider.OLLAMA].in_flight == 0
+
+
+async def test_hedge_loser_gives_back_its_half_open_slot() -> None:
+    from marketplace.services.circuit_breaker import CircuitBreaker
+
+    router = _two_provider_router(
+        adaptive=False, hedge_enabled=True, hedge_min_samples=5, slow_factor=1000,
+    )
+    router.register_provider(ModelProvider.OLLAMA, _slow_backend(1.0, ModelProvider.OLLAMA))
+    router.register_provider(ModelProvider.OPENAI, _slow_backend(0.01, ModelProvider.OPENAI))
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0, half_open_max_calls=1)
+    breaker.record_failure()  # OPEN, and HALF_OPEN on the next look
+    router._breakers[ModelProvider.OLLAMA] = breaker
+    for _ in range(5):
+        router._stats[ModelProvider.OLLAMA].record_success(20.0)
+
+    result = await router.complete(CompletionRequest(messages=[]))
+    await asyncio.sleep(0.01)  # let the cancelled loser unwind
+
+    assert result.provider == ModelProvider.OPENAI
+    assert breaker.allow_request() is True  # the trial slot is free again
+
+
+async def test_saturated_provider_is_tried_last() -> None:
+    config = _make_config(fallback_order=[ModelProvider.OLLAMA, ModelProvider.OPENAI])
+    config.ollama = ProviderConfig(default_model="llama3.2", max_concurrency=1)
+    router = ModelRouter(config)
+    router.register_provider(ModelProvider.OLLAMA, _slow_backend(0.2, ModelProvider.OLLAMA))
+    router.register_provider(ModelProvider.OPENAI, _make_backend(provider=ModelProvider.OPENAI))
+
+    first = asyncio.create_task(router.complete(CompletionRequest(messages=[])))
+    await asyncio.sleep(0.01)
+    second = await router.complete(CompletionRequest(messages=[]))
+
+    assert second.provider == ModelProvider.OPENAI
+    assert (await first).provider == ModelProvider.OLLAMA
+
+
+async def test_health_check_all_runs_concurrently_with_timeout() -> None:
+    router = _two_provider_router(health_check_timeout_seconds=0.2)
+    hung = _make_backend(provider=ModelProvider.OLLAMA)
+
+    async def _hang():
+        await asyncio.sleep(5)
+
+    hung.health_check = AsyncMock(side_effect=_hang)
+    slow_ok = _make_backend(provider=ModelProvider.OPENAI)
+
+    async def _slow_ok():
+        await asyncio.sleep(0.1)
+        return ModelHealth(provider=ModelProvider.OPENAI, available=True)
+
+    slow_ok.health_check = AsyncMock(side_effect=_slow_ok)
+    router.register_provider(ModelProvider.OLLAMA, hung)
+    router.register_provider(ModelProvider.OPENAI, slow_ok)
+
+    start = time.perf_counter()
+    results = await router.health_check_all()
+
+    assert time.perf_counter() - start < 0.5
+    assert results[ModelProvider.OLLAMA].available is False
+    assert results[ModelProvider.OPENAI].available is True
+    # Unhealthy providers move behind healthy ones.
+    assert router._candidates() == [ModelProvider.OPENAI, ModelProvider.OLLAMA]
@@ -0,0 +1,231 @@
+"""Tests for streamed completions: provider backends, and router failover."""
+
+from __future__ import annotations
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from marketplace.model_layer.config import ModelLayerConfig, ProviderConfig
+from marketplace.model_layer.providers.base import ModelProviderBackend
+from marketplace.model_layer.providers.foundry_local import FoundryLocalBackend
+from marketplace.model_layer.providers.ollama import OllamaBackend
+from marketplace.model_layer.providers.openai_provider import OpenAIBackend
+from marketplace.model_layer.router import ModelRouter
+from marketplace.model_layer.types import (
+    CompletionChunk,
+    CompletionRequest,
+    CompletionResponse,
+    ModelHealth,
+    ModelProvider,
+)
+
+
+def _request(**kwargs) -> CompletionRequest:
+    return CompletionRequest(messages=[{"role": "user", "content": "hi"}], **kwargs)
+
+
+async def _collect(chunks) -> list[CompletionChunk]:
+    return [chunk async for chunk in chunks]
+
+
+def _mock_http(body: str) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=body.encode())
+
+    return httpx.AsyncClient(base_url="http://test", transport=httpx.MockTransport(handler))
+
+
+class _FakeBackend(ModelProviderBackend):
+    """Streams fixed deltas; optionally fails before or after the first one."""
+
+    def __init__(self, provider: ModelProvider, deltas: list[str], fail_at: int | None = None) -> None:
+        self.provider = provider
+        self.deltas = deltas
+        self.fail_at = fail_at
+        self.calls = 0
+
+    async def complete(self, request: CompletionRequest) -> CompletionResponse:
+        raise NotImplementedError
+
+    async def stream(self, request: CompletionRequest):
+        self.calls += 1
+        for index, delta in enumerate(self.deltas):
+            if index == self.fail_at:
+                raise RuntimeError(f"{self.provider.value} broke")
+            yield CompletionChunk(delta=delta, provider=self.provider)
+        yield CompletionChunk(
+            provider=self.provider,
+            done=True,
+            response=CompletionResponse(
+                content="".join(self.deltas),
+                model="m",
+                provider=self.provider,
+                prompt_tokens=3,
+                completion_tokens=len(self.deltas),
+            ),
+        )
+
+    async def health_check(self) -> ModelHealth:
+        return ModelHealth(provider=self.provider, available=True)
+
+
+def _router(*backends: _FakeBackend) -> ModelRouter:
+    config = ModelLayerConfig(
+        default_provider=backends[0].provider,
+        fallback_order=[backend.provider for backend in backends],
+    )
+    router = ModelRouter(config)
+    for backend in backends:
+        router.register_provider(backend.provider, backend)
+    return router
+
+
+# ---------------------------------------------------------------------------
+# Provider backends
+# ---------------------------------------------------------------------------
+
+
+async def test_ollama_stream_yields_deltas_and_usage() -> None:
+    lines = [
+        {"model": "llama3.2", "message": {"content": "Hel"}, "done": False},
+        {"model": "llama3.2", "message": {"content": "lo"}, "done": False},
+        {"model": "llama3.2", "message": {"content": ""}, "done": True,
+         "prompt_eval_count": 7, "eval_count": 2},
+    ]
+    backend = OllamaBackend(ProviderConfig(base_url="http://test", default_model="llama3.2"))
+    backend._client = _mock_http("\n".join(json.dumps(line) for line in lines))
+
+    chunks = await _collect(backend.stream(_request()))
+
+    assert [c.delta for c in chunks if not c.done] == ["Hel", "lo"]
+    final = chunks[-1].response
+    assert final.content == "Hello"
+    assert (final.prompt_tokens, final.completion_tokens) == (7, 2)
+    assert final.provider is ModelProvider.OLLAMA
+
+
+async def test_foundry_stream_parses_sse_and_tool_calls() -> None:
+    events = [
+        {"model": "phi-4-mini", "choices": [{"delta": {"content": "A"}}]},
+        {"choices": [{"delta": {"tool_calls": [
+            {"index": 0, "id": "c1", "function": {"name": "search", "arguments": '{"q":'}},
+        ]}}]},
+        {"choices": [{"delta": {"tool_calls": [
+            {"index": 0, "function": {"arguments": '"x"}'}},
+        ]}}]},
+        {"choices": [], "usage": {"prompt_tokens": 4, "completion_tokens": 3}},
+    ]
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+    backend = FoundryLocalBackend(ProviderConfig(base_url="http://test", default_model="phi-4-mini"))
+    backend._client = _mock_http(body)
+
+    chunks = await _collect(backend.stream(_request()))
+
+    final = chunks[-1].response
+    assert final.content == "A"
+    assert final.tool_calls[0].name == "search"
+    assert final.tool_calls[0].arguments == '{"q":"x"}'
+    assert final.completion_tokens == 3
+
+
+async def test_openai_stream_requests_usage_and_prices_it() -> None:
+    def sdk_chunk(data: dict) -> MagicMock:
+        chunk = MagicMock()
+        chunk.model_dump.return_value = data
+        return chunk
+
+    async def sdk_stream():
+        yield sdk_chunk({"model": "gpt-4o-mini", "choices": [{"delta": {"content": "ok"}}]})
+        yield sdk_chunk({"choices": [], "usage": {"prompt_tokens": 1000, "completion_tokens": 1000}})
+
+    backend = OpenAIBackend(ProviderConfig(default_model="gpt-4o-mini"))
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=sdk_stream())
+    backend._client = client
+
+    chunks = await _collect(backend.stream(_request()))
+
+    kwargs = client.chat.completions.create.await_args.kwargs
+    assert kwargs["stream"] is True
+    assert kwargs["stream_options"] == {"include_usage": True}
+    final = chunks[-1].response
+    assert final.content == "ok"
+    assert final.cost_usd == pytest.approx(0.00075)
+
+
+# ---------------------------------------------------------------------------
+# Router
+# ---------------------------------------------------------------------------
+
+
+async def test_router_fails_over_before_first_token() -> None:
+    broken = _FakeBackend(ModelProvider.FOUNDRY_LOCAL, ["x"], fail_at=0)
+    healthy = _FakeBackend(ModelProvider.OLLAMA, ["a", "b"])
+    router = _router(broken, healthy)
+
+    chunks = await _collect(router.stream(_request()))
+
+    assert "".join(c.delta for c in chunks) == "ab"
+    assert chunks[-1].response.provider is ModelProvider.OLLAMA
+    assert router.provider_stats()[ModelProvider.FOUNDRY_LOCAL]["ewma_error_rate"] > 0
+
+
+async def test_router_does_not_fail_over_mid_stream() -> None:
+    flaky = _FakeBackend(ModelProvider.FOUNDRY_LOCAL, ["a", "b"], fail_at=1)
+    healthy = _FakeBackend(ModelProvider.OLLAMA, ["z"])
+    router = _router(flaky, healthy)
+    received: list[str] = []
+
+    with pytest.raises(RuntimeError, match="broke"):
+        async for chunk in router.stream(_request()):
+            received.append(chunk.delta)
+
+    assert received == ["a"]
+    assert healthy.calls == 0
+
+
+async def test_router_counts_tokens_at_stream_end() -> None:
+    router = _router(_FakeBackend(ModelProvider.OLLAMA, ["a", "b", "c"]))
+    mock_counter = MagicMock()
+
+    with patch("marketplace.model_layer.router.MODEL_TOKENS_TOTAL", mock_counter):
+        stream = router.stream(_request())
+        await stream.__anext__()
+        assert mock_counter.labels.call_count == 0
+        await _collect(stream)
+
+    directions = {call.kwargs["direction"] for call in mock_counter.labels.call_args_list}
+    assert directions == {"prompt", "completion"}
+
+
+async def test_router_releases_slot_when_consumer_stops_early() -> None:
+    backend = _FakeBackend(ModelProvider.OLLAMA, ["a", "b", "c"])
+    router = _router(backend)
+
+    stream = router.stream(_request())
+    await stream.__anext__()
+    await stream.aclose()
+
+    stats = router.provider_stats()[ModelProvider.OLLAMA]
+    assert stats["in_flight"] == 0
+    assert stats["ewma_error_rate"] == 0
+
+
+async def test_default_backend_stream_wraps_complete() -> None:
+    response = CompletionResponse(content="whole", provider=ModelProvider.OPENAI)
+
+    class Plain(ModelProviderBackend):
+        async def complete(self, request):
+            return response
+
+        async def health_check(self):
+            return ModelHealth(provider=ModelProvider.OPENAI, available=True)
+
+    chunks = await _collect(Plain().stream(_request()))
+
+    assert len(chunks) == 1
+    assert chunks[0].done and chunks[0].delta == "whole"
@@ -9,8 +9,10 @@ Covers:
   isolation, timeout, output capture, error containment, concurrent management.
 - TestSearchV2Service: Azure AI Search client, index sync, full-text search,
   faceted filtering, result ranking, empty results, query sanitization.
-- TestServiceBusService: message send/receive, queue management, dead letter
-  queue, message retry, connection management, batch operations.
+- TestServiceBusService: local queue backend send/receive, visibility timeout,
+  dead letter queue, max delivery count, batch operations, webhook pipeline.
+- TestServiceBusServiceAzure: Azure backend over a mocked async SDK client —
+  unconfigured mode, sender/receiver caching, settlement, receiver recovery.
 """
 
 import asyncio
@@ -77,7 +79,7 @@ from marketplace.services.search_v2_service import (
 # ---------------------------------------------------------------------------
 # Service Bus imports
 # ---------------------------------------------------------------------------
-from marketplace.services.servicebus_service import ServiceBusService
+from marketplace.services.servicebus_service import LocalQueueBackend, QueueMessage, ServiceBusService
 
 
 # ===========================================================================
@@ -959,171 +961,258 @@ class TestSearchV2Service:
 # ===========================================================================
 
 class TestServiceBusService:
-    """Service Bus service: message send/receive, DLQ, batch, lifecycle."""
+    """Local queue backend: send/receive, visibility timeout, DLQ, batch, lifecycle."""
+
+    async def test_send_receive_complete(self):
+        svc = LocalQueueBackend()
+        assert await svc.send_message("q1", {"key": "value"}, properties={"attempt": "1"}) is True
+
+        (msg,) = await svc.receive_messages("q1", max_wait_time=0)
+        assert json.loads(str(msg)) == {"key": "value"}
+        assert msg.properties == {"attempt": "1"}
+        assert msg.delivery_count == 1
+
+        assert await svc.complete_message(msg) is True
+        assert await svc.queue_depth("q1") == {"active": 0, "locked": 0, "dead_lettered": 0}
+
+    async def test_received_message_is_hidden_until_visibility_timeout(self):
+        svc = LocalQueueBackend(visibility_timeout=0.05)
+        await svc.send_message("q1", "hello")
+
+        (first,) = await svc.receive_messages("q1", max_wait_time=0)
+        assert await svc.receive_messages("q1", max_wait_time=0) == []
+        await asyncio.sleep(0.06)
+
+        (again,) = await svc.receive_messages("q1", max_wait_time=0)
+        assert again.message_id == first.message_id
+        assert again.delivery_count == 2
+        # The first receiver's lock expired, so it can no longer settle the message.
+        assert await svc.complete_message(first) is False
+        assert await svc.complete_message(again) is True
+
+    async def test_abandon_makes_message_visible_immediately(self):
+        svc = LocalQueueBackend(visibility_timeout=60)
+        await svc.send_message("q1", "retry me")
+        (msg,) = await svc.receive_messages("q1", max_wait_time=0)
+
+        assert await svc.abandon_message(msg) is True
+        assert len(await svc.receive_messages("q1", max_wait_time=0)) == 1
+
+    async def test_dead_letter_and_peek(self):
+        svc = LocalQueueBackend()
+        await svc.send_message("q1", "bad")
+        (msg,) = await svc.receive_messages("q1", max_wait_time=0)
+
+        assert await svc.dead_letter_message(msg, reason="processing error") is True
+        (dead,) = await svc.peek_dead_letters("q1")
+        assert str(dead) == "bad"
+        assert dead.dead_letter_reason == "processing error"
+        assert await svc.receive_messages("q1", max_wait_time=0) == []
+
+    async def test_max_delivery_count_dead_letters(self):
+        svc = LocalQueueBackend(visibility_timeout=0, max_delivery_count=2)
+        await svc.send_message("q1", "poison")
+
+        for _ in range(2):
+            assert len(await svc.receive_messages("q1", max_wait_time=0)) == 1
+        assert await svc.receive_messages("q1", max_wait_time=0) == []
+        (dead,) = await svc.peek_dead_letters("q1")
+        assert dead.dead_letter_reason == "MaxDeliveryCountExceeded"
+
+    async def test_send_batch_and_complete_batch_in_order(self):
+        svc = LocalQueueBackend()
+        assert await svc.send_batch("q1", ["a", {"b": 1}, "c"]) == 3
+        assert await svc.send_batch("q1", []) == 0
+
+        messages = await svc.receive_messages("q1", max_messages=2, max_wait_time=0)
+        assert [str(m) for m in messages] == ["a", '{"b": 1}']
+        assert await svc.complete_messages(messages) == 2
+        assert await svc.queue_depth("q1") == {"active": 1, "locked": 0, "dead_lettered": 0}
+
+    async def test_receive_long_polls_until_a_message_arrives(self):
+        svc = LocalQueueBackend()
+
+        async def _send_later():
+            await asyncio.sleep(0.05)
+            await svc.send_message("q1", "late")
+
+        sender = asyncio.create_task(_send_later())
+        messages = await svc.receive_messages("q1", max_wait_time=2)
+        await sender
+        assert [str(m) for m in messages] == ["late"]
+
+    async def test_queues_are_isolated(self):
+        svc = LocalQueueBackend()
+        await svc.send_message("q1", "one")
+        assert await svc.receive_messages("q2", max_wait_time=0) == []
+
+    async def test_file_backed_queue_survives_reopen(self, tmp_path):
+        path = str(tmp_path / "queue.db")
+        svc = LocalQueueBackend(path=path)
+        await svc.send_message("q1", "durable")
+        await svc.close()
+
+        reopened = LocalQueueBackend(path=path)
+        (msg,) = await reopened.receive_messages("q1", max_wait_time=0)
+        assert str(msg) == "durable"
+        await reopened.close()
+
+    async def test_webhook_pipeline_runs_on_local_queue(self, db):
+        from sqlalchemy import select as sa_select
+
+        from marketplace.models.webhook_v2 import DeadLetterEntry
+        from marketplace.services import webhook_v2_service
+
+        svc = LocalQueueBackend()
+        with patch.object(webhook_v2_service, "get_servicebus_service", return_value=svc), \
+                patch.object(webhook_v2_service.httpx, "AsyncClient") as mock_http:
+            client = AsyncMock()
+            client.__aenter__.return_value = client
+            client.post.return_value = MagicMock(status_code=503)
+            mock_http.return_value = client
+
+            await webhook_v2_service.enqueue_webhook_delivery(
+                db, "sub-1", {"callback_url": "https://example.com/hook"},
+            )
+            stats = [
+                await webhook_v2_service.process_webhook_queue(db, max_wait_time=0)
+                for _ in range(webhook_v2_service.MAX_DELIVERY_ATTEMPTS)
+            ]
 
-    def test_init_no_connection_string(self):
-        svc = ServiceBusService(connection_string="")
-        assert svc._client is None
-        assert svc._senders == {}
+        assert [s["dead_lettered"] for s in stats] == [0, 0, 1]
+        assert await svc.queue_depth("webhooks") == {"active": 0, "locked": 0, "dead_lettered": 1}
+        dead = (await db.execute(sa_select(DeadLetterEntry))).scalars().all()
+        assert len(dead) == 1
 
-    def test_send_message_stub_returns_false(self):
-        svc = ServiceBusService(connection_string="")
-        result = svc.send_message("queue1", "hello")
-        assert result is False
 
-    def test_send_message_dict_body_stub(self):
-        svc = ServiceBusService(connection_string="")
-        result = svc.send_message("queue1", {"key": "value"})
-        assert result is False
+def _azure_message(body: str = "payload") -> MagicMock:
+    msg = MagicMock()
+    msg.__str__ = lambda self: body
+    msg.message_id = "m-1"
+    msg.delivery_count = 1
+    msg.lock_token = "lock-1"
+    msg.application_properties = {}
+    return msg
 
-    def test_send_batch_stub_returns_zero(self):
-        svc = ServiceBusService(connection_string="")
-        result = svc.send_batch("queue1", ["msg1", "msg2"])
-        assert result == 0
 
-    def test_receive_messages_stub_returns_empty(self):
-        svc = ServiceBusService(connection_string="")
-        result = svc.receive_messages("queue1")
-        assert result == []
+class TestServiceBusServiceAzure:
+    """Azure backend: unconfigured mode, long-lived links, settlement, lifecycle."""
 
-    def test_complete_message_no_client(self):
+    def _svc(self) -> tuple[ServiceBusService, MagicMock]:
         svc = ServiceBusService(connection_string="")
-        result = svc.complete_message(MagicMock())
-        assert result is False
+        client = MagicMock()
+        client.close = AsyncMock()
+        svc._client = client
+        return svc, client
 
-    def test_dead_letter_message_no_client(self):
-        svc = ServiceBusService(connection_string="")
-        result = svc.dead_letter_message(MagicMock(), reason="bad")
-        assert result is False
-
-    def test_peek_dead_letters_no_client(self):
+    def test_init_no_connection_string(self):
         svc = ServiceBusService(connection_string="")
-        result = svc.peek_dead_letters("queue1")
-        assert result == []
+        assert svc._client is None
+        assert svc._senders == {} and svc._receivers == {}
 
-    def test_close_no_client(self):
+    async def test_unconfigured_operations_report_failure(self):
         svc = ServiceBusService(connection_string="")
-        # Should not raise even without a client
-        svc.close()
+        msg = QueueMessage(body="x", queue_name="queue1", raw=MagicMock())
+        assert await svc.send_message("queue1", "hello") is False
+        assert await svc.send_message("queue1", {"key": "value"}) is False
+        assert await svc.send_batch("queue1", ["msg1", "msg2"]) == 0
+        assert await svc.receive_messages("queue1") == []
+        assert await svc.complete_message(msg) is False
+        assert await svc.dead_letter_message(msg, reason="bad") is False
+        assert await svc.peek_dead_letters("queue1") == []
+        await svc.close()
         assert svc._client is None
 
-    def test_complete_message_with_mock(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()  # pretend we have a client
-        msg = MagicMock()
-        msg.complete = MagicMock()
-        result = svc.complete_message(msg)
-        assert result is True
-        msg.complete.assert_called_once()
+    def test_get_sender_caching(self):
+        svc, client = self._svc()
+        assert svc._get_sender("my-queue") is svc._get_sender("my-queue")
+        client.get_queue_sender.assert_called_once_with(queue_name="my-queue")
 
-    def test_dead_letter_message_with_mock(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()
-        msg = MagicMock()
-        msg.dead_letter = MagicMock()
-        result = svc.dead_letter_message(msg, reason="processing error")
-        assert result is True
-        msg.dead_letter.assert_called_once_with(
-            reason="processing error", error_description="processing error"
+    def test_get_sender_no_client(self):
+        assert ServiceBusService(connection_string="")._get_sender("any") is None
+
+    async def test_send_message_with_properties(self):
+        svc, client = self._svc()
+        sender = AsyncMock()
+        client.get_queue_sender.return_value = sender
+
+        with patch("marketplace.services.servicebus_service.ServiceBusMessage", create=True) as msg_cls:
+            assert await svc.send_message("events", "body", properties={"type": "webhook"}) is True
+
+        sender.send_messages.assert_awaited_once_with(msg_cls.return_value)
+        assert msg_cls.return_value.application_properties == {"type": "webhook"}
+
+    async def test_send_batch_with_client(self):
+        svc, client = self._svc()
+        sender = AsyncMock()
+        sender.create_message_batch.return_value = MagicMock()
+        client.get_queue_sender.return_value = sender
+
+        with patch("marketplace.services.servicebus_service.ServiceBusMessage", create=True):
+            assert await svc.send_batch("queue1", ["a", "b", "c"]) == 3
+        sender.send_messages.assert_awaited_once()
+
+    async def test_receive_messages_with_client(self):
+        svc, client = self._svc()
+        receiver = AsyncMock()
+        receiver.receive_messages.return_value = [_azure_message("a"), _azure_message("b")]
+        client.get_queue_receiver.return_value = receiver
+
+        messages = await svc.receive_messages("queue1", max_messages=5)
+        assert [str(m) for m in messages] == ["a", "b"]
+        assert all(m.queue_name == "queue1" for m in messages)
+
+    async def test_receive_failure_replaces_the_receiver(self):
+        svc, client = self._svc()
+        broken, fresh = AsyncMock(), AsyncMock()
+        broken.receive_messages.side_effect = RuntimeError("link detached")
+        fresh.receive_messages.return_value = [_azure_message("after")]
+        client.get_queue_receiver.side_effect = [broken, fresh]
+
+        with pytest.raises(RuntimeError):
+            await svc.receive_messages("queue1")
+        broken.close.assert_awaited_once()
+        assert "queue1" not in svc._receivers
+
+        (msg,) = await svc.receive_messages("queue1")
+        assert str(msg) == "after"
+        assert svc._receivers["queue1"] is fresh
+
+    async def test_complete_and_dead_letter_with_mock(self):
+        svc, client = self._svc()
+        receiver = AsyncMock()
+        receiver.receive_messages.return_value = [_azure_message("a"), _azure_message("b")]
+        client.get_queue_receiver.return_value = receiver
+        first, second = await svc.receive_messages("queue1")
+
+        assert await svc.complete_message(first) is True
+        receiver.complete_message.assert_awaited_once_with(first.raw)
+        assert await svc.dead_letter_message(second, reason="processing error") is True
+        receiver.dead_letter_message.assert_awaited_once_with(
+            second.raw, reason="processing error", error_description="processing error",
         )
 
-    def test_complete_message_attribute_error(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()
-        msg = MagicMock()
-        msg.complete = MagicMock(side_effect=AttributeError("no complete"))
-        result = svc.complete_message(msg)
-        assert result is False
-
-    def test_dead_letter_message_attribute_error(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()
-        msg = MagicMock()
-        msg.dead_letter = MagicMock(side_effect=AttributeError("no dead_letter"))
-        result = svc.dead_letter_message(msg)
-        assert result is False
-
-    def test_send_message_with_properties(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()
-        mock_sender = MagicMock()
-        svc._senders["events"] = mock_sender
-
-        # ServiceBusMessage may not be importable if SDK is missing, so inject it
-        import marketplace.services.servicebus_service as sb_mod
-        original = getattr(sb_mod, "ServiceBusMessage", None)
-        mock_msg_cls = MagicMock()
-        sb_mod.ServiceBusMessage = mock_msg_cls
-        try:
-            result = svc.send_message(
-                "events", "body", properties={"type": "webhook"}
-            )
-            assert result is True
-            mock_sender.send_messages.assert_called_once()
-        finally:
-            if original is not None:
-                sb_mod.ServiceBusMessage = original
-            else:
-                delattr(sb_mod, "ServiceBusMessage")
-
-    def test_send_batch_with_client(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()
-        mock_sender = MagicMock()
-        mock_batch = MagicMock()
-        mock_sender.create_message_batch.return_value = mock_batch
-        mock_batch.add_message = MagicMock()
-        svc._senders["queue1"] = mock_sender
-
-        import marketplace.services.servicebus_service as sb_mod
-        original = getattr(sb_mod, "ServiceBusMessage", None)
-        sb_mod.ServiceBusMessage = MagicMock(side_effect=lambda body: MagicMock(body=body))
-        try:
-            count = svc.send_batch("queue1", ["a", "b", "c"])
-            assert count == 3
-            assert mock_sender.send_messages.called
-        finally:
-            if original is not None:
-                sb_mod.ServiceBusMessage = original
-            else:
-                delattr(sb_mod, "ServiceBusMessage")
-
-    def test_close_with_senders(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()
-        s1 = MagicMock()
-        s2 = MagicMock()
+    async def test_settlement_errors_return_false(self):
+        svc, client = self._svc()
+        receiver = AsyncMock()
+        receiver.receive_messages.return_value = [_azure_message()]
+        receiver.complete_message.side_effect = AttributeError("no complete")
+        receiver.dead_letter_message.side_effect = RuntimeError("DLQ unavailable")
+        client.get_queue_receiver.return_value = receiver
+        (msg,) = await svc.receive_messages("queue1")
+
+        assert await svc.complete_message(msg) is False
+        assert await svc.dead_letter_message(msg) is False
+
+    async def test_close_with_links(self):
+        svc, client = self._svc()
+        s1, s2, r1 = AsyncMock(), AsyncMock(), AsyncMock()
         svc._senders = {"q1": s1, "q2": s2}
+        svc._receivers = {"q1": r1}
 
-        svc.close()
-        s1.close.assert_called_once()
-        s2.close.assert_called_once()
-        assert svc._senders == {}
+        await svc.close()
+        for link in (s1, s2, r1):
+            link.close.assert_awaited_once()
+        client.close.assert_awaited_once()
+        assert svc._senders == {} and svc._receivers == {}
         assert svc._client is None
-
-    def test_get_sender_caching(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()
-        mock_sender = MagicMock()
-        svc._client.get_queue_sender.return_value = mock_sender
-
-        sender1 = svc._get_sender("my-queue")
-        sender2 = svc._get_sender("my-queue")
-        assert sender1 is sender2
-        svc._client.get_queue_sender.assert_called_once_with(queue_name="my-queue")
-
-    def test_get_sender_no_client(self):
-        svc = ServiceBusService(connection_string="")
-        assert svc._get_sender("any") is None
-
-    def test_receive_messages_with_client(self):
-        svc = ServiceBusService(connection_string="")
-        svc._client = MagicMock()
-        mock_receiver = MagicMock()
-        mock_receiver.__enter__ = MagicMock(return_value=mock_receiver)
-        mock_receiver.__exit__ = MagicMock(return_value=False)
-        mock_receiver.receive_messages.return_value = [MagicMock(), MagicMock()]
-        svc._client.get_queue_receiver.return_value = mock_receiver
-
-        messages = svc.receive_messages("queue1", max_messages=5)
-        assert len(messages) == 2
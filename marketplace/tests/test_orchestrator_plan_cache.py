@@ -0,0 +1,191 @@
+"""Tests for the SmartOrchestrator plan cache and concurrent capability discovery."""
+
+from __future__ import annotations
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from marketplace.core.metrics import ORCHESTRATOR_PLAN_CACHE_LOOKUPS
+from marketplace.services.orchestrator_plan_cache import (
+    PlanCache,
+    PlanTemplate,
+    normalize_task,
+)
+from marketplace.services.smart_orchestrator import SmartOrchestrator
+
+
+def _plan(data_agent: str, analysis_agent: str) -> tuple[list[dict], list[dict], str]:
+    sub_tasks = [
+        {"id": "t1", "description": "fetch", "depends_on": [], "required_capability": "data"},
+        {"id": "t2", "description": "analyse", "depends_on": ["t1"], "required_capability": "analysis"},
+    ]
+    assignments = [
+        {"task_id": "t1", "agent_id": data_agent, "agent_name": "data", "skill_id": "default"},
+        {"task_id": "t2", "agent_id": analysis_agent, "agent_name": "analysis", "skill_id": "default"},
+    ]
+    dag = {
+        "nodes": {
+            "node_t1": {"type": "agent_call", "config": {"agent_id": data_agent}, "depends_on": []},
+            "node_t2": {"type": "agent_call", "config": {"agent_id": analysis_agent},
+                        "depends_on": ["node_t1"]},
+        },
+        "edges": [],
+    }
+    return sub_tasks, assignments, json.dumps(dag)
+
+
+def _lookups(result: str) -> float:
+    return ORCHESTRATOR_PLAN_CACHE_LOOKUPS.labels(result=result)._value.get()
+
+
+async def _no_discovery(capabilities):
+    raise AssertionError("discovery should not run")
+
+
+def test_normalize_task_ignores_case_punctuation_and_spacing() -> None:
+    assert normalize_task("  Fetch BTC prices,  then   analyse!") == "fetch btc prices then analyse"
+
+
+async def test_hit_returns_copy_of_revalidated_plan(db, make_agent) -> None:
+    a, _ = await make_agent()
+    b, _ = await make_agent()
+    cache = PlanCache()
+    await cache.put("Fetch prices, then analyse", PlanTemplate.from_plan(*_plan(a.id, b.id)))
+    before = _lookups("hit")
+
+    plan = await cache.get(db, "fetch prices then ANALYSE", _no_discovery)
+
+    assert plan is not None
+    assert plan.agent_ids() == {a.id, b.id}
+    assert plan.node_capabilities == {"node_t1": "data", "node_t2": "analysis"}
+    plan.assignments.clear()
+    again = await cache.get(db, "fetch prices then analyse", _no_discovery)
+    assert len(again.assignments) == 2
+    assert _lookups("hit") == before + 2
+    assert cache.stats()["hit_rate"] == 1.0
+
+
+async def test_inactive_agent_is_rebound_by_capability(db, make_agent) -> None:
+    a, _ = await make_agent()
+    b, _ = await make_agent()
+    replacement, _ = await make_agent()
+    cache = PlanCache()
+    await cache.put("task", PlanTemplate.from_plan(*_plan(a.id, b.id)))
+    b.status = "inactive"
+    await db.commit()
+    discover = AsyncMock(return_value={"analysis": [{"agent_id": replacement.id, "name": "r"}]})
+
+    plan = await cache.get(db, "task", discover)
+
+    discover.assert_awaited_once_with(["analysis"])
+    assert plan.dag["nodes"]["node_t2"]["config"]["agent_id"] == replacement.id
+    assert plan.assignments[1]["agent_id"] == replacement.id
+    # The repaired plan is what later lookups see.
+    assert (await cache.get(db, "task", _no_discovery)).agent_ids() == {a.id, replacement.id}
+
+
+async def test_plan_without_replacement_is_dropped(db, make_agent) -> None:
+    a, _ = await make_agent()
+    cache = PlanCache()
+    await cache.put("task", PlanTemplate.from_plan(*_plan(a.id, "gone-agent")))
+    before = _lookups("stale")
+
+    assert await cache.get(db, "task", AsyncMock(return_value={})) is None
+    assert _lookups("stale") == before + 1
+    assert cache.stats()["size"] == 0
+
+
+async def test_semantic_hit_for_reworded_task(db, make_agent) -> None:
+    a, _ = await make_agent()
+    b, _ = await make_agent()
+    vectors = {
+        "fetch prices then analyse": [1.0, 0.0, 0.05],
+        "get prices then analyse": [1.0, 0.0, 0.0],
+        "write a poem": [0.0, 1.0, 0.0],
+    }
+    embeddings = MagicMock()
+    embeddings.embed = AsyncMock(side_effect=lambda text: vectors[text])
+    cache = PlanCache(embedding_service=embeddings, similarity_threshold=0.95)
+    await cache.put("Fetch prices then analyse", PlanTemplate.from_plan(*_plan(a.id, b.id)))
+
+    assert await cache.get(db, "get prices then analyse", _no_discovery) is not None
+    assert await cache.get(db, "write a poem", _no_discovery) is None
+
+
+async def test_compose_reuses_cached_plan_without_llm(db, make_agent) -> None:
+    a, _ = await make_agent()
+    b, _ = await make_agent()
+    cache = PlanCache()
+
+    def llm(prompt: str) -> str:
+        return "synthesised"
+
+    orch = SmartOrchestrator(db=db, llm_client=llm, plan_cache=cache)
+    sub_tasks, assignments, graph_json = _plan(a.id, b.id)
+
+    await orch._remember_plan(
+        {"task_description": "Fetch prices then analyse", "sub_tasks": sub_tasks,
+         "assignments": assignments},
+        graph_json,
+    )
+    orch._graph = MagicMock()
+    orch._graph.ainvoke = AsyncMock()
+    execute = AsyncMock(return_value={"chain_execution_id": "exec-1", "agent_outputs": {"n": 1}})
+
+    with patch.object(orch, "_execute_chain", execute):
+        result = await orch._execute_with_langgraph("fetch prices, then analyse", "user-1")
+
+    orch._graph.ainvoke.assert_not_awaited()
+    assert result["plan_cached"] is True
+    assert result["chain_execution_id"] == "exec-1"
+    assert result["final_result"] == "synthesised"
+    assert json.loads(execute.await_args.args[0]["graph_json"]) == json.loads(graph_json)
+
+
+async def test_failed_execution_invalidates_cached_plan(db, make_agent) -> None:
+    a, _ = await make_agent()
+    b, _ = await make_agent()
+    cache = PlanCache()
+    orch = SmartOrchestrator(db=db, llm_client=MagicMock(return_value="x"), plan_cache=cache)
+    await cache.put("task", PlanTemplate.from_plan(*_plan(a.id, b.id)))
+    orch._graph = MagicMock()
+
+    with patch.object(orch, "_execute_chain", AsyncMock(return_value={"error": "boom"})):
+        await orch._execute_with_langgraph("task", "user-1")
+
+    assert cache.stats()["size"] == 0
+
+
+async def test_miss_runs_graph_and_records_planning_start(db) -> None:
+    cache = PlanCache()
+    orch = SmartOrchestrator(db=db, llm_client=MagicMock(), plan_cache=cache)
+    orch._graph = MagicMock()
+    orch._graph.ainvoke = AsyncMock(return_value={"final_result": "done"})
+    before = _lookups("miss")
+
+    result = await orch._execute_with_langgraph("brand new task", "user-1")
+
+    assert result["plan_cached"] is False
+    assert "planning_started_at" in orch._graph.ainvoke.await_args.args[0]
+    assert _lookups("miss") == before + 1
+
+
+async def test_discovery_isolates_failing_capability(db) -> None:
+    orch = SmartOrchestrator(db=db, llm_client=None)
+
+    async def _suggest(db, cap, max_results=3):
+        if cap == "analysis":
+            raise RuntimeError("index down")
+        return [{"agent_id": f"{cap}-agent"}]
+
+    with patch(
+        "marketplace.services.auto_chain_service.suggest_agents_for_capability",
+        new=AsyncMock(side_effect=_suggest),
+    ):
+        found = await orch._discover_agents(["data", "analysis", "output"], max_results=1)
+
+    assert found == {
+        "data": [{"agent_id": "data-agent"}],
+        "analysis": [],
+        "output": [{"agent_id": "output-agent"}],
+    }
@@ -573,7 +573,7 @@ async def test_cdn_get_content_tier_promotion():
     """Test CDN content promotion through tiers."""
     # Create a mock storage that returns content
     mock_storage = Mock()
-    mock_storage.get = Mock(return_value=b"tier3_content")
+    mock_storage.aget = AsyncMock(return_value=b"tier3_content")
 
     with patch("marketplace.services.cdn_service.get_storage", return_value=mock_storage):
         # Clear caches
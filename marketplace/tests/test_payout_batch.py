@@ -0,0 +1,146 @@
+"""Tests for the resumable, idempotent payout batch engine."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from marketplace.models.creator import Creator
+from marketplace.models.payout import PayoutItem
+from marketplace.models.redemption import RedemptionRequest
+from marketplace.models.token_account import TokenAccount
+from marketplace.services import payout_service, redemption_service
+from marketplace.services.payout_service import _ProviderThrottle
+
+
+class _Crash(Exception):
+    """Stands in for the process dying mid-run."""
+
+
+async def _creators(db, count: int, payout_method: str = "upi") -> list[str]:
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    await db.execute(insert(Creator), [
+        {"id": cid, "email": f"{cid}@test.com", "password_hash": "x",
+         "display_name": "Batch Creator", "payout_method": payout_method, "status": "active"}
+        for cid in ids
+    ])
+    await db.execute(insert(TokenAccount), [
+        {"id": str(uuid.uuid4()), "creator_id": cid, "balance": Decimal("25")}
+        for cid in ids
+    ])
+    await db.commit()
+    return ids
+
+
+async def _redemption_count(db) -> int:
+    return (await db.execute(select(func.count(RedemptionRequest.id)))).scalar()
+
+
+async def test_rerunning_the_month_does_not_pay_twice(db) -> None:
+    await _creators(db, 5)
+
+    with patch.object(payout_service.settings, "payout_batch_chunk_size", 2):
+        first = await payout_service.run_monthly_payout(db)
+        second = await payout_service.run_monthly_payout(db)
+
+    assert first["processed"] == 5 and second == first
+    assert await _redemption_count(db) == 5
+    report = await payout_service.get_payout_run(db, first["run_id"])
+    assert report["status"] == "completed"
+    assert report["checkpoint"]["planned"] is True
+
+
+async def test_a_crashed_run_resumes_where_it_stopped(db) -> None:
+    await _creators(db, 5)
+    original = payout_service._process_item
+    calls = 0
+
+    async def _crash_on_third(*args):
+        nonlocal calls
+        calls += 1
+        if calls == 3:
+            raise _Crash()
+        return await original(*args)
+
+    with patch.object(payout_service.settings, "payout_batch_chunk_size", 2):
+        with patch.object(payout_service, "_process_item", side_effect=_crash_on_third), \
+                pytest.raises(_Crash):
+            await payout_service.run_monthly_payout(db)
+        assert await _redemption_count(db) == 2
+
+        result = await payout_service.run_monthly_payout(db)
+
+    assert result["processed"] == 5 and result["errors"] == []
+    assert await _redemption_count(db) == 5
+    per_creator = (await db.execute(
+        select(RedemptionRequest.creator_id, func.count())
+        .group_by(RedemptionRequest.creator_id)
+    )).all()
+    assert {count for _, count in per_creator} == {1}
+
+
+async def test_failed_items_are_retried_until_attempts_run_out(db) -> None:
+    bad, good = await _creators(db, 2)
+    original = redemption_service.create_redemption
+
+    async def _fail_for_bad(session, creator_id, *args):
+        if creator_id == bad:
+            raise ConnectionError("bank timeout")
+        return await original(session, creator_id, *args)
+
+    with patch.object(payout_service.settings, "payout_max_attempts", 2), \
+            patch.object(redemption_service, "create_redemption", side_effect=_fail_for_bad):
+        first = await payout_service.run_monthly_payout(db)
+        assert (await payout_service.get_payout_run(db, first["run_id"]))["status"] == "incomplete"
+        second = await payout_service.run_monthly_payout(db)
+
+    assert second["processed"] == 1
+    assert second["errors"] == [{"creator_id": bad, "error": "bank timeout"}]
+    item = (await db.execute(
+        select(PayoutItem).where(PayoutItem.creator_id == bad)
+    )).scalar_one()
+    assert (item.state, item.attempts) == ("failed", 2)
+    assert (await payout_service.get_payout_run(db, second["run_id"]))["status"] == "completed"
+
+
+async def test_dispatch_retries_a_failed_redemption_in_the_next_run(db) -> None:
+    (creator_id,) = await _creators(db, 1)
+    await redemption_service.create_redemption(db, creator_id, "upi", 10.0)
+    await redemption_service.create_redemption(db, creator_id, "bank_withdrawal", 12.0)
+
+    with patch.object(
+        redemption_service, "process_bank_withdrawal", side_effect=ConnectionError("down"),
+    ):
+        first = await payout_service.process_pending_payouts(db)
+    second = await payout_service.process_pending_payouts(db)
+
+    assert (first["processed"], first["failed"], first["total_pending"]) == (1, 1, 2)
+    assert (second["processed"], second["total_pending"]) == (1, 1)
+    assert second["run_id"] != first["run_id"]
+    statuses = (await db.execute(select(RedemptionRequest.status))).scalars().all()
+    assert statuses == ["processing", "processing"]
+
+
+async def test_provider_throttle_limits_rate_and_concurrency() -> None:
+    throttle = _ProviderThrottle(concurrency=2, rate_per_second=100)
+    in_flight = peak = 0
+
+    async def _call() -> None:
+        nonlocal in_flight, peak
+        async with throttle.slot():
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_call() for _ in range(11)))
+
+    assert peak <= 2
+    assert time.perf_counter() - started >= 0.09
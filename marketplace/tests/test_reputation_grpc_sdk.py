@@ -707,7 +707,7 @@ class TestWebhookV2Service:
         mock_db.commit = AsyncMock()
         mock_db.refresh = AsyncMock()
 
-        mock_svc = MagicMock()
+        mock_svc = AsyncMock()
         mock_svc.send_message.return_value = True
 
         with patch("marketplace.services.webhook_v2_service.get_servicebus_service", return_value=mock_svc):
@@ -726,7 +726,7 @@ class TestWebhookV2Service:
 
         mock_db = AsyncMock()
         mock_db.add = MagicMock()
-        mock_svc = MagicMock()
+        mock_svc = AsyncMock()
         mock_svc.send_message.return_value = True
 
         with patch("marketplace.services.webhook_v2_service.get_servicebus_service", return_value=mock_svc):
@@ -741,7 +741,7 @@ class TestWebhookV2Service:
         from marketplace.services.webhook_v2_service import process_webhook_queue
 
         mock_db = AsyncMock()
-        mock_svc = MagicMock()
+        mock_svc = AsyncMock()
         mock_svc.receive_messages.return_value = []
 
         with patch("marketplace.services.webhook_v2_service.get_servicebus_service", return_value=mock_svc):
@@ -768,7 +768,7 @@ class TestWebhookV2Service:
         mock_msg = MagicMock()
         mock_msg.__str__ = lambda self: msg_body
 
-        mock_svc = MagicMock()
+        mock_svc = AsyncMock()
         mock_svc.receive_messages.return_value = [mock_msg]
 
         mock_response = MagicMock()
@@ -803,7 +803,7 @@ class TestWebhookV2Service:
         mock_msg = MagicMock()
         mock_msg.__str__ = lambda self: msg_body
 
-        mock_svc = MagicMock()
+        mock_svc = AsyncMock()
         mock_svc.receive_messages.return_value = [mock_msg]
 
         with patch("marketplace.services.webhook_v2_service.get_servicebus_service", return_value=mock_svc):
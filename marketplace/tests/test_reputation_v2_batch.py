@@ -0,0 +1,151 @@
+"""Tests for set-based reputation recomputation in ReputationV2Service."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from marketplace.models.reputation import ReputationScore
+from marketplace.models.transaction import Transaction
+from marketplace.services import reputation_v2_service
+from marketplace.services.reputation_v2_service import ReputationV2Service
+
+
+async def _insert_tx(db, buyer_id, seller_id, listing_id, status="completed", delivered_after=None):
+    now = datetime.now(timezone.utc)
+    db.add(Transaction(
+        id=str(uuid.uuid4()),
+        listing_id=listing_id,
+        buyer_id=buyer_id,
+        seller_id=seller_id,
+        amount_usdc=Decimal("1"),
+        status=status,
+        content_hash=f"sha256:{'ab' * 32}",
+        initiated_at=now - delivered_after if delivered_after else now,
+        delivered_at=now if delivered_after else None,
+        completed_at=now if status == "completed" else None,
+    ))
+    await db.commit()
+
+
+async def _marketplace(db, make_agent, make_listing):
+    seller, _ = await make_agent(name="batch-seller")
+    buyer, _ = await make_agent(name="batch-buyer")
+    other, _ = await make_agent(name="batch-other")
+    listing = await make_listing(seller.id)
+    await make_listing(seller.id)
+    await _insert_tx(db, buyer.id, seller.id, listing.id, delivered_after=timedelta(minutes=30))
+    await _insert_tx(db, other.id, seller.id, listing.id, status="disputed")
+    await _insert_tx(db, buyer.id, seller.id, listing.id, status="failed")
+    return seller, buyer, other
+
+
+async def test_batch_features_match_single_agent_features(
+    db: AsyncSession, make_agent, make_listing
+):
+    agents = await _marketplace(db, make_agent, make_listing)
+    svc = ReputationV2Service()
+    ids = [agent.id for agent in agents] + ["unknown-agent"]
+
+    batch = await svc.compute_features_batch(db, ids)
+
+    for agent_id in ids:
+        assert batch[agent_id] == await svc.compute_features(db, agent_id)
+    seller_features = batch[agents[0].id]
+    assert seller_features["transaction_count"] == 3
+    assert seller_features["unique_buyers"] == 2
+    assert seller_features["listing_count"] == 2
+    assert seller_features["dispute_rate"] == pytest.approx(2 / 3)
+    assert seller_features["response_time_avg"] == pytest.approx(0.5, abs=1e-3)
+
+
+async def test_vectorized_weighted_scores_match_per_row_formula(
+    db: AsyncSession, make_agent, make_listing
+):
+    agents = await _marketplace(db, make_agent, make_listing)
+    svc = ReputationV2Service()
+    features = await svc.compute_features_batch(db, [a.id for a in agents])
+    order = reputation_v2_service._FEATURE_ORDER
+    matrix = np.array([[f[name] for name in order] for f in features.values()])
+
+    scores = svc.predict_reputation_scores(matrix)
+
+    assert scores == [svc._weighted_score(f) for f in features.values()]
+
+
+async def test_batch_uses_single_model_prediction(db: AsyncSession, make_agent):
+    agents = [(await make_agent(name=f"batch-ml-{i}"))[0] for i in range(4)]
+    model = MagicMock()
+    model._model = object()
+    model.predict_batch.return_value = np.array([0.1, 0.2, 0.3, 0.4])
+    svc = ReputationV2Service()
+    svc._model = model
+
+    results = await svc.batch_update_reputations(db, [a.id for a in agents])
+
+    model.predict_batch.assert_called_once()
+    assert model.predict_batch.call_args.args[0].shape == (4, len(reputation_v2_service._FEATURE_ORDER))
+    assert [r["score"] for r in results] == pytest.approx([0.1, 0.2, 0.3, 0.4])
+    assert all(r["model_used"] for r in results)
+
+
+async def test_batch_upserts_one_row_per_agent(db: AsyncSession, make_agent, make_listing):
+    seller, buyer, other = await _marketplace(db, make_agent, make_listing)
+    svc = ReputationV2Service()
+    ids = [seller.id, buyer.id, other.id]
+
+    await svc.batch_update_reputations(db, ids)
+    results = await svc.batch_update_reputations(db, ids)
+
+    count = (await db.execute(select(func.count(ReputationScore.id)))).scalar()
+    assert count == 3
+    row = (await db.execute(
+        select(ReputationScore).where(ReputationScore.agent_id == seller.id)
+    )).scalar_one()
+    assert float(row.composite_score) == pytest.approx(round(results[0]["score"], 3))
+    assert row.total_transactions == 3
+    assert row.failed_deliveries == 2
+
+
+async def test_batch_chunks_agent_ids(db: AsyncSession, make_agent, monkeypatch):
+    agents = [(await make_agent(name=f"batch-chunk-{i}"))[0] for i in range(5)]
+    monkeypatch.setattr(reputation_v2_service, "_BATCH_SIZE", 2)
+    svc = ReputationV2Service()
+
+    results = await svc.batch_update_reputations(db, [a.id for a in agents])
+
+    assert [r["agent_id"] for r in results] == [a.id for a in agents]
+    count = (await db.execute(select(func.count(ReputationScore.id)))).scalar()
+    assert count == 5
+
+
+async def test_incremental_only_recomputes_touched_agents(
+    db: AsyncSession, make_agent, make_listing
+):
+    seller, buyer, other = await _marketplace(db, make_agent, make_listing)
+    svc = ReputationV2Service()
+
+    first = await svc.batch_update_reputations(db, incremental=True)
+    assert {r["agent_id"] for r in first} == {seller.id, buyer.id, other.id}
+    assert await svc.agents_touched_since(db) == []
+
+    listing = await make_listing(seller.id)
+    await _insert_tx(db, buyer.id, seller.id, listing.id)
+
+    second = await svc.batch_update_reputations(db, incremental=True)
+    assert {r["agent_id"] for r in second} == {seller.id, buyer.id}
+
+
+async def test_incremental_with_explicit_since(db: AsyncSession, make_agent, make_listing):
+    seller, buyer, other = await _marketplace(db, make_agent, make_listing)
+    svc = ReputationV2Service()
+
+    future = datetime.now(timezone.utc) + timedelta(hours=1)
+    assert await svc.agents_touched_since(db, since=future) == []
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    assert set(await svc.agents_touched_since(db, since=past)) == {seller.id, buyer.id, other.id}
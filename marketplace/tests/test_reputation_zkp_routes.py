@@ -6,11 +6,15 @@ Tests:
 - GET /api/v1/zkp/{listing_id}/proofs
 - POST /api/v1/zkp/{listing_id}/verify
 - GET /api/v1/zkp/{listing_id}/bloom-check
+- GET /api/v1/zkp/{listing_id}/merkle/proof
+- GET /api/v1/zkp/{listing_id}/chunks
 
 Uses httpx AsyncClient + ASGITransport to test against the real FastAPI app.
 """
 
 import asyncio
+import base64
+import hashlib
 import json
 from datetime import datetime, timezone
 from decimal import Decimal
@@ -653,3 +657,86 @@ async def test_bloom_check_word_too_long(client, make_agent, make_listing):
     long_word = "a" * 101
     resp = await client.get(f"/api/v1/zkp/{listing.id}/bloom-check?word={long_word}", headers=headers)
     assert resp.status_code == 422
+
+
+# ---------------------------------------------------------------------------
+# Merkle inclusion proofs / verified partial delivery
+# ---------------------------------------------------------------------------
+
+async def _listing_with_proofs(db, make_listing, seller_id, content: bytes):
+    listing = await make_listing(seller_id, content=content)
+    await zkp_service.generate_proofs(
+        db, listing.id, content, "web_search", len(content), datetime.now(timezone.utc), 0.5,
+    )
+    await db.commit()
+    return listing
+
+
+@pytest.mark.asyncio
+async def test_merkle_inclusion_proof(client, make_agent, make_listing, db):
+    """A single chunk verifies against the published root."""
+    seller, _ = await make_agent()
+    _, token = await make_agent()
+    content = bytes(range(256)) * 20  # 5 chunks
+    listing = await _listing_with_proofs(db, make_listing, seller.id, content)
+
+    resp = await client.get(
+        f"/api/v1/zkp/{listing.id}/merkle/proof?chunk=3",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    leaf = hashlib.sha256(content[3 * 1024:4 * 1024]).hexdigest()
+    assert data["leaf_hash"] == leaf
+    assert zkp_service.verify_inclusion(leaf, data["proof"], data["root"])
+
+    resp = await client.get(
+        f"/api/v1/zkp/{listing.id}/merkle/proof?chunk=5",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_verified_chunks_for_buyer(client, make_agent, make_listing, make_transaction, db):
+    """Paying buyers get chunk ranges that each verify against the root."""
+    seller, _ = await make_agent()
+    buyer, token = await make_agent()
+    content = b"abcdefghij" * 500  # 5000 bytes -> 5 chunks
+    listing = await _listing_with_proofs(db, make_listing, seller.id, content)
+    await make_transaction(buyer.id, seller.id, listing.id, status="delivered")
+
+    resp = await client.get(
+        f"/api/v1/zkp/{listing.id}/chunks?start=3&count=10",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["count"] == 2
+    assert data["leaf_count"] == 5
+    received = b""
+    for chunk in data["chunks"]:
+        raw = base64.b64decode(chunk["data"])
+        leaf = hashlib.sha256(raw).hexdigest()
+        assert zkp_service.verify_inclusion(leaf, chunk["proof"], data["root"])
+        received += raw
+    assert received == content[3 * 1024:]
+
+
+@pytest.mark.asyncio
+async def test_verified_chunks_require_purchase(client, make_agent, make_listing, make_transaction, db):
+    seller, seller_token = await make_agent()
+    buyer, token = await make_agent()
+    listing = await _listing_with_proofs(db, make_listing, seller.id, b"secret" * 400)
+    await make_transaction(buyer.id, seller.id, listing.id, status="payment_pending")
+
+    resp = await client.get(
+        f"/api/v1/zkp/{listing.id}/chunks", headers={"Authorization": f"Bearer {token}"},
+    )
+    assert resp.status_code == 403
+
+    resp = await client.get(
+        f"/api/v1/zkp/{listing.id}/chunks", headers={"Authorization": f"Bearer {seller_token}"},
+    )
+    assert resp.status_code == 200
+    assert resp.json()["count"] == 3
@@ -0,0 +1,129 @@
+"""Tests for the set-based retention policies."""
+
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.dialects import postgresql
+
+from marketplace.core.metrics import RETENTION_ROWS_PROCESSED
+from marketplace.models.agent_trust import WebhookDelivery
+from marketplace.models.revoked_token import RevokedToken
+from marketplace.services import retention_service
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def _deliveries(db, count: int, *, days_old: int, **values) -> None:
+    row = {
+        "subscription_id": str(uuid.uuid4()), "event_type": "listing_created",
+        "payload_json": '{"secret": "data"}', "signature": "sha256:abc",
+        "status": "delivered", "response_body": "OK",
+        "created_at": _now() - timedelta(days=days_old), **values,
+    }
+    await db.execute(insert(WebhookDelivery), [
+        {**row, "id": str(uuid.uuid4()), "event_id": str(uuid.uuid4())} for _ in range(count)
+    ])
+    await db.commit()
+
+
+async def test_redaction_runs_in_committed_batches(db) -> None:
+    await _deliveries(db, 7, days_old=40)
+    await _deliveries(db, 2, days_old=40, payload_json="", response_body="")
+    await _deliveries(db, 3, days_old=2)
+
+    engine = db.bind.sync_engine
+    updates = []
+
+    def _count_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE webhook_deliveries"):
+            updates.append(statement)
+
+    metric = RETENTION_ROWS_PROCESSED.labels(policy="webhook_delivery_bodies", action="redact")
+    before = metric._value.get()
+    event.listen(engine, "before_cursor_execute", _count_updates)
+    try:
+        with patch.object(retention_service.settings, "retention_batch_size", 3):
+            redacted = await retention_service.apply_policy(
+                db, retention_service.WEBHOOK_DELIVERY_BODIES,
+            )
+    finally:
+        event.remove(engine, "before_cursor_execute", _count_updates)
+
+    assert redacted == 7
+    assert len(updates) == 3  # 3 + 3 + 1
+    assert metric._value.get() - before == 7
+    bodies = (await db.execute(
+        select(WebhookDelivery.payload_json, WebhookDelivery.response_body, func.count())
+        .group_by(WebhookDelivery.payload_json, WebhookDelivery.response_body)
+        .order_by(func.count())
+    )).all()
+    # Already-empty bodies stay empty rather than being marked redacted
+    assert [tuple(row) for row in bodies] == [
+        ("", "", 2), ('{"secret": "data"}', "OK", 3), ("{}", "[redacted]", 7),
+    ]
+
+    assert await retention_service.apply_policy(
+        db, retention_service.WEBHOOK_DELIVERY_BODIES,
+    ) == 0
+
+
+async def test_run_retention_deletes_expired_revoked_tokens(db) -> None:
+    await db.execute(insert(RevokedToken), [
+        {"jti": str(uuid.uuid4()), "actor_id": "actor", "revoked_at": _now() - timedelta(hours=2),
+         "expires_at": _now() + timedelta(hours=offset)}
+        for offset in (-1, -1, -1, 1)
+    ])
+    await db.commit()
+
+    with patch.object(retention_service.settings, "retention_batch_size", 2):
+        processed = await retention_service.run_retention(db)
+
+    assert processed == {
+        "webhook_delivery_bodies": 0,
+        "memory_verification_evidence": 0,
+        "expired_revoked_tokens": 3,
+    }
+    assert (await db.execute(select(func.count()).select_from(RevokedToken))).scalar() == 1
+
+
+async def test_a_failing_policy_does_not_stop_the_others(db) -> None:
+    await _deliveries(db, 1, days_old=40)
+    broken = retention_service.RetentionPolicy(
+        name="broken", model=RevokedToken, age_column="no_such_column",
+        action="delete", retention=lambda: timedelta(0),
+    )
+
+    processed = await retention_service.run_retention(
+        db, (broken, retention_service.WEBHOOK_DELIVERY_BODIES),
+    )
+
+    assert processed == {"webhook_delivery_bodies": 1}
+
+
+def test_postgres_batches_are_keyed_by_ctid_and_skip_locked_rows() -> None:
+    statement = retention_service._batch_statement(
+        "postgresql", retention_service.EXPIRED_REVOKED_TOKENS, _now(), 1000, False,
+    )
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "DELETE FROM revoked_tokens WHERE ctid IN (SELECT ctid" in sql
+    assert "LIMIT" in sql and "FOR UPDATE SKIP LOCKED" in sql
+
+    partitioned = str(retention_service._batch_statement(
+        "postgresql", retention_service.EXPIRED_REVOKED_TOKENS, _now(), 1000, True,
+    ).compile(dialect=postgresql.dialect()))
+    assert "revoked_tokens.jti IN (SELECT revoked_tokens.jti" in partitioned
+
+
+def test_month_start_rolls_over_the_year() -> None:
+    moment = datetime(2026, 11, 18, tzinfo=timezone.utc)
+    assert [retention_service._month_start(moment, offset) for offset in range(3)] == [
+        datetime(2026, 11, 1, tzinfo=timezone.utc),
+        datetime(2026, 12, 1, tzinfo=timezone.utc),
+        datetime(2027, 1, 1, tzinfo=timezone.utc),
+    ]
@@ -1,8 +1,8 @@
 """Comprehensive tests for servicebus_service, trust_verification_service, and webhook_v2_service.
 
 Coverage:
-- ServiceBusService: stub mode, send_message, send_batch, receive_messages,
-  complete_message, dead_letter_message, peek_dead_letters, close, get_servicebus_service
+- ServiceBusService: unconfigured mode, send_message, send_batch, receive_messages,
+  settlement, peek_dead_letters, close, get_servicebus_service
 - trust_verification_service: helper functions, bootstrap_listing_trust_artifacts,
   run_strict_verification, run_strict_verification_by_listing_id, add_source_receipt,
   build_trust_payload
@@ -13,6 +13,7 @@ Coverage:
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
 import uuid
@@ -30,7 +31,12 @@ from marketplace.models.trust_verification import (
     VerificationResult,
 )
 from marketplace.models.webhook_v2 import DeadLetterEntry, DeliveryAttempt
-from marketplace.services.servicebus_service import ServiceBusService, get_servicebus_service
+from marketplace.services.servicebus_service import (
+    LocalQueueBackend,
+    QueueMessage,
+    ServiceBusService,
+    get_servicebus_service,
+)
 from marketplace.services.trust_verification_service import (
     TRUST_STATUS_FAILED,
     TRUST_STATUS_PENDING,
@@ -57,6 +63,7 @@ from marketplace.services.webhook_v2_service import (
     retry_dead_letter,
     retry_dead_letters,
 )
+from marketplace.tests.conftest import TestSession
 
 
 # =============================================================================
@@ -74,318 +81,295 @@ def _utcnow() -> datetime:
 
 
 # =============================================================================
-# ServiceBusService — stub mode (no connection string)
+# ServiceBusService — Azure backend without a client (no SDK / connection string)
 # =============================================================================
 
 
-class TestServiceBusServiceStubMode:
-    """When no connection string is provided the service must behave as a safe no-op stub."""
+class TestServiceBusServiceUnconfigured:
+    """Without a client the Azure backend reports failure instead of sending."""
 
     def test_init_without_connection_string_sets_client_to_none(self):
         svc = ServiceBusService(connection_string="")
         assert svc._client is None
 
-    def test_send_message_stub_returns_false(self):
-        svc = ServiceBusService(connection_string="")
-        result = svc.send_message("my-queue", {"key": "value"})
-        assert result is False
-
-    def test_send_message_stub_with_string_body_returns_false(self):
+    async def test_send_message_returns_false(self):
         svc = ServiceBusService(connection_string="")
-        result = svc.send_message("my-queue", "plain string message")
-        assert result is False
+        assert await svc.send_message("my-queue", {"key": "value"}) is False
+        assert await svc.send_message("my-queue", "plain string message") is False
 
-    def test_send_batch_stub_returns_zero(self):
+    async def test_send_batch_returns_zero(self):
         svc = ServiceBusService(connection_string="")
-        result = svc.send_batch("my-queue", [{"a": 1}, {"b": 2}, "text"])
-        assert result == 0
-
-    def test_receive_messages_stub_returns_empty_list(self):
-        svc = ServiceBusService(connection_string="")
-        result = svc.receive_messages("my-queue")
-        assert result == []
+        assert await svc.send_batch("my-queue", [{"a": 1}, {"b": 2}, "text"]) == 0
 
-    def test_complete_message_stub_returns_false(self):
+    async def test_receive_messages_returns_empty_list(self):
         svc = ServiceBusService(connection_string="")
-        msg = MagicMock()
-        result = svc.complete_message(msg)
-        assert result is False
-        msg.complete.assert_not_called()
+        assert await svc.receive_messages("my-queue") == []
 
-    def test_dead_letter_message_stub_returns_false(self):
+    async def test_settlement_returns_false(self):
         svc = ServiceBusService(connection_string="")
-        msg = MagicMock()
-        result = svc.dead_letter_message(msg, reason="bad message")
-        assert result is False
-        msg.dead_letter.assert_not_called()
+        msg = QueueMessage(body="{}", queue_name="my-queue", raw=MagicMock())
+        assert await svc.complete_message(msg) is False
+        assert await svc.dead_letter_message(msg, reason="bad message") is False
 
-    def test_peek_dead_letters_stub_returns_empty_list(self):
+    async def test_peek_dead_letters_returns_empty_list(self):
         svc = ServiceBusService(connection_string="")
-        result = svc.peek_dead_letters("my-queue")
-        assert result == []
+        assert await svc.peek_dead_letters("my-queue") == []
 
-    def test_close_stub_mode_no_error(self):
+    async def test_close_without_client_no_error(self):
         svc = ServiceBusService(connection_string="")
-        # Should not raise
-        svc.close()
+        await svc.close()
         assert svc._client is None
 
 
 # =============================================================================
-# ServiceBusService — with a mocked Azure client
+# ServiceBusService — with a mocked async Azure client
 # =============================================================================
 
 
+def _sdk_message(body: str = "payload", **props) -> MagicMock:
+    msg = MagicMock()
+    msg.__str__ = lambda self: body
+    msg.message_id = "m-1"
+    msg.delivery_count = 1
+    msg.lock_token = "lock-1"
+    msg.application_properties = {k.encode(): v.encode() for k, v in props.items()}
+    return msg
+
+
 class TestServiceBusServiceWithClient:
-    """Tests where _HAS_SERVICEBUS is True and a valid connection string is supplied."""
+    """Tests where the async SDK client is replaced by a mock."""
 
     def _make_svc_with_mock_client(self) -> tuple[ServiceBusService, MagicMock]:
         """Return a ServiceBusService with _client replaced by a MagicMock."""
-        svc = ServiceBusService(connection_string="")
+        svc = ServiceBusService(connection_string="", prefetch_count=50)
         mock_client = MagicMock()
         svc._client = mock_client
         return svc, mock_client
 
-    # ----- _get_sender --------------------------------------------------------
+    # ----- long-lived links ---------------------------------------------------
 
     def test_get_sender_returns_none_when_no_client(self):
         svc = ServiceBusService(connection_string="")
         assert svc._get_sender("my-queue") is None
 
-    def test_get_sender_caches_sender(self):
+    def test_get_sender_caches_sender_per_queue(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_sender = MagicMock()
-        mock_client.get_queue_sender.return_value = mock_sender
+        mock_client.get_queue_sender.side_effect = [MagicMock(), MagicMock()]
 
-        s1 = svc._get_sender("q1")
-        s2 = svc._get_sender("q1")
-        assert s1 is s2
-        mock_client.get_queue_sender.assert_called_once()
+        assert svc._get_sender("q1") is svc._get_sender("q1")
+        assert svc._get_sender("q2") is not svc._get_sender("q1")
+        assert mock_client.get_queue_sender.call_count == 2
 
-    def test_get_sender_creates_separate_senders_per_queue(self):
+    def test_get_receiver_is_cached_and_prefetches(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_client.get_queue_sender.side_effect = [MagicMock(), MagicMock()]
 
-        s1 = svc._get_sender("q1")
-        s2 = svc._get_sender("q2")
-        assert s1 is not s2
-        assert mock_client.get_queue_sender.call_count == 2
+        assert svc._get_receiver("q1") is svc._get_receiver("q1")
+        mock_client.get_queue_receiver.assert_called_once_with(queue_name="q1", prefetch_count=50)
 
     # ----- send_message -------------------------------------------------------
 
-    def test_send_message_calls_sender_send_messages(self):
+    async def test_send_message_awaits_sender(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_sender = MagicMock()
+        mock_sender = AsyncMock()
         mock_client.get_queue_sender.return_value = mock_sender
 
-        with patch("marketplace.services.servicebus_service.ServiceBusMessage") as MockMsg:
+        with patch("marketplace.services.servicebus_service.ServiceBusMessage", create=True) as MockMsg:
             mock_msg_instance = MagicMock()
             MockMsg.return_value = mock_msg_instance
-            result = svc.send_message("q1", "hello")
+            result = await svc.send_message("q1", "hello")
 
         assert result is True
-        mock_sender.send_messages.assert_called_once_with(mock_msg_instance)
+        mock_sender.send_messages.assert_awaited_once_with(mock_msg_instance)
 
-    def test_send_message_dict_body_is_json_serialised(self):
+    async def test_send_message_dict_body_and_properties(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_sender = MagicMock()
-        mock_client.get_queue_sender.return_value = mock_sender
-
-        captured_bodies: list[str] = []
-
-        with patch("marketplace.services.servicebus_service.ServiceBusMessage") as MockMsg:
-            def _capture(body):
-                captured_bodies.append(body)
-                return MagicMock()
-            MockMsg.side_effect = _capture
-            svc.send_message("q1", {"event": "sale", "amount": 42})
+        mock_client.get_queue_sender.return_value = AsyncMock()
 
-        assert len(captured_bodies) == 1
-        parsed = json.loads(captured_bodies[0])
-        assert parsed["event"] == "sale"
-        assert parsed["amount"] == 42
-
-    def test_send_message_with_properties_sets_application_properties(self):
-        svc, mock_client = self._make_svc_with_mock_client()
-        mock_sender = MagicMock()
-        mock_client.get_queue_sender.return_value = mock_sender
-
-        with patch("marketplace.services.servicebus_service.ServiceBusMessage") as MockMsg:
+        with patch("marketplace.services.servicebus_service.ServiceBusMessage", create=True) as MockMsg:
             mock_msg_instance = MagicMock()
             MockMsg.return_value = mock_msg_instance
-            svc.send_message("q1", "body", properties={"type": "webhook", "attempt": "1"})
+            await svc.send_message("q1", {"event": "sale", "amount": 42}, properties={"type": "webhook"})
 
-        assert mock_msg_instance.application_properties == {"type": "webhook", "attempt": "1"}
+        assert json.loads(MockMsg.call_args.args[0]) == {"event": "sale", "amount": 42}
+        assert mock_msg_instance.application_properties == {"type": "webhook"}
 
-    def test_send_message_returns_false_on_exception(self):
+    async def test_send_message_returns_false_on_exception(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_sender = MagicMock()
+        mock_sender = AsyncMock()
         mock_sender.send_messages.side_effect = RuntimeError("connection lost")
         mock_client.get_queue_sender.return_value = mock_sender
 
-        with patch("marketplace.services.servicebus_service.ServiceBusMessage"):
-            result = svc.send_message("q1", "body")
-
-        assert result is False
+        with patch("marketplace.services.servicebus_service.ServiceBusMessage", create=True):
+            assert await svc.send_message("q1", "body") is False
 
     # ----- send_batch ---------------------------------------------------------
 
-    def test_send_batch_sends_all_messages_and_returns_count(self):
+    async def test_send_batch_flushes_full_batches(self):
+        """When add_message raises ValueError (batch full), the batch is sent and a new one started."""
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_sender = MagicMock()
+        mock_sender = AsyncMock()
         mock_client.get_queue_sender.return_value = mock_sender
-        mock_batch = MagicMock()
-        mock_sender.create_message_batch.return_value = mock_batch
+        batch1, batch2 = MagicMock(), MagicMock()
+        batch1.add_message.side_effect = [None, ValueError("batch full")]
+        mock_sender.create_message_batch.side_effect = [batch1, batch2]
 
-        with patch("marketplace.services.servicebus_service.ServiceBusMessage"):
-            result = svc.send_batch("q1", ["msg1", "msg2", {"k": "v"}])
+        with patch("marketplace.services.servicebus_service.ServiceBusMessage", create=True):
+            result = await svc.send_batch("q1", ["m1", "m2", "m3"])
 
         assert result == 3
+        assert [c.args[0] for c in mock_sender.send_messages.await_args_list] == [batch1, batch2]
 
-    def test_send_batch_returns_zero_on_exception(self):
+    async def test_send_batch_sends_all_messages_and_returns_count(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_sender = MagicMock()
-        mock_sender.create_message_batch.side_effect = RuntimeError("network error")
+        mock_sender = AsyncMock()
+        mock_sender.create_message_batch.return_value = MagicMock()
         mock_client.get_queue_sender.return_value = mock_sender
 
-        result = svc.send_batch("q1", ["msg1"])
-        assert result == 0
+        with patch("marketplace.services.servicebus_service.ServiceBusMessage", create=True):
+            assert await svc.send_batch("q1", ["msg1", "msg2", {"k": "v"}]) == 3
+        mock_sender.send_messages.assert_awaited_once()
 
-    def test_send_batch_handles_batch_full_by_flushing(self):
-        """When add_message raises ValueError (batch full), existing batch must be sent first."""
+    async def test_send_batch_reports_messages_sent_before_failure(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_sender = MagicMock()
+        mock_sender = AsyncMock()
         mock_client.get_queue_sender.return_value = mock_sender
-
         batch1 = MagicMock()
-        batch2 = MagicMock()
-        mock_sender.create_message_batch.side_effect = [batch1, batch2]
-
-        # First add_message succeeds, second raises ValueError (batch full), third succeeds
         batch1.add_message.side_effect = [None, ValueError("batch full")]
-        batch2.add_message.return_value = None
-
-        with patch("marketplace.services.servicebus_service.ServiceBusMessage"):
-            result = svc.send_batch("q1", ["m1", "m2", "m3"])
+        mock_sender.create_message_batch.side_effect = [batch1, RuntimeError("network error")]
 
-        # All 3 messages should eventually be sent
-        assert result == 3
+        with patch("marketplace.services.servicebus_service.ServiceBusMessage", create=True):
+            assert await svc.send_batch("q1", ["m1", "m2"]) == 1
 
     # ----- receive_messages ---------------------------------------------------
 
-    def test_receive_messages_returns_messages_from_receiver(self):
+    async def test_receive_messages_wraps_sdk_messages(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_receiver = MagicMock()
-        mock_receiver.__enter__ = MagicMock(return_value=mock_receiver)
-        mock_receiver.__exit__ = MagicMock(return_value=False)
-        fake_msgs = [MagicMock(), MagicMock()]
-        mock_receiver.receive_messages.return_value = fake_msgs
-        mock_client.get_queue_receiver.return_value = mock_receiver
+        receiver = AsyncMock()
+        receiver.receive_messages.return_value = [_sdk_message('{"a": 1}', attempt="2")]
+        mock_client.get_queue_receiver.return_value = receiver
+
+        (msg,) = await svc.receive_messages("q1", max_messages=5, max_wait_time=2)
 
-        result = svc.receive_messages("q1", max_messages=5, max_wait_time=2)
-        assert result == fake_msgs
+        receiver.receive_messages.assert_awaited_once_with(max_message_count=5, max_wait_time=2)
+        assert str(msg) == '{"a": 1}'
+        assert msg.properties == {"attempt": "2"}
+        assert (msg.queue_name, msg.delivery_count) == ("q1", 1)
 
-    def test_receive_messages_returns_empty_on_exception(self):
+    async def test_receive_failure_closes_and_drops_the_receiver(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_client.get_queue_receiver.side_effect = RuntimeError("broken")
+        receiver = AsyncMock()
+        receiver.receive_messages.side_effect = RuntimeError("broken")
+        mock_client.get_queue_receiver.return_value = receiver
 
-        result = svc.receive_messages("q1")
-        assert result == []
+        with pytest.raises(RuntimeError):
+            await svc.receive_messages("q1")
 
-    # ----- complete_message ---------------------------------------------------
+        receiver.close.assert_awaited_once()
+        assert svc._receivers == {}
 
-    def test_complete_message_calls_complete(self):
-        svc, _ = self._make_svc_with_mock_client()
-        msg = MagicMock()
-        result = svc.complete_message(msg)
-        assert result is True
-        msg.complete.assert_called_once()
+    async def test_receiver_open_failure_is_raised(self):
+        svc, mock_client = self._make_svc_with_mock_client()
+        mock_client.get_queue_receiver.side_effect = RuntimeError("unauthorized")
 
-    def test_complete_message_returns_false_on_attribute_error(self):
-        svc, _ = self._make_svc_with_mock_client()
-        msg = MagicMock(spec=[])  # No .complete() attribute
-        result = svc.complete_message(msg)
-        assert result is False
+        with pytest.raises(RuntimeError):
+            await svc.receive_messages("q1")
 
-    def test_complete_message_returns_false_on_generic_exception(self):
-        svc, _ = self._make_svc_with_mock_client()
-        msg = MagicMock()
-        msg.complete.side_effect = RuntimeError("transport error")
-        result = svc.complete_message(msg)
-        assert result is False
+    # ----- settlement ---------------------------------------------------------
+
+    async def _received(self, svc, mock_client) -> tuple[AsyncMock, list]:
+        receiver = AsyncMock()
+        receiver.receive_messages.return_value = [_sdk_message("a"), _sdk_message("b")]
+        mock_client.get_queue_receiver.return_value = receiver
+        return receiver, await svc.receive_messages("q1")
+
+    async def test_complete_messages_settles_each_on_the_receiver(self):
+        svc, mock_client = self._make_svc_with_mock_client()
+        receiver, messages = await self._received(svc, mock_client)
+
+        assert await svc.complete_messages(messages) == 2
+        assert [c.args[0] for c in receiver.complete_message.await_args_list] == [m.raw for m in messages]
+
+    async def test_complete_message_returns_false_on_exception(self):
+        svc, mock_client = self._make_svc_with_mock_client()
+        receiver, messages = await self._received(svc, mock_client)
+        receiver.complete_message.side_effect = RuntimeError("lock lost")
+
+        assert await svc.complete_message(messages[0]) is False
+
+    async def test_dead_letter_message_returns_false_on_exception(self):
+        svc, mock_client = self._make_svc_with_mock_client()
+        receiver, messages = await self._received(svc, mock_client)
+        receiver.dead_letter_message.side_effect = RuntimeError("DLQ unavailable")
 
-    # ----- dead_letter_message ------------------------------------------------
+        assert await svc.dead_letter_message(messages[0]) is False
 
-    def test_dead_letter_message_calls_dead_letter_with_reason(self):
+    async def test_settlement_without_receiver_returns_false(self):
         svc, _ = self._make_svc_with_mock_client()
-        msg = MagicMock()
-        result = svc.dead_letter_message(msg, reason="payload invalid")
-        assert result is True
-        msg.dead_letter.assert_called_once_with(
-            reason="payload invalid", error_description="payload invalid"
+        msg = QueueMessage(body="{}", queue_name="never-received", raw=MagicMock())
+        assert await svc.complete_message(msg) is False
+
+    async def test_dead_letter_message_passes_reason(self):
+        svc, mock_client = self._make_svc_with_mock_client()
+        receiver, messages = await self._received(svc, mock_client)
+
+        assert await svc.dead_letter_message(messages[0], reason="payload invalid") is True
+        receiver.dead_letter_message.assert_awaited_once_with(
+            messages[0].raw, reason="payload invalid", error_description="payload invalid"
         )
 
-    def test_dead_letter_message_returns_false_on_attribute_error(self):
-        svc, _ = self._make_svc_with_mock_client()
-        msg = MagicMock(spec=[])  # No .dead_letter() attribute
-        result = svc.dead_letter_message(msg, reason="bad")
-        assert result is False
+    async def test_abandon_message(self):
+        svc, mock_client = self._make_svc_with_mock_client()
+        receiver, messages = await self._received(svc, mock_client)
 
-    def test_dead_letter_message_returns_false_on_exception(self):
-        svc, _ = self._make_svc_with_mock_client()
-        msg = MagicMock()
-        msg.dead_letter.side_effect = RuntimeError("DLQ unavailable")
-        result = svc.dead_letter_message(msg)
-        assert result is False
+        assert await svc.abandon_message(messages[1]) is True
+        receiver.abandon_message.assert_awaited_once_with(messages[1].raw)
 
     # ----- peek_dead_letters --------------------------------------------------
 
-    def test_peek_dead_letters_queries_dlq_subqueue(self):
+    async def test_peek_dead_letters_uses_dlq_subqueue(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        mock_receiver = MagicMock()
-        mock_receiver.__enter__ = MagicMock(return_value=mock_receiver)
-        mock_receiver.__exit__ = MagicMock(return_value=False)
-        fake_dlq_msgs = [MagicMock()]
-        mock_receiver.peek_messages.return_value = fake_dlq_msgs
-        mock_client.get_queue_receiver.return_value = mock_receiver
+        receiver = AsyncMock()
+        receiver.__aenter__.return_value = receiver
+        receiver.peek_messages.return_value = [_sdk_message("dead")]
+        mock_client.get_queue_receiver.return_value = receiver
 
-        result = svc.peek_dead_letters("my-queue", max_count=5)
-        assert result == fake_dlq_msgs
+        with patch("marketplace.services.servicebus_service.ServiceBusSubQueue", create=True) as SubQueue:
+            result = await svc.peek_dead_letters("my-queue", max_count=5)
 
-        call_kwargs = mock_client.get_queue_receiver.call_args
-        assert "my-queue/$deadletterqueue" in str(call_kwargs)
+        assert [str(m) for m in result] == ["dead"]
+        assert mock_client.get_queue_receiver.call_args.kwargs["sub_queue"] is SubQueue.DEAD_LETTER
 
-    def test_peek_dead_letters_returns_empty_on_exception(self):
+    async def test_peek_dead_letters_returns_empty_on_exception(self):
         svc, mock_client = self._make_svc_with_mock_client()
         mock_client.get_queue_receiver.side_effect = RuntimeError("forbidden")
 
-        result = svc.peek_dead_letters("my-queue")
-        assert result == []
+        assert await svc.peek_dead_letters("my-queue") == []
 
     # ----- close --------------------------------------------------------------
 
-    def test_close_closes_all_senders_and_client(self):
+    async def test_close_closes_links_and_client(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        sender1 = MagicMock()
-        sender2 = MagicMock()
-        svc._senders = {"q1": sender1, "q2": sender2}
+        mock_client.close = AsyncMock()
+        sender, receiver = AsyncMock(), AsyncMock()
+        svc._senders = {"q1": sender}
+        svc._receivers = {"q1": receiver}
 
-        svc.close()
+        await svc.close()
 
-        sender1.close.assert_called_once()
-        sender2.close.assert_called_once()
-        mock_client.close.assert_called_once()
+        sender.close.assert_awaited_once()
+        receiver.close.assert_awaited_once()
+        mock_client.close.assert_awaited_once()
         assert svc._client is None
-        assert svc._senders == {}
+        assert svc._senders == {} and svc._receivers == {}
 
-    def test_close_tolerates_sender_close_exception(self):
+    async def test_close_tolerates_link_close_exception(self):
         svc, mock_client = self._make_svc_with_mock_client()
-        broken_sender = MagicMock()
+        mock_client.close = AsyncMock()
+        broken_sender = AsyncMock()
         broken_sender.close.side_effect = RuntimeError("already closed")
         svc._senders = {"q1": broken_sender}
 
-        # Should not raise
-        svc.close()
+        await svc.close()
         assert svc._client is None
 
 
@@ -395,13 +379,12 @@ class TestServiceBusServiceWithClient:
 
 
 class TestGetServicebusService:
-    def test_returns_servicebus_service_instance(self):
-        # Reset singleton first
+    def test_without_connection_string_returns_local_backend(self):
         import marketplace.services.servicebus_service as sbs_mod
         sbs_mod._servicebus_service = None
 
         svc = get_servicebus_service()
-        assert isinstance(svc, ServiceBusService)
+        assert isinstance(svc, LocalQueueBackend)
 
     def test_returns_same_instance_on_repeated_calls(self):
         import marketplace.services.servicebus_service as sbs_mod
@@ -939,8 +922,8 @@ class TestEnqueueWebhookDelivery:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
-            mock_svc.send_message.return_value = False  # stub mode
+            mock_svc = AsyncMock()
+            mock_svc.send_message.return_value = False  # broker unavailable
             mock_get_svc.return_value = mock_svc
 
             result = await enqueue_webhook_delivery(
@@ -970,7 +953,7 @@ class TestEnqueueWebhookDelivery:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.send_message.return_value = True
             mock_get_svc.return_value = mock_svc
 
@@ -998,7 +981,7 @@ class TestProcessWebhookQueue:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.receive_messages.return_value = []
             mock_get_svc.return_value = mock_svc
 
@@ -1022,7 +1005,7 @@ class TestProcessWebhookQueue:
         ) as mock_get_svc, patch(
             "marketplace.services.webhook_v2_service.httpx.AsyncClient"
         ) as mock_http:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.receive_messages.return_value = [mock_msg]
             mock_svc.complete_message.return_value = True
             mock_get_svc.return_value = mock_svc
@@ -1055,7 +1038,7 @@ class TestProcessWebhookQueue:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.receive_messages.return_value = [mock_msg]
             mock_svc.complete_message.return_value = True
             mock_get_svc.return_value = mock_svc
@@ -1081,7 +1064,7 @@ class TestProcessWebhookQueue:
         ) as mock_get_svc, patch(
             "marketplace.services.webhook_v2_service.httpx.AsyncClient"
         ) as mock_http:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.receive_messages.return_value = [mock_msg]
             mock_svc.dead_letter_message.return_value = True
             mock_get_svc.return_value = mock_svc
@@ -1120,7 +1103,7 @@ class TestProcessWebhookQueue:
         ) as mock_get_svc, patch(
             "marketplace.services.webhook_v2_service.httpx.AsyncClient"
         ) as mock_http:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.receive_messages.return_value = [mock_msg]
             mock_svc.send_message.return_value = True
             mock_svc.complete_message.return_value = True
@@ -1159,7 +1142,7 @@ class TestProcessWebhookQueue:
         ) as mock_get_svc, patch(
             "marketplace.services.webhook_v2_service.httpx.AsyncClient"
         ) as mock_http:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.receive_messages.return_value = [mock_msg]
             mock_svc.send_message.return_value = True
             mock_svc.complete_message.return_value = True
@@ -1187,7 +1170,7 @@ class TestProcessWebhookQueue:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.receive_messages.return_value = [mock_msg]
             mock_svc.complete_message.return_value = True
             mock_get_svc.return_value = mock_svc
@@ -1197,6 +1180,101 @@ class TestProcessWebhookQueue:
 
         assert result["delivered"] == 0
 
+    async def test_each_message_is_settled_before_the_next_is_delivered(
+        self, db: AsyncSession
+    ):
+        """Locks must not run out while later messages in the batch are delivered."""
+        events: list[str] = []
+        messages = []
+        for name in ("first", "second"):
+            msg = MagicMock()
+            body = {"subscription_id": name, "event": {"callback_url": f"http://example.com/{name}"}}
+            msg.__str__ = lambda self, body=body: json.dumps(body)
+            messages.append(msg)
+
+        async def _post(url, json):
+            events.append(f"post {url.rsplit('/', 1)[-1]}")
+            return MagicMock(status_code=200)
+
+        async def _complete(msg):
+            events.append(f"complete {messages.index(msg)}")
+            return True
+
+        with patch(
+            "marketplace.services.webhook_v2_service.get_servicebus_service"
+        ) as mock_get_svc, patch(
+            "marketplace.services.webhook_v2_service.httpx.AsyncClient"
+        ) as mock_http:
+            mock_svc = AsyncMock()
+            mock_svc.receive_messages.return_value = messages
+            mock_svc.complete_message.side_effect = _complete
+            mock_get_svc.return_value = mock_svc
+            client = AsyncMock()
+            client.__aenter__.return_value = client
+            client.post.side_effect = _post
+            mock_http.return_value = client
+
+            result = await process_webhook_queue(db)
+
+        assert result["delivered"] == 2
+        assert events == ["post first", "complete 0", "post second", "complete 1"]
+        mock_svc.complete_messages.assert_not_called()
+
+    async def test_unexpected_error_abandons_the_message(self, db: AsyncSession):
+        mock_msg = MagicMock()
+        mock_msg.__str__ = lambda self: json.dumps({"subscription_id": "s", "event": []})
+
+        with patch(
+            "marketplace.services.webhook_v2_service.get_servicebus_service"
+        ) as mock_get_svc:
+            mock_svc = AsyncMock()
+            mock_svc.receive_messages.return_value = [mock_msg]
+            mock_get_svc.return_value = mock_svc
+
+            result = await process_webhook_queue(db)
+
+        assert result["failed"] == 1
+        mock_svc.abandon_message.assert_awaited_once_with(mock_msg)
+        mock_svc.complete_message.assert_not_called()
+
+    async def test_receive_errors_propagate(self, db: AsyncSession):
+        with patch(
+            "marketplace.services.webhook_v2_service.get_servicebus_service"
+        ) as mock_get_svc:
+            mock_svc = AsyncMock()
+            mock_svc.receive_messages.side_effect = RuntimeError("link detached")
+            mock_get_svc.return_value = mock_svc
+
+            with pytest.raises(RuntimeError):
+                await process_webhook_queue(db)
+
+
+class TestWebhookConsumerLoop:
+    async def test_failures_back_off_exponentially_and_reset_on_success(self):
+        from marketplace.services import webhook_v2_service
+
+        outcomes = [RuntimeError("down")] * 5 + [{}, RuntimeError("down")]
+        delays: list[float] = []
+
+        async def _process(db):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        async def _sleep(seconds):
+            delays.append(seconds)
+            if not outcomes:
+                raise asyncio.CancelledError
+
+        with patch.object(webhook_v2_service, "process_webhook_queue", _process), \
+                patch.object(webhook_v2_service.asyncio, "sleep", _sleep), \
+                patch("marketplace.database.async_session", new=TestSession):
+            with pytest.raises(asyncio.CancelledError):
+                await webhook_v2_service.webhook_consumer_loop(initial_delay=1)
+
+        assert delays == [1, 5.0, 10.0, 20.0, 40.0, 60.0, 5.0]
+
 
 # =============================================================================
 # webhook_v2_service — dead letter management
@@ -1239,7 +1317,7 @@ class TestRetryDeadLetters:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.send_message.return_value = True
             mock_get_svc.return_value = mock_svc
 
@@ -1263,7 +1341,7 @@ class TestRetryDeadLetters:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.send_message.return_value = True
             mock_get_svc.return_value = mock_svc
 
@@ -1290,7 +1368,7 @@ class TestRetryDeadLetters:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_get_svc.return_value = mock_svc
 
             results = await retry_dead_letters(db)
@@ -1305,7 +1383,7 @@ class TestRetryDeadLetters:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_get_svc.return_value = mock_svc
 
             results = await retry_dead_letters(db)
@@ -1337,7 +1415,7 @@ class TestRetryDeadLetter:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_svc.send_message.return_value = True
             mock_get_svc.return_value = mock_svc
 
@@ -1351,7 +1429,7 @@ class TestRetryDeadLetter:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_get_svc.return_value = mock_svc
 
             result = await retry_dead_letter(db, "nonexistent-entry-id")
@@ -1375,7 +1453,7 @@ class TestRetryDeadLetter:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
             mock_get_svc.return_value = mock_svc
 
             result = await retry_dead_letter(db, entry.id)
@@ -1402,7 +1480,7 @@ class TestRetryDeadLetter:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_svc = MagicMock()
+            mock_svc = AsyncMock()
 
             def _capture_send(queue, msg_body, **kwargs):
                 captured_messages.append(msg_body)
@@ -1601,7 +1679,7 @@ class TestWebhookV2ServiceClassWrapper:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_bus = MagicMock()
+            mock_bus = AsyncMock()
             mock_bus.send_message.return_value = False
             mock_get_svc.return_value = mock_bus
 
@@ -1621,7 +1699,7 @@ class TestWebhookV2ServiceClassWrapper:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_bus = MagicMock()
+            mock_bus = AsyncMock()
             mock_bus.receive_messages.return_value = []
             mock_get_svc.return_value = mock_bus
 
@@ -1634,7 +1712,7 @@ class TestWebhookV2ServiceClassWrapper:
         with patch(
             "marketplace.services.webhook_v2_service.get_servicebus_service"
         ) as mock_get_svc:
-            mock_bus = MagicMock()
+            mock_bus = AsyncMock()
             mock_get_svc.return_value = mock_bus
 
             result = await svc.retry(db, "nonexistent-id")
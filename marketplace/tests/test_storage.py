@@ -404,6 +404,47 @@ async def test_size_decrements_after_delete(store):
     assert store.size() == 1
 
 
+# ===========================================================================
+# HashFS — async methods
+# ===========================================================================
+
+async def test_async_methods_round_trip(store):
+    """aput/aget/aexists/adelete mirror their blocking counterparts."""
+    h = await store.aput(b"async payload")
+    assert h == _prefixed(b"async payload")
+    assert await store.aget(h) == b"async payload"
+    assert await store.aexists(h) is True
+    assert await store.adelete(h) is True
+    assert await store.aget(h) is None
+
+
+async def test_async_calls_run_on_the_store_io_pool(store):
+    """Blocking work happens on the store's own named threads."""
+    import threading
+
+    seen = []
+    original = store.get
+
+    def _get(content_hash):
+        seen.append(threading.current_thread().name)
+        return original(content_hash)
+
+    store.get = _get
+    await store.aget(store.put(b"x"))
+    assert seen and seen[0].startswith("hashfs-io")
+    store.shutdown_io()
+    assert await store.aexists(_prefixed(b"x")) is True  # pool is recreated
+
+
+async def test_astream_yields_chunks_and_none_when_missing(store):
+    """astream() returns None for unknown content, chunks otherwise."""
+    content = b"streamed " * 5000
+    h = await store.aput_stream(iter([content[:100], content[100:]]))
+    assert await store.astream(_prefixed(b"nope")) is None
+    parts = [part async for part in await store.astream(h)]
+    assert b"".join(parts) == content
+
+
 # ===========================================================================
 # HashFS — _normalize_hash
 # ===========================================================================
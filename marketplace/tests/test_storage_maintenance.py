@@ -0,0 +1,197 @@
+"""Tests for the HashFS inventory, storage GC and the integrity scrubber."""
+
+from __future__ import annotations
+
+import hashlib
+import time
+import uuid
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import insert
+
+from marketplace.models.listing import DataListing
+from marketplace.services import storage_maintenance_service as maintenance
+from marketplace.storage.azure_blob import AzureBlobStore
+from marketplace.storage.hashfs import HashFS
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HashFS(str(tmp_path / "store"))
+
+
+def test_inventory_tracks_puts_deletes_and_reads(store) -> None:
+    first = store.put(b"alpha")
+    store.put(b"alpha")
+    store.put_stream([b"be", b"ta"])
+    assert store.stats() == {"objects": 2, "bytes": 9, "chunks": 0, "chunk_bytes": 0}
+
+    assert store.get(first) == b"alpha"
+    by_hash = {blob.content_hash: blob for blob in store.inventory()}
+    assert by_hash[first].refcount == 2 and by_hash[first].last_access is not None
+    assert list(by_hash) == sorted(by_hash)
+
+    assert store.delete(first) is True
+    assert store.stats()["objects"] == 1
+
+
+def test_known_content_is_not_written_again(store, monkeypatch) -> None:
+    store.put(b"dedup me")
+    monkeypatch.setattr(type(store), "_ensure_dir", MagicMock(side_effect=AssertionError))
+    assert store.put(b"dedup me") == store.compute_hash(b"dedup me")
+
+
+def test_existing_store_is_indexed_off_the_constructor(tmp_path) -> None:
+    root = tmp_path / "store"
+    legacy = HashFS(str(root))
+    hashes = [legacy.put(f"legacy {i}".encode()) for i in range(3)]
+    legacy._inventory.close()
+    (root / ".inventory.db").unlink()
+    for suffix in ("-wal", "-shm"):
+        (root / f".inventory.db{suffix}").unlink(missing_ok=True)
+
+    with patch.object(HashFS, "_walk_blobs", side_effect=AssertionError):
+        reopened = HashFS(str(root))  # the constructor does not walk the tree
+    assert reopened.size() == 0
+
+    assert reopened.ensure_indexed() is True
+    assert reopened.ensure_indexed() is False
+    assert reopened.size() == 3
+    assert sorted(blob.content_hash for blob in reopened.inventory()) == sorted(hashes)
+
+
+async def test_gc_sweeps_only_unreferenced_blobs_past_grace(db, make_agent, store) -> None:
+    agent, _ = await make_agent()
+    kept = store.put(b"listed content")
+    orphan = store.put(b"orphaned content")
+    await db.execute(insert(DataListing).values(
+        id=str(uuid.uuid4()), seller_id=agent.id, title="kept", category="web_search",
+        content_hash=kept, content_size=14, price_usdc=Decimal("1"), status="active",
+    ))
+    await db.commit()
+
+    fresh = await maintenance.collect_garbage(db, store)
+    assert fresh["swept"] == 0  # both are inside the grace period
+
+    dry = await maintenance.collect_garbage(db, store, grace_hours=0, dry_run=True)
+    assert (dry["swept"], store.exists(orphan)) == (1, True)
+
+    report = await maintenance.collect_garbage(db, store, grace_hours=0)
+    assert report == {
+        "scanned": 2, "swept": 1, "bytes_freed": 16, "chunks_swept": 0,
+        "chunk_bytes_freed": 0, "live": 1, "dry_run": False,
+    }
+    assert store.exists(kept) and not store.exists(orphan)
+    assert store.size() == 1
+
+
+async def test_gc_keeps_a_blob_stored_again_after_the_inventory_read(db, store, monkeypatch) -> None:
+    orphan = store.put(b"about to be listed again")
+    time.sleep(0.01)
+    listed = store.inventory
+
+    def _racing_inventory(after=None):
+        for blob in listed(after):
+            store.put(b"about to be listed again")  # lands between read and delete
+            yield blob
+
+    monkeypatch.setattr(store, "inventory", _racing_inventory)
+    report = await maintenance.collect_garbage(db, store, grace_hours=0)
+
+    assert report["swept"] == 0
+    assert store.get(orphan) == b"about to be listed again"
+    assert store.size() == 1
+
+
+def test_azure_gc_delete_is_conditional_on_last_modified() -> None:
+    from azure.core.exceptions import ResourceModifiedError
+
+    blob_client = MagicMock()
+    blob_client.delete_blob.side_effect = ResourceModifiedError("ConditionNotMet")
+    azure = AzureBlobStore.__new__(AzureBlobStore)
+    azure._blob_client = MagicMock(return_value=blob_client)
+
+    assert azure.delete_stale("sha256:" + "ab" * 32, 1_700_000_000.0) is False
+    since = blob_client.delete_blob.call_args.kwargs["if_unmodified_since"]
+    assert since.timestamp() == 1_700_000_000.0
+
+
+def test_scrub_quarantines_corrupt_blobs_and_resumes(store) -> None:
+    hashes = sorted(store.put(f"blob {i}".encode()) for i in range(5))
+    damaged = hashes[1]
+    store._hash_to_path(damaged.removeprefix("sha256:")).write_bytes(b"bit rot")
+    vanished = hashes[3]
+    store._hash_to_path(vanished.removeprefix("sha256:")).unlink()
+
+    first = maintenance.scrub(store, max_objects=2, bytes_per_second=0)
+    assert (first["checked"], first["corrupt"]) == (2, [damaged])
+    assert first["cursor"] == damaged.removeprefix("sha256:")
+
+    second = maintenance.scrub(store, after=first["cursor"], max_objects=10, bytes_per_second=0)
+    assert (second["checked"], second["missing"], second["cursor"]) == (3, [vanished], None)
+
+    assert (store.root / ".quarantine" / damaged.removeprefix("sha256:")).exists()
+    assert store.size() == 3
+
+
+def test_scrub_respects_the_read_budget(store) -> None:
+    store.put(b"x" * 2000)
+    started = time.monotonic()
+    report = maintenance.scrub(store, bytes_per_second=10_000)
+    assert report["bytes"] == 2000
+    assert time.monotonic() - started >= 0.18
+
+
+def test_azure_inventory_lists_blobs_and_snapshots_stats() -> None:
+    hex_hash = hashlib.sha256(b"cloud").hexdigest()
+    blob = MagicMock(size=5, last_modified=None, last_accessed_on=None)
+    blob.name = f"sha256/{hex_hash[:2]}/{hex_hash[2:4]}/{hex_hash}"
+    client = MagicMock()
+    client.get_container_client.return_value.list_blobs.return_value = [blob]
+    azure = AzureBlobStore.__new__(AzureBlobStore)
+    azure._container_name = "content-store"
+    azure._client = client
+
+    assert azure.stats()["as_of"] is None
+    assert [info.hex_hash for info in azure.inventory()] == [hex_hash]
+    stats = maintenance.storage_stats(azure)
+    assert (stats["objects"], stats["bytes"]) == (1, 5) and stats["as_of"]
+
+
+async def test_only_one_worker_maintains_a_hashfs_root(tmp_path) -> None:
+    pytest.importorskip("fcntl")
+    first, second = HashFS(str(tmp_path / "store")), HashFS(str(tmp_path / "store"))
+
+    assert await maintenance.is_maintenance_leader(first) is True
+    assert await maintenance.is_maintenance_leader(second) is False
+    assert await maintenance.is_maintenance_leader(first) is True  # still held
+
+
+async def test_replicas_sharing_azure_elect_one_leader(monkeypatch) -> None:
+    class _Redis:
+        def __init__(self):
+            self.data = {}
+
+        async def get(self, key):
+            return self.data.get(key)
+
+        async def set(self, key, value, px=None, nx=False):
+            if nx and key in self.data:
+                return None
+            self.data[key] = value.encode()
+            return True
+
+    redis = _Redis()
+
+    async def _shared_redis():
+        return redis
+
+    monkeypatch.setattr(maintenance, "get_shared_redis", _shared_redis)
+    azure = AzureBlobStore.__new__(AzureBlobStore)
+
+    assert await maintenance.is_maintenance_leader(azure) is True
+    assert await maintenance.is_maintenance_leader(azure) is True  # renews its own lease
+    monkeypatch.setattr(maintenance, "_INSTANCE_ID", "other-replica")
+    assert await maintenance.is_maintenance_leader(azure) is False
@@ -0,0 +1,259 @@
+"""Tests for TieredCache: shared L2, single-flight loads, invalidation, snapshots."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from marketplace.config import settings
+from marketplace.models.agent import RegisteredAgent
+from marketplace.models.listing import DataListing
+from marketplace.services import cache_service
+from marketplace.services.cache_service import TieredCache, restore, snapshot
+
+
+class FakeRedis:
+    """The few Redis commands the cache uses, in memory."""
+
+    def __init__(self, fail: bool = False):
+        self.data: dict[str, bytes] = {}
+        self.published: list[tuple[str, bytes]] = []
+        self.fail = fail
+
+    def _check(self):
+        if self.fail:
+            raise ConnectionError("redis down")
+
+    async def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    async def set(self, key, value, px=None, nx=False):
+        self._check()
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    async def delete(self, key):
+        self._check()
+        return int(self.data.pop(key, None) is not None)
+
+    async def incr(self, key):
+        self._check()
+        value = int(self.data.get(key, b"0")) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    async def pexpire(self, key, ms):
+        self._check()
+        return int(key in self.data)
+
+    async def publish(self, channel, message):
+        self._check()
+        self.published.append((channel, message))
+        return 1
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(settings, "redis_url", "redis://fake:6379/0")
+    monkeypatch.setattr(cache_service, "_redis", fake)
+    monkeypatch.setattr(cache_service, "_redis_retry_at", 0.0)
+    return fake
+
+
+async def test_l2_is_shared_between_processes(redis) -> None:
+    worker_a = TieredCache("shared-test", maxsize=8, default_ttl=60)
+    worker_b = TieredCache("shared-test", maxsize=8, default_ttl=60)
+
+    await worker_a.aput("k", {"v": 1})
+
+    assert worker_b.get("k") is None  # not in B's L1
+    assert await worker_b.aget("k") == {"v": 1}
+    assert worker_b.get("k") == {"v": 1}  # refilled from L2
+    assert worker_b.stats()["l2_hits"] == 1 and worker_b.stats()["shared"] is True
+
+
+async def test_invalidation_reaches_other_processes(redis) -> None:
+    cache = TieredCache("inval-test", maxsize=8, default_ttl=60)
+    await cache.aput("k", 1)
+
+    await cache.ainvalidate("k")
+    assert "cache:inval-test:k" not in redis.data
+    (channel, message), = redis.published
+    assert channel == settings.cache_invalidation_channel
+
+    cache.put("k", 2)
+    cache_service._apply_invalidation(message)  # our own message: ignored
+    assert cache.get("k") == 2
+    cache_service._apply_invalidation(message.replace(cache_service._INSTANCE_ID.encode(), b"other"))
+    assert cache.get("k") is None
+
+
+async def test_concurrent_misses_share_one_load() -> None:
+    cache = TieredCache("flight-test", maxsize=8, default_ttl=60)
+    calls = 0
+
+    async def _load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"loaded": True}
+
+    results = await asyncio.gather(*(cache.get_or_load("k", _load) for _ in range(10)))
+
+    assert calls == 1
+    assert all(result == {"loaded": True} for result in results)
+
+
+async def test_failed_load_reaches_every_waiter_and_is_not_cached() -> None:
+    cache = TieredCache("error-test", maxsize=8, default_ttl=60)
+
+    async def _load():
+        await asyncio.sleep(0.01)
+        raise LookupError("gone")
+
+    results = await asyncio.gather(
+        *(cache.get_or_load("k", _load) for _ in range(3)), return_exceptions=True,
+    )
+    assert all(isinstance(result, LookupError) for result in results)
+    assert cache.get("k") is None
+
+
+async def test_replica_waits_for_another_replicas_load(redis) -> None:
+    cache = TieredCache("lock-test", maxsize=8, default_ttl=60)
+    redis.data["cache:lock-test:k:loading"] = b"other-replica"
+
+    async def _other_replica_finishes():
+        await asyncio.sleep(0.1)
+        redis.data["cache:lock-test:k"] = b'{"from": "other"}'
+
+    async def _load():
+        raise AssertionError("should have used the other replica's result")
+
+    asyncio.ensure_future(_other_replica_finishes())
+    assert await cache.get_or_load("k", _load) == {"from": "other"}
+
+
+async def test_replica_stops_waiting_when_the_other_load_yields_nothing(redis) -> None:
+    cache = TieredCache("lock-release-test", maxsize=8, default_ttl=60)
+    redis.data["cache:lock-release-test:k:loading"] = b"other-replica"
+
+    async def _other_replica_gives_up():
+        await asyncio.sleep(0.1)
+        del redis.data["cache:lock-release-test:k:loading"]  # loader raised / found nothing
+
+    async def _load():
+        return None
+
+    asyncio.ensure_future(_other_replica_gives_up())
+    started = time.monotonic()
+    assert await cache.get_or_load("k", _load) is None
+    assert time.monotonic() - started < cache_service._LOAD_LOCK_MS / 1000 / 2
+
+
+async def test_load_invalidated_locally_is_not_cached(redis) -> None:
+    cache = TieredCache("stale-local-test", maxsize=8, default_ttl=60)
+
+    async def _load():
+        snapshot_before_write = {"v": "old"}
+        await cache.ainvalidate("k")  # a write commits while the load runs
+        return snapshot_before_write
+
+    assert await cache.get_or_load("k", _load) == {"v": "old"}
+    assert cache.get("k") is None
+    assert "cache:stale-local-test:k" not in redis.data
+
+
+async def test_load_invalidated_by_another_process_is_not_cached(redis) -> None:
+    cache = TieredCache("stale-remote-test", maxsize=8, default_ttl=60)
+    other_process = TieredCache("stale-remote-test", maxsize=8, default_ttl=60)
+
+    async def _load():
+        await other_process.ainvalidate("k")  # pub/sub has not reached us yet
+        return {"v": "old"}
+
+    await cache.get_or_load("k", _load)
+    assert cache.get("k") is None
+    assert "cache:stale-remote-test:k" not in redis.data
+
+    async def _fresh():
+        return {"v": "new"}
+
+    assert await cache.get_or_load("k", _fresh) == {"v": "new"}
+    assert redis.data["cache:stale-remote-test:k"] == b'{"v":"new"}'
+
+
+async def test_invalidation_racing_the_write_takes_it_back(redis, monkeypatch) -> None:
+    cache = TieredCache("stale-race-test", maxsize=8, default_ttl=60)
+    aput = cache.aput
+
+    async def _invalidated_just_before_write(key, value, ttl=None):
+        await redis.incr("cache:stale-race-test:k:gen")  # other process: bump ...
+        await redis.delete("cache:stale-race-test:k")    # ... then delete
+        await aput(key, value, ttl)
+
+    monkeypatch.setattr(cache, "aput", _invalidated_just_before_write)
+
+    async def _load():
+        return {"v": "old"}
+
+    await cache.get_or_load("k", _load)
+    assert cache.get("k") is None
+    assert "cache:stale-race-test:k" not in redis.data
+
+
+async def test_heartbeat_keeps_the_cached_agent(db, make_agent, redis) -> None:
+    from marketplace.services import registry_service
+    from marketplace.services.cache_service import agent_cache
+
+    agent, _ = await make_agent()
+    await registry_service.get_agent(db, agent.id)
+    redis.published.clear()
+
+    beat = await registry_service.heartbeat(db, agent.id)
+
+    assert beat.last_seen_at is not None
+    assert agent_cache.get(f"agent:{agent.id}") is not None
+    assert redis.published == []
+
+
+async def test_redis_failure_degrades_to_l1(redis) -> None:
+    cache = TieredCache("down-test", maxsize=8, default_ttl=60)
+    redis.fail = True
+
+    await cache.aput("k", 1)
+    assert await cache.aget("k") == 1
+    assert cache_service._redis is None  # dropped, retried later
+
+
+async def test_snapshot_restores_without_sql(db, make_agent, make_listing) -> None:
+    agent, _ = await make_agent()
+    listing = await make_listing(agent.id, price_usdc=1.25)
+    data = snapshot(listing)
+    assert Decimal(data["price_usdc"]) == Decimal("1.25")  # JSON-native: a string
+    db.expunge_all()
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.bind.sync_engine, "before_cursor_execute", listener)
+    try:
+        restored = await restore(db, DataListing, data)
+    finally:
+        event.remove(db.bind.sync_engine, "before_cursor_execute", listener)
+
+    assert statements == []
+    assert restored in db and restored.id == listing.id
+    assert restored.price_usdc == Decimal("1.25")
+    assert restored.created_at == listing.created_at
+    assert await restore(db, DataListing, data) is restored
+    assert snapshot(await restore(db, RegisteredAgent, snapshot(agent)))["id"] == agent.id
@@ -0,0 +1,249 @@
+"""Tests for buffered usage metering and counter-backed limit checks."""
+
+import asyncio
+import statistics
+import time
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event, func, insert, select, text
+
+from marketplace.models.billing import UsageCounter, UsageMeter
+from marketplace.services import billing_v2_service, usage_metering_service
+
+pytestmark = pytest.mark.asyncio
+
+
+def _uid() -> str:
+    return str(uuid.uuid4())
+
+
+async def _plan_and_subscription(db, agent_id, api_calls_limit=1000):
+    plan = await billing_v2_service.create_plan(
+        db, name=f"plan-{_uid()[:8]}", price_monthly=9.99, api_calls_limit=api_calls_limit,
+    )
+    await billing_v2_service.subscribe(db, agent_id, plan.id)
+    return plan
+
+
+async def _count(db, model, agent_id):
+    result = await db.execute(select(func.count(model.id)).where(model.agent_id == agent_id))
+    return int(result.scalar() or 0)
+
+
+class _StatementCounter:
+    def __init__(self, db):
+        self.engine = db.get_bind()
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+async def test_record_usage_is_buffered_until_flush(db):
+    agent_id = _uid()
+    for _ in range(10):
+        await billing_v2_service.record_usage(db, agent_id, "api_calls", 5)
+
+    assert await _count(db, UsageMeter, agent_id) == 0
+    assert await usage_metering_service.flush_usage(db) == 1
+
+    counter = (await db.execute(
+        select(UsageCounter).where(UsageCounter.agent_id == agent_id)
+    )).scalar_one()
+    assert float(counter.value) == pytest.approx(50)
+    # Ten data points coalesce into one history row per flush.
+    assert await _count(db, UsageMeter, agent_id) == 1
+
+
+async def test_flush_upserts_existing_counter(db):
+    agent_id = _uid()
+    await billing_v2_service.record_usage(db, agent_id, "api_calls", 100)
+    await usage_metering_service.flush_usage(db)
+    await billing_v2_service.record_usage(db, agent_id, "api_calls", 25)
+    await usage_metering_service.flush_usage(db)
+
+    usage = await billing_v2_service.get_period_usage(db, agent_id)
+    assert usage == {"api_calls": pytest.approx(125)}
+    assert await _count(db, UsageCounter, agent_id) == 1
+
+
+async def test_failed_flush_keeps_usage_buffered(db):
+    agent_id = _uid()
+    await billing_v2_service.record_usage(db, agent_id, "storage", 3)
+
+    async def _broken_upsert(session, drained):
+        await session.execute(text("UPDATE no_such_table SET value = 1"))
+
+    with patch.object(usage_metering_service, "_upsert_counters", _broken_upsert):
+        with pytest.raises(Exception):
+            await usage_metering_service.flush_usage(db)
+
+    # The failed write ran in its own session: the caller's is still usable.
+    assert len(usage_metering_service.usage_buffer) == 1
+    assert await _count(db, UsageMeter, agent_id) == 0
+    assert await usage_metering_service.flush_usage(db) == 1
+    assert (await billing_v2_service.get_period_usage(db, agent_id))["storage"] == pytest.approx(3)
+
+
+async def test_usage_read_during_flush_commit_is_not_double_counted(db):
+    """A total read between a flush's commit and its settle counts the delta once."""
+    agent_id = _uid()
+    period_start = billing_v2_service._current_period_start()
+    usage_metering_service.record(agent_id, "api_calls", 10, period_start)
+    committed, release = asyncio.Event(), asyncio.Event()
+    write_usage = usage_metering_service._write_usage
+
+    async def _write_then_pause(session, drained):
+        await write_usage(session, drained)
+        committed.set()
+        await release.wait()
+
+    with patch.object(usage_metering_service, "_write_usage", _write_then_pause):
+        flush = asyncio.create_task(usage_metering_service.flush_usage(db))
+        await committed.wait()
+        total = asyncio.create_task(
+            usage_metering_service.current_usage(db, agent_id, "api_calls", period_start)
+        )
+        totals = asyncio.create_task(usage_metering_service.period_usage(db, agent_id, period_start))
+        await asyncio.sleep(0.05)
+        release.set()
+        await flush
+
+    assert await total == pytest.approx(10)
+    assert await totals == {"api_calls": pytest.approx(10)}
+
+
+async def test_cached_totals_are_bounded():
+    buffer = usage_metering_service.UsageBuffer(max_totals=2)
+    keys = [(_uid(), "api_calls", None) for _ in range(3)]
+    for key in keys:
+        buffer.store_total(key, 1.0)
+
+    assert buffer.cached_total(keys[0], ttl=60) is None
+    assert buffer.cached_total(keys[2], ttl=60) == 1.0
+    assert buffer.cached_total(keys[1], ttl=-1) is None  # expired entries are dropped
+    assert len(buffer._totals) == 1
+
+
+async def test_batch_size_triggers_inline_flush(db):
+    with patch.object(billing_v2_service.settings, "usage_flush_batch_size", 3):
+        for _ in range(3):
+            await billing_v2_service.record_usage(db, _uid(), "api_calls", 1)
+
+    assert len(usage_metering_service.usage_buffer) == 0
+    total = (await db.execute(select(func.count(UsageCounter.id)))).scalar()
+    assert total == 3
+
+
+async def test_check_limits_counts_unflushed_usage(db):
+    agent_id = _uid()
+    await _plan_and_subscription(db, agent_id, api_calls_limit=100)
+
+    await billing_v2_service.record_usage(db, agent_id, "api_calls", 60)
+    assert (await billing_v2_service.check_limits(db, agent_id, "api_calls"))["allowed"] is True
+    await usage_metering_service.flush_usage(db)
+    await billing_v2_service.record_usage(db, agent_id, "api_calls", 60)
+
+    result = await billing_v2_service.check_limits(db, agent_id, "api_calls")
+    assert result["current"] == pytest.approx(120)
+    assert result["allowed"] is False
+
+
+async def test_plan_limits_cache_invalidated_on_subscribe(db):
+    agent_id = _uid()
+    assert (await billing_v2_service.check_limits(db, agent_id, "api_calls"))["limit"] == 0
+
+    await _plan_and_subscription(db, agent_id, api_calls_limit=42)
+    assert (await billing_v2_service.check_limits(db, agent_id, "api_calls"))["limit"] == 42
+
+
+async def test_check_limits_latency_flat_as_usage_rows_grow(db):
+    """Load test: limit-check cost does not grow with the period's usage rows."""
+    agent_id = _uid()
+    await _plan_and_subscription(db, agent_id, api_calls_limit=10_000_000)
+    period_start = billing_v2_service._current_period_start()
+    period_end = usage_metering_service.period_end_for(period_start)
+
+    async def _grow_history(rows: int) -> None:
+        await db.execute(insert(UsageMeter), [
+            {
+                "agent_id": agent_id,
+                "metric_name": "api_calls",
+                "value": Decimal("1"),
+                "period_start": period_start,
+                "period_end": period_end,
+            }
+            for _ in range(rows)
+        ])
+        await db.commit()
+        usage_metering_service.record(agent_id, "api_calls", rows, period_start)
+        await usage_metering_service.flush_usage(db)
+
+    async def _measure() -> tuple[float, int]:
+        timings = []
+        with _StatementCounter(db) as counter:
+            for _ in range(20):
+                # Cold caches: worst case is still a fixed number of lookups.
+                billing_v2_service.invalidate_plan_cache(agent_id)
+                usage_metering_service.usage_buffer.clear()
+                start = time.perf_counter()
+                await billing_v2_service.check_limits(db, agent_id, "api_calls")
+                timings.append(time.perf_counter() - start)
+        return statistics.median(timings), counter.count
+
+    await _grow_history(100)
+    small_latency, small_statements = await _measure()
+    await _grow_history(20_000)
+    large_latency, large_statements = await _measure()
+
+    result = await billing_v2_service.check_limits(db, agent_id, "api_calls")
+    assert result["current"] == pytest.approx(20_100)
+    assert 0 < large_statements == small_statements
+    assert large_latency < small_latency * 5 + 0.005
+
+    # Warm path: cached plan and running total answer without any query.
+    with _StatementCounter(db) as counter:
+        await billing_v2_service.check_limits(db, agent_id, "api_calls")
+    assert counter.count == 0
+
+
+async def test_counters_are_backfilled_from_usage_recorded_before_they_existed(db):
+    """Usage metered before ``usage_counters`` existed still counts toward limits."""
+    agent_id = _uid()
+    await _plan_and_subscription(db, agent_id, api_calls_limit=100)
+    period_start = billing_v2_service._current_period_start()
+    await db.execute(insert(UsageMeter), [
+        {
+            "agent_id": agent_id,
+            "metric_name": "api_calls",
+            "value": Decimal("45"),
+            "period_start": period_start,
+            "period_end": usage_metering_service.period_end_for(period_start),
+        }
+        for _ in range(2)
+    ])
+    await db.commit()
+    assert await _count(db, UsageCounter, agent_id) == 0
+
+    await usage_metering_service.backfill_counters(db)
+    await usage_metering_service.backfill_counters(db)  # idempotent
+    counter = (await db.execute(
+        select(UsageCounter).where(UsageCounter.agent_id == agent_id)
+    )).scalar_one()
+    assert float(counter.value) == pytest.approx(90)
+
+    await billing_v2_service.record_usage(db, agent_id, "api_calls", 20)
+    await usage_metering_service.flush_usage(db)
+    result = await billing_v2_service.check_limits(db, agent_id, "api_calls")
+    assert result["current"] == pytest.approx(110)
+    assert result["allowed"] is False
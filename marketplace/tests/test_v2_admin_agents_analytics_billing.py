@@ -428,6 +428,37 @@ class TestAdminPayouts:
         assert resp.status_code == 422
 
 
+class TestAdminReverifyListings:
+    """POST /api/v2/admin/listings/reverify"""
+
+    async def test_reverify_schedules_bulk_run(self, client, make_creator, db):
+        from unittest.mock import patch
+
+        admin_creator, admin_token = await make_creator()
+        await seed_system_roles(db)
+        await assign_role(db, admin_creator.id, "creator", "admin", "system")
+
+        with patch(
+            "marketplace.services.listing_trust_pipeline.schedule_reverify_all_listings"
+        ) as schedule:
+            resp = await client.post(
+                "/api/v2/admin/listings/reverify",
+                headers={"Authorization": f"Bearer {admin_token}"},
+            )
+
+        assert resp.status_code == 202
+        assert resp.json() == {"scheduled": True, "status": "active"}
+        schedule.assert_called_once_with(status="active", requested_by=admin_creator.id)
+
+    async def test_reverify_rejects_non_admin(self, client, make_creator):
+        _, token = await make_creator()
+        resp = await client.post(
+            "/api/v2/admin/listings/reverify",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert resp.status_code == 403
+
+
 class TestAdminStreamToken:
     """GET /api/v2/admin/events/stream-token"""
 
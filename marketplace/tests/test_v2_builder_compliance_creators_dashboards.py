@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import uuid
 
 from marketplace.core.auth import decode_stream_token
@@ -253,12 +254,22 @@ async def test_compliance_data_export_happy_path(client, make_agent):
     assert response.status_code == 200
     body = response.json()
     assert "job_id" in body
-    assert body["status"] == "completed"
+    assert body["status"] in ("pending", "running", "completed")
     assert body["agent_id"] == agent.id
     assert body["format"] == "json"
-    assert body["download_url"] is not None
     assert "created_at" in body
 
+    # The export runs in the background; poll until it finishes
+    for _ in range(100):
+        status = await client.get(
+            f"/api/v2/compliance/data-export/{body['job_id']}", headers=headers,
+        )
+        if status.json()["status"] == "completed":
+            break
+        await asyncio.sleep(0.02)
+    assert status.json()["status"] == "completed"
+    assert status.json()["download_url"] is not None
+
 
 async def test_compliance_data_export_no_auth_returns_401(client):
     response = await client.post(
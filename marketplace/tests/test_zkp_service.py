@@ -4,12 +4,16 @@ Tests use in-memory SQLite via conftest fixtures.
 All 4 proof types are tested: merkle_root, schema, bloom_filter, metadata.
 """
 
+import base64
+import hashlib
 import json
 from datetime import datetime, timezone
 
 import pytest
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from marketplace.core.exceptions import ConflictError
 from marketplace.services import zkp_service
 from marketplace.models.zkproof import ZKProof
 
@@ -317,7 +321,7 @@ async def test_generate_proofs_schema_proof(db: AsyncSession, make_listing, make
 
 
 async def test_generate_proofs_bloom_filter_proof(db: AsyncSession, make_listing, make_agent):
-    """Bloom filter proof contains bloom_hex and metadata."""
+    """Bloom filter proof stores raw bits in proof_blob plus parameters."""
     agent, _ = await make_agent("seller4")
     listing = await make_listing(agent.id)
 
@@ -331,14 +335,212 @@ async def test_generate_proofs_bloom_filter_proof(db: AsyncSession, make_listing
     bloom_proof = next(p for p in proofs if p.proof_type == "bloom_filter")
     proof_data = json.loads(bloom_proof.proof_data)
 
-    assert "bloom_hex" in proof_data
+    assert "bloom_hex" not in proof_data
     assert proof_data["size_bytes"] == 256
     assert proof_data["hash_count"] == 3
+    assert proof_data["hash_scheme"] == zkp_service.BLOOM_SCHEME
+    assert len(bloom_proof.proof_blob) == 256
 
     # Verify words are in the bloom filter
-    bloom_bytes = bytes.fromhex(proof_data["bloom_hex"])
-    assert zkp_service.check_bloom(bloom_bytes, "blockchain")
-    assert zkp_service.check_bloom(bloom_bytes, "bitcoin")
+    bloom_bytes, scheme = zkp_service.bloom_from_proof(bloom_proof)
+    assert zkp_service.check_bloom(bloom_bytes, "blockchain", scheme)
+    assert zkp_service.check_bloom(bloom_bytes, "bitcoin", scheme)
+    assert zkp_service.public_inputs_for(bloom_proof)["bloom_hex"] == bloom_bytes.hex()
+
+
+def test_bloom_from_proof_reads_legacy_hex_rows():
+    """Rows written before proof_blob keep working with seeded hashing."""
+    bloom = bytearray(zkp_service.BLOOM_SIZE)
+    for seed in range(zkp_service.BLOOM_HASHES):
+        bit = zkp_service._bloom_hash("legacy", seed)
+        bloom[bit // 8] |= 1 << (bit % 8)
+    proof = ZKProof(
+        listing_id="x",
+        proof_type="bloom_filter",
+        commitment="c",
+        proof_data=json.dumps({"bloom_hex": bytes(bloom).hex(), "size_bytes": 256, "hash_count": 3}),
+        public_inputs="{}",
+    )
+
+    bloom_bytes, scheme = zkp_service.bloom_from_proof(proof)
+    assert zkp_service.check_bloom(bloom_bytes, "legacy", scheme)
+
+
+@pytest.mark.parametrize("step", [1, 7, 1000, 4096])
+def test_proof_builder_is_chunking_invariant(step):
+    """Any chunking of the stream yields the same leaves, bloom and schema."""
+    content = ("Grüße aus Köln — déjà vu " * 200 + '{"k": 1}').encode("utf-8")
+    builder = zkp_service.ProofBuilder()
+    for i in range(0, len(content), step):
+        builder.update(content[i:i + step])
+
+    assert [leaf.hex() for leaf in builder.leaves()] == zkp_service.build_merkle_tree(content)["leaves"]
+    assert builder.bloom() == zkp_service.build_bloom_filter(content)
+    assert builder.schema() == zkp_service.extract_schema(content)
+    assert zkp_service.check_bloom(builder.bloom(), "grüße")
+    assert zkp_service.check_bloom(builder.bloom(), "köln")
+
+
+def test_proof_builder_streams_text_stats_past_parse_limit(monkeypatch):
+    """Past SCHEMA_PARSE_LIMIT the builder stops buffering and counts text."""
+    monkeypatch.setattr(zkp_service, "SCHEMA_PARSE_LIMIT", 16)
+    content = b"one two\nthree four five\nsix"
+    builder = zkp_service.ProofBuilder()
+    for i in range(0, len(content), 5):
+        builder.update(content[i:i + 5])
+
+    assert builder.schema() == zkp_service.extract_schema(content)
+
+
+@pytest.mark.parametrize("size", [1, 1024, 3 * 1024 + 5, 7 * 1024])
+def test_inclusion_proofs_recompute_root(size):
+    """Every chunk's sibling path folds back to the persisted root."""
+    content = bytes(i % 251 for i in range(size))
+    material = zkp_service.compute_proof_material(content)
+    tree = zkp_service.MerkleTree(material["merkle_levels"], material["leaf_count"])
+
+    assert tree.root == material["merkle_root"]
+    assert tree.depth == material["depth"]
+    for index in range(tree.leaf_count):
+        chunk = content[index * zkp_service.CHUNK_SIZE:(index + 1) * zkp_service.CHUNK_SIZE]
+        leaf = hashlib.sha256(chunk).hexdigest()
+        path = tree.inclusion_proof(index)
+        assert len(path) == tree.depth
+        assert zkp_service.verify_inclusion(leaf, path, tree.root)
+        assert not zkp_service.verify_inclusion(hashlib.sha256(b"forged").hexdigest(), path, tree.root)
+
+
+def test_merkle_tree_rejects_mismatched_blob():
+    with pytest.raises(ValueError):
+        zkp_service.MerkleTree(b"\x00" * 64, 2)
+
+
+def _legacy_merkle_root(content: bytes) -> str:
+    """Root as rows without ``hash_scheme`` computed it: parents hash hex strings."""
+    size = zkp_service.CHUNK_SIZE
+    level = [hashlib.sha256(content[i:i + size]).hexdigest() for i in range(0, len(content), size)]
+    while len(level) > 1:
+        level = [
+            hashlib.sha256((level[i] + level[min(i + 1, len(level) - 1)]).encode()).hexdigest()
+            for i in range(0, len(level), 2)
+        ]
+    return level[0]
+
+
+async def test_merkle_tree_serves_legacy_rows_without_rewriting_them(
+    db: AsyncSession, make_listing, make_agent,
+):
+    """Rows without a packed tree keep their published root; proofs verify against it."""
+    agent, _ = await make_agent()
+    content = bytes(range(256)) * 10  # 3 chunks, the last one partial
+    listing = await make_listing(agent.id, content=content)
+    root = _legacy_merkle_root(content)
+    db.add(ZKProof(
+        listing_id=listing.id,
+        proof_type="merkle_root",
+        commitment=root,
+        proof_data=json.dumps({"leaf_count": 3, "depth": 2}),
+        public_inputs=json.dumps({"root": root, "leaf_count": 3, "depth": 2}),
+    ))
+    await db.commit()
+
+    proof = await zkp_service.get_inclusion_proof(db, listing.id, 2)
+
+    assert proof["root"] == root
+    assert proof["hash_scheme"] != zkp_service.MERKLE_SCHEME
+    leaf = hashlib.sha256(content[2 * zkp_service.CHUNK_SIZE:]).hexdigest()
+    assert proof["leaf_hash"] == leaf
+    assert zkp_service.verify_inclusion(leaf, proof["proof"], root, proof["hash_scheme"])
+    assert not zkp_service.verify_inclusion(leaf, proof["proof"], root)
+    stored = (await db.execute(
+        select(ZKProof.commitment, ZKProof.proof_blob).where(ZKProof.listing_id == listing.id)
+    )).one()
+    assert tuple(stored) == (root, None)
+
+
+async def test_merkle_tree_rejects_legacy_rows_whose_content_changed(
+    db: AsyncSession, make_listing, make_agent,
+):
+    agent, _ = await make_agent()
+    listing = await make_listing(agent.id, content=b"x" * 2500)
+    db.add(ZKProof(
+        listing_id=listing.id,
+        proof_type="merkle_root",
+        commitment="legacy-root",
+        proof_data=json.dumps({"leaf_count": 3, "depth": 2}),
+        public_inputs=json.dumps({"root": "legacy-root", "leaf_count": 3, "depth": 2}),
+    ))
+    await db.commit()
+
+    with pytest.raises(ConflictError):
+        await zkp_service.get_merkle_tree(db, listing.id)
+
+
+async def test_decoded_proofs_are_cached(db: AsyncSession, make_listing, make_agent):
+    agent, _ = await make_agent()
+    listing = await make_listing(agent.id)
+    content = b"cached proof material"
+    await zkp_service.generate_proofs(
+        db, listing.id, content, "web_search", len(content), datetime.now(timezone.utc), 0.5,
+    )
+
+    first = await zkp_service.get_decoded_proofs(db, listing.id)
+    second = await zkp_service.get_decoded_proofs(db, listing.id)
+    assert first is second
+    zkp_service.invalidate_proof_cache(listing.id)
+    assert await zkp_service.get_decoded_proofs(db, listing.id) is not first
+
+
+async def test_proof_headers_leave_the_merkle_tree_to_its_own_cache(
+    db: AsyncSession, make_listing, make_agent, monkeypatch,
+):
+    """Bloom and keyword checks never decode the tree; trees are cached by bytes."""
+    from marketplace.services.cache_service import merkle_tree_cache
+
+    agent, _ = await make_agent()
+    listing = await make_listing(agent.id)
+    content = b"tree material " * 500
+    await zkp_service.generate_proofs(
+        db, listing.id, content, "web_search", len(content), datetime.now(timezone.utc), 0.5,
+    )
+
+    monkeypatch.setattr(zkp_service, "MerkleTree", None)  # decoding it would fail
+    assert (await zkp_service.bloom_check_word(db, listing.id, "tree"))["probably_present"]
+    assert "tree" not in (await zkp_service.get_decoded_proofs(db, listing.id))["merkle_root"]
+    monkeypatch.undo()
+
+    tree = await zkp_service.get_merkle_tree(db, listing.id)
+    assert await zkp_service.get_merkle_tree(db, listing.id) is tree
+    assert merkle_tree_cache.stats()["bytes_used"] == len(tree.blob)
+    zkp_service.invalidate_proof_cache(listing.id)
+    assert merkle_tree_cache.stats()["bytes_used"] == 0
+
+
+async def test_verified_chunks_read_only_the_requested_range(
+    db: AsyncSession, make_listing, make_agent, monkeypatch,
+):
+    from marketplace.services import cdn_service
+    from marketplace.storage.hashfs import HashFS
+
+    agent, _ = await make_agent()
+    content = bytes(range(256)) * 40  # 10 chunks
+    listing = await make_listing(agent.id, content=content)
+    await zkp_service.generate_proofs(
+        db, listing.id, content, "web_search", len(content), datetime.now(timezone.utc), 0.5,
+    )
+
+    async def _no_full_read(*args):
+        raise AssertionError("read the whole content")
+
+    monkeypatch.setattr(cdn_service, "get_content", _no_full_read)
+    monkeypatch.setattr(HashFS, "get", _no_full_read)
+    result = await zkp_service.get_verified_chunks(db, listing.id, agent.id, start=4, count=3)
+
+    size = zkp_service.CHUNK_SIZE
+    assert [c["index"] for c in result["chunks"]] == [4, 5, 6]
+    assert b"".join(
+        base64.b64decode(c["data"]) for c in result["chunks"]
+    ) == content[4 * size:7 * size]
 
 
 async def test_generate_proofs_metadata_proof(db: AsyncSession, make_listing, make_agent):